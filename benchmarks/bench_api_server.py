@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+手动交易 API 服务器压测
+
+用模拟的手动交易处理器（查询持仓耗时 --positions-ms，平仓耗时 --close-ms）启动 API 服务器，
+若干客户端线程在 keep-alive 连接上持续请求 /positions，另有若干线程持续请求 /close，
+统计每个接口的请求数、每秒请求数和 p50 / p99 延迟。
+
+--compare 时先用改造前的方式（单线程 HTTPServer、HTTP/1.0 每次请求新建连接）跑一遍作为对照。
+
+用法:
+    python benchmarks/bench_api_server.py --duration 5 --readers 16 --closers 2 --compare
+"""
+import argparse
+import http.client
+import os
+import statistics
+import sys
+import threading
+import time
+from collections import defaultdict
+from http.server import HTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.trading.manual_order_api import ManualOrderAPIHandler, ManualOrderAPIServer
+
+
+class StubOrderHandler:
+    """模拟手动交易处理器"""
+    
+    def __init__(self, positions_ms: float, close_ms: float, positions: int = 50):
+        self.positions_delay = positions_ms / 1000
+        self.close_delay = close_ms / 1000
+        self.manual_positions = {str(i): None for i in range(positions)}
+    
+    def get_positions_view(self):
+        time.sleep(self.positions_delay)
+        return 'v1', [
+            {'order_id': order_id, 'symbol': 'BTCUSDT', 'current_price': 100.0, 'pnl_percent': 0.0}
+            for order_id in self.manual_positions
+        ]
+    
+    def close_position_by_id(self, order_id):
+        time.sleep(self.close_delay)
+        return True
+    
+    def execute_manual_order(self, order):
+        time.sleep(self.close_delay)
+        return '1'
+
+
+class LegacyHandler(ManualOrderAPIHandler):
+    """改造前的协议：HTTP/1.0，每个响应后关闭连接"""
+    
+    protocol_version = 'HTTP/1.0'
+
+
+class LegacyServer:
+    """改造前的服务器：单线程 HTTPServer，请求在接收线程中串行处理"""
+    
+    def __init__(self, order_handler):
+        LegacyHandler.order_handler = order_handler
+        self.server = HTTPServer(('127.0.0.1', 0), LegacyHandler)
+        self.address = self.server.server_address[:2]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+    
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class ThreadedServer:
+    """新的服务器"""
+    
+    def __init__(self, order_handler, order_workers, query_workers):
+        self.api = ManualOrderAPIServer(
+            order_handler,
+            host='127.0.0.1',
+            port=0,
+            order_workers=order_workers,
+            query_workers=query_workers,
+            max_pending_queries=1024
+        )
+        self.api.start()
+        self.address = self.api.address
+    
+    def stop(self):
+        self.api.stop()
+
+
+def client_loop(address, method, path, deadline, results, lock):
+    """在一个 keep-alive 连接上持续发送请求（服务器关闭连接时自动重连）"""
+    conn = http.client.HTTPConnection(*address, timeout=60)
+    latencies = []
+    errors = 0
+    
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=b'' if method == 'POST' else None)
+            response = conn.getresponse()
+            response.read()
+            if response.status >= 500:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+    
+    conn.close()
+    with lock:
+        results[path.split('/')[1]]['latencies'].extend(latencies)
+        results[path.split('/')[1]]['errors'] += errors
+
+
+def run(name, server, args):
+    results = defaultdict(lambda: {'latencies': [], 'errors': 0})
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+    
+    threads = [
+        threading.Thread(target=client_loop, args=(server.address, 'GET', '/positions', deadline, results, lock))
+        for _ in range(args.readers)
+    ] + [
+        threading.Thread(target=client_loop, args=(server.address, 'POST', '/close/1', deadline, results, lock))
+        for _ in range(args.closers)
+    ]
+    
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.stop()
+    
+    print(f"\n[{name}]")
+    total = 0
+    for endpoint, data in sorted(results.items()):
+        latencies = sorted(data['latencies'])
+        total += len(latencies)
+        if not latencies:
+            print(f"  /{endpoint:<10} 无成功请求  错误 {data['errors']}")
+            continue
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(
+            f"  /{endpoint:<10} 请求数 {len(latencies):>6}  "
+            f"{len(latencies) / elapsed:8.1f} req/s  "
+            f"p50 {statistics.median(latencies):8.2f} ms  "
+            f"p99 {p99:8.2f} ms  "
+            f"错误 {data['errors']}"
+        )
+    print(f"  合计 {total / elapsed:.1f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='手动交易 API 服务器压测')
+    parser.add_argument('--duration', type=float, default=5.0, help='每轮压测时长（秒）')
+    parser.add_argument('--readers', type=int, default=16, help='请求 /positions 的客户端数')
+    parser.add_argument('--closers', type=int, default=2, help='请求 /close 的客户端数')
+    parser.add_argument('--positions-ms', type=float, default=20.0, help='模拟查询持仓耗时（毫秒）')
+    parser.add_argument('--close-ms', type=float, default=5.0, help='模拟平仓耗时（毫秒）')
+    parser.add_argument('--order-workers', type=int, default=4)
+    parser.add_argument('--query-workers', type=int, default=4)
+    parser.add_argument('--compare', action='store_true', help='先用改造前的单线程服务器跑一轮对照')
+    args = parser.parse_args()
+    
+    print(
+        f"时长 {args.duration}s, 持仓查询客户端 {args.readers}, 平仓客户端 {args.closers}, "
+        f"查询耗时 {args.positions_ms}ms, 平仓耗时 {args.close_ms}ms"
+    )
+    
+    handler = StubOrderHandler(args.positions_ms, args.close_ms)
+    if args.compare:
+        run('单线程 HTTPServer（改造前）', LegacyServer(handler), args)
+    run(
+        f'多线程 + keep-alive（下单 {args.order_workers} / 查询 {args.query_workers} 线程）',
+        ThreadedServer(handler, args.order_workers, args.query_workers),
+        args
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+回测引擎基准测试
+
+生成多个交易对若干年的 15m K线，测量 DoubleMaBacktester.run_many 的耗时，
+并与逐根K线调用 DoubleMaStrategy.analyze 的重放方式（按少量K线测得的单根耗时外推）对比。
+
+用法:
+    python benchmarks/bench_backtest.py --symbols 36 --years 3
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.backtest import DoubleMaBacktester
+from src.market.kline_decoder import KLINE_DTYPE
+from src.strategies.double_ma import DoubleMaStrategy
+
+BAR_MS = 15 * 60 * 1000
+
+
+def make_bars(count, seed):
+    rng = np.random.default_rng(seed)
+    bars = np.zeros(count, dtype=KLINE_DTYPE)
+    bars['open_time'] = 1600000000000 // BAR_MS * BAR_MS + np.arange(count, dtype=np.int64) * BAR_MS
+    bars['close_time'] = bars['open_time'] + BAR_MS - 1
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.006, count)))
+    bars['close'] = close
+    bars['open'] = np.concatenate(([close[0]], close[:-1]))
+    return bars
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回测引擎基准测试')
+    parser.add_argument('--symbols', type=int, default=36)
+    parser.add_argument('--years', type=float, default=3)
+    args = parser.parse_args()
+    
+    logging.getLogger('trading_bot').setLevel(logging.ERROR)
+    
+    count = int(args.years * 365 * 24 * 4)
+    universe = {f"SYM{i}USDT": make_bars(count, i) for i in range(args.symbols)}
+    
+    backtester = DoubleMaBacktester()
+    start = time.perf_counter()
+    portfolio = backtester.run_many(universe, '15m')
+    elapsed = time.perf_counter() - start
+    
+    total_bars = count * args.symbols
+    print(f"交易对: {args.symbols}, 每个交易对K线: {count}, 总K线: {total_bars}")
+    print(f"回测引擎: {elapsed:.2f} s ({total_bars / elapsed / 1e6:.2f} M 根/秒), 交易 {portfolio.stats['trades']} 笔")
+    
+    # 逐根调用 analyze 的耗时（取 2000 根K线测量后外推）
+    sample = universe['SYM0USDT'][:2000]
+    strategy = DoubleMaStrategy()
+    start = time.perf_counter()
+    for t in range(len(sample)):
+        now = datetime.fromtimestamp((int(sample['close_time'][t]) + 1) / 1000)
+        strategy.analyze('SYM0USDT', sample[:t + 1], '15m', now=now)
+    per_bar = (time.perf_counter() - start) / len(sample)
+    print(f"逐根 analyze 重放（外推）: {per_bar * total_bars:.1f} s ({per_bar * 1e6:.1f} us/根)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+批量指标基准测试
+
+对比每个策略周期计算所有交易对六条均线、密集度和价格位置的耗时：
+  - 逐个交易对：calculate_all_mas + check_ma_convergence + check_price_position
+  - BatchIndicatorEngine：整个 (交易对 × K线) 矩阵一次向量化计算
+
+用法:
+    python benchmarks/bench_batch_indicators.py --symbols 4 50 200 --bars 150
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.strategies.indicators import TechnicalIndicators
+from src.strategies.batch_indicators import BatchIndicatorEngine
+
+SMA_PERIODS = [20, 60, 120]
+EMA_PERIODS = [20, 60, 120]
+
+
+def per_symbol(matrix):
+    """原始实现：逐个交易对计算"""
+    for closes in matrix:
+        ma_data = {}
+        for period in SMA_PERIODS:
+            ma_data[f'sma_{period}'] = TechnicalIndicators.sma(closes, period)
+        for period in EMA_PERIODS:
+            ma_data[f'ema_{period}'] = TechnicalIndicators.ema(closes, period)
+        values = [v for v in ma_data.values() if v > 0]
+        TechnicalIndicators.check_ma_convergence(values, 2.0)
+        TechnicalIndicators.check_price_position(float(closes[-1]), values)
+
+
+def measure(func, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='批量指标基准测试')
+    parser.add_argument('--symbols', type=int, nargs='+', default=[4, 50, 200])
+    parser.add_argument('--bars', type=int, default=150)
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(42)
+    engine = BatchIndicatorEngine(SMA_PERIODS, EMA_PERIODS)
+    
+    print(f"{'交易对数量':>10}  {'逐个计算':>12} {'批量计算':>12} {'加速比':>8}")
+    for count in args.symbols:
+        matrix = 100 + np.cumsum(rng.normal(0, 0.5, (count, args.bars)), axis=1)
+        symbols = [f"SYM{i}USDT" for i in range(count)]
+        
+        legacy_ms = measure(lambda: per_symbol(matrix), args.repeats)
+        batch_ms = measure(lambda: engine.compute(symbols, matrix), args.repeats)
+        print(f"{count:>10}  {legacy_ms:>9.3f} ms {batch_ms:>9.3f} ms {legacy_ms / batch_ms:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+HTTP 会话池基准测试
+
+在本地启动一个模拟 AsterDEX 的 HTTP 服务器，分别用旧的模块级 requests 调用
+（每次请求新建连接）和会话池（keep-alive）跑完整的高频策略周期，对比单次请求延迟。
+
+服务器在每个新 TCP 连接上人为延迟 --handshake-ms 毫秒，用来模拟公网 TCP+TLS 握手。
+
+用法:
+    python benchmarks/bench_http_pool.py --cycles 5 --handshake-ms 30
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import requests
+from eth_account import Account
+
+from src.api import AsterDexClient
+from src.strategies import DoubleMaStrategy
+from src.trading import Trader, RiskManager
+
+
+SYMBOLS = ['BTCUSDT', 'ETHUSDT', 'BNBUSDT', 'ASTERUSDT']
+
+
+def make_klines(limit: int):
+    """生成模拟K线"""
+    now = int(time.time() * 1000) // 900000 * 900000
+    klines = []
+    for i in range(limit):
+        open_time = now - (limit - i) * 900000
+        price = 100 + (i % 20) * 0.1
+        klines.append([
+            open_time, f"{price:.2f}", f"{price + 0.5:.2f}", f"{price - 0.5:.2f}",
+            f"{price + 0.1:.2f}", "1000.0", open_time + 899999, "100000.0",
+            100, "500.0", "50000.0", "0"
+        ])
+    return klines
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """模拟交易所接口"""
+    
+    protocol_version = 'HTTP/1.1'
+    handshake_delay = 0.0
+    
+    def setup(self):
+        # 每个新连接模拟一次握手耗时
+        time.sleep(self.handshake_delay)
+        super().setup()
+        # 与真实服务器一致，关闭 Nagle 避免与延迟 ACK 叠加
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def log_message(self, format, *args):
+        pass
+    
+    def _reply(self, data):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _route(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/fapi/v1/klines':
+            return make_klines(int(query.get('limit', ['500'])[0]))
+        if url.path == '/fapi/v3/balance':
+            return [{'asset': 'USDT', 'availableBalance': '1000.0'}]
+        if url.path == '/fapi/v3/positionRisk':
+            return []
+        if url.path == '/fapi/v1/ticker/price':
+            return {'symbol': query.get('symbol', [''])[0], 'price': '100.0'}
+        return {}
+    
+    def do_GET(self):
+        self._reply(self._route())
+    
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length', 0))
+        self.rfile.read(length)
+        self._reply({})
+    
+    do_DELETE = do_POST
+
+
+class LegacyAsterDexClient(AsterDexClient):
+    """改造前的请求方式：模块级 requests 调用，每次新建连接"""
+    
+    def _request(self, method, endpoint, params=None, signed=False):
+        url = self.api_base_url + endpoint
+        params = self._sign_request(params or {}) if signed else (params or {})
+        if method == 'GET':
+            response = requests.get(url, params=params, timeout=30)
+        elif method == 'POST':
+            response = requests.post(url, data=params, timeout=30)
+        else:
+            response = requests.delete(url, data=params, timeout=30)
+        response.raise_for_status()
+        return response.json()
+
+
+class TimedClientMixin:
+    """记录每次请求耗时"""
+    
+    def _request(self, *args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return super()._request(*args, **kwargs)
+        finally:
+            self.latencies.append((time.perf_counter() - start) * 1000)
+
+
+class TimedLegacyClient(TimedClientMixin, LegacyAsterDexClient):
+    pass
+
+
+class TimedPooledClient(TimedClientMixin, AsterDexClient):
+    pass
+
+
+def run_cycle(client, strategy, trader):
+    """复刻 TradingBot._run_high_frequency_strategy 的请求模式"""
+    for symbol in SYMBOLS:
+        klines = client.get_klines(symbol=symbol, interval='15m', limit=150)
+        strategy.analyze(symbol, klines, '15m')
+        # 模拟有信号时的执行路径（余额 + 持仓查询）
+        trader.execute_signal(symbol, {'action': 'CLOSE', 'confidence': 80}, '15m')
+
+
+def bench(client_cls, base_url, cycles, http_config=None):
+    account = Account.create()
+    client = client_cls(
+        user=account.address,
+        signer=account.address,
+        private_key=account.key.hex(),
+        api_base_url=base_url,
+        http_config=http_config
+    )
+    client.latencies = []
+    strategy = DoubleMaStrategy()
+    trader = Trader(client, None, RiskManager(), strategy)
+    
+    cycle_times = []
+    for _ in range(cycles):
+        start = time.perf_counter()
+        run_cycle(client, strategy, trader)
+        cycle_times.append((time.perf_counter() - start) * 1000)
+    
+    client.close()
+    return client.latencies, cycle_times
+
+
+def summarize(name, latencies, cycle_times):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name:<10} 请求数 {len(latencies):>4}  "
+        f"均值 {statistics.mean(latencies):7.2f} ms  "
+        f"p50 {statistics.median(latencies):7.2f} ms  "
+        f"p99 {p99:7.2f} ms  "
+        f"周期均值 {statistics.mean(cycle_times):8.2f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='HTTP 会话池基准测试')
+    parser.add_argument('--cycles', type=int, default=5)
+    parser.add_argument('--handshake-ms', type=float, default=30.0)
+    args = parser.parse_args()
+    
+    StandInHandler.handshake_delay = args.handshake_ms / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StandInHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    
+    print(f"模拟握手延迟: {args.handshake_ms} ms, 周期数: {args.cycles}, 交易对: {len(SYMBOLS)}")
+    summarize('旧实现', *bench(TimedLegacyClient, base_url, args.cycles))
+    summarize('会话池', *bench(TimedPooledClient, base_url, args.cycles))
+    
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
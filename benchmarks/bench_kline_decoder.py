@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+K线解码基准测试
+
+从原始响应体（bytes）开始计时，对比：
+  - 原始实现：json.loads + parse_klines 的 7 次列表推导 + 转为 NumPy 数组供指标计算
+  - decode_klines：json.loads 后一次转换为结构化数组
+  - decode_klines_json：从响应体解码为结构化数组（安装了 orjson 时用 orjson 解析）
+
+用法:
+    python benchmarks/bench_kline_decoder.py --sizes 150 1500 100000
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.market.kline_decoder import decode_klines, decode_klines_json
+
+
+def make_payload(count):
+    """生成与 /fapi/v1/klines 相同格式的响应体"""
+    rng = np.random.default_rng(42)
+    closes = 30000 + np.cumsum(rng.normal(0, 20, count))
+    start = 1700000000000
+    klines = []
+    for i, close in enumerate(closes):
+        open_time = start + i * 60000
+        klines.append([
+            open_time,
+            f"{close - 5:.2f}",
+            f"{close + 15:.2f}",
+            f"{close - 15:.2f}",
+            f"{close:.2f}",
+            f"{rng.uniform(10, 500):.3f}",
+            open_time + 59999,
+            f"{rng.uniform(1e5, 1e7):.5f}",
+            int(rng.integers(100, 5000)),
+            f"{rng.uniform(5, 250):.3f}",
+            f"{rng.uniform(5e4, 5e6):.5f}",
+            "0"
+        ])
+    return json.dumps(klines, separators=(',', ':')).encode('utf-8')
+
+
+def legacy_decode(payload):
+    """原始实现"""
+    klines = json.loads(payload)
+    parsed = {
+        'open_time': [int(k[0]) for k in klines],
+        'open': [float(k[1]) for k in klines],
+        'high': [float(k[2]) for k in klines],
+        'low': [float(k[3]) for k in klines],
+        'close': [float(k[4]) for k in klines],
+        'volume': [float(k[5]) for k in klines],
+        'close_time': [int(k[6]) for k in klines]
+    }
+    # 指标层把列表转回 NumPy（np.mean / pd.Series）
+    return {name: np.asarray(values) for name, values in parsed.items()}
+
+
+def measure(func, payload, repeats):
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func(payload)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='K线解码基准测试')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[150, 1500, 100000])
+    parser.add_argument('--repeats', type=int, default=0, help='重复次数（默认按规模自动选择）')
+    args = parser.parse_args()
+    
+    candidates = [
+        ('原始实现', legacy_decode),
+        ('decode_klines', lambda payload: decode_klines(json.loads(payload))),
+        ('decode_klines_json', decode_klines_json)
+    ]
+    
+    print(f"{'K线数量':>10}  {'实现':<20} {'中位耗时':>12} {'加速比':>8}")
+    for size in args.sizes:
+        payload = make_payload(size)
+        repeats = args.repeats or max(5, min(500, 200000 // size))
+        
+        # 结果一致性检查
+        expected = legacy_decode(payload)
+        bars = decode_klines_json(payload)
+        for name in ('open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time'):
+            assert np.array_equal(expected[name], bars[name]), name
+        
+        baseline = None
+        for name, func in candidates:
+            elapsed = measure(func, payload, repeats)
+            baseline = baseline or elapsed
+            print(f"{size:>10}  {name:<20} {elapsed:>9.3f} ms {baseline / elapsed:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
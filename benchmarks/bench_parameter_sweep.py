@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+参数扫描基准测试
+
+生成多个交易对的 15m K线，分别用单进程和进程池评估同一批参数组合，
+输出每组参数的平均耗时和加速比（进程池的加速比受 CPU 核数限制）。
+
+用法:
+    python benchmarks/bench_parameter_sweep.py --symbols 12 --years 1 --samples 24 --workers 4
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.backtest import DEFAULT_PARAM_SPACE, ParameterSweep, random_samples
+from src.market.kline_decoder import KLINE_DTYPE
+
+BAR_MS = 15 * 60 * 1000
+
+
+def make_bars(count, seed):
+    rng = np.random.default_rng(seed)
+    bars = np.zeros(count, dtype=KLINE_DTYPE)
+    bars['open_time'] = 1600000000000 // BAR_MS * BAR_MS + np.arange(count, dtype=np.int64) * BAR_MS
+    bars['close_time'] = bars['open_time'] + BAR_MS - 1
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.006, count)))
+    bars['close'] = close
+    bars['open'] = np.concatenate(([close[0]], close[:-1]))
+    return bars
+
+
+def main():
+    parser = argparse.ArgumentParser(description='参数扫描基准测试')
+    parser.add_argument('--symbols', type=int, default=12)
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--samples', type=int, default=24)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+    
+    logging.getLogger('trading_bot').setLevel(logging.ERROR)
+    
+    count = int(args.years * 365 * 24 * 4)
+    universe = {f"SYM{i}USDT": make_bars(count, i) for i in range(args.symbols)}
+    param_sets = random_samples(DEFAULT_PARAM_SPACE, args.samples, seed=0)
+    
+    print(f"交易对: {args.symbols}, 每个交易对K线: {count}, 参数组合: {len(param_sets)}, CPU: {os.cpu_count()}")
+    
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for workers in sorted({1, args.workers}):
+            sweep = ParameterSweep('15m', data_dir=tmp, workers=workers)
+            sweep.load(universe)
+            start = time.perf_counter()
+            results = sweep.run(param_sets, output='')
+            timings[workers] = time.perf_counter() - start
+            print(
+                f"{workers} 个进程: {timings[workers]:.2f} s "
+                f"({timings[workers] / len(param_sets) * 1000:.0f} ms/组), "
+                f"最优 sharpe {results[0]['stats'].get('sharpe', 0):.2f}"
+            )
+    
+    if args.workers > 1:
+        print(f"加速比: {timings[1] / timings[args.workers]:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
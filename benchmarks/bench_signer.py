@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+请求签名基准测试
+
+对比原始 _sign_request 实现与 AsterDexSigner 的签名吞吐量（次/秒）和 p50/p99 延迟。
+
+用法:
+    python benchmarks/bench_signer.py --iterations 2000
+"""
+import argparse
+import json
+import math
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from eth_abi import encode
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from web3 import Web3
+
+from src.api.signer import AsterDexSigner, trim_dict
+
+
+ORDER_PARAMS = {
+    'symbol': 'BTCUSDT',
+    'side': 'BUY',
+    'type': 'MARKET',
+    'quantity': '0.001',
+    'positionSide': 'BOTH',
+    'reduceOnly': False
+}
+
+
+def make_legacy_signer(user, signer, private_key, recv_window=50000):
+    """原始实现：每次都重新编码、重新解析私钥"""
+    def sign(params):
+        nonce = math.trunc(time.time() * 1000000)
+        params = {key: value for key, value in params.items() if value is not None}
+        params['recvWindow'] = recv_window
+        params['timestamp'] = int(round(time.time() * 1000))
+        trimmed_params = trim_dict(params.copy())
+        json_str = json.dumps(trimmed_params, sort_keys=True).replace(' ', '').replace("'", '\\"')
+        encoded = encode(['string', 'address', 'address', 'uint256'], [json_str, user, signer, nonce])
+        keccak_hex = Web3.keccak(encoded).hex()
+        signable_msg = encode_defunct(hexstr=keccak_hex)
+        signed_message = Account.sign_message(signable_message=signable_msg, private_key=private_key)
+        params['nonce'] = nonce
+        params['user'] = user
+        params['signer'] = signer
+        params['signature'] = '0x' + signed_message.signature.hex()
+        return params
+    return sign
+
+
+def measure(name, sign, iterations):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        sign(dict(ORDER_PARAMS))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    elapsed = time.perf_counter() - start
+    
+    latencies.sort()
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{name:<14} {iterations / elapsed:9.1f} 次/秒  "
+        f"p50 {statistics.median(latencies):7.3f} ms  p99 {p99:7.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description='请求签名基准测试')
+    parser.add_argument('--iterations', type=int, default=2000)
+    args = parser.parse_args()
+    
+    account = Account.create()
+    user = Account.create().address
+    private_key = account.key.hex()
+    
+    legacy = make_legacy_signer(user, account.address, private_key)
+    signer = AsterDexSigner(user, account.address, private_key)
+    
+    # 预热
+    legacy(dict(ORDER_PARAMS))
+    signer.sign(dict(ORDER_PARAMS))
+    
+    measure('原始实现', legacy, args.iterations)
+    measure('AsterDexSigner', signer.sign, args.iterations)
+
+
+if __name__ == '__main__':
+    main()
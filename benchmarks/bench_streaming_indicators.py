@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+流式指标基准测试
+
+模拟每根新K线收盘时重新计算六条均线（SMA/EMA 20/60/120），对比：
+  - 原始实现：对最近的K线窗口重新计算 np.mean + pandas ewm
+  - MovingAverageSet：每根K线 O(1) 更新
+
+用法:
+    python benchmarks/bench_streaming_indicators.py --bars 2000 --window 150 1500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from src.strategies.indicators import TechnicalIndicators
+from src.strategies.streaming_indicators import MovingAverageSet
+
+SMA_PERIODS = [20, 60, 120]
+EMA_PERIODS = [20, 60, 120]
+
+
+def legacy_all_mas(close_prices):
+    """原始实现：每条均线单独处理整段窗口"""
+    result = {}
+    for period in SMA_PERIODS:
+        result[f'sma_{period}'] = TechnicalIndicators.sma(close_prices, period)
+    for period in EMA_PERIODS:
+        result[f'ema_{period}'] = TechnicalIndicators.ema(close_prices, period)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='流式指标基准测试')
+    parser.add_argument('--bars', type=int, default=2000, help='模拟的新K线数量')
+    parser.add_argument('--window', type=int, nargs='+', default=[150, 1500], help='原始实现每次处理的K线数量')
+    args = parser.parse_args()
+    
+    rng = np.random.default_rng(42)
+    
+    print(f"{'窗口':>8}  {'实现':<20} {'每根K线耗时':>14} {'加速比':>8}")
+    for window in args.window:
+        closes = 30000 + np.cumsum(rng.normal(0, 20, window + args.bars))
+        open_times = 1700000000000 + np.arange(len(closes), dtype=np.int64) * 60000
+        
+        start = time.perf_counter()
+        for end in range(window, len(closes)):
+            legacy_all_mas(closes[end - window:end])
+        legacy_us = (time.perf_counter() - start) / args.bars * 1e6
+        
+        ma_set = MovingAverageSet(SMA_PERIODS, EMA_PERIODS)
+        ma_set.sync(open_times[:window], closes[:window])
+        start = time.perf_counter()
+        for end in range(window + 1, len(closes) + 1):
+            ma_set.sync(open_times[end - window:end], closes[end - window:end])
+        sync_us = (time.perf_counter() - start) / args.bars * 1e6
+        
+        ma_set = MovingAverageSet(SMA_PERIODS, EMA_PERIODS)
+        ma_set.seed(closes[:window].tolist())
+        values = closes[window:].tolist()
+        start = time.perf_counter()
+        for value in values:
+            ma_set.update(value)
+            ma_set.values()
+        update_us = (time.perf_counter() - start) / args.bars * 1e6
+        
+        print(f"{window:>8}  {'原始实现':<20} {legacy_us:>11.2f} us {1:>7.2f}x")
+        print(f"{window:>8}  {'sync（含窗口检查）':<20} {sync_us:>11.2f} us {legacy_us / sync_us:>7.2f}x")
+        print(f"{window:>8}  {'update + values':<20} {update_us:>11.2f} us {legacy_us / update_us:>7.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,7 @@ Phase 4: 根据市场状态动态调整策略参数
 - 优化确认时间
 - 优化杠杆和仓位
 """
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 import json
 
 from ..api.base_ai_client import BaseAIClient
@@ -39,7 +39,8 @@ class StrategyParameterOptimizer:
         self,
         current_params: Dict[str, Any],
         market_context: Dict[str, Any],
-        recent_performance: Optional[Dict[str, Any]] = None
+        recent_performance: Optional[Dict[str, Any]] = None,
+        backtest_results: Optional[List[Dict[str, Any]]] = None
     ) -> Dict[str, Any]:
         """
         根据市场状态优化策略参数
@@ -48,6 +49,7 @@ class StrategyParameterOptimizer:
             current_params: 当前策略参数
             market_context: 市场情报分析
             recent_performance: 近期表现（可选）
+            backtest_results: 参数扫描的回测结果（可选，ParameterSweep.summarize 的输出）
             
         Returns:
             {
@@ -61,7 +63,7 @@ class StrategyParameterOptimizer:
         """
         try:
             prompt = self._build_optimization_prompt(
-                current_params, market_context, recent_performance
+                current_params, market_context, recent_performance, backtest_results
             )
             
             # 调用 AI 优化
@@ -104,7 +106,8 @@ class StrategyParameterOptimizer:
         self,
         current_params: Dict[str, Any],
         market_context: Dict[str, Any],
-        recent_performance: Optional[Dict[str, Any]]
+        recent_performance: Optional[Dict[str, Any]],
+        backtest_results: Optional[List[Dict[str, Any]]] = None
     ) -> str:
         """构建参数优化提示词"""
         
@@ -122,6 +125,15 @@ class StrategyParameterOptimizer:
             prompt += f"""
 【近期表现】
 {json.dumps(recent_performance, indent=2, ensure_ascii=False)}
+"""
+        
+        if backtest_results:
+            prompt += f"""
+【历史回测结果】（参数扫描排名前列的组合，sma_periods/ema_periods 为均线周期，
+breakout_confirmation_minutes 为确认时间（分钟））
+{json.dumps(backtest_results, indent=2, ensure_ascii=False)}
+
+建议参数时请优先参考回测中收益稳定、回撤较小的组合，不要只看收益率。
 """
         
         prompt += """
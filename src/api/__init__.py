@@ -2,6 +2,16 @@
 API 客户端模块
 """
 from .asterdex_client import AsterDexClient
+from .async_asterdex_client import AsyncAsterDexClient
 from .deepseek_client import DeepSeekClient
+from .rate_limiter import RequestScheduler, RateLimitTimeout
+from .clock_sync import ServerClock
 
-__all__ = ['AsterDexClient', 'DeepSeekClient']
+__all__ = [
+    'AsterDexClient',
+    'AsyncAsterDexClient',
+    'DeepSeekClient',
+    'RequestScheduler',
+    'RateLimitTimeout',
+    'ServerClock'
+]
@@ -1,16 +1,14 @@
 """
 AsterDEX API 客户端
 """
-import json
-import math
-import time
 from typing import Dict, Any, List, Optional
+import numpy as np
 import requests
-from eth_abi import encode
-from eth_account import Account
-from eth_account.messages import encode_defunct
-from web3 import Web3
 
+from .http_pool import HTTPSessionPool, EndpointTimeouts
+from .rate_limiter import RequestScheduler, endpoint_weight, endpoint_priority, ORDER_ENDPOINTS
+from .signer import AsterDexSigner, trim_dict
+from ..market.kline_decoder import decode_klines_json
 from ..utils.logger import get_logger
 
 
@@ -23,7 +21,9 @@ class AsterDexClient:
         signer: str,
         private_key: str,
         api_base_url: str = 'https://fapi.asterdex.com',
-        recv_window: int = 50000
+        recv_window: int = 50000,
+        http_config: Optional[Dict[str, Any]] = None,
+        rate_limit_config: Optional[Dict[str, Any]] = None
     ):
         """
         初始化客户端
@@ -34,6 +34,8 @@ class AsterDexClient:
             private_key: API 钱包私钥
             api_base_url: API 基础 URL
             recv_window: 接收窗口时间（毫秒）
+            http_config: HTTP 连接池配置（会话数、keep-alive、按端点超时）
+            rate_limit_config: 请求限流配置（权重上限、行情预留比例等）
         """
         self.user = user
         self.signer = signer
@@ -41,6 +43,45 @@ class AsterDexClient:
         self.api_base_url = api_base_url
         self.recv_window = recv_window
         self.logger = get_logger()
+        
+        # 持久连接会话池（APScheduler 工作线程与手动交易线程共享）
+        self.session_pool = HTTPSessionPool.from_config(
+            http_config,
+            headers={'User-Agent': 'AsterDexTradingBot/1.0'}
+        )
+        self.timeouts = EndpointTimeouts(http_config)
+        
+        # 签名器（私钥只解析一次）
+        self.request_signer = AsterDexSigner(
+            user=user,
+            signer=signer,
+            private_key=private_key,
+            recv_window=recv_window
+        )
+        
+        # 请求限流调度器（按端点权重扣除额度，交易请求优先）
+        self.rate_limiter = RequestScheduler.from_config(rate_limit_config)
+        
+        # 服务器时钟（启用后签名使用校正后的时间）
+        self.clock = None
+    
+    def use_server_clock(self, clock):
+        """
+        使用服务器时钟生成签名时间戳
+        
+        Args:
+            clock: ServerClock 实例
+        """
+        self.clock = clock
+        self.request_signer.time_source = clock.time
+    
+    def get_rate_limit_metrics(self) -> Optional[Dict[str, Any]]:
+        """获取请求额度使用情况（未启用限流时返回 None）"""
+        return self.rate_limiter.metrics() if self.rate_limiter else None
+    
+    def close(self):
+        """关闭客户端持有的 HTTP 连接"""
+        self.session_pool.close()
     
     def _trim_dict(self, my_dict: Dict) -> Dict:
         """
@@ -52,22 +93,7 @@ class AsterDexClient:
         Returns:
             转换后的字典
         """
-        for key in my_dict:
-            value = my_dict[key]
-            if isinstance(value, list):
-                new_value = []
-                for item in value:
-                    if isinstance(item, dict):
-                        new_value.append(json.dumps(self._trim_dict(item)))
-                    else:
-                        new_value.append(str(item))
-                my_dict[key] = json.dumps(new_value)
-                continue
-            if isinstance(value, dict):
-                my_dict[key] = json.dumps(self._trim_dict(value))
-                continue
-            my_dict[key] = str(value)
-        return my_dict
+        return trim_dict(my_dict)
     
     def _sign_request(self, params: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -79,47 +105,15 @@ class AsterDexClient:
         Returns:
             包含签名的参数
         """
-        # 生成 nonce（微秒）
-        nonce = math.trunc(time.time() * 1000000)
-        
-        # 过滤空值并添加必需参数
-        params = {key: value for key, value in params.items() if value is not None}
-        params['recvWindow'] = self.recv_window
-        params['timestamp'] = int(round(time.time() * 1000))
-        
-        # 转换参数
-        trimmed_params = self._trim_dict(params.copy())
-        
-        # 生成 JSON 字符串
-        json_str = json.dumps(trimmed_params, sort_keys=True).replace(' ', '').replace("'", '\\"')
-        
-        # ABI 编码
-        encoded = encode(
-            ['string', 'address', 'address', 'uint256'],
-            [json_str, self.user, self.signer, nonce]
-        )
-        
-        # Keccak 哈希
-        keccak_hex = Web3.keccak(encoded).hex()
-        
-        # 签名
-        signable_msg = encode_defunct(hexstr=keccak_hex)
-        signed_message = Account.sign_message(signable_message=signable_msg, private_key=self.private_key)
-        
-        # 添加签名参数
-        params['nonce'] = nonce
-        params['user'] = self.user
-        params['signer'] = self.signer
-        params['signature'] = '0x' + signed_message.signature.hex()
-        
-        return params
+        return self.request_signer.sign(params)
     
     def _request(
         self,
         method: str,
         endpoint: str,
         params: Optional[Dict[str, Any]] = None,
-        signed: bool = False
+        signed: bool = False,
+        raw: bool = False
     ) -> Dict[str, Any]:
         """
         发送 HTTP 请求
@@ -129,6 +123,7 @@ class AsterDexClient:
             endpoint: API 端点
             params: 请求参数
             signed: 是否需要签名
+            raw: 是否返回未解析的响应体（bytes）
             
         Returns:
             响应数据
@@ -138,31 +133,49 @@ class AsterDexClient:
         if params is None:
             params = {}
         
-        # 如果需要签名
-        if signed:
-            params = self._sign_request(params)
+        # 先等待请求额度再签名，避免排队时间消耗 recvWindow
+        if self.rate_limiter:
+            self.rate_limiter.acquire(
+                endpoint_weight(method, endpoint, params),
+                priority=endpoint_priority(method, endpoint, signed),
+                is_order=(method, endpoint) in ORDER_ENDPOINTS
+            )
+        
+        timeout = self.timeouts.get(endpoint)
         
         try:
-            if method == 'GET':
-                response = requests.get(url, params=params, timeout=30)
-            elif method == 'POST':
-                headers = {
-                    'Content-Type': 'application/x-www-form-urlencoded',
-                    'User-Agent': 'AsterDexTradingBot/1.0'
-                }
-                response = requests.post(url, data=params, headers=headers, timeout=30)
-            elif method == 'DELETE':
-                response = requests.delete(url, data=params, timeout=30)
-            else:
-                raise ValueError(f"不支持的 HTTP 方法: {method}")
+            with self.session_pool.session() as session:
+                # 取得会话后再签名，等待空闲会话的时间不消耗 recvWindow
+                if signed:
+                    params = self._sign_request(params)
+                
+                if method == 'GET':
+                    response = session.get(url, params=params, timeout=timeout)
+                elif method == 'POST':
+                    headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+                    response = session.post(url, data=params, headers=headers, timeout=timeout)
+                elif method == 'PUT':
+                    response = session.put(url, data=params, timeout=timeout)
+                elif method == 'DELETE':
+                    response = session.delete(url, data=params, timeout=timeout)
+                else:
+                    raise ValueError(f"不支持的 HTTP 方法: {method}")
+            
+            if self.rate_limiter:
+                self.rate_limiter.update_from_headers(response.headers, response.status_code)
             
             response.raise_for_status()
+            if raw:
+                return response.content
             return response.json()
-        
+            
         except requests.exceptions.RequestException as e:
             self.logger.error(f"API 请求失败 [{method} {endpoint}]: {e}")
             if hasattr(e, 'response') and e.response is not None:
                 self.logger.error(f"响应内容: {e.response.text}")
+                # -1021: 时间戳超出 recvWindow，立即重新同步时钟
+                if self.clock and '-1021' in e.response.text:
+                    self.clock.request_resync()
             raise
     
     # ==================== 市场数据接口 ====================
@@ -213,6 +226,33 @@ class AsterDexClient:
         
         return self._request('GET', '/fapi/v1/klines', params)
     
+    def get_klines_array(
+        self,
+        symbol: str,
+        interval: str,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        limit: int = 500
+    ) -> np.ndarray:
+        """
+        获取K线数据并直接解码为 NumPy 结构化数组（参数同 get_klines）
+        
+        Returns:
+            dtype 为 KLINE_DTYPE 的结构化数组
+        """
+        params = {
+            'symbol': symbol,
+            'interval': interval,
+            'limit': limit
+        }
+        
+        if start_time:
+            params['startTime'] = start_time
+        if end_time:
+            params['endTime'] = end_time
+        
+        return decode_klines_json(self._request('GET', '/fapi/v1/klines', params, raw=True))
+    
     def get_ticker_price(self, symbol: Optional[str] = None) -> Dict[str, Any]:
         """
         获取最新价格
@@ -280,7 +320,9 @@ class AsterDexClient:
         price: Optional[str] = None,
         position_side: str = 'BOTH',
         time_in_force: str = 'GTC',
-        reduce_only: bool = False
+        reduce_only: bool = False,
+        stop_price: Optional[str] = None,
+        working_type: Optional[str] = None
     ) -> Dict[str, Any]:
         """
         下单
@@ -288,12 +330,14 @@ class AsterDexClient:
         Args:
             symbol: 交易对符号
             side: 买卖方向（BUY/SELL）
-            order_type: 订单类型（LIMIT/MARKET/STOP/TAKE_PROFIT等）
+            order_type: 订单类型（LIMIT/MARKET/STOP/TAKE_PROFIT/STOP_MARKET/TAKE_PROFIT_MARKET等）
             quantity: 数量
             price: 价格（限价单必填）
             position_side: 持仓方向（BOTH/LONG/SHORT）
             time_in_force: 有效方式（GTC/IOC/FOK）
             reduce_only: 是否只减仓
+            stop_price: 触发价格（条件单必填）
+            working_type: 触发价格类型（MARK_PRICE/CONTRACT_PRICE）
             
         Returns:
             订单信息
@@ -310,11 +354,35 @@ class AsterDexClient:
         if price:
             params['price'] = price
         
+        if stop_price:
+            params['stopPrice'] = stop_price
+        
+        if working_type:
+            params['workingType'] = working_type
+        
         if order_type == 'LIMIT':
             params['timeInForce'] = time_in_force
         
         return self._request('POST', '/fapi/v3/order', params, signed=True)
     
+    def get_order(self, symbol: str, order_id: int) -> Dict[str, Any]:
+        """
+        查询订单
+        
+        Args:
+            symbol: 交易对符号
+            order_id: 订单ID
+            
+        Returns:
+            订单信息（包含 status）
+        """
+        params = {
+            'symbol': symbol,
+            'orderId': order_id
+        }
+        
+        return self._request('GET', '/fapi/v3/order', params, signed=True)
+    
     def cancel_order(self, symbol: str, order_id: int) -> Dict[str, Any]:
         """
         取消订单
@@ -397,3 +465,17 @@ class AsterDexClient:
         }
         
         return self._request('POST', '/fapi/v1/marginType', params, signed=True)
+    
+    # ==================== 用户数据流接口 ====================
+    
+    def start_user_stream(self) -> Dict[str, Any]:
+        """创建 listenKey（用户数据流）"""
+        return self._request('POST', '/fapi/v3/listenKey', signed=True)
+    
+    def keepalive_user_stream(self) -> Dict[str, Any]:
+        """延长 listenKey 有效期（有效期 60 分钟）"""
+        return self._request('PUT', '/fapi/v3/listenKey', signed=True)
+    
+    def close_user_stream(self) -> Dict[str, Any]:
+        """关闭 listenKey"""
+        return self._request('DELETE', '/fapi/v3/listenKey', signed=True)
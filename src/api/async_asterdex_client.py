@@ -0,0 +1,492 @@
+"""
+AsterDEX 异步 API 客户端
+
+与 AsterDexClient 提供相同的方法，全部为协程，可在一个事件循环中并发请求多个交易对
+"""
+import asyncio
+from typing import Dict, Any, Callable, List, Optional
+import aiohttp
+import numpy as np
+
+from .asterdex_client import AsterDexClient
+from .http_pool import DEFAULT_HTTP_CONFIG, EndpointTimeouts
+from .rate_limiter import RequestScheduler, endpoint_weight, endpoint_priority, ORDER_ENDPOINTS
+from .signer import AsterDexSigner
+from ..market.kline_decoder import decode_klines_json
+from ..utils.logger import get_logger
+
+
+class AsyncAsterDexClient:
+    """AsterDEX 异步 API 客户端"""
+    
+    # 签名逻辑与同步客户端完全一致
+    _trim_dict = AsterDexClient._trim_dict
+    _sign_request = AsterDexClient._sign_request
+    
+    def __init__(
+        self,
+        user: str,
+        signer: str,
+        private_key: str,
+        api_base_url: str = 'https://fapi.asterdex.com',
+        recv_window: int = 50000,
+        http_config: Optional[Dict[str, Any]] = None,
+        rate_limiter: Optional[RequestScheduler] = None,
+        time_source: Optional[Callable[[], float]] = None
+    ):
+        """
+        初始化客户端
+        
+        Args:
+            user: 主钱包地址
+            signer: API 钱包地址
+            private_key: API 钱包私钥
+            api_base_url: API 基础 URL
+            recv_window: 接收窗口时间（毫秒）
+            http_config: HTTP 连接池配置（与同步客户端共用 asterdex.http 配置块）
+            rate_limiter: 请求限流调度器（与同步客户端共用同一实例）
+            time_source: 签名使用的时间函数（例如 ServerClock.time）
+        """
+        self.user = user
+        self.signer = signer
+        self.private_key = private_key
+        self.api_base_url = api_base_url
+        self.recv_window = recv_window
+        self.http_config = {**DEFAULT_HTTP_CONFIG, **(http_config or {})}
+        self.timeouts = EndpointTimeouts(http_config)
+        self.request_signer = AsterDexSigner(user, signer, private_key, recv_window, time_source=time_source)
+        self.rate_limiter = rate_limiter
+        self.logger = get_logger()
+        
+        # 会话在首次请求时创建（必须在事件循环内创建）
+        self._session: Optional[aiohttp.ClientSession] = None
+    
+    async def __aenter__(self) -> 'AsyncAsterDexClient':
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+    
+    def _get_session(self) -> aiohttp.ClientSession:
+        """获取（必要时创建）HTTP 会话"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.http_config['pool_size'] * self.http_config['pool_maxsize'],
+                limit_per_host=self.http_config['pool_maxsize'],
+                force_close=not self.http_config['keep_alive']
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                headers={'User-Agent': 'AsterDexTradingBot/1.0'}
+            )
+        return self._session
+    
+    async def close(self):
+        """关闭 HTTP 会话"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def _request(
+        self,
+        method: str,
+        endpoint: str,
+        params: Optional[Dict[str, Any]] = None,
+        signed: bool = False,
+        raw: bool = False
+    ) -> Any:
+        """
+        发送 HTTP 请求
+        
+        Args:
+            method: HTTP 方法
+            endpoint: API 端点
+            params: 请求参数
+            signed: 是否需要签名
+            raw: 是否返回未解析的响应体（bytes）
+            
+        Returns:
+            响应数据
+        """
+        url = self.api_base_url + endpoint
+        
+        if params is None:
+            params = {}
+        
+        # 等待请求额度（调度器是阻塞的，放到线程池中等待）
+        if self.rate_limiter:
+            await asyncio.get_running_loop().run_in_executor(
+                None,
+                lambda: self.rate_limiter.acquire(
+                    endpoint_weight(method, endpoint, params),
+                    priority=endpoint_priority(method, endpoint, signed),
+                    is_order=(method, endpoint) in ORDER_ENDPOINTS
+                )
+            )
+        
+        # 如果需要签名
+        if signed:
+            params = self._sign_request(params)
+        
+        # 与 requests 的编码方式保持一致（非字符串值使用 str()）
+        params = {key: str(value) for key, value in params.items()}
+        
+        connect_timeout, read_timeout = self.timeouts.get(endpoint)
+        timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+        
+        session = self._get_session()
+        
+        try:
+            if method == 'GET':
+                request = session.get(url, params=params, timeout=timeout)
+            elif method == 'POST':
+                request = session.post(url, data=params, timeout=timeout)
+            elif method == 'PUT':
+                request = session.put(url, data=params, timeout=timeout)
+            elif method == 'DELETE':
+                request = session.delete(url, data=params, timeout=timeout)
+            else:
+                raise ValueError(f"不支持的 HTTP 方法: {method}")
+            
+            async with request as response:
+                if self.rate_limiter:
+                    self.rate_limiter.update_from_headers(response.headers, response.status)
+                if response.status >= 400:
+                    text = await response.text()
+                    self.logger.error(f"响应内容: {text}")
+                response.raise_for_status()
+                if raw:
+                    return await response.read()
+                return await response.json(content_type=None)
+                
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.logger.error(f"API 请求失败 [{method} {endpoint}]: {e}")
+            raise
+    
+    # ==================== 市场数据接口 ====================
+    
+    async def ping(self) -> Dict[str, Any]:
+        """测试连接"""
+        return await self._request('GET', '/fapi/v1/ping')
+    
+    async def get_server_time(self) -> Dict[str, Any]:
+        """获取服务器时间"""
+        return await self._request('GET', '/fapi/v1/time')
+    
+    async def get_exchange_info(self) -> Dict[str, Any]:
+        """获取交易所信息"""
+        return await self._request('GET', '/fapi/v1/exchangeInfo')
+    
+    async def get_klines(
+        self,
+        symbol: str,
+        interval: str,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        limit: int = 500
+    ) -> List[List]:
+        """
+        获取K线数据
+        
+        Args:
+            symbol: 交易对符号
+            interval: K线间隔
+            start_time: 开始时间（毫秒时间戳）
+            end_time: 结束时间（毫秒时间戳）
+            limit: 返回数量（默认500，最大1500）
+            
+        Returns:
+            K线数据列表
+        """
+        params = {
+            'symbol': symbol,
+            'interval': interval,
+            'limit': limit
+        }
+        
+        if start_time:
+            params['startTime'] = start_time
+        if end_time:
+            params['endTime'] = end_time
+        
+        return await self._request('GET', '/fapi/v1/klines', params)
+    
+    async def get_klines_array(
+        self,
+        symbol: str,
+        interval: str,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None,
+        limit: int = 500
+    ) -> np.ndarray:
+        """
+        获取K线数据并直接解码为 NumPy 结构化数组（参数同 get_klines）
+        
+        Returns:
+            dtype 为 KLINE_DTYPE 的结构化数组
+        """
+        params = {
+            'symbol': symbol,
+            'interval': interval,
+            'limit': limit
+        }
+        
+        if start_time:
+            params['startTime'] = start_time
+        if end_time:
+            params['endTime'] = end_time
+        
+        return decode_klines_json(await self._request('GET', '/fapi/v1/klines', params, raw=True))
+    
+    async def get_klines_batch(
+        self,
+        symbols: List[str],
+        interval: str,
+        limit: int = 500,
+        as_array: bool = False
+    ) -> Dict[str, Any]:
+        """
+        并发获取多个交易对的K线数据
+        
+        Args:
+            symbols: 交易对列表
+            interval: K线间隔
+            limit: 每个交易对返回数量
+            as_array: 是否直接解码为 NumPy 结构化数组
+            
+        Returns:
+            {交易对: K线数据}，单个交易对失败时值为对应的异常对象
+        """
+        fetch = self.get_klines_array if as_array else self.get_klines
+        results = await asyncio.gather(
+            *(fetch(symbol, interval, limit=limit) for symbol in symbols),
+            return_exceptions=True
+        )
+        return dict(zip(symbols, results))
+    
+    async def get_ticker_price(self, symbol: Optional[str] = None) -> Dict[str, Any]:
+        """
+        获取最新价格
+        
+        Args:
+            symbol: 交易对符号（可选）
+            
+        Returns:
+            价格信息
+        """
+        params = {}
+        if symbol:
+            params['symbol'] = symbol
+        
+        return await self._request('GET', '/fapi/v1/ticker/price', params)
+    
+    async def get_mark_price(self, symbol: Optional[str] = None) -> Dict[str, Any]:
+        """
+        获取标记价格
+        
+        Args:
+            symbol: 交易对符号（可选）
+            
+        Returns:
+            标记价格信息
+        """
+        params = {}
+        if symbol:
+            params['symbol'] = symbol
+        
+        return await self._request('GET', '/fapi/v1/premiumIndex', params)
+    
+    # ==================== 账户和交易接口 ====================
+    
+    async def get_account_info(self) -> Dict[str, Any]:
+        """获取账户信息"""
+        return await self._request('GET', '/fapi/v3/account', signed=True)
+    
+    async def get_balance(self) -> Dict[str, Any]:
+        """获取账户余额"""
+        return await self._request('GET', '/fapi/v3/balance', signed=True)
+    
+    async def get_position_info(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        获取持仓信息
+        
+        Args:
+            symbol: 交易对符号（可选）
+            
+        Returns:
+            持仓信息列表
+        """
+        params = {}
+        if symbol:
+            params['symbol'] = symbol
+        
+        return await self._request('GET', '/fapi/v3/positionRisk', params, signed=True)
+    
+    async def place_order(
+        self,
+        symbol: str,
+        side: str,
+        order_type: str,
+        quantity: str,
+        price: Optional[str] = None,
+        position_side: str = 'BOTH',
+        time_in_force: str = 'GTC',
+        reduce_only: bool = False,
+        stop_price: Optional[str] = None,
+        working_type: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        下单
+        
+        Args:
+            symbol: 交易对符号
+            side: 买卖方向（BUY/SELL）
+            order_type: 订单类型（LIMIT/MARKET/STOP/TAKE_PROFIT/STOP_MARKET/TAKE_PROFIT_MARKET等）
+            quantity: 数量
+            price: 价格（限价单必填）
+            position_side: 持仓方向（BOTH/LONG/SHORT）
+            time_in_force: 有效方式（GTC/IOC/FOK）
+            reduce_only: 是否只减仓
+            stop_price: 触发价格（条件单必填）
+            working_type: 触发价格类型（MARK_PRICE/CONTRACT_PRICE）
+            
+        Returns:
+            订单信息
+        """
+        params = {
+            'symbol': symbol,
+            'side': side,
+            'type': order_type,
+            'quantity': quantity,
+            'positionSide': position_side,
+            'reduceOnly': reduce_only
+        }
+        
+        if price:
+            params['price'] = price
+        
+        if stop_price:
+            params['stopPrice'] = stop_price
+        
+        if working_type:
+            params['workingType'] = working_type
+        
+        if order_type == 'LIMIT':
+            params['timeInForce'] = time_in_force
+        
+        return await self._request('POST', '/fapi/v3/order', params, signed=True)
+    
+    async def get_order(self, symbol: str, order_id: int) -> Dict[str, Any]:
+        """
+        查询订单
+        
+        Args:
+            symbol: 交易对符号
+            order_id: 订单ID
+            
+        Returns:
+            订单信息（包含 status）
+        """
+        params = {
+            'symbol': symbol,
+            'orderId': order_id
+        }
+        
+        return await self._request('GET', '/fapi/v3/order', params, signed=True)
+    
+    async def cancel_order(self, symbol: str, order_id: int) -> Dict[str, Any]:
+        """
+        取消订单
+        
+        Args:
+            symbol: 交易对符号
+            order_id: 订单ID
+            
+        Returns:
+            取消结果
+        """
+        params = {
+            'symbol': symbol,
+            'orderId': order_id
+        }
+        
+        return await self._request('DELETE', '/fapi/v3/order', params, signed=True)
+    
+    async def cancel_all_orders(self, symbol: str) -> Dict[str, Any]:
+        """
+        取消所有订单
+        
+        Args:
+            symbol: 交易对符号
+            
+        Returns:
+            取消结果
+        """
+        params = {'symbol': symbol}
+        return await self._request('DELETE', '/fapi/v3/allOpenOrders', params, signed=True)
+    
+    async def get_open_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        获取未成交订单
+        
+        Args:
+            symbol: 交易对符号（可选）
+            
+        Returns:
+            订单列表
+        """
+        params = {}
+        if symbol:
+            params['symbol'] = symbol
+        
+        return await self._request('GET', '/fapi/v3/openOrders', params, signed=True)
+    
+    async def change_leverage(self, symbol: str, leverage: int) -> Dict[str, Any]:
+        """
+        调整杠杆倍数
+        
+        Args:
+            symbol: 交易对符号
+            leverage: 杠杆倍数
+            
+        Returns:
+            调整结果
+        """
+        params = {
+            'symbol': symbol,
+            'leverage': leverage
+        }
+        
+        return await self._request('POST', '/fapi/v1/leverage', params, signed=True)
+    
+    async def change_margin_type(self, symbol: str, margin_type: str) -> Dict[str, Any]:
+        """
+        调整保证金模式
+        
+        Args:
+            symbol: 交易对符号
+            margin_type: 保证金模式（ISOLATED/CROSSED）
+            
+        Returns:
+            调整结果
+        """
+        params = {
+            'symbol': symbol,
+            'marginType': margin_type
+        }
+        
+        return await self._request('POST', '/fapi/v1/marginType', params, signed=True)
+    
+    # ==================== 用户数据流接口 ====================
+    
+    async def start_user_stream(self) -> Dict[str, Any]:
+        """创建 listenKey（用户数据流）"""
+        return await self._request('POST', '/fapi/v3/listenKey', signed=True)
+    
+    async def keepalive_user_stream(self) -> Dict[str, Any]:
+        """延长 listenKey 有效期（有效期 60 分钟）"""
+        return await self._request('PUT', '/fapi/v3/listenKey', signed=True)
+    
+    async def close_user_stream(self) -> Dict[str, Any]:
+        """关闭 listenKey"""
+        return await self._request('DELETE', '/fapi/v3/listenKey', signed=True)
@@ -0,0 +1,212 @@
+"""
+服务器时钟同步模块
+
+定期采样 /fapi/v1/time，用往返时间（RTT）补偿网络延迟，估计本地时钟与服务器时钟的偏移
+和漂移速率。签名器使用校正后的时间生成 timestamp/nonce，recvWindow 因此可以大幅缩小。
+"""
+import statistics
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+from ..utils.logger import get_logger
+
+
+class ServerClock:
+    """服务器时钟（偏移 + 漂移校正）"""
+    
+    def __init__(
+        self,
+        client,
+        samples: int = 5,
+        resync_interval: float = 300,
+        history_size: int = 12,
+        time_source: Optional[Callable[[], float]] = None
+    ):
+        """
+        初始化服务器时钟
+        
+        Args:
+            client: AsterDexClient 实例（提供 get_server_time）
+            samples: 每次同步的采样次数（取 RTT 最小的一次）
+            resync_interval: 后台重新同步间隔（秒）
+            history_size: 用于估计漂移的历史同步次数
+            time_source: 返回本地时间（秒）的函数，默认 time.time
+        """
+        self.client = client
+        self.samples = max(1, samples)
+        self.resync_interval = resync_interval
+        self.history_size = max(2, history_size)
+        self.time_source = time_source or time.time
+        self.logger = get_logger()
+        
+        self._lock = threading.Lock()
+        self._offset = 0.0                  # 服务器时间 - 本地时间（秒），在 _synced_at 时刻
+        self._drift = 0.0                   # 偏移随本地时间的变化率（秒/秒）
+        self._synced_at: Optional[float] = None
+        self._history: List[Tuple[float, float]] = []   # [(本地时间, 偏移)]
+        self._last_rtts: List[float] = []
+        self._best_rtt: Optional[float] = None
+        self.sync_count = 0
+        
+        self._stop_event = threading.Event()
+        self._resync_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+    
+    # ==================== 采样与同步 ====================
+    
+    def _sample(self) -> Tuple[float, float, float]:
+        """
+        采样一次
+        
+        Returns:
+            (本地中点时间, 偏移, RTT)，单位均为秒
+        """
+        t0 = self.time_source()
+        server_ms = self.client.get_server_time()['serverTime']
+        t1 = self.time_source()
+        
+        # 假设请求和响应的单程延迟相同，服务器时间对应本地往返的中点
+        midpoint = (t0 + t1) / 2
+        return midpoint, server_ms / 1000 - midpoint, t1 - t0
+    
+    def sync(self) -> Dict[str, Any]:
+        """
+        与服务器同步一次
+        
+        Returns:
+            同步报告（见 report）
+        """
+        samples = [self._sample() for _ in range(self.samples)]
+        
+        # RTT 最小的样本受排队延迟影响最小，偏移估计最准确
+        midpoint, offset, rtt = min(samples, key=lambda s: s[2])
+        
+        with self._lock:
+            self._history.append((midpoint, offset))
+            self._history = self._history[-self.history_size:]
+            self._drift = self._estimate_drift()
+            self._offset = offset
+            self._synced_at = midpoint
+            self._last_rtts = [s[2] for s in samples]
+            self._best_rtt = rtt
+            self.sync_count += 1
+        
+        report = self.report()
+        self.logger.info(
+            f"⏱️ 时钟同步: 偏移 {report['offset_ms']:+.1f}ms, "
+            f"RTT {report['rtt_ms']:.1f}ms, 漂移 {report['drift_ppm']:+.1f}ppm"
+        )
+        return report
+    
+    def _estimate_drift(self) -> float:
+        """对历史偏移做最小二乘线性拟合，斜率即漂移速率（需持有锁）"""
+        if len(self._history) < 2:
+            return 0.0
+        
+        times = [t for t, _ in self._history]
+        offsets = [o for _, o in self._history]
+        mean_t = sum(times) / len(times)
+        mean_o = sum(offsets) / len(offsets)
+        
+        denominator = sum((t - mean_t) ** 2 for t in times)
+        if denominator <= 0:
+            return 0.0
+        
+        return sum((t - mean_t) * (o - mean_o) for t, o in zip(times, offsets)) / denominator
+    
+    # ==================== 时间 ====================
+    
+    def offset(self, now: Optional[float] = None) -> float:
+        """
+        当前偏移（秒，含漂移校正）
+        
+        Args:
+            now: 本地时间，默认当前时间
+            
+        Returns:
+            服务器时间 - 本地时间
+        """
+        now = self.time_source() if now is None else now
+        
+        with self._lock:
+            if self._synced_at is None:
+                return 0.0
+            return self._offset + self._drift * (now - self._synced_at)
+    
+    def time(self) -> float:
+        """校正后的当前时间（秒），可作为签名器的 time_source"""
+        now = self.time_source()
+        return now + self.offset(now)
+    
+    def report(self) -> Dict[str, Any]:
+        """
+        时钟同步报告
+        
+        Returns:
+            偏移、RTT、漂移等统计（时间单位毫秒）
+        """
+        with self._lock:
+            rtts = list(self._last_rtts)
+            best_rtt = self._best_rtt
+            synced_at = self._synced_at
+            drift = self._drift
+            history = len(self._history)
+        
+        rtt_ms = best_rtt * 1000 if best_rtt is not None else None
+        # 偏移的不确定度不超过半个 RTT；建议窗口留出一个完整往返和同步间隔内的漂移
+        suggested = None
+        if rtt_ms is not None:
+            drift_ms = abs(drift) * self.resync_interval * 1000
+            suggested = int(max(500, 3 * rtt_ms + drift_ms + 100))
+        
+        return {
+            'synced': synced_at is not None,
+            'sync_count': self.sync_count,
+            'offset_ms': round(self.offset() * 1000, 3),
+            'rtt_ms': round(rtt_ms, 3) if rtt_ms is not None else None,
+            'rtt_median_ms': round(statistics.median(rtts) * 1000, 3) if rtts else None,
+            'rtt_max_ms': round(max(rtts) * 1000, 3) if rtts else None,
+            'drift_ppm': round(drift * 1e6, 3),
+            'history_size': history,
+            'last_sync_age_seconds': round(self.time_source() - synced_at, 1) if synced_at else None,
+            'suggested_recv_window_ms': suggested
+        }
+    
+    # ==================== 后台同步 ====================
+    
+    def start(self):
+        """启动后台定期同步"""
+        if self._thread and self._thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._sync_loop,
+            daemon=True,
+            name="ServerClockSync"
+        )
+        self._thread.start()
+    
+    def stop(self):
+        """停止后台同步"""
+        self._stop_event.set()
+        self._resync_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+    
+    def request_resync(self):
+        """请求尽快重新同步（例如服务器返回时间戳超出 recvWindow）"""
+        self._resync_event.set()
+    
+    def _sync_loop(self):
+        while not self._stop_event.is_set():
+            self._resync_event.wait(timeout=self.resync_interval)
+            self._resync_event.clear()
+            if self._stop_event.is_set():
+                break
+            
+            try:
+                self.sync()
+            except Exception as e:
+                self.logger.error(f"时钟同步失败: {e}")
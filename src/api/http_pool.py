@@ -0,0 +1,183 @@
+"""
+HTTP 会话池模块
+
+为 AsterDEX 客户端提供可在多线程间安全共享的持久连接（keep-alive）会话
+"""
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Optional, Tuple, Iterator
+import requests
+from requests.adapters import HTTPAdapter
+
+from ..utils.logger import get_logger
+
+
+# 默认的 HTTP 配置（对应配置文件中的 asterdex.http 块）
+DEFAULT_HTTP_CONFIG = {
+    'pool_size': 4,             # 会话数量（同时进行的请求数上限）
+    'pool_maxsize': 10,         # 每个会话到同一主机的最大连接数
+    'keep_alive': True,         # 是否复用 TCP/TLS 连接
+    'max_retries': 0,           # 连接级别的自动重试次数
+    'acquire_timeout': 30,      # 等待空闲会话的最长时间（秒）
+    'connect_timeout': 5,       # 建立连接超时（秒）
+    'timeouts': {               # 读取超时（秒），按端点配置
+        'default': 30
+    }
+}
+
+
+class HTTPSessionPool:
+    """
+    线程安全的 HTTP 会话池
+    
+    requests.Session 本身不保证线程安全，因此每个线程在请求期间独占一个会话，
+    用完后归还。会话内部的连接池保持 keep-alive，避免每次请求重新握手。
+    """
+    
+    def __init__(
+        self,
+        pool_size: int = 4,
+        pool_maxsize: int = 10,
+        keep_alive: bool = True,
+        max_retries: int = 0,
+        acquire_timeout: float = 30,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        """
+        初始化会话池
+        
+        Args:
+            pool_size: 会话数量
+            pool_maxsize: 每个会话的最大连接数
+            keep_alive: 是否保持连接
+            max_retries: 连接级别的重试次数
+            acquire_timeout: 获取会话的超时时间（秒）
+            headers: 所有请求共用的请求头
+        """
+        self.pool_size = max(1, int(pool_size))
+        self.pool_maxsize = max(1, int(pool_maxsize))
+        self.keep_alive = keep_alive
+        self.max_retries = max_retries
+        self.acquire_timeout = acquire_timeout
+        self.headers = headers or {}
+        self.logger = get_logger()
+        
+        # 后进先出：优先复用最近使用过、连接仍然活跃的会话
+        self._sessions: queue.LifoQueue = queue.LifoQueue()
+        self._all_sessions = []
+        self._lock = threading.Lock()
+        self._closed = False
+        
+        for _ in range(self.pool_size):
+            session = self._create_session()
+            self._all_sessions.append(session)
+            self._sessions.put(session)
+    
+    def _create_session(self) -> requests.Session:
+        """创建一个配置好连接池的会话"""
+        session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=self.max_retries
+        )
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        session.headers.update(self.headers)
+        
+        if not self.keep_alive:
+            session.headers['Connection'] = 'close'
+        
+        return session
+    
+    @contextmanager
+    def session(self) -> Iterator[requests.Session]:
+        """
+        借出一个会话（上下文管理器）
+        
+        Yields:
+            当前线程独占的 requests.Session
+        """
+        if self._closed:
+            raise RuntimeError("HTTP 会话池已关闭")
+        
+        try:
+            session = self._sessions.get(timeout=self.acquire_timeout)
+        except queue.Empty:
+            raise TimeoutError(f"等待 HTTP 会话超时（{self.acquire_timeout}秒）")
+        
+        try:
+            yield session
+        finally:
+            self._sessions.put(session)
+    
+    def close(self):
+        """关闭所有会话及其连接"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+        
+        for session in self._all_sessions:
+            try:
+                session.close()
+            except Exception as e:
+                self.logger.warning(f"关闭 HTTP 会话失败: {e}")
+    
+    @classmethod
+    def from_config(
+        cls,
+        http_config: Optional[Dict[str, Any]] = None,
+        headers: Optional[Dict[str, str]] = None
+    ) -> 'HTTPSessionPool':
+        """
+        根据配置创建会话池
+        
+        Args:
+            http_config: asterdex.http 配置块
+            headers: 公共请求头
+            
+        Returns:
+            HTTPSessionPool 实例
+        """
+        config = {**DEFAULT_HTTP_CONFIG, **(http_config or {})}
+        
+        return cls(
+            pool_size=config['pool_size'],
+            pool_maxsize=config['pool_maxsize'],
+            keep_alive=config['keep_alive'],
+            max_retries=config['max_retries'],
+            acquire_timeout=config['acquire_timeout'],
+            headers=headers
+        )
+
+
+class EndpointTimeouts:
+    """按端点解析请求超时"""
+    
+    def __init__(self, http_config: Optional[Dict[str, Any]] = None):
+        """
+        初始化超时配置
+        
+        Args:
+            http_config: asterdex.http 配置块
+        """
+        config = {**DEFAULT_HTTP_CONFIG, **(http_config or {})}
+        
+        self.connect_timeout = float(config['connect_timeout'])
+        self.read_timeouts = {**DEFAULT_HTTP_CONFIG['timeouts'], **config.get('timeouts', {})}
+        self.default_read_timeout = float(self.read_timeouts['default'])
+    
+    def get(self, endpoint: str) -> Tuple[float, float]:
+        """
+        获取端点的超时设置
+        
+        Args:
+            endpoint: API 端点，如 /fapi/v1/klines
+            
+        Returns:
+            (连接超时, 读取超时)
+        """
+        read_timeout = self.read_timeouts.get(endpoint, self.default_read_timeout)
+        return self.connect_timeout, float(read_timeout)
@@ -0,0 +1,364 @@
+"""
+请求限流调度模块
+
+按端点权重维护令牌桶，并根据响应头（X-MBX-USED-WEIGHT-1M / X-MBX-ORDER-COUNT-1M）
+校正剩余额度。下单、撤单优先于账户查询，账户查询优先于行情请求；
+行情请求不能动用为交易保留的那部分额度。
+"""
+import threading
+import time
+from typing import Dict, Any, Callable, Optional
+
+from ..utils.logger import get_logger
+
+
+# 优先级（数值越小越优先）
+PRIORITY_ORDER = 0      # 下单、撤单、调整杠杆等交易操作
+PRIORITY_ACCOUNT = 1    # 余额、持仓、挂单等账户查询
+PRIORITY_MARKET = 2     # 行情数据
+
+PRIORITY_NAMES = {
+    PRIORITY_ORDER: 'order',
+    PRIORITY_ACCOUNT: 'account',
+    PRIORITY_MARKET: 'market'
+}
+
+# 默认限流配置（对应配置文件中的 asterdex.rate_limit 块）
+DEFAULT_RATE_LIMIT_CONFIG = {
+    'enabled': True,
+    'weight_limit': 2400,           # 每个周期的请求权重上限
+    'order_limit': 1200,            # 每个周期的下单次数上限
+    'interval_seconds': 60,         # 限流周期（秒）
+    'market_reserve_ratio': 0.2,    # 行情请求不能使用的额度比例（留给交易）
+    'acquire_timeout': 30           # 等待额度的最长时间（秒）
+}
+
+# 端点权重 {(方法, 端点): 权重}，未列出的端点权重为 1
+ENDPOINT_WEIGHTS = {
+    ('GET', '/fapi/v1/exchangeInfo'): 1,
+    ('GET', '/fapi/v1/premiumIndex'): 1,
+    ('GET', '/fapi/v3/account'): 5,
+    ('GET', '/fapi/v3/balance'): 5,
+    ('GET', '/fapi/v3/positionRisk'): 5,
+    ('GET', '/fapi/v3/openOrders'): 1,
+}
+
+# 不带 symbol 时权重更高的端点
+ENDPOINT_WEIGHTS_ALL_SYMBOLS = {
+    ('GET', '/fapi/v1/ticker/price'): 2,
+    ('GET', '/fapi/v1/premiumIndex'): 10,
+    ('GET', '/fapi/v3/openOrders'): 40,
+}
+
+# 计入下单次数的请求
+ORDER_ENDPOINTS = {
+    ('POST', '/fapi/v3/order'),
+}
+
+
+class RateLimitTimeout(Exception):
+    """等待限流额度超时"""
+
+
+def endpoint_weight(method: str, endpoint: str, params: Optional[Dict[str, Any]] = None) -> int:
+    """
+    计算请求权重
+    
+    Args:
+        method: HTTP 方法
+        endpoint: API 端点
+        params: 请求参数
+        
+    Returns:
+        请求权重
+    """
+    params = params or {}
+    key = (method, endpoint)
+    
+    if endpoint == '/fapi/v1/klines':
+        limit = int(params.get('limit', 500))
+        if limit < 100:
+            return 1
+        if limit < 500:
+            return 2
+        if limit <= 1000:
+            return 5
+        return 10
+    
+    if key in ENDPOINT_WEIGHTS_ALL_SYMBOLS and not params.get('symbol'):
+        return ENDPOINT_WEIGHTS_ALL_SYMBOLS[key]
+    
+    return ENDPOINT_WEIGHTS.get(key, 1)
+
+
+def endpoint_priority(method: str, endpoint: str, signed: bool) -> int:
+    """
+    判断请求优先级
+    
+    Args:
+        method: HTTP 方法
+        endpoint: API 端点
+        signed: 是否为签名请求
+        
+    Returns:
+        优先级（PRIORITY_*）
+    """
+    if method != 'GET' and signed:
+        return PRIORITY_ORDER
+    if signed:
+        return PRIORITY_ACCOUNT
+    return PRIORITY_MARKET
+
+
+class _TokenBucket:
+    """按周期匀速恢复的令牌桶"""
+    
+    def __init__(self, capacity: float, interval: float, now: float):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / interval
+        self.tokens = self.capacity
+        self.updated_at = now
+    
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+    
+    def wait_time(self, amount: float) -> float:
+        """攒够 amount 个令牌还需要的时间（秒）"""
+        return max(0.0, (amount - self.tokens) / self.rate)
+
+
+class RequestScheduler:
+    """
+    按权重和优先级调度请求
+    
+    线程安全；交易器、手动交易监控线程和 HTTP API 共用同一个实例。
+    """
+    
+    def __init__(
+        self,
+        weight_limit: int = 2400,
+        order_limit: int = 1200,
+        interval_seconds: float = 60,
+        market_reserve_ratio: float = 0.2,
+        acquire_timeout: float = 30,
+        time_source: Optional[Callable[[], float]] = None
+    ):
+        """
+        初始化调度器
+        
+        Args:
+            weight_limit: 每个周期的请求权重上限
+            order_limit: 每个周期的下单次数上限
+            interval_seconds: 限流周期（秒）
+            market_reserve_ratio: 为交易保留、行情请求不能使用的额度比例
+            acquire_timeout: 等待额度的最长时间（秒）
+            time_source: 返回单调时间（秒）的函数，默认 time.monotonic
+        """
+        self.weight_limit = weight_limit
+        self.order_limit = order_limit
+        self.interval_seconds = interval_seconds
+        self.acquire_timeout = acquire_timeout
+        self.time_source = time_source or time.monotonic
+        self.logger = get_logger()
+        
+        # 各优先级不能动用的额度
+        self._reserves = {
+            PRIORITY_ORDER: 0.0,
+            PRIORITY_ACCOUNT: 0.0,
+            PRIORITY_MARKET: weight_limit * market_reserve_ratio
+        }
+        
+        self._condition = threading.Condition()
+        now = self.time_source()
+        self._weights = _TokenBucket(weight_limit, interval_seconds, now)
+        self._orders = _TokenBucket(order_limit, interval_seconds, now)
+        self._waiting = {priority: 0 for priority in PRIORITY_NAMES}
+        self._blocked_until = 0.0
+        
+        # 统计
+        self._server_used_weight: Optional[int] = None
+        self._server_order_count: Optional[int] = None
+        self._requests = {priority: 0 for priority in PRIORITY_NAMES}
+        self._wait_seconds = {priority: 0.0 for priority in PRIORITY_NAMES}
+        self._throttled = 0
+        self._timeouts = 0
+    
+    def _can_proceed(self, weight: int, priority: int, is_order: bool) -> bool:
+        """额度是否足够且没有更高优先级的请求在排队（需持有锁）"""
+        if any(self._waiting[p] for p in PRIORITY_NAMES if p < priority):
+            return False
+        if self._weights.tokens - weight < self._reserves[priority]:
+            return False
+        if is_order and self._orders.tokens < 1:
+            return False
+        return True
+    
+    def acquire(
+        self,
+        weight: int,
+        priority: int = PRIORITY_MARKET,
+        is_order: bool = False,
+        timeout: Optional[float] = None
+    ) -> float:
+        """
+        等待并扣除请求额度
+        
+        Args:
+            weight: 请求权重
+            priority: 优先级（PRIORITY_*）
+            is_order: 是否计入下单次数
+            timeout: 最长等待时间（秒），默认使用 acquire_timeout
+            
+        Returns:
+            实际等待时间（秒）
+            
+        Raises:
+            RateLimitTimeout: 超时仍未获得额度
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        # 权重超过桶容量的请求只要求桶满即可，避免永远等待
+        weight = min(weight, self.weight_limit - self._reserves[priority])
+        
+        start = self.time_source()
+        deadline = start + timeout
+        
+        with self._condition:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = self.time_source()
+                    self._weights.refill(now)
+                    self._orders.refill(now)
+                    
+                    if now >= self._blocked_until and self._can_proceed(weight, priority, is_order):
+                        break
+                    
+                    if now >= deadline:
+                        self._timeouts += 1
+                        raise RateLimitTimeout(
+                            f"等待请求额度超时（{timeout}秒，权重 {weight}，"
+                            f"优先级 {PRIORITY_NAMES[priority]}）"
+                        )
+                    
+                    # 计算额度恢复所需时间；被更高优先级阻塞时等待通知
+                    wait = max(
+                        self._blocked_until - now,
+                        self._weights.wait_time(weight + self._reserves[priority]),
+                        self._orders.wait_time(1) if is_order else 0.0,
+                        0.01
+                    )
+                    self._condition.wait(min(wait, deadline - now))
+                
+                self._weights.tokens -= weight
+                if is_order:
+                    self._orders.tokens -= 1
+            finally:
+                self._waiting[priority] -= 1
+                self._condition.notify_all()
+            
+            waited = self.time_source() - start
+            self._requests[priority] += 1
+            self._wait_seconds[priority] += waited
+        
+        if waited > 1:
+            self.logger.warning(f"请求限流等待 {waited:.2f} 秒（优先级 {PRIORITY_NAMES[priority]}）")
+        
+        return waited
+    
+    def update_from_headers(self, headers: Dict[str, str], status_code: int = 200):
+        """
+        根据响应头校正剩余额度
+        
+        服务端统计包含同一账户/IP 上其他进程的请求，因此只在它比本地估计更紧时下调本地额度。
+        
+        Args:
+            headers: 响应头
+            status_code: HTTP 状态码（429/418 时按 Retry-After 暂停所有请求）
+        """
+        used_weight = _header_int(headers, 'X-MBX-USED-WEIGHT-1M')
+        order_count = _header_int(headers, 'X-MBX-ORDER-COUNT-1M')
+        
+        with self._condition:
+            now = self.time_source()
+            
+            if used_weight is not None:
+                self._server_used_weight = used_weight
+                self._weights.refill(now)
+                self._weights.tokens = min(self._weights.tokens, self.weight_limit - used_weight)
+            
+            if order_count is not None:
+                self._server_order_count = order_count
+                self._orders.refill(now)
+                self._orders.tokens = min(self._orders.tokens, self.order_limit - order_count)
+            
+            if status_code in (418, 429):
+                retry_after = _header_int(headers, 'Retry-After') or self.interval_seconds
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+                self._throttled += 1
+                self.logger.error(f"⛔ 触发交易所限流（HTTP {status_code}），暂停请求 {retry_after} 秒")
+            
+            self._condition.notify_all()
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        获取当前额度使用情况
+        
+        Returns:
+            限流指标
+        """
+        with self._condition:
+            now = self.time_source()
+            self._weights.refill(now)
+            self._orders.refill(now)
+            
+            return {
+                'weight_limit': self.weight_limit,
+                'weight_available': round(self._weights.tokens, 2),
+                'weight_used_pct': round((1 - self._weights.tokens / self.weight_limit) * 100, 2),
+                'server_used_weight': self._server_used_weight,
+                'order_limit': self.order_limit,
+                'order_available': round(self._orders.tokens, 2),
+                'server_order_count': self._server_order_count,
+                'blocked_seconds': round(max(0.0, self._blocked_until - now), 2),
+                'throttled_count': self._throttled,
+                'timeout_count': self._timeouts,
+                'waiting': {PRIORITY_NAMES[p]: n for p, n in self._waiting.items()},
+                'requests': {PRIORITY_NAMES[p]: n for p, n in self._requests.items()},
+                'wait_seconds': {PRIORITY_NAMES[p]: round(s, 3) for p, s in self._wait_seconds.items()}
+            }
+    
+    @classmethod
+    def from_config(cls, rate_limit_config: Optional[Dict[str, Any]] = None) -> Optional['RequestScheduler']:
+        """
+        根据配置创建调度器
+        
+        Args:
+            rate_limit_config: asterdex.rate_limit 配置块
+            
+        Returns:
+            RequestScheduler 实例，未启用时返回 None
+        """
+        config = {**DEFAULT_RATE_LIMIT_CONFIG, **(rate_limit_config or {})}
+        
+        if not config['enabled']:
+            return None
+        
+        return cls(
+            weight_limit=config['weight_limit'],
+            order_limit=config['order_limit'],
+            interval_seconds=config['interval_seconds'],
+            market_reserve_ratio=config['market_reserve_ratio'],
+            acquire_timeout=config['acquire_timeout']
+        )
+
+
+def _header_int(headers: Dict[str, str], name: str) -> Optional[int]:
+    """读取整数响应头（不区分大小写）"""
+    value = headers.get(name)
+    if value is None:
+        value = headers.get(name.lower())
+    try:
+        return int(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
@@ -0,0 +1,172 @@
+"""
+AsterDEX 请求签名模块
+
+私钥只解析一次，ABI 编码中固定不变的部分（user/signer 地址）预先计算。
+安装 coincurve 后 eth_keys 会自动改用 libsecp256k1，ECDSA 耗时可再降一个数量级
+"""
+import json
+import math
+import time
+from typing import Dict, Any, Callable, Optional
+from eth_abi import encode
+from eth_hash.auto import keccak
+from eth_keys import keys
+from eth_utils import to_bytes, to_checksum_address
+
+from ..utils.logger import get_logger
+
+
+# EIP-191 前缀（encode_defunct 对 32 字节哈希使用的版本 E 前缀）
+_EIP191_PREFIX = b'\x19Ethereum Signed Message:\n32'
+
+# ABI 编码中 string 参数的偏移量：四个头部槽位 * 32 字节
+_STRING_OFFSET = (4 * 32).to_bytes(32, 'big')
+
+
+def trim_dict(my_dict: Dict) -> Dict:
+    """
+    将字典中的值转换为字符串（原地修改，与 AsterDexClient._trim_dict 语义一致）
+    
+    Args:
+        my_dict: 原始字典
+        
+    Returns:
+        转换后的字典
+    """
+    for key in my_dict:
+        value = my_dict[key]
+        if isinstance(value, list):
+            new_value = []
+            for item in value:
+                if isinstance(item, dict):
+                    new_value.append(json.dumps(trim_dict(item)))
+                else:
+                    new_value.append(str(item))
+            my_dict[key] = json.dumps(new_value)
+            continue
+        if isinstance(value, dict):
+            my_dict[key] = json.dumps(trim_dict(value))
+            continue
+        my_dict[key] = str(value)
+    return my_dict
+
+
+def _encode_address(address: str) -> bytes:
+    """把地址编码为 32 字节 ABI 槽位（由 eth_abi 校验地址格式）"""
+    return encode(['address'], [address])
+
+
+class AsterDexSigner:
+    """AsterDEX 请求签名器"""
+    
+    def __init__(
+        self,
+        user: str,
+        signer: str,
+        private_key: str,
+        recv_window: int = 50000,
+        time_source: Optional[Callable[[], float]] = None
+    ):
+        """
+        初始化签名器
+        
+        Args:
+            user: 主钱包地址
+            signer: API 钱包地址
+            private_key: API 钱包私钥
+            recv_window: 接收窗口时间（毫秒）
+            time_source: 返回当前时间（秒）的函数，默认 time.time
+        """
+        self.user = user
+        self.signer = signer
+        self.recv_window = recv_window
+        self.time_source = time_source or time.time
+        self.logger = get_logger()
+        
+        # 私钥只解析一次
+        self._key = keys.PrivateKey(to_bytes(hexstr=private_key))
+        
+        # 预先编码固定的地址槽位
+        self._address_slots = _encode_address(user) + _encode_address(signer)
+    
+    @property
+    def signer_address(self) -> str:
+        """私钥对应的地址"""
+        return to_checksum_address(self._key.public_key.to_canonical_address())
+    
+    def _canonical_json(self, params: Dict[str, Any]) -> str:
+        """生成待签名的 JSON 字符串"""
+        if any(isinstance(value, (list, dict)) for value in params.values()):
+            # 嵌套结构走原有的递归转换
+            trimmed_params = trim_dict(params.copy())
+        else:
+            trimmed_params = {key: str(value) for key, value in params.items()}
+        
+        return json.dumps(trimmed_params, sort_keys=True).replace(' ', '').replace("'", '\\"')
+    
+    def _encode(self, json_str: str, nonce: int) -> bytes:
+        """ABI 编码 (string, address, address, uint256)"""
+        data = json_str.encode('utf-8')
+        padding = (-len(data)) % 32
+        
+        return b''.join((
+            _STRING_OFFSET,
+            self._address_slots,
+            nonce.to_bytes(32, 'big'),
+            len(data).to_bytes(32, 'big'),
+            data,
+            bytes(padding)
+        ))
+    
+    def sign_payload(self, json_str: str, nonce: int) -> str:
+        """
+        对已生成的 JSON 字符串签名
+        
+        Args:
+            json_str: 待签名的 JSON 字符串
+            nonce: nonce（微秒）
+            
+        Returns:
+            0x 开头的签名
+        """
+        message_hash = keccak(_EIP191_PREFIX + keccak(self._encode(json_str, nonce)))
+        signature = self._key.sign_msg_hash(message_hash)
+        v, r, s = signature.vrs
+        
+        return '0x' + (r.to_bytes(32, 'big') + s.to_bytes(32, 'big') + bytes([v + 27])).hex()
+    
+    def sign(
+        self,
+        params: Dict[str, Any],
+        nonce: Optional[int] = None,
+        timestamp: Optional[int] = None
+    ) -> Dict[str, Any]:
+        """
+        对请求参数进行签名
+        
+        Args:
+            params: 请求参数
+            nonce: 指定 nonce（微秒），默认取当前时间
+            timestamp: 指定时间戳（毫秒），默认取当前时间
+            
+        Returns:
+            包含签名的参数
+        """
+        # 生成 nonce（微秒）
+        if nonce is None:
+            nonce = math.trunc(self.time_source() * 1000000)
+        
+        # 过滤空值并添加必需参数
+        params = {key: value for key, value in params.items() if value is not None}
+        params['recvWindow'] = self.recv_window
+        params['timestamp'] = int(round(self.time_source() * 1000)) if timestamp is None else timestamp
+        
+        signature = self.sign_payload(self._canonical_json(params), nonce)
+        
+        # 添加签名参数
+        params['nonce'] = nonce
+        params['user'] = self.user
+        params['signer'] = self.signer
+        params['signature'] = signature
+        
+        return params
@@ -0,0 +1,176 @@
+"""
+WebSocket 数据流基类
+
+在独立的后台线程中运行事件循环，负责连接、断线重连和消息分发
+"""
+import asyncio
+import json
+import threading
+import time
+from typing import Dict, Any, Optional
+import websockets
+
+from ..utils.logger import get_logger
+
+
+class WebSocketStream:
+    """
+    WebSocket 数据流基类
+    
+    子类实现 _build_url、_on_message，按需实现 _on_connect（例如断线后回补数据）。
+    """
+    
+    def __init__(
+        self,
+        name: str,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+        ping_interval: float = 20.0
+    ):
+        """
+        初始化数据流
+        
+        Args:
+            name: 数据流名称（用于线程名和日志）
+            reconnect_delay: 首次重连等待时间（秒）
+            max_reconnect_delay: 最大重连等待时间（秒），按指数退避增长
+            ping_interval: 心跳间隔（秒）
+        """
+        self.name = name
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.ping_interval = ping_interval
+        self.logger = get_logger()
+        
+        self.is_running = False
+        self.is_connected = False
+        self.connect_count = 0
+        self.last_message_time: Optional[float] = None
+        
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._connection = None
+        self._connected_event = threading.Event()
+    
+    # ==================== 子类接口 ====================
+    
+    def _build_url(self) -> str:
+        """返回要连接的 WebSocket 地址"""
+        raise NotImplementedError
+    
+    def _on_message(self, message: Dict[str, Any]):
+        """处理一条已解析的消息（在事件循环线程中调用）"""
+        raise NotImplementedError
+    
+    async def _prepare(self):
+        """每次连接前调用（例如申请 listenKey）"""
+    
+    async def _on_connect(self):
+        """连接建立后调用（可用于回补断线期间缺失的数据）"""
+    
+    # ==================== 生命周期 ====================
+    
+    def start(self):
+        """启动数据流（后台线程）"""
+        if self.is_running:
+            self.logger.warning(f"{self.name} 已在运行")
+            return
+        
+        self.is_running = True
+        self._thread = threading.Thread(
+            target=self._run_loop,
+            daemon=True,
+            name=self.name
+        )
+        self._thread.start()
+    
+    def stop(self):
+        """停止数据流"""
+        if not self.is_running:
+            return
+        
+        self.is_running = False
+        self.reconnect()
+        
+        if self._thread:
+            self._thread.join(timeout=5)
+        
+        self.logger.info(f"🛑 {self.name} 已停止")
+    
+    def reconnect(self):
+        """关闭当前连接（运行中会自动重连）"""
+        loop = self._loop
+        connection = self._connection
+        if loop is not None and connection is not None:
+            asyncio.run_coroutine_threadsafe(connection.close(), loop)
+    
+    def wait_until_connected(self, timeout: Optional[float] = None) -> bool:
+        """
+        等待首次连接完成（含 _on_connect）
+        
+        Args:
+            timeout: 超时时间（秒）
+            
+        Returns:
+            是否已连接
+        """
+        return self._connected_event.wait(timeout)
+    
+    def _run_loop(self):
+        """后台线程入口"""
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        
+        try:
+            self._loop.run_until_complete(self._run())
+        finally:
+            self._loop.close()
+            self._loop = None
+    
+    async def _run(self):
+        """连接并在断线后按指数退避重连"""
+        delay = self.reconnect_delay
+        
+        while self.is_running:
+            try:
+                await self._prepare()
+                url = self._build_url()
+                
+                async with websockets.connect(
+                    url,
+                    ping_interval=self.ping_interval,
+                    max_size=None
+                ) as connection:
+                    self._connection = connection
+                    self.connect_count += 1
+                    self.logger.info(f"🔌 {self.name} 已连接（第 {self.connect_count} 次）")
+                    
+                    await self._on_connect()
+                    
+                    self.is_connected = True
+                    self._connected_event.set()
+                    delay = self.reconnect_delay
+                    
+                    async for raw in connection:
+                        self.last_message_time = time.time()
+                        try:
+                            self._on_message(json.loads(raw))
+                        except Exception as e:
+                            self.logger.error(f"{self.name} 消息处理失败: {e}", exc_info=True)
+                            
+            except Exception as e:
+                if self.is_running:
+                    self.logger.warning(f"{self.name} 连接异常: {e}")
+            
+            finally:
+                self._connection = None
+                self.is_connected = False
+            
+            if self.is_running:
+                self.logger.info(f"{self.name} {delay:.1f} 秒后重连")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+    
+    async def _run_blocking(self, func, *args, **kwargs):
+        """在线程池中执行阻塞调用（例如 REST 回补），避免阻塞事件循环"""
+        return await self._loop.run_in_executor(None, lambda: func(*args, **kwargs))
@@ -0,0 +1,27 @@
+"""
+回测模块
+"""
+from .engine import DoubleMaBacktester, BacktestResult, PortfolioResult
+from .sweep import ParameterSweep, DEFAULT_PARAM_SPACE, grid, random_samples
+from .walk_forward import (
+    WalkForwardOptimizer,
+    WalkForwardResult,
+    WalkForwardWindow,
+    make_windows,
+    load_strategy_parameters
+)
+
+__all__ = [
+    'DoubleMaBacktester',
+    'BacktestResult',
+    'PortfolioResult',
+    'ParameterSweep',
+    'DEFAULT_PARAM_SPACE',
+    'grid',
+    'random_samples',
+    'WalkForwardOptimizer',
+    'WalkForwardResult',
+    'WalkForwardWindow',
+    'make_windows',
+    'load_strategy_parameters'
+]
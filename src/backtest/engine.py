@@ -0,0 +1,465 @@
+"""
+回测引擎模块
+
+在历史K线上按与 DoubleMaStrategy.analyze 相同的规则（均线密集、突破、站稳、再次密集平仓）
+重放双均线策略。指标、突破和站稳条件对整段序列向量化计算，只有可能改变状态的K线
+才进入逐根的状态机；时间取自K线（第 t 根K线收盘时刻），不依赖系统时钟。
+成交按手续费和滑点建模，输出交易列表、权益曲线和统计指标。
+"""
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from ..market.bar_close import interval_to_ms
+from ..market.kline_decoder import decode_klines
+from ..strategies.batch_indicators import POSITION_ABOVE, POSITION_BELOW, classify
+from ..strategies.double_ma import DoubleMaStrategy
+from ..utils.logger import get_logger
+
+
+_YEAR_MS = 365 * 24 * 60 * 60 * 1000
+
+
+@dataclass
+class BacktestResult:
+    """单个交易对的回测结果"""
+    
+    symbol: str
+    interval: str
+    open_time: np.ndarray           # 每根K线的开盘时间（毫秒）
+    equity: np.ndarray              # 每根K线收盘时的权益（含未实现盈亏）
+    signals: List[Dict[str, Any]]   # [{'index', 'time', 'action', 'price'}]，time 为信号K线的收盘时刻
+    trades: List[Dict[str, Any]]
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class PortfolioResult:
+    """多交易对回测结果（资金平均分配到各交易对）"""
+    
+    results: Dict[str, BacktestResult]
+    open_time: np.ndarray           # 所有交易对K线时间的并集
+    equity: np.ndarray              # 组合权益（各交易对权益之和，缺失处沿用上一根K线）
+    stats: Dict[str, Any] = field(default_factory=dict)
+    
+    @property
+    def trades(self) -> List[Dict[str, Any]]:
+        """所有交易（按入场时间排序）"""
+        trades = [trade for result in self.results.values() for trade in result.trades]
+        return sorted(trades, key=lambda t: t['entry_time'])
+
+
+class DoubleMaBacktester:
+    """双均线策略回测引擎"""
+    
+    def __init__(
+        self,
+        strategy: Optional[DoubleMaStrategy] = None,
+        initial_capital: float = 10000.0,
+        position_percent: float = 30.0,
+        leverage: int = 3,
+        fee_rate: float = 0.0005,
+        slippage_bps: float = 2.0,
+        fill_price: str = 'next_open'
+    ):
+        """
+        初始化回测引擎
+        
+        Args:
+            strategy: 提供参数的策略实例（均线周期、密集阈值、确认时间），默认使用默认参数
+            initial_capital: 初始资金（USDT，多交易对时平均分配）
+            position_percent: 每次开仓占用的保证金占权益的百分比
+            leverage: 杠杆倍数
+            fee_rate: 手续费率（按成交名义价值收取，开平仓各一次）
+            slippage_bps: 滑点（基点），买入价上浮、卖出价下浮
+            fill_price: 成交价：next_open 为信号K线的下一根K线开盘价，close 为信号K线收盘价
+        """
+        if fill_price not in ('next_open', 'close'):
+            raise ValueError(f"不支持的成交价类型: {fill_price}")
+        
+        self.strategy = strategy or DoubleMaStrategy()
+        self.initial_capital = initial_capital
+        self.position_percent = position_percent
+        self.leverage = leverage
+        self.fee_rate = fee_rate
+        self.slippage = slippage_bps / 10000
+        self.fill_price = fill_price
+        self.logger = get_logger()
+    
+    # ==================== 信号 ====================
+    
+    def generate_signals(
+        self,
+        bars: np.ndarray,
+        interval: str,
+        mas: Optional[Dict[str, np.ndarray]] = None
+    ) -> List[Tuple[int, str]]:
+        """
+        重放策略规则，得到每个非 HOLD 信号
+        
+        Args:
+            bars: KLINE_DTYPE 结构化数组（从旧到新）
+            interval: K线间隔
+            mas: 预先计算好的均线序列 {均线名称: 与 bars 对齐的数组}，None 时由 bars 计算
+            
+        Returns:
+            [(K线下标, 'BUY'/'SELL'/'CLOSE')]
+        """
+        close = bars['close']
+        n = len(close)
+        if n == 0:
+            return []
+        
+        if mas is None:
+            mas = self.strategy.engine.compute_series(close)['mas']
+        avg, _, convergent, position = classify(mas, close, self.strategy.convergence_threshold)
+        
+        # 突破：前一根收盘价在均线平均值一侧，当前收盘价在另一侧（check_breakout）
+        prev_close = np.concatenate(([np.nan], close[:-1]))
+        breakout_up = (prev_close < avg) & (close > avg)
+        breakout_down = (prev_close > avg) & (close < avg)
+        
+        # 站稳：最近 N 根收盘价都在均线平均值同一侧（check_price_stability）
+        bars_needed = self.strategy._get_confirmation_bars(
+            interval, self.strategy.breakout_confirmation_minutes
+        )
+        stable_up = np.ones(n, dtype=bool)
+        stable_down = np.ones(n, dtype=bool)
+        for lag in range(bars_needed):
+            shifted = np.concatenate((np.full(lag, np.nan), close[:n - lag]))
+            stable_up &= shifted > avg
+            stable_down &= shifted < avg
+        
+        now = bars['close_time'] + 1
+        confirm_ms = self.strategy.breakout_confirmation_minutes * 60 * 1000
+        
+        # 不密集的K线不会改变开仓状态；密集且价格在均线一侧的K线才可能突破或开仓，
+        # 持仓后的第一根密集K线平仓
+        convergent_index = np.flatnonzero(convergent)
+        candidates = np.flatnonzero(convergent & ((position == POSITION_ABOVE) | (position == POSITION_BELOW)))
+        
+        # 逐根状态机只访问候选K线，各条件预先取成 Python 列表（避免 NumPy 标量索引的开销）
+        candidate_list = candidates.tolist()
+        is_above = (position[candidates] == POSITION_ABOVE).tolist()
+        up = breakout_up[candidates].tolist()
+        down = breakout_down[candidates].tolist()
+        hold_up = stable_up[candidates].tolist()
+        hold_down = stable_down[candidates].tolist()
+        times = now[candidates].tolist()
+        
+        signals = []
+        direction = None
+        breakout_time = None
+        i = 0
+        while i < len(candidate_list):
+            t = candidate_list[i]
+            opened = None
+            
+            if is_above[i]:
+                if direction != 'UP' and up[i]:
+                    direction, breakout_time = 'UP', times[i]
+                if direction == 'UP' and hold_up[i] and times[i] - breakout_time >= confirm_ms:
+                    opened = 'BUY'
+            else:
+                if direction != 'DOWN' and down[i]:
+                    direction, breakout_time = 'DOWN', times[i]
+                if direction == 'DOWN' and hold_down[i] and times[i] - breakout_time >= confirm_ms:
+                    opened = 'SELL'
+            
+            i += 1
+            if opened is None:
+                continue
+            
+            signals.append((t, opened))
+            
+            # 持仓期间只有密集K线会触发平仓，平仓的K线本身不再判断开仓
+            k = int(np.searchsorted(convergent_index, t, side='right'))
+            if k == len(convergent_index):
+                break
+            closed_at = int(convergent_index[k])
+            signals.append((closed_at, 'CLOSE'))
+            direction = None
+            breakout_time = None
+            i = int(np.searchsorted(candidates, closed_at, side='right'))
+        
+        return signals
+    
+    # ==================== 成交与权益 ====================
+    
+    def _fill(self, bars: np.ndarray, index: int, side: str) -> Tuple[int, float]:
+        """
+        成交的K线下标和价格（含滑点）
+        
+        Args:
+            bars: K线
+            index: 信号K线下标
+            side: BUY/SELL（成交方向）
+            
+        Returns:
+            (成交K线下标, 成交价)
+        """
+        if self.fill_price == 'next_open' and index + 1 < len(bars):
+            fill_index, price = index + 1, float(bars['open'][index + 1])
+        else:
+            fill_index, price = index, float(bars['close'][index])
+        
+        price *= (1 + self.slippage) if side == 'BUY' else (1 - self.slippage)
+        return fill_index, price
+    
+    def run(
+        self,
+        symbol: str,
+        klines,
+        interval: str,
+        initial_capital: Optional[float] = None,
+        mas: Optional[Dict[str, np.ndarray]] = None
+    ) -> BacktestResult:
+        """
+        回测单个交易对
+        
+        Args:
+            symbol: 交易对符号
+            klines: K线（REST 格式列表或 KLINE_DTYPE 结构化数组，从旧到新）
+            interval: K线间隔
+            initial_capital: 初始资金，默认使用构造参数
+            mas: 预先计算好的均线序列（见 generate_signals）
+            
+        Returns:
+            BacktestResult
+        """
+        bars = decode_klines(klines)
+        capital = self.initial_capital if initial_capital is None else initial_capital
+        close = bars['close']
+        n = len(bars)
+        
+        signals = self.generate_signals(bars, interval, mas)
+        
+        realized = np.zeros(n)          # 第 t 根K线上实现的盈亏（含手续费）
+        unrealized = np.zeros(n)
+        trades = []
+        equity = capital
+        entry = None
+        
+        signal_records = []
+        for index, action in signals:
+            signal_records.append({
+                'index': index,
+                'time': int(bars['close_time'][index]) + 1,
+                'action': action,
+                'price': float(close[index])
+            })
+            
+            if action in ('BUY', 'SELL'):
+                fill_index, price = self._fill(bars, index, action)
+                notional = equity * self.position_percent / 100 * self.leverage
+                quantity = notional / price
+                fee = notional * self.fee_rate
+                realized[fill_index] -= fee
+                entry = {
+                    'side': 'LONG' if action == 'BUY' else 'SHORT',
+                    'direction': 1 if action == 'BUY' else -1,
+                    'signal_index': index,
+                    'fill_index': fill_index,
+                    'price': price,
+                    'quantity': quantity,
+                    'fee': fee
+                }
+                continue
+            
+            trades.append(self._close_trade(symbol, bars, entry, index, realized, unrealized))
+            equity += trades[-1]['pnl']
+            entry = None
+        
+        # 数据结束时仍有持仓：按最后一根K线收盘价平仓
+        if entry is not None:
+            trades.append(self._close_trade(symbol, bars, entry, n - 1, realized, unrealized, reason='END'))
+        
+        equity_curve = capital + np.cumsum(realized) + unrealized
+        
+        result = BacktestResult(
+            symbol=symbol,
+            interval=interval,
+            open_time=bars['open_time'].copy(),
+            equity=equity_curve,
+            signals=signal_records,
+            trades=trades
+        )
+        result.stats = self._stats(equity_curve, trades, capital, interval)
+        return result
+    
+    def _close_trade(
+        self,
+        symbol: str,
+        bars: np.ndarray,
+        entry: Dict[str, Any],
+        index: int,
+        realized: np.ndarray,
+        unrealized: np.ndarray,
+        reason: str = 'SIGNAL'
+    ) -> Dict[str, Any]:
+        """平仓并写入盈亏序列"""
+        direction = entry['direction']
+        if reason == 'END':
+            exit_index = index
+            exit_price = float(bars['close'][index]) * ((1 - self.slippage) if direction > 0 else (1 + self.slippage))
+        else:
+            exit_index, exit_price = self._fill(bars, index, 'SELL' if direction > 0 else 'BUY')
+        
+        quantity = entry['quantity']
+        fee = quantity * exit_price * self.fee_rate
+        gross = direction * quantity * (exit_price - entry['price'])
+        
+        # 持仓期间按收盘价计算未实现盈亏
+        start, stop = entry['fill_index'], exit_index
+        if stop > start:
+            unrealized[start:stop] += direction * quantity * (bars['close'][start:stop] - entry['price'])
+        realized[exit_index] += gross - fee
+        
+        margin = quantity * entry['price'] / self.leverage
+        pnl = gross - fee - entry['fee']
+        return {
+            'symbol': symbol,
+            'side': entry['side'],
+            'signal_time': int(bars['close_time'][entry['signal_index']]) + 1,
+            'entry_time': int(bars['open_time'][entry['fill_index']]),
+            'entry_price': entry['price'],
+            'exit_signal_time': int(bars['close_time'][index]) + 1,
+            'exit_time': int(bars['open_time'][exit_index]),
+            'exit_price': exit_price,
+            'quantity': quantity,
+            'fees': entry['fee'] + fee,
+            'pnl': pnl,
+            'return_percent': pnl / margin * 100 if margin else 0.0,
+            'bars_held': exit_index - entry['fill_index'],
+            'exit_reason': reason
+        }
+    
+    # ==================== 统计 ====================
+    
+    @staticmethod
+    def _stats(
+        equity: np.ndarray,
+        trades: List[Dict[str, Any]],
+        capital: float,
+        interval: str
+    ) -> Dict[str, Any]:
+        """
+        统计指标
+        
+        Args:
+            equity: 权益曲线
+            trades: 交易列表
+            capital: 初始资金
+            interval: K线间隔（用于年化）
+            
+        Returns:
+            收益率、最大回撤、夏普比率、胜率、盈亏比等
+        """
+        if len(equity) == 0:
+            return {'bars': 0, 'trades': 0}
+        
+        peak = np.maximum.accumulate(np.maximum(equity, capital))
+        drawdown = (peak - equity) / peak
+        
+        returns = np.diff(equity) / equity[:-1] if len(equity) > 1 else np.zeros(0)
+        bars_per_year = _YEAR_MS / interval_to_ms(interval)
+        sharpe = 0.0
+        if len(returns) > 1 and returns.std() > 0:
+            sharpe = float(returns.mean() / returns.std() * np.sqrt(bars_per_year))
+        
+        pnls = np.array([t['pnl'] for t in trades])
+        wins = pnls[pnls > 0]
+        losses = pnls[pnls <= 0]
+        held = sum(t['bars_held'] for t in trades)
+        
+        return {
+            'bars': int(len(equity)),
+            'initial_capital': capital,
+            'final_equity': float(equity[-1]),
+            'total_return_percent': float((equity[-1] / capital - 1) * 100),
+            'max_drawdown_percent': float(drawdown.max() * 100),
+            'sharpe': sharpe,
+            'trades': int(len(trades)),
+            'win_rate_percent': float(len(wins) / len(pnls) * 100) if len(pnls) else 0.0,
+            'profit_factor': float(wins.sum() / -losses.sum()) if losses.sum() < 0 else None,
+            'average_pnl': float(pnls.mean()) if len(pnls) else 0.0,
+            'total_fees': float(sum(t['fees'] for t in trades)),
+            'exposure_percent': float(held / len(equity) * 100)
+        }
+    
+    # ==================== 多交易对 ====================
+    
+    def run_many(
+        self,
+        klines_by_symbol: Dict[str, Any],
+        interval: str,
+        mas_by_symbol: Optional[Dict[str, Dict[str, np.ndarray]]] = None
+    ) -> PortfolioResult:
+        """
+        回测多个交易对（初始资金平均分配）
+        
+        Args:
+            klines_by_symbol: {交易对: K线}
+            interval: K线间隔
+            mas_by_symbol: {交易对: 预先计算好的均线序列}（可选）
+            
+        Returns:
+            PortfolioResult
+        """
+        symbols = [s for s, k in klines_by_symbol.items() if k is not None and len(k)]
+        if not symbols:
+            raise ValueError("没有可回测的K线数据")
+        
+        capital = self.initial_capital / len(symbols)
+        results = {
+            symbol: self.run(
+                symbol, klines_by_symbol[symbol], interval, initial_capital=capital,
+                mas=mas_by_symbol.get(symbol) if mas_by_symbol else None
+            )
+            for symbol in symbols
+        }
+        
+        # 对齐到所有K线时间的并集：上市前按初始资金计，缺失的K线沿用上一根的权益
+        open_time = np.unique(np.concatenate([r.open_time for r in results.values()]))
+        equity = np.zeros(len(open_time))
+        for result in results.values():
+            position = np.searchsorted(result.open_time, open_time, side='right') - 1
+            aligned = np.where(position >= 0, result.equity[np.maximum(position, 0)], capital)
+            equity += aligned
+        
+        trades = [t for r in results.values() for t in r.trades]
+        portfolio = PortfolioResult(results=results, open_time=open_time, equity=equity)
+        portfolio.stats = self._stats(equity, trades, self.initial_capital, interval)
+        portfolio.stats['symbols'] = len(symbols)
+        return portfolio
+    
+    def run_store(
+        self,
+        store,
+        symbols: List[str],
+        interval: str,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None
+    ) -> PortfolioResult:
+        """
+        从本地K线存储读取历史数据并回测
+        
+        Args:
+            store: KlineStore 实例
+            symbols: 交易对列表
+            interval: K线间隔
+            start_time: 开始时间（毫秒，含）
+            end_time: 结束时间（毫秒，不含）
+            
+        Returns:
+            PortfolioResult
+        """
+        klines_by_symbol = {
+            symbol: store.get_range(symbol, interval, start_time, end_time)
+            for symbol in symbols
+        }
+        for symbol, bars in klines_by_symbol.items():
+            if len(bars) == 0:
+                self.logger.warning(f"{symbol} {interval} 本地没有K线数据，跳过")
+        return self.run_many(klines_by_symbol, interval)
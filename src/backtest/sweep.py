@@ -0,0 +1,356 @@
+"""
+参数扫描模块
+
+在回测引擎上并行评估策略参数组合（网格或随机抽样），覆盖
+sma_periods、ema_periods、convergence_threshold、breakout_confirmation_minutes。
+K线只写入磁盘一次（每个交易对一个 .npy 文件），各工作进程以只读内存映射方式加载，
+不在进程间复制价格数据。结果按指标排序后写入 JSON 文件，可作为回测表现提供给 AI 参数优化器。
+"""
+import itertools
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+from ..market.kline_decoder import decode_klines
+from ..strategies.double_ma import DoubleMaStrategy
+from ..utils.logger import get_logger
+from .engine import DoubleMaBacktester
+
+
+# 默认扫描空间
+DEFAULT_PARAM_SPACE: Dict[str, List[Any]] = {
+    'sma_periods': [[10, 30, 90], [20, 60, 120], [30, 90, 180]],
+    'ema_periods': [[10, 30, 90], [20, 60, 120], [30, 90, 180]],
+    'convergence_threshold': [1.0, 1.5, 2.0, 3.0],
+    'breakout_confirmation_minutes': [15, 30, 45]
+}
+
+# 越小越好的指标
+_ASCENDING_METRICS = {'max_drawdown_percent'}
+
+
+def grid(space: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    """
+    网格参数组合
+    
+    Args:
+        space: {参数名: 候选值列表}
+        
+    Returns:
+        所有组合的参数字典列表
+    """
+    names = list(space.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def random_samples(space: Dict[str, List[Any]], count: int, seed: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    从网格中无放回随机抽样
+    
+    Args:
+        space: {参数名: 候选值列表}
+        count: 抽样数量（不少于网格大小时返回整个网格）
+        seed: 随机种子
+        
+    Returns:
+        参数字典列表
+    """
+    names = list(space.keys())
+    sizes = [len(space[name]) for name in names]
+    total = int(np.prod(sizes)) if sizes else 0
+    if count >= total:
+        return grid(space)
+    
+    # 按混合进制把组合序号解码为各参数的下标，避免展开整个网格
+    samples = []
+    for number in random.Random(seed).sample(range(total), count):
+        params = {}
+        for name, size in zip(reversed(names), reversed(sizes)):
+            number, index = divmod(number, size)
+            params[name] = space[name][index]
+        samples.append({name: params[name] for name in names})
+    return samples
+
+
+# ==================== 工作进程 ====================
+
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+def _load_price_data(price_files: Dict[str, str]) -> Dict[str, np.ndarray]:
+    """以只读内存映射方式加载价格数据"""
+    return {symbol: np.load(path, mmap_mode='r') for symbol, path in price_files.items()}
+
+
+def _evaluate(
+    klines_by_symbol: Dict[str, np.ndarray],
+    interval: str,
+    backtest_params: Dict[str, Any],
+    params: Dict[str, Any],
+    mas_by_symbol: Optional[Dict[str, Dict[str, np.ndarray]]] = None
+) -> Dict[str, Any]:
+    """回测一组参数"""
+    try:
+        strategy = DoubleMaStrategy(**params)
+        backtester = DoubleMaBacktester(strategy=strategy, **backtest_params)
+        portfolio = backtester.run_many(klines_by_symbol, interval, mas_by_symbol)
+        return {
+            'params': params,
+            'stats': portfolio.stats,
+            'symbols': {
+                symbol: {
+                    'total_return_percent': result.stats.get('total_return_percent'),
+                    'trades': result.stats.get('trades')
+                }
+                for symbol, result in portfolio.results.items()
+            }
+        }
+    except Exception as e:
+        return {'params': params, 'error': str(e)}
+
+
+def _init_worker(price_files: Dict[str, str], interval: str, backtest_params: Dict[str, Any]):
+    _WORKER_STATE['klines'] = _load_price_data(price_files)
+    _WORKER_STATE['interval'] = interval
+    _WORKER_STATE['backtest_params'] = backtest_params
+
+
+def _worker_evaluate(params: Dict[str, Any]) -> Dict[str, Any]:
+    return _evaluate(
+        _WORKER_STATE['klines'],
+        _WORKER_STATE['interval'],
+        _WORKER_STATE['backtest_params'],
+        params
+    )
+
+
+class ParameterSweep:
+    """双均线策略参数扫描"""
+    
+    def __init__(
+        self,
+        interval: str,
+        data_dir: str = 'data/sweeps',
+        backtest_params: Optional[Dict[str, Any]] = None,
+        workers: Optional[int] = None,
+        metric: str = 'sharpe',
+        min_trades: int = 1
+    ):
+        """
+        初始化参数扫描
+        
+        Args:
+            interval: K线间隔
+            data_dir: 工作目录（价格数据快照和结果文件）
+            backtest_params: 传给 DoubleMaBacktester 的参数（初始资金、杠杆、手续费等）
+            workers: 进程数，默认 CPU 核数；1 表示在当前进程内顺序执行
+            metric: 排序指标（组合统计中的字段，例如 sharpe、total_return_percent、max_drawdown_percent）
+            min_trades: 交易次数少于该值的组合排在最后
+        """
+        self.interval = interval
+        self.data_dir = data_dir
+        self.backtest_params = dict(backtest_params or {})
+        self.workers = workers or os.cpu_count() or 1
+        self.metric = metric
+        self.min_trades = min_trades
+        self.logger = get_logger()
+        
+        self.price_files: Dict[str, str] = {}
+    
+    # ==================== 价格数据 ====================
+    
+    def load(self, klines_by_symbol: Dict[str, Any]) -> Dict[str, str]:
+        """
+        把K线写入价格数据快照（每个交易对一个 .npy 文件）
+        
+        Args:
+            klines_by_symbol: {交易对: K线}
+            
+        Returns:
+            {交易对: 文件路径}
+        """
+        directory = os.path.join(self.data_dir, 'prices', self.interval)
+        os.makedirs(directory, exist_ok=True)
+        
+        price_files = {}
+        for symbol, klines in klines_by_symbol.items():
+            bars = decode_klines(klines)
+            if len(bars) == 0:
+                self.logger.warning(f"{symbol} {self.interval} 没有K线数据，跳过")
+                continue
+            path = os.path.join(directory, f"{symbol}.npy")
+            np.save(path, np.ascontiguousarray(bars))
+            price_files[symbol] = path
+        
+        if not price_files:
+            raise ValueError("没有可扫描的K线数据")
+        
+        self.price_files = price_files
+        return price_files
+    
+    def load_store(
+        self,
+        store,
+        symbols: List[str],
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None
+    ) -> Dict[str, str]:
+        """
+        从本地K线存储读取历史数据并写入快照
+        
+        Args:
+            store: KlineStore 实例
+            symbols: 交易对列表
+            start_time: 开始时间（毫秒，含）
+            end_time: 结束时间（毫秒，不含）
+            
+        Returns:
+            {交易对: 文件路径}
+        """
+        return self.load({
+            symbol: store.get_range(symbol, self.interval, start_time, end_time)
+            for symbol in symbols
+        })
+    
+    # ==================== 扫描 ====================
+    
+    def run(self, param_sets: List[Dict[str, Any]], output: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        评估所有参数组合并写入排序后的结果
+        
+        Args:
+            param_sets: 参数字典列表（见 grid / random_samples）
+            output: 结果文件路径，默认 data_dir 下按时间命名；传入空字符串不写文件
+            
+        Returns:
+            排序后的结果列表 [{'rank', 'params', 'stats', 'symbols'}]，失败的组合带 error 字段
+        """
+        if not self.price_files:
+            raise ValueError("请先调用 load / load_store 写入价格数据")
+        
+        start = time.perf_counter()
+        workers = min(self.workers, len(param_sets)) or 1
+        
+        if workers == 1:
+            klines = _load_price_data(self.price_files)
+            results = [_evaluate(klines, self.interval, self.backtest_params, p) for p in param_sets]
+        else:
+            chunksize = max(1, len(param_sets) // (workers * 4))
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(self.price_files, self.interval, self.backtest_params)
+            ) as executor:
+                results = list(executor.map(_worker_evaluate, param_sets, chunksize=chunksize))
+        
+        elapsed = time.perf_counter() - start
+        ranked = self.rank(results)
+        
+        failed = sum(1 for r in ranked if 'error' in r)
+        self.logger.info(
+            f"参数扫描完成: {len(param_sets)} 组参数 × {len(self.price_files)} 个交易对, "
+            f"{workers} 个进程, 耗时 {elapsed:.1f}s" + (f", 失败 {failed} 组" if failed else "")
+        )
+        
+        if output != '':
+            path = output or os.path.join(
+                self.data_dir, f"sweep_{self.interval}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+            )
+            self.save(ranked, path, elapsed)
+        
+        return ranked
+    
+    def rank(self, results: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        按指标排序（失败和交易次数不足的组合排在最后）
+        
+        Args:
+            results: 扫描结果列表
+            
+        Returns:
+            带 rank 字段的排序结果
+        """
+        ascending = self.metric in _ASCENDING_METRICS
+        
+        def key(result):
+            stats = result.get('stats')
+            if not stats:
+                return (2, 0.0)
+            value = stats.get(self.metric)
+            if value is None or stats.get('trades', 0) < self.min_trades:
+                return (1, 0.0)
+            return (0, value if ascending else -value)
+        
+        ranked = sorted(results, key=key)
+        for rank, result in enumerate(ranked, 1):
+            result['rank'] = rank
+        return ranked
+    
+    def save(self, results: List[Dict[str, Any]], path: str, elapsed: Optional[float] = None):
+        """
+        写入结果文件
+        
+        Args:
+            results: 排序后的结果
+            path: 文件路径
+            elapsed: 扫描耗时（秒）
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        report = {
+            'interval': self.interval,
+            'symbols': sorted(self.price_files.keys()),
+            'metric': self.metric,
+            'min_trades': self.min_trades,
+            'backtest_params': self.backtest_params,
+            'created_at': datetime.now().isoformat(),
+            'elapsed_seconds': elapsed,
+            'results': results
+        }
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        self.logger.info(f"参数扫描结果已保存: {path}")
+    
+    @staticmethod
+    def load_results(path: str) -> Dict[str, Any]:
+        """读取结果文件"""
+        with open(path, 'r') as f:
+            return json.load(f)
+    
+    @staticmethod
+    def summarize(results: List[Dict[str, Any]], top: int = 5) -> List[Dict[str, Any]]:
+        """
+        精简的排名前列结果（用于 AI 参数优化提示词）
+        
+        Args:
+            results: 排序后的结果
+            top: 保留数量
+            
+        Returns:
+            [{'rank', 'params', 收益率/回撤/夏普/胜率/交易次数}]
+        """
+        summary = []
+        for result in results:
+            if 'error' in result:
+                continue
+            stats = result['stats']
+            summary.append({
+                'rank': result.get('rank'),
+                'params': result['params'],
+                'total_return_percent': round(stats.get('total_return_percent', 0.0), 2),
+                'max_drawdown_percent': round(stats.get('max_drawdown_percent', 0.0), 2),
+                'sharpe': round(stats.get('sharpe', 0.0), 2),
+                'win_rate_percent': round(stats.get('win_rate_percent', 0.0), 1),
+                'trades': stats.get('trades', 0)
+            })
+            if len(summary) >= top:
+                break
+        return summary
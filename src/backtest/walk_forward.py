@@ -0,0 +1,567 @@
+"""
+滚动窗口（walk-forward）优化模块
+
+把历史K线切成滚动的样本内 / 样本外窗口：在每个样本内窗口上扫描参数并选出最优组合，
+再用紧随其后的样本外窗口检验，最后汇总样本外表现和参数稳定性，输出可由
+TradingBot._init_strategies 加载的参数文件。
+
+每个交易对每条均线只在完整历史上计算一次并写入磁盘（只读内存映射），
+各窗口直接取切片，重叠窗口不会重复计算均线；窗口之间在进程池中并行。
+"""
+import json
+import os
+import statistics
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+from ..strategies.batch_indicators import sma_series, ema_series
+from ..utils.logger import get_logger
+from .sweep import DEFAULT_PARAM_SPACE, ParameterSweep, grid, _evaluate, _load_price_data
+
+
+_DAY_MS = 24 * 60 * 60 * 1000
+
+# 参数文件中的字段 -> DoubleMaStrategy 参数
+_PARAMETER_FIELDS = {
+    'sma_periods': 'sma_periods',
+    'ema_periods': 'ema_periods',
+    'convergence_threshold_percent': 'convergence_threshold',
+    'breakout_confirmation_minutes': 'breakout_confirmation_minutes'
+}
+
+
+@dataclass
+class WalkForwardWindow:
+    """一个滚动窗口（时间均为毫秒，左闭右开）"""
+    
+    index: int
+    in_sample_start: int
+    in_sample_end: int          # 同时是样本外窗口的开始
+    out_of_sample_end: int
+
+
+@dataclass
+class WalkForwardResult:
+    """滚动窗口优化结果"""
+    
+    interval: str
+    windows: List[Dict[str, Any]]           # 每个窗口的最优参数、样本内和样本外统计
+    stability: Dict[str, Any]               # 样本外汇总和参数稳定性
+    parameters: Optional[Dict[str, Any]]    # 推荐参数（DoubleMaStrategy 参数），没有有效窗口时为 None
+    report_path: Optional[str] = None
+    parameters_path: Optional[str] = None
+    stats: Dict[str, Any] = field(default_factory=dict)
+
+
+def make_windows(
+    start_time: int,
+    end_time: int,
+    in_sample_ms: int,
+    out_of_sample_ms: int,
+    step_ms: Optional[int] = None
+) -> List[WalkForwardWindow]:
+    """
+    生成滚动窗口
+    
+    Args:
+        start_time: 历史数据开始时间（毫秒）
+        end_time: 历史数据结束时间（毫秒，不含）
+        in_sample_ms: 样本内窗口长度
+        out_of_sample_ms: 样本外窗口长度
+        step_ms: 窗口滚动步长，默认等于样本外窗口长度（样本外窗口首尾相接）
+        
+    Returns:
+        窗口列表（只包含样本外窗口完整落在历史范围内的窗口）
+    """
+    step_ms = step_ms or out_of_sample_ms
+    if in_sample_ms <= 0 or out_of_sample_ms <= 0 or step_ms <= 0:
+        raise ValueError("窗口长度和步长必须大于 0")
+    
+    windows = []
+    start = start_time
+    while start + in_sample_ms + out_of_sample_ms <= end_time:
+        windows.append(WalkForwardWindow(
+            index=len(windows),
+            in_sample_start=start,
+            in_sample_end=start + in_sample_ms,
+            out_of_sample_end=start + in_sample_ms + out_of_sample_ms
+        ))
+        start += step_ms
+    return windows
+
+
+def load_strategy_parameters(path: str, interval: Optional[str] = None) -> Dict[str, Any]:
+    """
+    读取滚动窗口优化输出的参数文件
+    
+    Args:
+        path: 参数文件路径
+        interval: 策略使用的K线间隔，与文件中的间隔不一致时拒绝加载
+        
+    Returns:
+        DoubleMaStrategy 的参数（sma_periods、ema_periods、convergence_threshold、breakout_confirmation_minutes）
+        
+    Raises:
+        ValueError: 文件与策略的K线间隔不一致
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+    
+    if interval and data.get('interval') and data['interval'] != interval:
+        raise ValueError(f"参数文件的K线间隔 {data['interval']} 与策略 {interval} 不一致")
+    
+    return {name: data[key] for key, name in _PARAMETER_FIELDS.items() if key in data}
+
+
+# ==================== 工作进程 ====================
+
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+class _IndicatorCache:
+    """完整历史均线序列（只读内存映射，按需打开）"""
+    
+    def __init__(self, files: Dict[Tuple[str, str, int], str]):
+        self.files = files
+        self._arrays: Dict[Tuple[str, str, int], np.ndarray] = {}
+    
+    def get(self, symbol: str, kind: str, period: int) -> np.ndarray:
+        key = (symbol, kind, period)
+        if key not in self._arrays:
+            self._arrays[key] = np.load(self.files[key], mmap_mode='r')
+        return self._arrays[key]
+
+
+def _window_slices(
+    klines_by_symbol: Dict[str, np.ndarray],
+    start: int,
+    end: int
+) -> Dict[str, slice]:
+    """每个交易对在 [start, end) 内的K线下标范围（没有K线的交易对不包含在内）"""
+    slices = {}
+    for symbol, bars in klines_by_symbol.items():
+        lo, hi = np.searchsorted(bars['open_time'], [start, end], side='left')
+        if hi > lo:
+            slices[symbol] = slice(int(lo), int(hi))
+    return slices
+
+
+def _backtest_slice(
+    klines_by_symbol: Dict[str, np.ndarray],
+    cache: _IndicatorCache,
+    slices: Dict[str, slice],
+    interval: str,
+    backtest_params: Dict[str, Any],
+    params: Dict[str, Any]
+) -> Dict[str, Any]:
+    """用预先计算的均线切片回测一组参数"""
+    klines = {symbol: klines_by_symbol[symbol][window] for symbol, window in slices.items()}
+    mas_by_symbol = {}
+    for symbol, window in slices.items():
+        mas = {}
+        for period in params.get('sma_periods', []):
+            mas[f'sma_{period}'] = cache.get(symbol, 'sma', period)[window]
+        for period in params.get('ema_periods', []):
+            mas[f'ema_{period}'] = cache.get(symbol, 'ema', period)[window]
+        mas_by_symbol[symbol] = mas
+    return _evaluate(klines, interval, backtest_params, params, mas_by_symbol)
+
+
+def _evaluate_window(
+    klines_by_symbol: Dict[str, np.ndarray],
+    cache: _IndicatorCache,
+    config: Dict[str, Any],
+    window: WalkForwardWindow
+) -> Dict[str, Any]:
+    """在样本内窗口扫描参数，用最优参数回测样本外窗口"""
+    interval = config['interval']
+    backtest_params = config['backtest_params']
+    ranker = ParameterSweep(interval, metric=config['metric'], min_trades=config['min_trades'])
+    
+    result = {
+        'index': window.index,
+        'in_sample': {'start': window.in_sample_start, 'end': window.in_sample_end},
+        'out_of_sample': {'start': window.in_sample_end, 'end': window.out_of_sample_end},
+        'best_params': None
+    }
+    
+    in_slices = _window_slices(klines_by_symbol, window.in_sample_start, window.in_sample_end)
+    out_slices = _window_slices(klines_by_symbol, window.in_sample_end, window.out_of_sample_end)
+    if not in_slices or not out_slices:
+        result['error'] = "窗口内没有K线数据"
+        return result
+    
+    ranked = ranker.rank([
+        _backtest_slice(klines_by_symbol, cache, in_slices, interval, backtest_params, params)
+        for params in config['param_sets']
+    ])
+    best = ranked[0]
+    stats = best.get('stats') or {}
+    if 'error' in best or stats.get('trades', 0) < config['min_trades'] or stats.get(config['metric']) is None:
+        result['error'] = "样本内没有满足条件的参数组合"
+        return result
+    
+    out = _backtest_slice(klines_by_symbol, cache, out_slices, interval, backtest_params, best['params'])
+    if 'error' in out:
+        result['error'] = out['error']
+        return result
+    
+    result['best_params'] = best['params']
+    result['in_sample_stats'] = stats
+    result['out_of_sample_stats'] = out['stats']
+    result['candidates'] = ParameterSweep.summarize(ranked, top=config['top'])
+    return result
+
+
+def _init_worker(price_files: Dict[str, str], ma_files: Dict[Tuple[str, str, int], str], config: Dict[str, Any]):
+    _WORKER_STATE['klines'] = _load_price_data(price_files)
+    _WORKER_STATE['cache'] = _IndicatorCache(ma_files)
+    _WORKER_STATE['config'] = config
+
+
+def _worker_evaluate_window(window: WalkForwardWindow) -> Dict[str, Any]:
+    return _evaluate_window(_WORKER_STATE['klines'], _WORKER_STATE['cache'], _WORKER_STATE['config'], window)
+
+
+class WalkForwardOptimizer:
+    """双均线策略滚动窗口优化"""
+    
+    def __init__(
+        self,
+        interval: str,
+        in_sample_days: float = 90,
+        out_of_sample_days: float = 30,
+        step_days: Optional[float] = None,
+        data_dir: str = 'data/walk_forward',
+        backtest_params: Optional[Dict[str, Any]] = None,
+        workers: Optional[int] = None,
+        metric: str = 'sharpe',
+        min_trades: int = 1,
+        top: int = 5
+    ):
+        """
+        初始化滚动窗口优化
+        
+        Args:
+            interval: K线间隔
+            in_sample_days: 样本内窗口天数
+            out_of_sample_days: 样本外窗口天数
+            step_days: 窗口滚动步长（天），默认等于样本外窗口天数
+            data_dir: 工作目录（价格和均线快照、结果文件）
+            backtest_params: 传给 DoubleMaBacktester 的参数
+            workers: 进程数，默认 CPU 核数；1 表示在当前进程内顺序执行
+            metric: 样本内选择参数的指标（见 ParameterSweep）
+            min_trades: 样本内交易次数少于该值的组合不会被选中
+            top: 每个窗口在结果中保留的样本内候选数量
+        """
+        self.interval = interval
+        self.in_sample_ms = int(in_sample_days * _DAY_MS)
+        self.out_of_sample_ms = int(out_of_sample_days * _DAY_MS)
+        self.step_ms = int(step_days * _DAY_MS) if step_days else None
+        self.data_dir = data_dir
+        self.backtest_params = dict(backtest_params or {})
+        self.workers = workers or os.cpu_count() or 1
+        self.metric = metric
+        self.min_trades = min_trades
+        self.top = top
+        self.logger = get_logger()
+        
+        # 价格快照与 ParameterSweep 相同
+        self.sweep = ParameterSweep(
+            interval,
+            data_dir=data_dir,
+            backtest_params=self.backtest_params,
+            metric=metric,
+            min_trades=min_trades
+        )
+        self.ma_files: Dict[Tuple[str, str, int], str] = {}
+    
+    # ==================== 数据 ====================
+    
+    def load(self, klines_by_symbol: Dict[str, Any]) -> Dict[str, str]:
+        """
+        写入价格数据快照（清空已有的均线缓存）
+        
+        Args:
+            klines_by_symbol: {交易对: K线}
+            
+        Returns:
+            {交易对: 文件路径}
+        """
+        self.ma_files = {}
+        return self.sweep.load(klines_by_symbol)
+    
+    def load_store(
+        self,
+        store,
+        symbols: List[str],
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None
+    ) -> Dict[str, str]:
+        """
+        从本地K线存储读取历史数据并写入快照
+        
+        Args:
+            store: KlineStore 实例
+            symbols: 交易对列表
+            start_time: 开始时间（毫秒，含）
+            end_time: 结束时间（毫秒，不含）
+            
+        Returns:
+            {交易对: 文件路径}
+        """
+        self.ma_files = {}
+        return self.sweep.load_store(store, symbols, start_time, end_time)
+    
+    def precompute(self, param_sets: List[Dict[str, Any]]) -> int:
+        """
+        在完整历史上计算参数组合用到的所有均线并写入磁盘（已计算的跳过）
+        
+        Args:
+            param_sets: 参数字典列表
+            
+        Returns:
+            新计算的均线序列数量
+        """
+        needed = set()
+        for params in param_sets:
+            needed.update(('sma', p) for p in params.get('sma_periods', []))
+            needed.update(('ema', p) for p in params.get('ema_periods', []))
+        
+        directory = os.path.join(self.data_dir, 'indicators', self.interval)
+        os.makedirs(directory, exist_ok=True)
+        
+        computed = 0
+        for symbol, bars in _load_price_data(self.sweep.price_files).items():
+            close = np.asarray(bars['close'], dtype=np.float64)
+            for kind, period in sorted(needed):
+                key = (symbol, kind, period)
+                if key in self.ma_files:
+                    continue
+                values = sma_series(close, period) if kind == 'sma' else ema_series(close, period)
+                path = os.path.join(directory, f"{symbol}_{kind}_{period}.npy")
+                np.save(path, values)
+                self.ma_files[key] = path
+                computed += 1
+        return computed
+    
+    def windows(self) -> List[WalkForwardWindow]:
+        """按已加载数据的时间范围生成滚动窗口"""
+        bars = _load_price_data(self.sweep.price_files)
+        start = min(int(b['open_time'][0]) for b in bars.values())
+        end = max(int(b['close_time'][-1]) + 1 for b in bars.values())
+        return make_windows(start, end, self.in_sample_ms, self.out_of_sample_ms, self.step_ms)
+    
+    # ==================== 优化 ====================
+    
+    def run(
+        self,
+        param_sets: Optional[List[Dict[str, Any]]] = None,
+        output: Optional[str] = None,
+        parameters_output: Optional[str] = None
+    ) -> WalkForwardResult:
+        """
+        执行滚动窗口优化
+        
+        Args:
+            param_sets: 参数字典列表，默认 DEFAULT_PARAM_SPACE 的完整网格
+            output: 完整报告路径，默认 data_dir 下按时间命名；传入空字符串不写文件
+            parameters_output: 推荐参数文件路径（供 strategies.*.parameters_file 加载），
+                默认 data_dir/parameters_<interval>.json；传入空字符串不写文件
+                
+        Returns:
+            WalkForwardResult
+        """
+        if not self.sweep.price_files:
+            raise ValueError("请先调用 load / load_store 写入价格数据")
+        
+        param_sets = param_sets or grid(DEFAULT_PARAM_SPACE)
+        windows = self.windows()
+        if not windows:
+            raise ValueError("历史数据不足一个样本内 + 样本外窗口")
+        
+        start = time.perf_counter()
+        computed = self.precompute(param_sets)
+        precompute_seconds = time.perf_counter() - start
+        
+        config = {
+            'interval': self.interval,
+            'backtest_params': self.backtest_params,
+            'param_sets': param_sets,
+            'metric': self.metric,
+            'min_trades': self.min_trades,
+            'top': self.top
+        }
+        
+        workers = min(self.workers, len(windows))
+        if workers <= 1:
+            klines = _load_price_data(self.sweep.price_files)
+            cache = _IndicatorCache(self.ma_files)
+            window_results = [_evaluate_window(klines, cache, config, w) for w in windows]
+        else:
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(self.sweep.price_files, self.ma_files, config)
+            ) as executor:
+                window_results = list(executor.map(_worker_evaluate_window, windows))
+        
+        elapsed = time.perf_counter() - start
+        stability = self._aggregate(window_results)
+        parameters = self._select_parameters(window_results)
+        
+        result = WalkForwardResult(
+            interval=self.interval,
+            windows=window_results,
+            stability=stability,
+            parameters=parameters,
+            stats={
+                'windows': len(windows),
+                'param_sets': len(param_sets),
+                'symbols': len(self.sweep.price_files),
+                'workers': workers,
+                'indicator_series_computed': computed,
+                'precompute_seconds': precompute_seconds,
+                'elapsed_seconds': elapsed
+            }
+        )
+        
+        self.logger.info(
+            f"滚动窗口优化完成: {len(windows)} 个窗口 × {len(param_sets)} 组参数, "
+            f"{workers} 个进程, 耗时 {elapsed:.1f}s, "
+            f"样本外累计收益 {stability.get('oos_total_return_percent', 0.0):.2f}%"
+        )
+        
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        if output != '':
+            result.report_path = output or os.path.join(
+                self.data_dir, f"walk_forward_{self.interval}_{timestamp}.json"
+            )
+            self._write_json(result.report_path, {
+                'interval': self.interval,
+                'symbols': sorted(self.sweep.price_files.keys()),
+                'in_sample_days': self.in_sample_ms / _DAY_MS,
+                'out_of_sample_days': self.out_of_sample_ms / _DAY_MS,
+                'step_days': (self.step_ms or self.out_of_sample_ms) / _DAY_MS,
+                'metric': self.metric,
+                'backtest_params': self.backtest_params,
+                'created_at': datetime.now().isoformat(),
+                'stats': result.stats,
+                'stability': stability,
+                'parameters': parameters,
+                'windows': window_results
+            })
+        
+        if parameters and parameters_output != '':
+            result.parameters_path = parameters_output or os.path.join(
+                self.data_dir, f"parameters_{self.interval}.json"
+            )
+            self.save_parameters(result, result.parameters_path)
+        
+        return result
+    
+    def _aggregate(self, windows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        汇总样本外表现和参数稳定性
+        
+        Args:
+            windows: 每个窗口的结果
+            
+        Returns:
+            样本外累计收益、平均收益、盈利窗口比例、效率（样本外与样本内日均收益之比）、
+            参数选择次数等
+        """
+        valid = [w for w in windows if w.get('best_params')]
+        stability: Dict[str, Any] = {'windows': len(windows), 'valid_windows': len(valid)}
+        if not valid:
+            return stability
+        
+        is_returns = [w['in_sample_stats']['total_return_percent'] for w in valid]
+        oos_returns = [w['out_of_sample_stats']['total_return_percent'] for w in valid]
+        
+        compounded = 1.0
+        for value in oos_returns:
+            compounded *= 1 + value / 100
+        
+        is_daily = statistics.mean(is_returns) / (self.in_sample_ms / _DAY_MS)
+        oos_daily = statistics.mean(oos_returns) / (self.out_of_sample_ms / _DAY_MS)
+        
+        selections = Counter(json.dumps(w['best_params'], sort_keys=True) for w in valid)
+        most_common, count = selections.most_common(1)[0]
+        
+        stability.update({
+            'oos_total_return_percent': (compounded - 1) * 100,
+            'oos_mean_return_percent': statistics.mean(oos_returns),
+            'oos_return_std': statistics.pstdev(oos_returns),
+            'oos_positive_windows_percent': sum(1 for r in oos_returns if r > 0) / len(valid) * 100,
+            'oos_max_drawdown_percent': max(w['out_of_sample_stats'].get('max_drawdown_percent', 0.0) for w in valid),
+            'oos_mean_sharpe': statistics.mean(w['out_of_sample_stats'].get('sharpe', 0.0) for w in valid),
+            'is_mean_return_percent': statistics.mean(is_returns),
+            'is_mean_sharpe': statistics.mean(w['in_sample_stats'].get('sharpe', 0.0) for w in valid),
+            'efficiency': oos_daily / is_daily if is_daily > 0 else None,
+            'distinct_params': len(selections),
+            'top_param_share_percent': count / len(valid) * 100,
+            'selections': [
+                {'params': json.loads(key), 'windows': n} for key, n in selections.most_common()
+            ]
+        })
+        return stability
+    
+    def _select_parameters(self, windows: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        推荐参数：被选中次数最多的组合，次数相同时取这些窗口样本外指标平均值更高的组合
+        
+        Args:
+            windows: 每个窗口的结果
+            
+        Returns:
+            DoubleMaStrategy 参数，没有有效窗口时为 None
+        """
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for window in windows:
+            if window.get('best_params'):
+                groups.setdefault(json.dumps(window['best_params'], sort_keys=True), []).append(window)
+        if not groups:
+            return None
+        
+        sign = -1 if self.metric == 'max_drawdown_percent' else 1
+        
+        def key(item):
+            members = item[1]
+            scores = [w['out_of_sample_stats'].get(self.metric) or 0.0 for w in members]
+            return (len(members), sign * statistics.mean(scores))
+        
+        best_key, _ = max(groups.items(), key=key)
+        return json.loads(best_key)
+    
+    def save_parameters(self, result: WalkForwardResult, path: str):
+        """
+        写入推荐参数文件（字段名与 config.json 的策略配置一致）
+        
+        Args:
+            result: 优化结果
+            path: 文件路径
+        """
+        params = result.parameters or {}
+        data = {'interval': result.interval}
+        for key, name in _PARAMETER_FIELDS.items():
+            if name in params:
+                data[key] = params[name]
+        data['generated_at'] = datetime.now().isoformat()
+        data['walk_forward'] = {k: v for k, v in result.stability.items() if k != 'selections'}
+        self._write_json(path, data)
+        self.logger.info(f"滚动窗口优化参数已保存: {path}")
+    
+    @staticmethod
+    def _write_json(path: str, data: Dict[str, Any]):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
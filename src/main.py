@@ -5,17 +5,30 @@ import os
 import sys
 import time
 import signal
+import asyncio
+import threading
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, List
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 
-from api import AsterDexClient, DeepSeekClient
+from ai import AIPositionManager
+from api import AsterDexClient, AsyncAsterDexClient, DeepSeekClient, ServerClock
+from api.base_ai_client import create_ai_client
 from strategies import DoubleMaStrategy
-from trading import Trader, RiskManager, ManualOrderHandler, ManualOrderAPIServer
+from backtest import load_strategy_parameters
+from market import BarCloseDispatcher, KlineResampler, KlineStore, MarketDataStream, MarketSnapshot
+from trading import (
+    Trader, RiskManager, AccountStateService, ExchangeInfoService,
+    ManualOrderHandler, ManualOrderAPIServer, SymbolPipeline, ProtectiveOrderManager, TrailingStopEngine
+)
 from utils import get_config, setup_logger, get_logger
 
 
+# 策略每次分析使用的K线数量
+_STRATEGY_KLINE_LIMIT = 150
+
+
 class TradingBot:
     """交易机器人主类"""
     
@@ -45,21 +58,63 @@ class TradingBot:
         
         # 初始化客户端
         self.asterdex_client = self._init_asterdex_client()
+        self.server_clock = self._init_server_clock()
         self.deepseek_client = self._init_deepseek_client()
         
+        # 并发获取K线的异步客户端，首次使用时在常驻事件循环线程中创建，复用 HTTP 会话
+        self._async_client = None
+        self._async_loop = None
+        self._async_thread = None
+        self._async_lock = threading.Lock()
+        
         # 初始化策略
         self.strategies = self._init_strategies()
         
         # 初始化风险管理器
         self.risk_manager = self._init_risk_manager()
         
+        # 初始化交易所信息缓存（所有交易器共享）
+        self.exchange_info = self._init_exchange_info()
+        
+        # 初始化账户状态服务（可选）
+        self.account_state = self._init_account_state()
+        
+        # 初始化共享行情快照（交易器、手动交易和 HTTP API 合并价格/K线请求）
+        self.market_snapshot = self._init_market_snapshot()
+        
+        # 交易所止损 / 止盈条件单（交易器和手动交易共享）
+        self.protective_orders = self._init_protective_orders()
+        
+        # 移动止损 / 保本止损引擎（可选）
+        self.trailing_stops = self._init_trailing_stops()
+        
         # 初始化交易器
         self.traders = {}
         self._init_traders()
         
+        # 每个策略一个按交易对并发执行的线程池
+        self.symbol_pipelines = self._init_symbol_pipelines()
+        
         # 初始化调度器
         self.scheduler = BackgroundScheduler()
         
+        # 由基础周期K线本地合成更大周期的K线（可选）
+        self.resampler = self._init_resampler()
+        
+        # 初始化 WebSocket 行情数据流和本地K线存储（可选）
+        self.market_stream = self._init_market_stream()
+        self.kline_store = self._init_kline_store()
+        
+        # 移动止损按每次标记价格推送更新；没有行情数据流时由引擎线程定期拉取价格
+        if self.trailing_stops:
+            if self.market_stream:
+                self.market_stream.add_price_listener(self.trailing_stops.on_price)
+            else:
+                self.trailing_stops.price_source = self._get_all_prices
+        
+        # 初始化K线收盘调度器（scheduling.mode 为 interval 时使用固定间隔调度）
+        self.bar_close_dispatcher = self._init_bar_close_dispatcher()
+        
         # 初始化手动交易功能（可选）
         self.manual_order_handler = None
         self.manual_order_api = None
@@ -77,8 +132,266 @@ class TradingBot:
             signer=asterdex_config['signer'],
             private_key=asterdex_config['private_key'],
             api_base_url=asterdex_config.get('api_base_url', 'https://fapi.asterdex.com'),
-            recv_window=self.config.trading.get('recv_window', 50000)
+            recv_window=self.config.trading.get('recv_window', 50000),
+            http_config=asterdex_config.get('http'),
+            rate_limit_config=asterdex_config.get('rate_limit')
+        )
+    
+    def _init_server_clock(self) -> ServerClock:
+        """初始化服务器时钟同步（签名时间戳使用服务器时间）"""
+        clock_config = self.config.asterdex.get('clock_sync', {})
+        
+        if not clock_config.get('enabled', True):
+            return None
+        
+        clock = ServerClock(
+            client=self.asterdex_client,
+            samples=clock_config.get('samples', 5),
+            resync_interval=clock_config.get('resync_interval_seconds', 300)
+        )
+        
+        try:
+            report = clock.sync()
+        except Exception as e:
+            self.logger.warning(f"时钟同步失败，使用本地时间签名: {e}")
+            return None
+        
+        self.asterdex_client.use_server_clock(clock)
+        
+        recv_window = self.asterdex_client.recv_window
+        if recv_window < report['suggested_recv_window_ms']:
+            self.logger.warning(
+                f"recv_window={recv_window}ms 小于建议值 {report['suggested_recv_window_ms']}ms"
+                f"（RTT {report['rtt_ms']:.1f}ms），请求可能被拒绝"
+            )
+        
+        return clock
+    
+    def _create_async_client(self) -> AsyncAsterDexClient:
+        """创建异步 AsterDEX 客户端（用于并发获取行情）"""
+        asterdex_config = self.config.asterdex
+        
+        return AsyncAsterDexClient(
+            user=asterdex_config['user'],
+            signer=asterdex_config['signer'],
+            private_key=asterdex_config['private_key'],
+            api_base_url=asterdex_config.get('api_base_url', 'https://fapi.asterdex.com'),
+            recv_window=self.config.trading.get('recv_window', 50000),
+            http_config=asterdex_config.get('http'),
+            rate_limiter=self.asterdex_client.rate_limiter,
+            time_source=self.server_clock.time if self.server_clock else None
+        )
+    
+    def _run_async(self, coro):
+        """
+        在常驻事件循环线程中运行协程并等待结果（可从多个线程同时调用）
+        
+        Args:
+            coro: 使用 self._async_client 的协程
+            
+        Returns:
+            协程的返回值
+        """
+        with self._async_lock:
+            if self._async_loop is None:
+                self._async_client = self._create_async_client()
+                self._async_loop = asyncio.new_event_loop()
+                self._async_thread = threading.Thread(
+                    target=self._async_loop.run_forever,
+                    daemon=True,
+                    name="AsyncClientLoop"
+                )
+                self._async_thread.start()
+            loop = self._async_loop
+        
+        return asyncio.run_coroutine_threadsafe(coro, loop).result()
+    
+    def _close_async_client(self):
+        """关闭异步客户端的 HTTP 会话并停止事件循环线程"""
+        with self._async_lock:
+            loop, thread, client = self._async_loop, self._async_thread, self._async_client
+            self._async_loop = self._async_thread = self._async_client = None
+        
+        if loop is None:
+            return
+        
+        try:
+            asyncio.run_coroutine_threadsafe(client.close(), loop).result(timeout=5)
+        except Exception as e:
+            self.logger.warning(f"关闭异步客户端失败: {e}")
+        
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        if not thread.is_alive():
+            loop.close()
+    
+    def _fetch_klines(self, symbols: List[str], interval: str, limit: int = 150) -> Dict[str, Any]:
+        """
+        获取多个交易对的K线数据
+        
+        启用K线重采样时，更大周期的K线由基础周期K线在本地合成；
+        其余优先读取 WebSocket 行情数据流中的内存K线；启用本地K线存储时其余交易对只增量请求新K线；
+        否则默认通过异步客户端并发请求，一个周期的耗时约等于一次往返；
+        asterdex.concurrent_kline_fetch 为 false 时退回逐个同步请求。
+        
+        Args:
+            symbols: 交易对列表
+            interval: K线间隔
+            limit: 每个交易对的K线数量
+            
+        Returns:
+            {交易对: K线数据}（REST 结果已解码为 NumPy 结构化数组），失败的交易对对应异常对象
+        """
+        results = {}
+        
+        if self.resampler and self.resampler.derives(interval):
+            results.update(self._fetch_resampled_klines(symbols, interval, limit))
+        
+        if self.market_stream:
+            for symbol in symbols:
+                if symbol in results:
+                    continue
+                klines = self.market_stream.get_klines(symbol, interval, limit=limit)
+                if klines is not None:
+                    results[symbol] = klines
+        
+        missing = [symbol for symbol in symbols if symbol not in results]
+        if not missing:
+            return results
+        
+        if self.kline_store:
+            results.update(self.kline_store.fetch_many(missing, interval, limit))
+            return results
+        
+        if self.config.asterdex.get('concurrent_kline_fetch', True):
+            try:
+                results.update(self._run_async(self._fetch_klines_async(missing, interval, limit)))
+                return results
+            except Exception as e:
+                self.logger.warning(f"并发获取K线失败，改为逐个获取: {e}")
+        
+        for symbol in missing:
+            try:
+                results[symbol] = self._get_klines_rest(symbol, interval, limit)
+            except Exception as e:
+                results[symbol] = e
+        
+        return results
+    
+    def _fetch_symbol_klines(self, symbol: str, interval: str, limit: int = 150):
+        """
+        获取单个交易对的K线数据（顺序与 _fetch_klines 相同：本地合成、行情数据流、本地K线存储、REST）
+        
+        Args:
+            symbol: 交易对符号
+            interval: K线间隔
+            limit: K线数量
+            
+        Returns:
+            K线数组
+        """
+        if self.resampler and self.resampler.derives(interval):
+            klines = self._resample_symbol_klines(symbol, interval, limit)
+            if klines is not None:
+                return klines
+        
+        if self.market_stream:
+            klines = self.market_stream.get_klines(symbol, interval, limit=limit)
+            if klines is not None:
+                return klines
+        
+        if self.kline_store:
+            self.kline_store.sync(symbol, interval)
+            return self.kline_store.get_klines(symbol, interval, limit)
+        
+        return self._get_klines_rest(symbol, interval, limit)
+    
+    def _resample_symbol_klines(self, symbol: str, interval: str, limit: int):
+        """
+        由基础周期K线合成单个交易对的K线
+        
+        Args:
+            symbol: 交易对符号
+            interval: 目标K线间隔
+            limit: 目标K线数量
+            
+        Returns:
+            K线数组，基础K线不足以合成 limit 根时返回 None（改为直接获取目标周期）
+        """
+        base_interval = self.resampler.base_interval
+        base_limit = self.resampler.base_limit(interval, limit)
+        
+        base = None
+        if self.market_stream:
+            base = self.market_stream.get_klines(symbol, base_interval, limit=base_limit)
+        if base is None and self.kline_store:
+            self.kline_store.sync(symbol, base_interval)
+            base = self.kline_store.get_klines(symbol, base_interval, base_limit)
+        if base is None and base_limit <= self.resampler.max_request_limit:
+            base = self._get_klines_rest(symbol, base_interval, base_limit)
+        if base is not None:
+            klines = self.resampler.resample(base, interval, limit)
+            if len(klines) >= limit:
+                return klines
+        
+        self.logger.warning(
+            f"[{symbol}] {interval} 需要 {base_limit} 根 {base_interval} K线合成，基础K线不足，直接获取 {interval} K线"
         )
+        return None
+    
+    def _fetch_resampled_klines(self, symbols: List[str], interval: str, limit: int) -> Dict[str, Any]:
+        """
+        由基础周期K线合成多个交易对的K线
+        
+        Args:
+            symbols: 交易对列表
+            interval: 目标K线间隔
+            limit: 每个交易对的目标K线数量
+            
+        Returns:
+            {交易对: K线数组}，基础K线不足或获取失败的交易对不包含在内
+        """
+        base_interval = self.resampler.base_interval
+        base_limit = self.resampler.base_limit(interval, limit)
+        
+        if not self.market_stream and not self.kline_store and base_limit > self.resampler.max_request_limit:
+            self.logger.warning(
+                f"{interval} 需要 {base_limit} 根 {base_interval} K线合成，超过单次请求上限 "
+                f"{self.resampler.max_request_limit}，直接获取 {interval} K线（启用 market_stream 或 kline_store 后本地合成）"
+            )
+            return {}
+        
+        results = {}
+        for symbol, base in self._fetch_klines(symbols, base_interval, base_limit).items():
+            if isinstance(base, Exception):
+                continue
+            klines = self.resampler.resample(base, interval, limit)
+            if len(klines) >= limit:
+                results[symbol] = klines
+        
+        short = [symbol for symbol in symbols if symbol not in results]
+        if short:
+            self.logger.warning(
+                f"{interval} 需要 {base_limit} 根 {base_interval} K线合成，基础K线不足，直接获取: {', '.join(short)}"
+            )
+        return results
+    
+    def _last_closed_open_time(self, symbol: str, interval: str):
+        """最后一根已收盘K线的开盘时间（合成周期由基础周期推算），供K线收盘调度器使用"""
+        if self.resampler and self.resampler.derives(interval):
+            base_open_time = self.market_stream.get_last_closed_open_time(symbol, self.resampler.base_interval)
+            return self.resampler.last_closed_open_time(base_open_time, interval)
+        return self.market_stream.get_last_closed_open_time(symbol, interval)
+    
+    def _get_klines_rest(self, symbol: str, interval: str, limit: int):
+        """通过 REST 获取K线（有行情快照时相同请求合并）"""
+        if self.market_snapshot:
+            return self.market_snapshot.get_klines(symbol, interval, limit)
+        return self.asterdex_client.get_klines_array(symbol=symbol, interval=interval, limit=limit)
+    
+    async def _fetch_klines_async(self, symbols: List[str], interval: str, limit: int) -> Dict[str, Any]:
+        """并发获取K线数据（在常驻事件循环线程中运行）"""
+        return await self._async_client.get_klines_batch(symbols, interval, limit=limit, as_array=True)
     
     def _init_deepseek_client(self) -> DeepSeekClient:
         """初始化 DeepSeek 客户端（可选）"""
@@ -112,58 +425,138 @@ class TradingBot:
         
         # 高频策略
         if strategies_config.get('high_frequency', {}).get('enabled', False):
-            hf_config = strategies_config['high_frequency']
-            ma_periods = hf_config.get('ma_periods', {})
-            
-            strategies['high_frequency'] = DoubleMaStrategy(
-                sma_periods=[
-                    ma_periods.get('sma_short', 20),
-                    ma_periods.get('sma_medium', 60),
-                    ma_periods.get('sma_long', 120)
-                ],
-                ema_periods=[
-                    ma_periods.get('ema_short', 20),
-                    ma_periods.get('ema_medium', 60),
-                    ma_periods.get('ema_long', 120)
-                ],
-                convergence_threshold=hf_config.get('convergence_threshold_percent', 2.0),
-                breakout_confirmation_minutes=hf_config.get('breakout_confirmation_minutes', 30)
-            )
+            strategies['high_frequency'] = self._build_strategy('high_frequency', strategies_config['high_frequency'])
             self.logger.info("高频策略已启用")
         
         # 中频策略
         if strategies_config.get('medium_frequency', {}).get('enabled', False):
-            mf_config = strategies_config['medium_frequency']
-            ma_periods = mf_config.get('ma_periods', {})
-            
-            strategies['medium_frequency'] = DoubleMaStrategy(
-                sma_periods=[
-                    ma_periods.get('sma_short', 20),
-                    ma_periods.get('sma_medium', 60),
-                    ma_periods.get('sma_long', 120)
-                ],
-                ema_periods=[
-                    ma_periods.get('ema_short', 20),
-                    ma_periods.get('ema_medium', 60),
-                    ma_periods.get('ema_long', 120)
-                ],
-                convergence_threshold=mf_config.get('convergence_threshold_percent', 2.0),
-                breakout_confirmation_minutes=mf_config.get('breakout_confirmation_minutes', 30)
-            )
+            strategies['medium_frequency'] = self._build_strategy('medium_frequency', strategies_config['medium_frequency'])
             self.logger.info("中频策略已启用")
         
         return strategies
     
+    def _build_strategy(self, name: str, strategy_config: Dict[str, Any]) -> DoubleMaStrategy:
+        """
+        按配置创建策略
+        
+        配置了 parameters_file（滚动窗口优化输出的参数文件）时，文件中的参数覆盖配置中的参数
+        """
+        ma_periods = strategy_config.get('ma_periods', {})
+        params = {
+            'sma_periods': [
+                ma_periods.get('sma_short', 20),
+                ma_periods.get('sma_medium', 60),
+                ma_periods.get('sma_long', 120)
+            ],
+            'ema_periods': [
+                ma_periods.get('ema_short', 20),
+                ma_periods.get('ema_medium', 60),
+                ma_periods.get('ema_long', 120)
+            ],
+            'convergence_threshold': strategy_config.get('convergence_threshold_percent', 2.0),
+            'breakout_confirmation_minutes': strategy_config.get('breakout_confirmation_minutes', 30),
+            'streaming_ema': strategy_config.get('streaming_ema', False)
+        }
+        
+        parameters_file = strategy_config.get('parameters_file')
+        if parameters_file:
+            if not os.path.exists(parameters_file):
+                self.logger.warning(f"{name} 参数文件不存在，使用配置参数: {parameters_file}")
+            else:
+                try:
+                    params.update(load_strategy_parameters(parameters_file, strategy_config.get('interval')))
+                    self.logger.info(f"{name} 已加载优化参数 {parameters_file}: {params}")
+                except Exception as e:
+                    self.logger.warning(f"{name} 参数文件加载失败，使用配置参数: {e}")
+        
+        return DoubleMaStrategy(**params)
+    
     def _init_risk_manager(self) -> RiskManager:
         """初始化风险管理器"""
         trading_config = self.config.trading
+        risk_config = self.config.risk_management
         
         return RiskManager(
             max_leverage=trading_config.get('max_leverage', 5),
             max_position_percent=trading_config.get('max_position_percent', 30.0),
-            margin_type=trading_config.get('margin_type', 'ISOLATED')
+            margin_type=trading_config.get('margin_type', 'ISOLATED'),
+            stop_loss_percent=(
+                risk_config.get('stop_loss_percent', 3.0) if risk_config.get('enable_stop_loss', False) else None
+            ),
+            take_profit_percent=(
+                risk_config.get('take_profit_percent', 10.0) if risk_config.get('enable_take_profit', False) else None
+            )
+        )
+    
+    def _init_protective_orders(self) -> ProtectiveOrderManager:
+        """初始化交易所止损 / 止盈条件单管理器"""
+        protective_config = self.config.risk_management.get('protective_orders', {})
+        
+        if not protective_config.get('enabled', True):
+            return None
+        
+        return ProtectiveOrderManager(
+            self.asterdex_client,
+            account_state=self.account_state,
+            working_type=protective_config.get('working_type', 'MARK_PRICE')
         )
     
+    def _init_trailing_stops(self) -> TrailingStopEngine:
+        """初始化移动止损 / 保本止损引擎（可选）"""
+        trailing_config = self.config.risk_management.get('trailing_stop', {})
+        
+        if not trailing_config.get('enabled', False):
+            return None
+        
+        engine = TrailingStopEngine(
+            protective_orders=self.protective_orders,
+            trail_percent=trailing_config.get('trail_percent'),
+            activation_percent=trailing_config.get('activation_percent', 0.0),
+            break_even_percent=trailing_config.get('break_even_percent'),
+            break_even_offset_percent=trailing_config.get('break_even_offset_percent', 0.0),
+            min_update_interval=trailing_config.get('min_update_interval_seconds', 5.0),
+            min_step_percent=trailing_config.get('min_step_percent', 0.1),
+            max_updates_per_second=trailing_config.get('max_updates_per_second', 2.0),
+            flush_interval=trailing_config.get('flush_interval_seconds', 1.0)
+        )
+        self.logger.info("✅ 移动止损引擎已初始化")
+        return engine
+    
+    def _get_all_prices(self) -> Dict[str, float]:
+        """一次请求获取全部交易对价格"""
+        if self.market_snapshot:
+            return self.market_snapshot.get_prices()
+        return {t['symbol']: float(t['price']) for t in self.asterdex_client.get_ticker_price()}
+    
+    def _init_exchange_info(self) -> ExchangeInfoService:
+        """初始化交易所信息缓存（磁盘持久化 + 后台刷新）"""
+        exchange_info_config = self.config.get('exchange_info', {})
+        
+        service = ExchangeInfoService(
+            client=self.asterdex_client,
+            cache_file=exchange_info_config.get('cache_file', 'cache/exchange_info.json'),
+            ttl_seconds=exchange_info_config.get('ttl_seconds', 3600)
+        )
+        service.load()
+        return service
+    
+    def _init_account_state(self) -> AccountStateService:
+        """初始化账户状态服务（用户数据流，可选）"""
+        user_stream_config = self.config.get('user_stream', {})
+        
+        if not user_stream_config.get('enabled', False):
+            return None
+        
+        service = AccountStateService(
+            client=self.asterdex_client,
+            ws_url=user_stream_config.get('ws_url', 'wss://fstream.asterdex.com'),
+            keepalive_interval=user_stream_config.get('keepalive_interval_seconds', 1800),
+            reconcile_interval=user_stream_config.get('reconcile_interval_seconds', 60),
+            max_snapshot_age=user_stream_config.get('max_snapshot_age_seconds', 300)
+        )
+        self.logger.info("✅ 账户状态服务已初始化")
+        return service
+    
     def _init_traders(self):
         """初始化交易器"""
         trading_config = self.config.trading
@@ -175,7 +568,12 @@ class TradingBot:
                 deepseek_client=self.deepseek_client,
                 risk_manager=self.risk_manager,
                 strategy=strategy,
-                leverage=leverage
+                leverage=leverage,
+                account_state=self.account_state,
+                exchange_info=self.exchange_info,
+                market_snapshot=self.market_snapshot,
+                protective_orders=self.protective_orders,
+                trailing_stops=self.trailing_stops
             )
             
             # 初始化交易器
@@ -194,6 +592,161 @@ class TradingBot:
                 except Exception as e:
                     self.logger.error(f"{symbol} 设置失败: {e}")
     
+    def _init_kline_store(self) -> KlineStore:
+        """初始化本地K线存储（可选）"""
+        store_config = self.config.get('kline_store', {})
+        
+        if not store_config.get('enabled', False):
+            return None
+        
+        # 首次同步至少下载本地合成需要的基础K线
+        initial_limit = max(store_config.get('initial_limit', 1500), self._resample_base_limit())
+        
+        store = KlineStore(
+            client=self.asterdex_client,
+            data_dir=store_config.get('data_dir', 'data/klines'),
+            initial_limit=initial_limit,
+            workers=store_config.get('workers', 4),
+            time_source=self.server_clock.time if self.server_clock else None
+        )
+        self.logger.info(f"✅ 本地K线存储已初始化: {store.data_dir}")
+        return store
+    
+    def _init_market_stream(self) -> MarketDataStream:
+        """初始化 WebSocket 行情数据流（可选）"""
+        stream_config = self.config.get('market_stream', {})
+        
+        if not stream_config.get('enabled', False):
+            return None
+        
+        intervals = [
+            strategy_config.get('interval')
+            for strategy_config in self.config.strategies.values()
+            if strategy_config.get('enabled', False) and strategy_config.get('interval')
+        ]
+        
+        # 合成周期只订阅基础周期
+        if self.resampler:
+            intervals = [
+                self.resampler.base_interval if self.resampler.derives(interval) else interval
+                for interval in intervals
+            ]
+        
+        # 内存中至少保留（并在首次连接时回补）本地合成需要的基础K线
+        base_limit = self._resample_base_limit()
+        max_bars = max(stream_config.get('max_bars', 500), base_limit)
+        backfill_limit = max(stream_config.get('backfill_limit', 150), base_limit)
+        
+        stream = MarketDataStream(
+            client=self.asterdex_client,
+            symbols=self.config.trading.get('symbols', []),
+            intervals=sorted(set(intervals)),
+            ws_url=stream_config.get('ws_url', 'wss://fstream.asterdex.com'),
+            max_bars=max_bars,
+            backfill_limit=backfill_limit,
+            stale_after_seconds=stream_config.get('stale_after_seconds', 60)
+        )
+        self.logger.info("✅ WebSocket 行情数据流已初始化")
+        return stream
+    
+    def _init_resampler(self) -> KlineResampler:
+        """初始化K线重采样器（可选）"""
+        resampling_config = self.config.get('resampling', {})
+        
+        if not resampling_config.get('enabled', False):
+            return None
+        
+        resampler = KlineResampler(base_interval=resampling_config.get('base_interval', '15m'))
+        derived = sorted({
+            strategy_config.get('interval')
+            for strategy_config in self.config.strategies.values()
+            if strategy_config.get('enabled', False) and resampler.derives(strategy_config.get('interval', ''))
+        })
+        self.logger.info(
+            f"✅ K线重采样已启用: 基础周期 {resampler.base_interval}"
+            + (f"，本地合成 {', '.join(derived)}" if derived else "")
+        )
+        return resampler
+    
+    def _resample_base_limit(self) -> int:
+        """本地合成各策略周期最多需要的基础K线数量（没有合成周期时为 0）"""
+        if not self.resampler:
+            return 0
+        
+        return max(
+            (
+                self.resampler.base_limit(strategy_config['interval'], _STRATEGY_KLINE_LIMIT)
+                for strategy_config in self.config.strategies.values()
+                if strategy_config.get('enabled', False) and self.resampler.derives(strategy_config.get('interval', ''))
+            ),
+            default=0
+        )
+    
+    def _init_market_snapshot(self) -> MarketSnapshot:
+        """初始化共享行情快照"""
+        snapshot_config = self.config.get('market_snapshot', {})
+        
+        if not snapshot_config.get('enabled', True):
+            return None
+        
+        return MarketSnapshot(
+            self.asterdex_client,
+            price_ttl=snapshot_config.get('price_ttl_seconds', 1.0),
+            kline_ttl=snapshot_config.get('kline_ttl_seconds', 2.0)
+        )
+    
+    def _init_symbol_pipelines(self) -> Dict[str, SymbolPipeline]:
+        """初始化按交易对并发执行的线程池"""
+        execution_config = self.config.get('execution', {})
+        symbols = self.config.trading.get('symbols', [])
+        max_workers = execution_config.get('max_workers', min(8, max(1, len(symbols))))
+        symbol_timeout = execution_config.get('symbol_timeout_seconds', 60)
+        
+        return {
+            name: SymbolPipeline(name, max_workers=max_workers, symbol_timeout=symbol_timeout)
+            for name in self.strategies
+        }
+    
+    def _init_bar_close_dispatcher(self) -> BarCloseDispatcher:
+        """初始化K线收盘调度器"""
+        scheduling_config = self.config.get('scheduling', {})
+        
+        if scheduling_config.get('mode', 'bar_close') != 'bar_close':
+            return None
+        
+        dispatcher = BarCloseDispatcher(
+            settle_delay=scheduling_config.get('settle_delay_seconds', 1.0),
+            max_wait=scheduling_config.get('max_wait_seconds', 10.0),
+            bar_source=self._last_closed_open_time if self.market_stream else None,
+            time_source=self.server_clock.time if self.server_clock else None
+        )
+        
+        # 行情数据流收到收盘推送时立即唤醒调度器
+        if self.market_stream:
+            self.market_stream.add_bar_close_listener(dispatcher.notify_bar_closed)
+        
+        self.logger.info("✅ K线收盘调度器已初始化")
+        return dispatcher
+    
+    def _init_position_manager(self, review_config: Dict[str, Any]) -> AIPositionManager:
+        """初始化 AI 持仓复查（可选，使用 DeepSeek 配置）"""
+        deepseek_config = self.config.deepseek
+        
+        if not review_config.get('enabled', False) or not deepseek_config:
+            return None
+        
+        ai_client = create_ai_client({
+            'provider': 'deepseek',
+            'api_key': deepseek_config.get('api_key'),
+            'api_base': deepseek_config.get('api_base_url', ''),
+            'model': deepseek_config.get('model', '')
+        })
+        if ai_client is None:
+            return None
+        
+        self.logger.info("✅ AI 持仓复查已启用（只收紧止损）")
+        return AIPositionManager(ai_client)
+    
     def _init_manual_trading(self):
         """初始化手动交易功能"""
         manual_config = self.config.config.get('manual_trading', {})
@@ -214,12 +767,26 @@ class TradingBot:
             handler_config = {
                 'order_file': manual_config.get('file_watch', {}).get('order_file', 'manual_orders.json'),
                 'enable_file_watch': manual_config.get('file_watch', {}).get('enabled', True),
+                'file_watch_mode': manual_config.get('file_watch', {}).get('mode', 'json'),
+                'use_inotify': manual_config.get('file_watch', {}).get('use_inotify', True),
+                'poll_interval': manual_config.get('file_watch', {}).get('poll_interval_seconds', 1.0),
                 'default_leverage': manual_config.get('default_leverage', 3),
                 'default_position_percent': manual_config.get('default_position_percent', 20),
-                'check_interval': manual_config.get('check_interval', 10)
+                'check_interval': manual_config.get('check_interval', 10),
+                'close_workers': manual_config.get('close_workers', 4),
+                'price_max_age': manual_config.get('price_max_age_seconds', 5.0),
+                'ai_review_interval': manual_config.get('ai_review', {}).get('interval_seconds', 300)
             }
             
-            self.manual_order_handler = ManualOrderHandler(trader, handler_config)
+            self.manual_order_handler = ManualOrderHandler(
+                trader,
+                handler_config,
+                market_stream=self.market_stream,
+                market_snapshot=self.market_snapshot,
+                protective_orders=self.protective_orders,
+                trailing_stops=self.trailing_stops,
+                position_manager=self._init_position_manager(manual_config.get('ai_review', {}))
+            )
             self.logger.info("✅ 手动交易处理器已初始化")
             
             # 创建 API 服务器（如果启用）
@@ -231,106 +798,146 @@ class TradingBot:
                 self.manual_order_api = ManualOrderAPIServer(
                     self.manual_order_handler,
                     host=host,
-                    port=port
+                    port=port,
+                    order_workers=api_config.get('order_workers', 4),
+                    query_workers=api_config.get('query_workers', 4),
+                    max_pending_queries=api_config.get('max_pending_queries', 64),
+                    request_timeout=api_config.get('request_timeout_seconds', 30),
+                    keepalive_timeout=api_config.get('keepalive_timeout_seconds', 30)
                 )
                 self.logger.info("✅ 手动交易 API 服务器已初始化")
-            
+                
         except Exception as e:
             self.logger.error(f"初始化手动交易功能失败: {e}", exc_info=True)
             self.manual_order_handler = None
             self.manual_order_api = None
     
-    def _run_high_frequency_strategy(self):
-        """运行高频策略"""
-        if 'high_frequency' not in self.strategies:
+    def _run_high_frequency_strategy(self, symbols: List[str] = None):
+        """
+        运行高频策略
+        
+        Args:
+            symbols: 需要分析的交易对（K线收盘调度时只传入收盘K线有更新的交易对），默认全部
+        """
+        self._run_strategy('high_frequency', '高频策略', '15m', symbols)
+    
+    def _run_medium_frequency_strategy(self, symbols: List[str] = None):
+        """
+        运行中频策略
+        
+        Args:
+            symbols: 需要分析的交易对（K线收盘调度时只传入收盘K线有更新的交易对），默认全部
+        """
+        self._run_strategy('medium_frequency', '中频策略', '4h', symbols)
+    
+    def _run_strategy(self, name: str, label: str, default_interval: str, symbols: List[str] = None):
+        """
+        运行一个周期的策略检查
+        
+        每个交易对的 获取K线 → 分析 → 执行 在线程池中并发运行，互不等待；
+        单个交易对超时或出错只影响它自己。execution.mode 为 batch 时先批量获取和分析，
+        再按交易对并发执行。
+        
+        Args:
+            name: 策略名称（配置键）
+            label: 日志中显示的名称
+            default_interval: 默认K线间隔
+            symbols: 需要分析的交易对，默认全部
+        """
+        if name not in self.strategies:
             return
         
         try:
             self.logger.info("=" * 40)
-            self.logger.info(f"执行高频策略检查 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]")
+            self.logger.info(f"执行{label}检查 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]")
             
-            strategy = self.strategies['high_frequency']
-            trader = self.traders['high_frequency']
+            strategy = self.strategies[name]
+            trader = self.traders[name]
             
-            hf_config = self.config.strategies['high_frequency']
-            interval = hf_config.get('interval', '15m')
-            symbols = self.config.trading.get('symbols', [])
+            interval = self.config.strategies[name].get('interval', default_interval)
+            if symbols is None:
+                symbols = self.config.trading.get('symbols', [])
             
-            for symbol in symbols:
-                try:
-                    # 获取K线数据
-                    klines = self.asterdex_client.get_klines(
-                        symbol=symbol,
-                        interval=interval,
-                        limit=150  # 获取足够的数据来计算均线
-                    )
-                    
-                    # 分析信号
-                    signal = strategy.analyze(symbol, klines, interval)
-                    
-                    self.logger.info(
-                        f"[{symbol}] 信号: {signal['action']}, "
-                        f"信心: {signal['confidence']}, "
-                        f"理由: {signal['reason']}"
-                    )
-                    
-                    # 执行交易
-                    if signal['action'] != 'HOLD':
-                        trader.execute_signal(symbol, signal, interval)
+            if self.config.get('execution', {}).get('mode', 'per_symbol') == 'batch':
+                # 批量模式：并发获取所有交易对的K线并一次批量计算指标，只有执行阶段按交易对并发
+                start = time.perf_counter()
+                klines_by_symbol = self._fetch_klines(symbols, interval, limit=_STRATEGY_KLINE_LIMIT)
+                signals = strategy.analyze_batch(klines_by_symbol, interval, symbols)
+                self.logger.info(f"⏱️ {name} 批量获取和分析 {(time.perf_counter() - start) * 1000:.0f}ms")
                 
-                except Exception as e:
-                    self.logger.error(f"处理 {symbol} 时出错: {e}")
+                def analyze(symbol, timer):
+                    signal = signals[symbol]
+                    if isinstance(signal, Exception):
+                        raise signal
+                    return signal
+            else:
+                def analyze(symbol, timer):
+                    # 获取足够的数据来计算均线
+                    with timer.stage('fetch'):
+                        klines = self._fetch_symbol_klines(symbol, interval, limit=_STRATEGY_KLINE_LIMIT)
+                    with timer.stage('analyze'):
+                        return strategy.analyze(symbol, klines, interval)
             
-            self.logger.info("高频策略检查完成")
-        
-        except Exception as e:
-            self.logger.error(f"高频策略执行失败: {e}")
-    
-    def _run_medium_frequency_strategy(self):
-        """运行中频策略"""
-        if 'medium_frequency' not in self.strategies:
-            return
-        
-        try:
-            self.logger.info("=" * 40)
-            self.logger.info(f"执行中频策略检查 [{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}]")
+            def process(symbol, timer):
+                signal = analyze(symbol, timer)
+                
+                self.logger.info(
+                    f"[{symbol}] 信号: {signal['action']}, "
+                    f"信心: {signal['confidence']}, "
+                    f"理由: {signal['reason']}"
+                )
+                
+                # 执行交易
+                if signal['action'] != 'HOLD':
+                    with timer.stage('execute'):
+                        trader.execute_signal(symbol, signal, interval, expired=timer.expired)
+                
+                return signal
             
-            strategy = self.strategies['medium_frequency']
-            trader = self.traders['medium_frequency']
+            results = self.symbol_pipelines[name].run(symbols, process)
             
-            mf_config = self.config.strategies['medium_frequency']
-            interval = mf_config.get('interval', '4h')
-            symbols = self.config.trading.get('symbols', [])
+            for symbol, result in results.items():
+                if isinstance(result, Exception):
+                    self.logger.error(f"处理 {symbol} 时出错: {result}")
             
-            for symbol in symbols:
-                try:
-                    # 获取K线数据
-                    klines = self.asterdex_client.get_klines(
-                        symbol=symbol,
-                        interval=interval,
-                        limit=150
-                    )
-                    
-                    # 分析信号
-                    signal = strategy.analyze(symbol, klines, interval)
-                    
-                    self.logger.info(
-                        f"[{symbol}] 信号: {signal['action']}, "
-                        f"信心: {signal['confidence']}, "
-                        f"理由: {signal['reason']}"
-                    )
-                    
-                    # 执行交易
-                    if signal['action'] != 'HOLD':
-                        trader.execute_signal(symbol, signal, interval)
-                
-                except Exception as e:
-                    self.logger.error(f"处理 {symbol} 时出错: {e}")
+            self.logger.info(f"{label}检查完成")
             
-            self.logger.info("中频策略检查完成")
-        
         except Exception as e:
-            self.logger.error(f"中频策略执行失败: {e}")
+            self.logger.error(f"{label}执行失败: {e}")
+    
+    def _schedule_strategy(self, name: str, label: str, runner, default_interval: str, default_seconds: int):
+        """
+        调度策略：默认在每根K线收盘后执行，scheduling.mode 为 interval 时按固定间隔执行
+        
+        Args:
+            name: 策略名称（配置键）
+            label: 日志中显示的名称
+            runner: 策略执行函数，接受交易对列表
+            default_interval: 默认K线间隔
+            default_seconds: 固定间隔调度的默认秒数
+        """
+        strategy_config = self.config.strategies[name]
+        
+        if self.bar_close_dispatcher:
+            interval = strategy_config.get('interval', default_interval)
+            self.bar_close_dispatcher.register(
+                name,
+                interval,
+                self.config.trading.get('symbols', []),
+                lambda symbols, bar_close: runner(symbols)
+            )
+            self.logger.info(f"{label}已调度，每根 {interval} K线收盘后执行")
+            return
+        
+        seconds = strategy_config.get('check_interval_seconds', default_seconds)
+        self.scheduler.add_job(
+            runner,
+            trigger=IntervalTrigger(seconds=seconds),
+            id=name,
+            name=label,
+            max_instances=1
+        )
+        self.logger.info(f"{label}已调度，每 {seconds} 秒执行一次")
     
     def start(self):
         """启动交易机器人"""
@@ -345,30 +952,47 @@ class TradingBot:
         
         # 高频策略
         if strategies_config.get('high_frequency', {}).get('enabled', False):
-            hf_interval = strategies_config['high_frequency'].get('check_interval_seconds', 300)
-            self.scheduler.add_job(
-                self._run_high_frequency_strategy,
-                trigger=IntervalTrigger(seconds=hf_interval),
-                id='high_frequency',
-                name='高频策略',
-                max_instances=1
-            )
-            self.logger.info(f"高频策略已调度，每 {hf_interval} 秒执行一次")
+            self._schedule_strategy('high_frequency', '高频策略', self._run_high_frequency_strategy, '15m', 300)
         
         # 中频策略
         if strategies_config.get('medium_frequency', {}).get('enabled', False):
-            mf_interval = strategies_config['medium_frequency'].get('check_interval_seconds', 3600)
+            self._schedule_strategy('medium_frequency', '中频策略', self._run_medium_frequency_strategy, '4h', 3600)
+        
+        # 启动行情数据流（等待首次连接和K线回补完成）
+        if self.market_stream:
+            self.market_stream.start()
+            if not self.market_stream.wait_until_connected(timeout=30):
+                self.logger.warning("行情数据流尚未连接，暂时使用 REST 获取K线")
+        
+        # 启动交易所信息后台刷新和时钟同步
+        self.exchange_info.start()
+        if self.server_clock:
+            self.server_clock.start()
+        
+        # 启动账户状态服务
+        if self.account_state:
+            self.account_state.start()
+            if not self.account_state.wait_until_connected(timeout=30):
+                self.logger.warning("用户数据流尚未连接，暂时通过 REST 查询余额和持仓")
+        
+        # 定期对账交易所条件单（补上漏收的订单推送；没有用户数据流时是唯一的成交检测）
+        if self.protective_orders:
+            sync_seconds = self.config.risk_management.get('protective_orders', {}).get('sync_interval_seconds', 10)
             self.scheduler.add_job(
-                self._run_medium_frequency_strategy,
-                trigger=IntervalTrigger(seconds=mf_interval),
-                id='medium_frequency',
-                name='中频策略',
+                self.protective_orders.sync,
+                trigger=IntervalTrigger(seconds=sync_seconds),
+                id='protective_orders_sync',
+                name='条件单对账',
                 max_instances=1
             )
-            self.logger.info(f"中频策略已调度，每 {mf_interval} 秒执行一次")
+        
+        if self.trailing_stops:
+            self.trailing_stops.start()
         
         # 启动调度器
         self.scheduler.start()
+        if self.bar_close_dispatcher:
+            self.bar_close_dispatcher.start()
         self.is_running = True
         
         self.logger.info("交易机器人已启动")
@@ -389,6 +1013,27 @@ class TradingBot:
         # 停止调度器
         if self.scheduler.running:
             self.scheduler.shutdown(wait=True)
+        if self.bar_close_dispatcher:
+            self.bar_close_dispatcher.stop()
+        for pipeline in self.symbol_pipelines.values():
+            pipeline.shutdown()
+        if self.trailing_stops:
+            self.trailing_stops.stop()
+        if self.protective_orders:
+            self.protective_orders.shutdown()
+        
+        # 停止后台服务（交易所信息刷新、时钟同步、行情数据流、账户状态服务）
+        self.exchange_info.stop()
+        if self.server_clock:
+            self.server_clock.stop()
+        if self.market_stream:
+            self.market_stream.stop()
+        if self.account_state:
+            self.account_state.stop()
+        
+        # 释放 HTTP 连接
+        self.asterdex_client.close()
+        self._close_async_client()
         
         self.is_running = False
         self.logger.info("交易机器人已停止")
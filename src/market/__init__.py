@@ -0,0 +1,24 @@
+"""
+行情数据模块
+"""
+from .bar_close import BarCloseDispatcher, interval_to_ms
+from .kline_decoder import KLINE_DTYPE, decode_klines, decode_klines_json
+from .kline_store import KlineStore
+from .market_snapshot import MarketSnapshot
+from .market_stream import BarSeries, MarketDataStream
+from .resampler import KlineResampler, can_resample, resample_klines
+
+__all__ = [
+    'BarCloseDispatcher',
+    'interval_to_ms',
+    'KLINE_DTYPE',
+    'decode_klines',
+    'decode_klines_json',
+    'KlineStore',
+    'MarketSnapshot',
+    'BarSeries',
+    'MarketDataStream',
+    'KlineResampler',
+    'can_resample',
+    'resample_klines'
+]
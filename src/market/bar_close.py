@@ -0,0 +1,300 @@
+"""
+K线收盘事件调度模块
+
+按K线边界（而不是固定间隔）唤醒策略：每个周期的K线收盘后等待一个很短的结算延迟就触发，
+只把收盘K线确实更新了的交易对交给策略，并记录从K线收盘到信号生成的延迟。
+启用行情数据流时，收盘推送会提前唤醒调度线程。
+"""
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable
+
+from ..utils.logger import get_logger
+
+
+_INTERVAL_UNITS_MS = {
+    'm': 60 * 1000,
+    'h': 60 * 60 * 1000,
+    'd': 24 * 60 * 60 * 1000,
+    'w': 7 * 24 * 60 * 60 * 1000
+}
+
+# 1970-01-01 是周四，交易所的周线从周一（1970-01-05）开始
+_WEEK_OFFSET_MS = 4 * 24 * 60 * 60 * 1000
+
+
+def interval_to_ms(interval: str) -> int:
+    """
+    K线间隔转换为毫秒
+    
+    Args:
+        interval: K线间隔（如 1m、15m、4h、1d、1w）
+        
+    Returns:
+        毫秒数
+        
+    Raises:
+        ValueError: 不支持的间隔（例如按自然月划分的 1M）
+    """
+    unit = interval[-1:]
+    if unit not in _INTERVAL_UNITS_MS or not interval[:-1].isdigit():
+        raise ValueError(f"不支持的K线间隔: {interval}")
+    return int(interval[:-1]) * _INTERVAL_UNITS_MS[unit]
+
+
+def _interval_offset(interval: str) -> int:
+    """周期起点相对 Unix 纪元的偏移（毫秒）"""
+    return _WEEK_OFFSET_MS if interval.endswith('w') else 0
+
+
+class _BarCloseJob:
+    """单个调度任务的状态"""
+    
+    def __init__(self, name: str, interval: str, symbols: List[str], callback: Callable, history_size: int):
+        self.name = name
+        self.interval = interval
+        self.interval_ms = interval_to_ms(interval)
+        self.offset_ms = _interval_offset(interval)
+        self.symbols = list(symbols)
+        self.callback = callback
+        
+        self.last_dispatched: Dict[str, int] = {}      # {交易对: 已分发的收盘K线开盘时间}
+        self.running = False
+        self.dispatch_count = 0
+        self.last_bar_close: Optional[int] = None
+        self.last_symbols: List[str] = []
+        self.dispatch_delays: deque = deque(maxlen=history_size)  # 收盘到开始分析（毫秒）
+        self.signal_delays: deque = deque(maxlen=history_size)    # 收盘到信号生成（毫秒）
+    
+    def boundary(self, time_ms: int) -> int:
+        """time_ms 所在K线的开盘时间（即上一根K线的收盘边界；周线从周一开始）"""
+        return (time_ms - self.offset_ms) // self.interval_ms * self.interval_ms + self.offset_ms
+
+
+class BarCloseDispatcher:
+    """K线收盘事件调度器"""
+    
+    def __init__(
+        self,
+        settle_delay: float = 1.0,
+        max_wait: float = 10.0,
+        bar_source: Optional[Callable[[str, str], Optional[int]]] = None,
+        time_source: Optional[Callable[[], float]] = None,
+        history_size: int = 200
+    ):
+        """
+        初始化调度器
+        
+        Args:
+            settle_delay: K线收盘后等待的秒数（留给交易所完成收盘和推送）
+            max_wait: 收盘后最多等待数据源确认的秒数，超时后仍然分发（由策略自行通过 REST 获取）
+            bar_source: 返回 (交易对, 周期) 最后一根已收盘K线开盘时间的函数（例如行情数据流），
+                None 表示所有交易对在边界时刻都视为已收盘；函数返回 None 表示未知，同样直接分发
+            time_source: 返回当前时间（秒）的函数，默认 time.time（可传入 ServerClock.time）
+            history_size: 每个任务保留的延迟样本数量
+        """
+        self.settle_delay = max(0.0, settle_delay)
+        self.max_wait = max(0.0, max_wait)
+        self.bar_source = bar_source
+        self.time_source = time_source or time.time
+        self.history_size = history_size
+        self.logger = get_logger()
+        
+        self._jobs: Dict[str, _BarCloseJob] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+    
+    def register(self, name: str, interval: str, symbols: List[str], callback: Callable[[List[str], int], Any]):
+        """
+        注册调度任务
+        
+        Args:
+            name: 任务名称
+            interval: K线间隔
+            symbols: 交易对列表
+            callback: callback(交易对列表, K线收盘时间毫秒)，只传入本次收盘K线有更新的交易对
+        """
+        job = _BarCloseJob(name, interval, symbols, callback, self.history_size)
+        
+        # 注册前已经收盘的K线不再分发，从下一根K线收盘开始调度
+        now_ms = self._now_ms() - int(self.settle_delay * 1000)
+        current_open = job.boundary(now_ms) - job.interval_ms
+        job.last_dispatched = {symbol: current_open for symbol in job.symbols}
+        
+        with self._lock:
+            self._jobs[name] = job
+        self._wakeup.set()
+    
+    def notify_bar_closed(self, symbol: str, interval: str):
+        """数据源收到K线收盘推送时调用，提前唤醒调度线程"""
+        self._wakeup.set()
+    
+    # ==================== 调度循环 ====================
+    
+    def start(self):
+        """启动调度线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, len(self._jobs)),
+            thread_name_prefix='BarCloseJob'
+        )
+        self._thread = threading.Thread(
+            target=self._loop,
+            daemon=True,
+            name="BarCloseDispatcher"
+        )
+        self._thread.start()
+    
+    def stop(self):
+        """停止调度线程（等待正在执行的任务结束）"""
+        self._stop_event.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+        if self._executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+    
+    def _loop(self):
+        while not self._stop_event.is_set():
+            try:
+                timeout = self._tick(self._now_ms())
+            except Exception as e:
+                self.logger.error(f"K线收盘调度出错: {e}")
+                timeout = 1.0
+            
+            self._wakeup.wait(timeout=timeout)
+            self._wakeup.clear()
+    
+    def _now_ms(self) -> int:
+        return int(self.time_source() * 1000)
+    
+    def _tick(self, now_ms: int) -> float:
+        """
+        检查所有任务并分发到期的交易对
+        
+        Returns:
+            距离下一次检查的秒数
+        """
+        settle_ms = int(self.settle_delay * 1000)
+        max_wait_ms = int(self.max_wait * 1000)
+        next_check_ms = None
+        
+        with self._lock:
+            jobs = list(self._jobs.values())
+        
+        for job in jobs:
+            # 最近一次已经过了结算延迟的K线收盘时间
+            bar_close = job.boundary(now_ms - settle_ms)
+            bar_open = bar_close - job.interval_ms
+            
+            pending = [s for s in job.symbols if job.last_dispatched.get(s, -1) < bar_open]
+            waiting = []
+            
+            if pending and not job.running:
+                ready = []
+                for symbol in pending:
+                    if self._is_closed(symbol, job.interval, bar_open) or now_ms >= bar_close + max_wait_ms:
+                        ready.append(symbol)
+                    else:
+                        waiting.append(symbol)
+                
+                if ready:
+                    self._dispatch(job, ready, bar_open, bar_close, now_ms)
+            elif pending:
+                waiting = pending
+            
+            # 仍有交易对在等待数据源确认（或任务正在执行）时稍后再检查，否则等到下一根K线收盘
+            if waiting:
+                candidate = now_ms + 250
+            else:
+                candidate = bar_close + job.interval_ms + settle_ms
+            next_check_ms = candidate if next_check_ms is None else min(next_check_ms, candidate)
+        
+        if next_check_ms is None:
+            return 1.0
+        return max(0.05, (next_check_ms - self._now_ms()) / 1000)
+    
+    def _is_closed(self, symbol: str, interval: str, bar_open: int) -> bool:
+        """数据源是否已确认该K线收盘（没有数据源或未知时视为已收盘）"""
+        if self.bar_source is None:
+            return True
+        try:
+            last_closed = self.bar_source(symbol, interval)
+        except Exception:
+            return True
+        return last_closed is None or last_closed >= bar_open
+    
+    def _dispatch(self, job: _BarCloseJob, symbols: List[str], bar_open: int, bar_close: int, now_ms: int):
+        """在线程池中执行任务"""
+        job.running = True
+        for symbol in symbols:
+            job.last_dispatched[symbol] = bar_open
+        job.dispatch_delays.append(now_ms - bar_close)
+        
+        def run():
+            try:
+                job.callback(symbols, bar_close)
+            except Exception as e:
+                self.logger.error(f"K线收盘任务 {job.name} 执行失败: {e}")
+            finally:
+                delay = self._now_ms() - bar_close
+                job.signal_delays.append(delay)
+                job.dispatch_count += 1
+                job.last_bar_close = bar_close
+                job.last_symbols = symbols
+                job.running = False
+                self.logger.info(
+                    f"⏱️ {job.name} {job.interval} K线收盘 → 信号 {delay}ms ({len(symbols)} 个交易对)"
+                )
+                self._wakeup.set()
+        
+        if self._executor is None:
+            run()
+        else:
+            self._executor.submit(run)
+    
+    # ==================== 统计 ====================
+    
+    @staticmethod
+    def _summary(samples) -> Optional[Dict[str, Any]]:
+        values = sorted(samples)
+        if not values:
+            return None
+        return {
+            'last': samples[-1],
+            'p50': statistics.median(values),
+            'p95': values[min(len(values) - 1, int(len(values) * 0.95))],
+            'max': values[-1]
+        }
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        每个任务的调度统计
+        
+        Returns:
+            {任务名称: 分发次数、最近一次收盘时间和交易对、收盘到分析/信号的延迟（毫秒）}
+        """
+        with self._lock:
+            jobs = list(self._jobs.values())
+        
+        return {
+            job.name: {
+                'interval': job.interval,
+                'dispatch_count': job.dispatch_count,
+                'last_bar_close': job.last_bar_close,
+                'last_symbols': list(job.last_symbols),
+                'dispatch_delay_ms': self._summary(list(job.dispatch_delays)),
+                'signal_delay_ms': self._summary(list(job.signal_delays))
+            }
+            for job in jobs
+        }
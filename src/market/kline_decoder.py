@@ -0,0 +1,85 @@
+"""
+K线解码模块
+
+把 /fapi/v1/klines 的响应一次性解码为 NumPy 结构化数组。
+响应体用 JSON 解析（安装了 orjson 时使用 orjson），再按列直接填充结构化数组。
+"""
+import json
+from typing import List, Union
+
+import numpy as np
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover - orjson 为可选依赖
+    _json_loads = json.loads
+
+
+# K线结构化数组的字段（与 REST 响应的前 11 列一一对应）
+KLINE_DTYPE = np.dtype([
+    ('open_time', 'i8'),
+    ('open', 'f8'),
+    ('high', 'f8'),
+    ('low', 'f8'),
+    ('close', 'f8'),
+    ('volume', 'f8'),
+    ('close_time', 'i8'),
+    ('quote_volume', 'f8'),
+    ('trades', 'i8'),
+    ('taker_buy_volume', 'f8'),
+    ('taker_buy_quote_volume', 'f8')
+])
+
+_FIELD_COUNT = len(KLINE_DTYPE.names)
+
+
+def empty_klines() -> np.ndarray:
+    """空的K线数组"""
+    return np.empty(0, dtype=KLINE_DTYPE)
+
+
+def decode_klines(klines: Union[List[List], np.ndarray]) -> np.ndarray:
+    """
+    把已解析的K线列表转换为结构化数组
+    
+    Args:
+        klines: REST 格式的K线列表（从旧到新），或已解码的结构化数组
+        
+    Returns:
+        dtype 为 KLINE_DTYPE 的结构化数组
+    """
+    if isinstance(klines, np.ndarray) and klines.dtype == KLINE_DTYPE:
+        return klines
+    
+    if len(klines) == 0:
+        return empty_klines()
+    
+    if len(klines[0]) < _FIELD_COUNT:
+        raise ValueError(f"K线格式错误: 每行至少需要 {_FIELD_COUNT} 列")
+    
+    # 每列由 NumPy 直接从迭代器填充，不生成中间列表
+    count = len(klines)
+    bars = np.empty(count, dtype=KLINE_DTYPE)
+    for index, name in enumerate(KLINE_DTYPE.names):
+        bars[name] = np.fromiter((k[index] for k in klines), dtype=np.float64, count=count)
+    return bars
+
+
+def decode_klines_json(payload: Union[bytes, str]) -> np.ndarray:
+    """
+    把K线接口的原始响应体解码为结构化数组
+    
+    Args:
+        payload: 响应体（JSON 数组的数组）
+        
+    Returns:
+        dtype 为 KLINE_DTYPE 的结构化数组
+        
+    Raises:
+        ValueError: 响应不是K线数组
+    """
+    klines = _json_loads(payload)
+    if not isinstance(klines, list):
+        raise ValueError(f"K线响应格式错误: {payload[:200]!r}")
+    return decode_klines(klines)
@@ -0,0 +1,350 @@
+"""
+本地K线存储模块
+
+按 (交易对, 周期) 把已收盘的K线以列式二进制文件追加保存到磁盘，启动时内存映射；
+每个周期只请求最后一根已收盘K线之后的数据，未收盘的K线单独保存在内存中。
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+import numpy as np
+
+from .kline_decoder import KLINE_DTYPE, empty_klines
+from ..utils.logger import get_logger
+
+
+# 单次 REST 请求的最大K线数量
+_MAX_FETCH_LIMIT = 1500
+
+
+class KlineSeriesFile:
+    """
+    单个 (交易对, 周期) 的列式K线文件
+    
+    目录下每个字段一个 .bin 文件（原生字节序的定长数组），只追加不修改；
+    读取时通过 np.memmap 映射，不需要把历史数据全部读入内存。
+    """
+    
+    def __init__(self, directory: str):
+        """
+        打开（必要时创建）K线文件
+        
+        Args:
+            directory: 该序列的目录
+        """
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        
+        self._columns: Dict[str, np.ndarray] = {}
+        self.length = 0
+        self._open()
+    
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, f"{name}.bin")
+    
+    def _open(self):
+        """映射所有列；各列长度不一致（例如写入中断）时截断到最短的一列"""
+        lengths = []
+        for name in KLINE_DTYPE.names:
+            path = self._path(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            lengths.append(size // KLINE_DTYPE[name].itemsize)
+        
+        length = min(lengths)
+        
+        for name in KLINE_DTYPE.names:
+            path = self._path(name)
+            expected = length * KLINE_DTYPE[name].itemsize
+            if os.path.exists(path) and os.path.getsize(path) != expected:
+                os.truncate(path, expected)
+        
+        self._map(length)
+    
+    def _map(self, length: int):
+        """按当前长度重新映射各列"""
+        self.length = length
+        self._columns = {}
+        
+        if length == 0:
+            return
+        
+        for name in KLINE_DTYPE.names:
+            self._columns[name] = np.memmap(
+                self._path(name),
+                dtype=KLINE_DTYPE[name],
+                mode='r',
+                shape=(length,)
+            )
+    
+    @property
+    def last_open_time(self) -> Optional[int]:
+        """最后一根K线的开盘时间"""
+        return int(self._columns['open_time'][-1]) if self.length else None
+    
+    @property
+    def last_close_time(self) -> Optional[int]:
+        """最后一根K线的收盘时间"""
+        return int(self._columns['close_time'][-1]) if self.length else None
+    
+    def append(self, bars: np.ndarray) -> int:
+        """
+        追加已收盘的K线（只保留开盘时间晚于最后一根的部分）
+        
+        Args:
+            bars: KLINE_DTYPE 结构化数组（从旧到新）
+            
+        Returns:
+            实际追加的数量
+        """
+        last_open_time = self.last_open_time
+        if last_open_time is not None:
+            bars = bars[bars['open_time'] > last_open_time]
+        
+        if len(bars) == 0:
+            return 0
+        
+        for name in KLINE_DTYPE.names:
+            with open(self._path(name), 'ab') as f:
+                f.write(np.ascontiguousarray(bars[name]).tobytes())
+        
+        self._map(self.length + len(bars))
+        return len(bars)
+    
+    def tail(self, count: int) -> np.ndarray:
+        """
+        读取最后 count 根K线（复制为结构化数组）
+        
+        Args:
+            count: 数量
+            
+        Returns:
+            KLINE_DTYPE 结构化数组
+        """
+        count = min(count, self.length)
+        return self.slice(self.length - count, self.length)
+    
+    def slice(self, start: int, stop: int) -> np.ndarray:
+        """读取 [start, stop) 区间的K线"""
+        bars = np.empty(max(0, stop - start), dtype=KLINE_DTYPE)
+        if len(bars):
+            for name in KLINE_DTYPE.names:
+                bars[name] = self._columns[name][start:stop]
+        return bars
+    
+    def search(self, open_time: int) -> int:
+        """返回开盘时间不早于 open_time 的第一根K线的下标"""
+        if not self.length:
+            return 0
+        return int(np.searchsorted(self._columns['open_time'], open_time, side='left'))
+
+
+class KlineStore:
+    """本地K线存储（增量更新）"""
+    
+    def __init__(
+        self,
+        client,
+        data_dir: str = 'data/klines',
+        initial_limit: int = 1500,
+        workers: int = 4,
+        time_source: Optional[Callable[[], float]] = None
+    ):
+        """
+        初始化K线存储
+        
+        Args:
+            client: AsterDexClient 实例（需提供 get_klines_array）
+            data_dir: 数据目录
+            initial_limit: 首次同步时下载的K线数量（超过单次请求上限时分页获取）
+            workers: 批量同步的并发线程数
+            time_source: 返回当前时间（秒）的函数，用于判断K线是否收盘，默认 time.time
+        """
+        self.client = client
+        self.data_dir = data_dir
+        self.initial_limit = initial_limit
+        self.workers = max(1, workers)
+        self.time_source = time_source or time.time
+        self.logger = get_logger()
+        
+        self._files: Dict[Tuple[str, str], KlineSeriesFile] = {}
+        self._forming: Dict[Tuple[str, str], np.ndarray] = {}
+        self._locks: Dict[Tuple[str, str], threading.Lock] = {}
+        self._lock = threading.Lock()
+    
+    def _series(self, symbol: str, interval: str) -> Tuple[KlineSeriesFile, threading.Lock]:
+        """获取（必要时打开）序列文件及其锁"""
+        key = (symbol, interval)
+        with self._lock:
+            if key not in self._files:
+                directory = os.path.join(self.data_dir, symbol, interval)
+                self._files[key] = KlineSeriesFile(directory)
+                self._locks[key] = threading.Lock()
+            return self._files[key], self._locks[key]
+    
+    # ==================== 同步 ====================
+    
+    def sync(self, symbol: str, interval: str) -> int:
+        """
+        增量同步：只请求最后一根已收盘K线之后的数据
+        
+        Args:
+            symbol: 交易对符号
+            interval: K线间隔
+            
+        Returns:
+            新增的已收盘K线数量
+        """
+        series, lock = self._series(symbol, interval)
+        
+        with lock:
+            added = 0
+            
+            if series.length == 0:
+                bars = self._fetch_recent(symbol, interval, self.initial_limit)
+                return self._store(symbol, interval, series, bars)
+            
+            while True:
+                bars = self.client.get_klines_array(
+                    symbol=symbol,
+                    interval=interval,
+                    start_time=series.last_close_time + 1,
+                    limit=_MAX_FETCH_LIMIT
+                )
+                added += self._store(symbol, interval, series, bars)
+                
+                # 不足一页说明已经追上最新K线
+                if len(bars) < _MAX_FETCH_LIMIT:
+                    return added
+    
+    def _fetch_recent(self, symbol: str, interval: str, limit: int) -> np.ndarray:
+        """获取最近的 limit 根K线（从最新一页向前分页）"""
+        pages = []
+        count = 0
+        end_time = None
+        
+        while count < limit:
+            page_limit = min(limit - count, _MAX_FETCH_LIMIT)
+            page = self.client.get_klines_array(
+                symbol=symbol,
+                interval=interval,
+                end_time=end_time,
+                limit=page_limit
+            )
+            pages.insert(0, page)
+            count += len(page)
+            
+            # 不足一页说明已经没有更早的K线
+            if len(page) < page_limit:
+                break
+            end_time = int(page['open_time'][0]) - 1
+        
+        return np.concatenate(pages) if pages else empty_klines()
+    
+    def _store(self, symbol: str, interval: str, series: KlineSeriesFile, bars: np.ndarray) -> int:
+        """已收盘的K线写入磁盘，未收盘的保存在内存（需持有序列锁）"""
+        now_ms = int(self.time_source() * 1000)
+        closed_mask = bars['close_time'] < now_ms
+        
+        forming = bars[~closed_mask]
+        self._forming[(symbol, interval)] = forming[-1:].copy() if len(forming) else empty_klines()
+        
+        return series.append(bars[closed_mask])
+    
+    def sync_many(self, symbols: List[str], interval: str) -> Dict[str, Any]:
+        """
+        并发同步多个交易对
+        
+        Args:
+            symbols: 交易对列表
+            interval: K线间隔
+            
+        Returns:
+            {交易对: 新增数量}，失败的交易对对应异常对象
+        """
+        def run(symbol):
+            try:
+                return self.sync(symbol, interval)
+            except Exception as e:
+                return e
+        
+        with ThreadPoolExecutor(max_workers=min(self.workers, max(1, len(symbols)))) as executor:
+            return dict(zip(symbols, executor.map(run, symbols)))
+    
+    # ==================== 读取 ====================
+    
+    def get_klines(
+        self,
+        symbol: str,
+        interval: str,
+        limit: int = 500,
+        include_forming: bool = True
+    ) -> np.ndarray:
+        """
+        读取最近的K线（与 REST 接口一样，最后一根可以是未收盘的K线）
+        
+        Args:
+            symbol: 交易对符号
+            interval: K线间隔
+            limit: 数量
+            include_forming: 是否包含未收盘的K线
+            
+        Returns:
+            KLINE_DTYPE 结构化数组（从旧到新）
+        """
+        series, lock = self._series(symbol, interval)
+        
+        with lock:
+            forming = self._forming.get((symbol, interval)) if include_forming else None
+            if forming is not None and len(forming):
+                closed = series.tail(limit - 1) if limit > 1 else empty_klines()
+                return np.concatenate([closed, forming])
+            return series.tail(limit)
+    
+    def get_range(
+        self,
+        symbol: str,
+        interval: str,
+        start_time: Optional[int] = None,
+        end_time: Optional[int] = None
+    ) -> np.ndarray:
+        """
+        按开盘时间读取已收盘K线（供回测使用）
+        
+        Args:
+            symbol: 交易对符号
+            interval: K线间隔
+            start_time: 开始时间（毫秒，含）
+            end_time: 结束时间（毫秒，不含）
+            
+        Returns:
+            KLINE_DTYPE 结构化数组
+        """
+        series, lock = self._series(symbol, interval)
+        
+        with lock:
+            start = series.search(start_time) if start_time is not None else 0
+            stop = series.search(end_time) if end_time is not None else series.length
+            return series.slice(start, stop)
+    
+    def fetch_many(self, symbols: List[str], interval: str, limit: int) -> Dict[str, Any]:
+        """
+        同步后读取多个交易对的K线
+        
+        Args:
+            symbols: 交易对列表
+            interval: K线间隔
+            limit: 每个交易对的K线数量
+            
+        Returns:
+            {交易对: K线数组}，失败的交易对对应异常对象
+        """
+        results = {}
+        for symbol, added in self.sync_many(symbols, interval).items():
+            if isinstance(added, Exception):
+                results[symbol] = added
+            else:
+                results[symbol] = self.get_klines(symbol, interval, limit)
+        return results
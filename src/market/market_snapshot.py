@@ -0,0 +1,214 @@
+"""
+共享行情快照模块
+
+高频/中频交易器、手动交易处理器和 HTTP API 经常在同一时刻请求相同交易对的价格和K线。
+这里把这些只读请求合并：相同的请求同时只有一个在途，其余调用方等待并共享结果；
+结果在很短的有效期内直接从缓存返回。价格一次请求全部交易对（不带 symbol 的 ticker 接口），
+替代 N 次单交易对请求。
+"""
+import threading
+import time
+from typing import Dict, Any, Optional, Callable, Hashable
+
+import numpy as np
+
+from ..utils.logger import get_logger
+
+
+class _InFlight:
+    """一个正在执行的请求"""
+    
+    __slots__ = ('event', 'value', 'error')
+    
+    def __init__(self):
+        self.event = threading.Event()
+        self.value = None
+        self.error: Optional[BaseException] = None
+
+
+class MarketSnapshot:
+    """带请求合并的短时行情缓存"""
+    
+    def __init__(
+        self,
+        client,
+        price_ttl: float = 1.0,
+        kline_ttl: float = 2.0,
+        time_source: Optional[Callable[[], float]] = None
+    ):
+        """
+        初始化行情快照
+        
+        Args:
+            client: AsterDexClient 实例
+            price_ttl: 价格缓存有效期（秒）
+            kline_ttl: K线缓存有效期（秒）
+            time_source: 返回当前时间（秒）的函数，默认 time.monotonic
+        """
+        self.client = client
+        self.price_ttl = price_ttl
+        self.kline_ttl = kline_ttl
+        self.time_source = time_source or time.monotonic
+        self.logger = get_logger()
+        
+        self._cache: Dict[Hashable, tuple] = {}           # {键: (过期时间, 值)}
+        self._in_flight: Dict[Hashable, _InFlight] = {}
+        self._lock = threading.Lock()
+        
+        self._stats = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'errors': 0}
+    
+    # ==================== 请求合并 ====================
+    
+    def _get(self, key: Hashable, ttl: float, loader: Callable[[], Any]) -> Any:
+        """
+        读取缓存；缓存过期时只有一个调用方执行 loader，其余调用方等待同一结果
+        
+        Args:
+            key: 请求键
+            ttl: 有效期（秒）
+            loader: 发起请求的函数
+            
+        Returns:
+            loader 的返回值
+        """
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached and cached[0] > self.time_source():
+                self._stats['cache_hits'] += 1
+                return cached[1]
+            
+            pending = self._in_flight.get(key)
+            if pending is None:
+                pending = _InFlight()
+                self._in_flight[key] = pending
+                leader = True
+                self._stats['requests'] += 1
+            else:
+                leader = False
+                self._stats['coalesced'] += 1
+        
+        if not leader:
+            pending.event.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.value
+        
+        try:
+            pending.value = loader()
+        except BaseException as e:
+            pending.error = e
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        else:
+            with self._lock:
+                self._cache[key] = (self.time_source() + ttl, pending.value)
+        finally:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            pending.event.set()
+        
+        return pending.value
+    
+    def invalidate(self, prefix: Optional[str] = None):
+        """
+        清除缓存
+        
+        Args:
+            prefix: 只清除该类型的缓存（prices、mark_prices、klines），None 表示全部
+        """
+        with self._lock:
+            if prefix is None:
+                self._cache.clear()
+            else:
+                for key in [k for k in self._cache if k[0] == prefix]:
+                    del self._cache[key]
+    
+    # ==================== 价格 ====================
+    
+    def get_prices(self) -> Dict[str, float]:
+        """
+        所有交易对的最新价格（一次请求）
+        
+        Returns:
+            {交易对: 最新价格}
+        """
+        def load():
+            tickers = self.client.get_ticker_price()
+            if isinstance(tickers, dict):
+                tickers = [tickers]
+            return {t['symbol']: float(t['price']) for t in tickers}
+        
+        return self._get(('prices',), self.price_ttl, load)
+    
+    def get_price(self, symbol: str) -> float:
+        """
+        单个交易对的最新价格（从全部交易对的价格中读取，缺失时单独请求）
+        
+        Args:
+            symbol: 交易对符号
+            
+        Returns:
+            最新价格
+        """
+        price = self.get_prices().get(symbol)
+        if price is not None:
+            return price
+        
+        return self._get(
+            ('price', symbol),
+            self.price_ttl,
+            lambda: float(self.client.get_ticker_price(symbol)['price'])
+        )
+    
+    def get_mark_prices(self) -> Dict[str, float]:
+        """
+        所有交易对的标记价格（一次请求）
+        
+        Returns:
+            {交易对: 标记价格}
+        """
+        def load():
+            items = self.client.get_mark_price()
+            if isinstance(items, dict):
+                items = [items]
+            return {item['symbol']: float(item['markPrice']) for item in items}
+        
+        return self._get(('mark_prices',), self.price_ttl, load)
+    
+    # ==================== K线 ====================
+    
+    def get_klines(self, symbol: str, interval: str, limit: int = 500) -> np.ndarray:
+        """
+        最近的K线（KLINE_DTYPE 结构化数组，多个调用方共享，只读）
+        
+        Args:
+            symbol: 交易对符号
+            interval: K线间隔
+            limit: K线数量
+            
+        Returns:
+            K线数组
+        """
+        def load():
+            bars = self.client.get_klines_array(symbol=symbol, interval=interval, limit=limit)
+            bars.flags.writeable = False
+            return bars
+        
+        return self._get(('klines', symbol, interval, limit), self.kline_ttl, load)
+    
+    # ==================== 统计 ====================
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        请求统计
+        
+        Returns:
+            实际请求数、缓存命中数、合并到在途请求的次数、失败次数
+        """
+        with self._lock:
+            stats = dict(self._stats)
+            stats['cached_keys'] = len(self._cache)
+        served = stats['requests'] + stats['cache_hits'] + stats['coalesced']
+        stats['saved_percent'] = round((1 - stats['requests'] / served) * 100, 1) if served else 0.0
+        return stats
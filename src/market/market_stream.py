@@ -0,0 +1,356 @@
+"""
+WebSocket 行情数据流模块
+
+订阅K线和标记价格推送，在内存中维护每个 (交易对, 周期) 的K线序列，
+断线重连后通过 REST 回补缺失的K线，使用方读取最新状态时无需网络请求
+"""
+import threading
+import time
+from collections import deque
+from typing import Dict, Any, List, Optional, Tuple, Callable
+
+from ..api.ws_stream import WebSocketStream
+from ..utils.logger import get_logger
+
+
+# 单次 REST 请求的最大K线数量
+_MAX_FETCH_LIMIT = 1500
+
+
+class BarSeries:
+    """
+    单个 (交易对, 周期) 的K线序列
+    
+    K线保存为与 REST /fapi/v1/klines 相同的列表格式，可直接交给策略分析。
+    """
+    
+    def __init__(self, max_bars: int = 500):
+        """
+        初始化K线序列
+        
+        Args:
+            max_bars: 最多保留的K线数量
+        """
+        self.bars: deque = deque(maxlen=max_bars)
+        self.last_closed_open_time: Optional[int] = None
+    
+    def __len__(self) -> int:
+        return len(self.bars)
+    
+    @property
+    def last_open_time(self) -> Optional[int]:
+        """最后一根K线的开盘时间"""
+        return int(self.bars[-1][0]) if self.bars else None
+    
+    def update(self, bar: List, closed: bool = False):
+        """
+        用一根K线更新序列（同一开盘时间则替换，更新的则追加，更旧的忽略）
+        
+        Args:
+            bar: REST 格式的K线
+            closed: 该K线是否已收盘
+        """
+        open_time = int(bar[0])
+        last_open_time = self.last_open_time
+        
+        if last_open_time is None or open_time > last_open_time:
+            self.bars.append(bar)
+        elif open_time == last_open_time:
+            self.bars[-1] = bar
+        else:
+            return
+        
+        if closed:
+            self.last_closed_open_time = open_time
+    
+    def merge(self, klines: List[List], now_ms: Optional[int] = None):
+        """
+        合并 REST 返回的K线（用于初始化和断线回补）
+        
+        Args:
+            klines: REST 格式的K线列表（从旧到新）
+            now_ms: 当前时间（毫秒），用于判断K线是否已收盘
+        """
+        now_ms = now_ms if now_ms is not None else int(time.time() * 1000)
+        
+        for kline in klines:
+            self.update(kline, closed=int(kline[6]) < now_ms)
+    
+    def to_klines(self, limit: Optional[int] = None) -> List[List]:
+        """
+        获取K线列表（副本）
+        
+        Args:
+            limit: 只返回最近的 N 根
+            
+        Returns:
+            K线列表（从旧到新）
+        """
+        bars = list(self.bars)
+        return bars[-limit:] if limit else bars
+
+
+class MarketDataStream(WebSocketStream):
+    """WebSocket 行情数据流"""
+    
+    def __init__(
+        self,
+        client,
+        symbols: List[str],
+        intervals: List[str],
+        ws_url: str = 'wss://fstream.asterdex.com',
+        max_bars: int = 500,
+        backfill_limit: int = 150,
+        stale_after_seconds: float = 60.0
+    ):
+        """
+        初始化行情数据流
+        
+        Args:
+            client: AsterDexClient 实例（用于 REST 回补）
+            symbols: 订阅的交易对
+            intervals: 订阅的K线周期
+            ws_url: WebSocket 基础地址
+            max_bars: 每个序列最多保留的K线数量
+            backfill_limit: 首次连接时通过 REST 拉取的K线数量（超过单次请求上限时分页获取）
+            stale_after_seconds: 超过该时间未收到消息视为数据过期
+        """
+        super().__init__(name='MarketDataStream')
+        
+        self.client = client
+        self.symbols = list(symbols)
+        self.intervals = list(intervals)
+        self.ws_url = ws_url.rstrip('/')
+        self.max_bars = max_bars
+        self.backfill_limit = backfill_limit
+        self.stale_after_seconds = stale_after_seconds
+        self.logger = get_logger()
+        
+        self._lock = threading.RLock()
+        self._series: Dict[Tuple[str, str], BarSeries] = {
+            (symbol, interval): BarSeries(max_bars)
+            for symbol in self.symbols
+            for interval in self.intervals
+        }
+        # {交易对: {'price', 'index_price', 'funding_rate', 'event_time'}}
+        self._mark_prices: Dict[str, Dict[str, Any]] = {}
+        
+        # K线收盘回调 callback(交易对, 周期)
+        self._bar_close_listeners: List[Callable[[str, str], None]] = []
+        # 标记价格回调 callback(交易对, 价格)
+        self._price_listeners: List[Callable[[str, float], None]] = []
+    
+    # ==================== 连接与消息处理 ====================
+    
+    def _build_url(self) -> str:
+        """组合订阅地址"""
+        streams = []
+        for symbol in self.symbols:
+            for interval in self.intervals:
+                streams.append(f"{symbol.lower()}@kline_{interval}")
+            streams.append(f"{symbol.lower()}@markPrice@1s")
+        
+        return f"{self.ws_url}/stream?streams={'/'.join(streams)}"
+    
+    async def _on_connect(self):
+        """连接后通过 REST 回补缺失的K线"""
+        for symbol, interval in list(self._series.keys()):
+            try:
+                await self._backfill(symbol, interval)
+            except Exception as e:
+                self.logger.error(f"回补K线失败 [{symbol} {interval}]: {e}")
+    
+    async def _backfill(self, symbol: str, interval: str):
+        """回补单个序列"""
+        with self._lock:
+            last_open_time = self._series[(symbol, interval)].last_open_time
+        
+        if last_open_time is None:
+            klines = await self._fetch_recent(symbol, interval, self.backfill_limit)
+            self._merge(symbol, interval, klines)
+            self.logger.info(f"📥 {symbol} {interval} 初始化 {len(klines)} 根K线")
+            return
+        
+        # 从最后一根K线开始补齐（包括该K线本身，它可能在断线期间收盘）
+        total = 0
+        while True:
+            klines = await self._run_blocking(
+                self.client.get_klines,
+                symbol=symbol,
+                interval=interval,
+                start_time=last_open_time,
+                limit=_MAX_FETCH_LIMIT
+            )
+            self._merge(symbol, interval, klines)
+            total += len(klines)
+            
+            if len(klines) < _MAX_FETCH_LIMIT:
+                break
+            last_open_time = int(klines[-1][0])
+        
+        if total > 1:
+            self.logger.info(f"📥 {symbol} {interval} 回补 {total - 1} 根K线")
+    
+    async def _fetch_recent(self, symbol: str, interval: str, limit: int) -> List[List]:
+        """获取最近的 limit 根K线（从最新一页向前分页）"""
+        klines: List[List] = []
+        end_time = None
+        
+        while len(klines) < limit:
+            page_limit = min(limit - len(klines), _MAX_FETCH_LIMIT)
+            page = await self._run_blocking(
+                self.client.get_klines,
+                symbol=symbol,
+                interval=interval,
+                end_time=end_time,
+                limit=page_limit
+            )
+            klines = page + klines
+            
+            # 不足一页说明已经没有更早的K线
+            if len(page) < page_limit:
+                break
+            end_time = int(page[0][0]) - 1
+        
+        return klines
+    
+    def _merge(self, symbol: str, interval: str, klines: List[List]):
+        with self._lock:
+            self._series[(symbol, interval)].merge(klines)
+    
+    def _on_message(self, message: Dict[str, Any]):
+        """处理推送消息"""
+        data = message.get('data', message)
+        event = data.get('e')
+        
+        if event == 'kline':
+            k = data['k']
+            key = (data['s'], k['i'])
+            bar = [
+                k['t'], k['o'], k['h'], k['l'], k['c'], k['v'],
+                k['T'], k['q'], k['n'], k['V'], k['Q'], '0'
+            ]
+            closed = bool(k.get('x'))
+            with self._lock:
+                series = self._series.get(key)
+                if series is None:
+                    return
+                series.update(bar, closed=closed)
+            
+            if closed:
+                for listener in self._bar_close_listeners:
+                    try:
+                        listener(key[0], key[1])
+                    except Exception as e:
+                        self.logger.error(f"K线收盘回调出错: {e}")
+        
+        elif event == 'markPriceUpdate':
+            price = float(data['p'])
+            with self._lock:
+                self._mark_prices[data['s']] = {
+                    'price': price,
+                    'index_price': float(data.get('i', 0) or 0),
+                    'funding_rate': float(data.get('r', 0) or 0),
+                    'event_time': int(data.get('E', 0))
+                }
+            
+            for listener in self._price_listeners:
+                try:
+                    listener(data['s'], price)
+                except Exception as e:
+                    self.logger.error(f"标记价格回调出错: {e}")
+    
+    def add_bar_close_listener(self, callback: Callable[[str, str], None]):
+        """
+        注册K线收盘回调（在数据流线程中调用，回调应尽快返回）
+        
+        Args:
+            callback: callback(交易对, 周期)
+        """
+        self._bar_close_listeners.append(callback)
+    
+    def add_price_listener(self, callback: Callable[[str, float], None]):
+        """
+        注册标记价格回调（每次标记价格推送时在数据流线程中调用，回调应尽快返回）
+        
+        Args:
+            callback: callback(交易对, 价格)
+        """
+        self._price_listeners.append(callback)
+    
+    # ==================== 读取接口（无网络请求） ====================
+    
+    def is_fresh(self) -> bool:
+        """数据流是否在线且未过期"""
+        if not self.is_connected or self.last_message_time is None:
+            return False
+        return time.time() - self.last_message_time <= self.stale_after_seconds
+    
+    def get_klines(
+        self,
+        symbol: str,
+        interval: str,
+        limit: Optional[int] = None
+    ) -> Optional[List[List]]:
+        """
+        获取内存中的K线
+        
+        Args:
+            symbol: 交易对符号
+            interval: K线间隔
+            limit: 最少需要的K线数量（不足时返回 None）
+            
+        Returns:
+            K线列表，未订阅、数据过期或数量不足时返回 None
+        """
+        if not self.is_fresh():
+            return None
+        
+        with self._lock:
+            series = self._series.get((symbol, interval))
+            if series is None or len(series) == 0:
+                return None
+            if limit and len(series) < limit:
+                return None
+            return series.to_klines(limit)
+    
+    def get_last_closed_open_time(self, symbol: str, interval: str) -> Optional[int]:
+        """
+        最后一根已收盘K线的开盘时间
+        
+        Args:
+            symbol: 交易对符号
+            interval: K线间隔
+            
+        Returns:
+            开盘时间（毫秒），未订阅或数据过期时返回 None
+        """
+        if not self.is_fresh():
+            return None
+        
+        with self._lock:
+            series = self._series.get((symbol, interval))
+            return series.last_closed_open_time if series is not None else None
+    
+    def get_mark_price(self, symbol: str) -> Optional[float]:
+        """
+        获取最新标记价格
+        
+        Args:
+            symbol: 交易对符号
+            
+        Returns:
+            标记价格，未订阅或数据过期时返回 None
+        """
+        if not self.is_fresh():
+            return None
+        
+        with self._lock:
+            info = self._mark_prices.get(symbol)
+            return info['price'] if info else None
+    
+    def get_mark_price_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """获取标记价格详情（价格、指数价格、资金费率、事件时间）"""
+        with self._lock:
+            info = self._mark_prices.get(symbol)
+            return dict(info) if info else None
@@ -0,0 +1,167 @@
+"""
+K线重采样模块
+
+用内存中的基础周期K线（例如 15m）在本地合成 30m / 1h / 4h / 1d 等更大周期的K线，
+不再为每个策略周期单独请求交易所。周期边界与交易所一致：按 UTC 零点对齐，周线从周一开始。
+历史开头不完整的周期会被丢弃；最后一个周期未走完时与 REST 接口一样作为未收盘K线保留。
+"""
+from typing import List, Optional, Union
+
+import numpy as np
+
+from .bar_close import interval_to_ms, _interval_offset
+from .kline_decoder import KLINE_DTYPE, decode_klines, empty_klines
+
+
+# 成交量类字段在合成时求和
+_SUM_FIELDS = ('volume', 'quote_volume', 'trades', 'taker_buy_volume', 'taker_buy_quote_volume')
+
+
+def align_open_time(open_time: Union[int, np.ndarray], interval: str) -> Union[int, np.ndarray]:
+    """
+    计算时间所在周期的开盘时间
+    
+    Args:
+        open_time: 时间（毫秒），可以是数组
+        interval: K线间隔
+        
+    Returns:
+        周期开盘时间（毫秒）
+    """
+    interval_ms = interval_to_ms(interval)
+    offset = _interval_offset(interval)
+    return (open_time - offset) // interval_ms * interval_ms + offset
+
+
+def can_resample(source_interval: str, target_interval: str) -> bool:
+    """
+    目标周期能否由基础周期合成（目标周期是基础周期的整数倍，且边界对齐）
+    
+    Args:
+        source_interval: 基础K线间隔
+        target_interval: 目标K线间隔
+        
+    Returns:
+        是否可以合成
+    """
+    try:
+        source_ms = interval_to_ms(source_interval)
+        target_ms = interval_to_ms(target_interval)
+    except ValueError:
+        return False
+    return (
+        target_ms >= source_ms
+        and target_ms % source_ms == 0
+        and _interval_offset(target_interval) % source_ms == 0
+    )
+
+
+def resample_klines(
+    bars: Union[List[List], np.ndarray],
+    target_interval: str,
+    source_interval: Optional[str] = None
+) -> np.ndarray:
+    """
+    把基础周期K线合成为更大周期的K线
+    
+    Args:
+        bars: 基础周期K线（从旧到新，REST 格式列表或 KLINE_DTYPE 数组）
+        target_interval: 目标K线间隔
+        source_interval: 基础K线间隔（传入时检查能否合成）
+        
+    Returns:
+        KLINE_DTYPE 结构化数组；开头不完整的周期被丢弃，最后一根可以是未收盘的K线
+        
+    Raises:
+        ValueError: 目标周期不能由基础周期合成
+    """
+    if source_interval is not None and not can_resample(source_interval, target_interval):
+        raise ValueError(f"{target_interval} 不能由 {source_interval} K线合成")
+    
+    bars = decode_klines(bars)
+    if len(bars) == 0:
+        return empty_klines()
+    
+    buckets = align_open_time(bars['open_time'], target_interval)
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    ends = np.concatenate((starts[1:], [len(bars)])) - 1
+    
+    result = np.empty(len(starts), dtype=KLINE_DTYPE)
+    result['open_time'] = buckets[starts]
+    result['close_time'] = result['open_time'] + interval_to_ms(target_interval) - 1
+    result['open'] = bars['open'][starts]
+    result['close'] = bars['close'][ends]
+    result['high'] = np.maximum.reduceat(bars['high'], starts)
+    result['low'] = np.minimum.reduceat(bars['low'], starts)
+    for name in _SUM_FIELDS:
+        result[name] = np.add.reduceat(bars[name], starts)
+    
+    # 数据从周期中间开始时，第一根的开盘价和高低点都不完整
+    if bars['open_time'][0] != result['open_time'][0]:
+        result = result[1:]
+    
+    return result
+
+
+class KlineResampler:
+    """按基础周期为各策略周期提供本地合成的K线"""
+    
+    def __init__(self, base_interval: str = '15m', max_request_limit: int = 1500):
+        """
+        初始化重采样器
+        
+        Args:
+            base_interval: 基础K线间隔（内存中保存和同步的周期）
+            max_request_limit: 单次 REST 请求的最大K线数量
+        """
+        self.base_interval = base_interval
+        self.base_ms = interval_to_ms(base_interval)
+        self.max_request_limit = max_request_limit
+    
+    def derives(self, interval: str) -> bool:
+        """目标周期是否需要（并且可以）由基础周期合成"""
+        return interval != self.base_interval and can_resample(self.base_interval, interval)
+    
+    def base_limit(self, interval: str, limit: int) -> int:
+        """
+        合成 limit 根目标K线需要的基础K线数量（包含开头可能被丢弃的不完整周期）
+        
+        Args:
+            interval: 目标K线间隔
+            limit: 目标K线数量
+            
+        Returns:
+            基础K线数量
+        """
+        ratio = interval_to_ms(interval) // self.base_ms
+        return (limit + 1) * ratio
+    
+    def resample(self, bars: Union[List[List], np.ndarray], interval: str, limit: Optional[int] = None) -> np.ndarray:
+        """
+        合成目标周期K线
+        
+        Args:
+            bars: 基础周期K线
+            interval: 目标K线间隔
+            limit: 只保留最近的数量
+            
+        Returns:
+            KLINE_DTYPE 结构化数组
+        """
+        result = resample_klines(bars, interval, self.base_interval)
+        return result[-limit:] if limit else result
+    
+    def last_closed_open_time(self, base_open_time: Optional[int], interval: str) -> Optional[int]:
+        """
+        由最后一根已收盘基础K线推算目标周期最后一根已收盘K线的开盘时间
+        
+        Args:
+            base_open_time: 最后一根已收盘基础K线的开盘时间（毫秒）
+            interval: 目标K线间隔
+            
+        Returns:
+            开盘时间（毫秒），没有基础数据时返回 None
+        """
+        if base_open_time is None:
+            return None
+        return int(align_open_time(base_open_time + self.base_ms, interval)) - interval_to_ms(interval)
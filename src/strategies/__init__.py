@@ -2,6 +2,18 @@
 交易策略模块
 """
 from .indicators import TechnicalIndicators
+from .streaming_indicators import StreamingSMA, StreamingEMA, StreamingATR, MovingAverageSet
+from .batch_indicators import BatchIndicatorEngine, BatchIndicatorResult, BatchEMAState
 from .double_ma import DoubleMaStrategy
 
-__all__ = ['TechnicalIndicators', 'DoubleMaStrategy']
+__all__ = [
+    'TechnicalIndicators',
+    'StreamingSMA',
+    'StreamingEMA',
+    'StreamingATR',
+    'MovingAverageSet',
+    'BatchIndicatorEngine',
+    'BatchIndicatorResult',
+    'BatchEMAState',
+    'DoubleMaStrategy'
+]
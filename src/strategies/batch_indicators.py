@@ -0,0 +1,493 @@
+"""
+批量指标计算模块
+
+把多个交易对的收盘价排成 (交易对 × K线) 矩阵，用 NumPy 一次算出所有交易对的
+SMA/EMA、均线密集度和价格位置，交易对数量增加时每个周期的计算时间基本不变。
+结果与逐个调用 TechnicalIndicators 的函数一致；传入 BatchEMAState 时 EMA 为流式状态
+（覆盖第一次计算以来的全部历史，与 DoubleMaStrategy.analyze 使用的 MovingAverageSet 相同）。
+"""
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from ..market.kline_decoder import decode_klines
+
+
+# 价格位置编码（与 TechnicalIndicators.check_price_position 的返回值对应）
+POSITION_UNKNOWN = 0
+POSITION_ABOVE = 1
+POSITION_BELOW = 2
+POSITION_CROSS = 3
+
+POSITION_LABELS = ('UNKNOWN', 'ABOVE', 'BELOW', 'CROSS')
+
+
+def sma_series(close: np.ndarray, period: int) -> np.ndarray:
+    """
+    每一根K线处的 SMA（前缀和相减得到滚动均值，K线不足一个周期时为 0.0）
+    
+    Args:
+        close: 收盘价序列（从旧到新）
+        period: 周期
+        
+    Returns:
+        与 close 等长的序列
+    """
+    close = np.asarray(close, dtype=np.float64)
+    values = np.zeros(len(close))
+    if 0 < period <= len(close):
+        cumsum = np.concatenate(([0.0], np.cumsum(close)))
+        values[period - 1:] = (cumsum[period:] - cumsum[:-period]) / period
+    return values
+
+
+def ema_series(close: np.ndarray, period: int) -> np.ndarray:
+    """
+    每一根K线处的 EMA（pandas 的 ewm 递推在 C 层完成，K线不足一个周期时为 0.0）
+    
+    Args:
+        close: 收盘价序列（从旧到新）
+        period: 周期
+        
+    Returns:
+        与 close 等长的序列
+    """
+    close = np.asarray(close, dtype=np.float64)
+    values = pd.Series(close).ewm(span=period, adjust=False).mean().to_numpy()
+    return np.where(np.arange(1, len(close) + 1) >= period, values, 0.0)
+
+
+def classify(
+    mas: Dict[str, np.ndarray],
+    price: np.ndarray,
+    convergence_threshold: float
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    均线密集度和价格位置（逐元素，与 DoubleMaStrategy.analyze 的判断相同）
+    
+    Args:
+        mas: {均线名称: 数组}，所有数组形状相同，无效值为 0.0
+        price: 与均线数组形状相同的价格
+        convergence_threshold: 均线密集阈值（百分比）
+        
+    Returns:
+        (有效均线平均值, 均线差异百分比, 是否密集, 价格位置编码)
+    """
+    price = np.asarray(price, dtype=np.float64)
+    ma_stack = np.stack(list(mas.values()), axis=-1) if mas else np.zeros(price.shape + (0,))
+    valid = ma_stack > 0
+    valid_count = valid.sum(axis=-1)
+    
+    # 只统计有效（大于 0）的均线
+    with np.errstate(invalid='ignore', divide='ignore'):
+        ma_max = np.where(valid, ma_stack, -np.inf).max(axis=-1, initial=-np.inf)
+        ma_min = np.where(valid, ma_stack, np.inf).min(axis=-1, initial=np.inf)
+        ma_avg = np.where(valid_count > 0, np.where(valid, ma_stack, 0.0).sum(axis=-1) / valid_count, 0.0)
+        spread = np.where(valid_count >= 2, (ma_max - ma_min) / ma_max * 100, np.inf)
+    
+    is_convergent = (valid_count >= 2) & (spread <= convergence_threshold)
+    
+    position = np.full(price.shape, POSITION_CROSS, dtype=np.int8)
+    position[price > ma_avg * 1.01] = POSITION_ABOVE
+    position[price < ma_avg * 0.99] = POSITION_BELOW
+    position[valid_count == 0] = POSITION_UNKNOWN
+    
+    return ma_avg, spread, is_convergent, position
+
+
+@dataclass
+class BatchIndicatorResult:
+    """批量计算结果（每个数组的第 i 个元素对应 symbols[i]）"""
+    
+    symbols: List[str]
+    close: np.ndarray                   # (交易对, K线) 收盘价矩阵，缺失部分为 NaN
+    lengths: np.ndarray                 # 每个交易对的有效K线数量
+    mas: Dict[str, np.ndarray]          # {'sma_20': (交易对,), ...}，数据不足为 0.0
+    current_price: np.ndarray           # 最新收盘价
+    ma_avg: np.ndarray                  # 有效均线的平均值，没有有效均线时为 0.0
+    spread_percent: np.ndarray          # (最大均线 - 最小均线) / 最大均线 * 100
+    is_convergent: np.ndarray           # 均线是否密集
+    position: np.ndarray                # 价格位置编码（POSITION_*）
+    
+    def __post_init__(self):
+        self._index = {symbol: i for i, symbol in enumerate(self.symbols)}
+    
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._index
+    
+    def index(self, symbol: str) -> int:
+        """交易对在结果数组中的下标"""
+        return self._index[symbol]
+    
+    def closes(self, symbol: str) -> np.ndarray:
+        """交易对的有效收盘价（从旧到新）"""
+        i = self._index[symbol]
+        return self.close[i, self.close.shape[1] - self.lengths[i]:]
+    
+    def for_symbol(self, symbol: str) -> Dict[str, Any]:
+        """
+        单个交易对的指标
+        
+        Args:
+            symbol: 交易对符号
+            
+        Returns:
+            ma_data（与 calculate_all_mas 相同的键）、current_price、ma_avg、
+            spread_percent、is_convergent、price_position
+        """
+        i = self._index[symbol]
+        return {
+            'ma_data': {name: float(values[i]) for name, values in self.mas.items()},
+            'current_price': float(self.current_price[i]),
+            'ma_avg': float(self.ma_avg[i]),
+            'spread_percent': float(self.spread_percent[i]),
+            'is_convergent': bool(self.is_convergent[i]),
+            'price_position': POSITION_LABELS[self.position[i]]
+        }
+
+
+class BatchEMAState:
+    """
+    批量模式的 EMA 流式状态（与 MovingAverageSet.sync 的语义相同）
+    
+    每个交易对保存已收盘K线的 EMA、已处理的K线数量和最后处理的开盘时间；
+    每次计算只把新收盘的K线计入状态，最后一根K线（可能尚未收盘）只计入返回值。
+    窗口与已处理的数据不连续（例如第一次计算或中间缺失K线）时用整个窗口重新初始化。
+    """
+    
+    def __init__(self):
+        self.ema: Dict[str, np.ndarray] = {}            # {交易对: 每个周期的已收盘 EMA}
+        self.count: Dict[str, int] = {}                 # {交易对: 已处理的已收盘K线数量}
+        self.last_open_time: Dict[str, int] = {}        # {交易对: 最后处理的已收盘K线开盘时间}
+    
+    def reset(self, symbol: Optional[str] = None):
+        """
+        清空状态
+        
+        Args:
+            symbol: 只清空该交易对，None 表示全部
+        """
+        for table in (self.ema, self.count, self.last_open_time):
+            if symbol is None:
+                table.clear()
+            else:
+                table.pop(symbol, None)
+    
+    def new_closed(self, symbol: str, bars: np.ndarray) -> np.ndarray:
+        """
+        窗口中尚未计入状态的已收盘收盘价（不连续时先重置该交易对）
+        
+        Args:
+            symbol: 交易对符号
+            bars: K线结构化数组（从旧到新，最后一根视为未收盘）
+            
+        Returns:
+            新收盘的收盘价
+        """
+        closed_times = bars['open_time'][:-1]
+        
+        start = None
+        last = self.last_open_time.get(symbol)
+        if last is not None:
+            index = int(np.searchsorted(closed_times, last))
+            if index < len(closed_times) and closed_times[index] == last:
+                start = index + 1
+        
+        if start is None:
+            self.reset(symbol)
+            start = 0
+        
+        if len(closed_times):
+            self.last_open_time[symbol] = int(closed_times[-1])
+        
+        return bars['close'][start:-1]
+
+
+class BatchIndicatorEngine:
+    """多交易对批量指标计算"""
+    
+    def __init__(
+        self,
+        sma_periods: List[int] = [20, 60, 120],
+        ema_periods: List[int] = [20, 60, 120],
+        convergence_threshold: float = 2.0
+    ):
+        """
+        初始化计算引擎
+        
+        Args:
+            sma_periods: SMA 周期列表
+            ema_periods: EMA 周期列表
+            convergence_threshold: 均线密集阈值（百分比）
+        """
+        self.sma_periods = list(sma_periods)
+        self.ema_periods = list(ema_periods)
+        self.convergence_threshold = convergence_threshold
+        
+        # EMA 权重按 (周期, K线数量) 缓存
+        self._ema_weights: Dict[Tuple[int, int], Tuple[np.ndarray, np.ndarray]] = {}
+    
+    @staticmethod
+    def build_matrix(
+        klines_by_symbol: Dict[str, Any],
+        symbols: Optional[List[str]] = None,
+        max_bars: Optional[int] = None
+    ) -> Tuple[List[str], np.ndarray, np.ndarray]:
+        """
+        把各交易对的K线排成收盘价矩阵（右对齐，最新的K线在最后一列）
+        
+        Args:
+            klines_by_symbol: {交易对: K线}（REST 列表或结构化数组），值为异常或空的交易对被跳过
+            symbols: 交易对顺序，默认按字典顺序
+            max_bars: 每个交易对最多使用的K线数量
+            
+        Returns:
+            (交易对列表, 收盘价矩阵, 有效K线数量)；较短的序列左侧用 NaN 填充
+        """
+        names, bars_list = BatchIndicatorEngine._decode_all(klines_by_symbol, symbols, max_bars)
+        matrix, lengths = BatchIndicatorEngine._stack([bars['close'] for bars in bars_list])
+        return names, matrix, lengths
+    
+    @staticmethod
+    def _decode_all(
+        klines_by_symbol: Dict[str, Any],
+        symbols: Optional[List[str]],
+        max_bars: Optional[int]
+    ) -> Tuple[List[str], List[np.ndarray]]:
+        """解码各交易对的K线，跳过异常和空数据"""
+        names = []
+        bars_list = []
+        for symbol in (symbols if symbols is not None else list(klines_by_symbol)):
+            klines = klines_by_symbol.get(symbol)
+            if klines is None or isinstance(klines, Exception):
+                continue
+            
+            bars = decode_klines(klines)
+            if len(bars) == 0:
+                continue
+            
+            if max_bars:
+                bars = bars[-max_bars:]
+            names.append(symbol)
+            bars_list.append(bars)
+        
+        return names, bars_list
+    
+    @staticmethod
+    def _stack(columns: List[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        """把多个序列右对齐排成矩阵，较短的序列左侧用 NaN 填充"""
+        lengths = np.array([len(c) for c in columns], dtype=np.int64)
+        width = int(lengths.max()) if len(lengths) else 0
+        
+        matrix = np.full((len(columns), width), np.nan)
+        for i, column in enumerate(columns):
+            matrix[i, width - len(column):] = column
+        
+        return matrix, lengths
+    
+    def compute(
+        self,
+        symbols: List[str],
+        close: np.ndarray,
+        lengths: Optional[np.ndarray] = None,
+        emas: Optional[Dict[str, np.ndarray]] = None
+    ) -> BatchIndicatorResult:
+        """
+        计算所有交易对的指标
+        
+        Args:
+            symbols: 交易对列表（与矩阵的行对应）
+            close: (交易对, K线) 收盘价矩阵，右对齐，左侧缺失部分为 NaN
+            lengths: 每行的有效K线数量，默认按 NaN 统计
+            emas: 已算好的 EMA（{'ema_20': (交易对,), ...}，例如流式 EMA），默认按矩阵窗口计算
+            
+        Returns:
+            BatchIndicatorResult
+        """
+        close = np.asarray(close, dtype=np.float64)
+        if close.ndim != 2:
+            raise ValueError(f"收盘价矩阵必须是二维数组: {close.shape}")
+        
+        rows, width = close.shape
+        if lengths is None:
+            lengths = np.count_nonzero(~np.isnan(close), axis=1)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        
+        filled = np.nan_to_num(close, nan=0.0)
+        
+        mas: Dict[str, np.ndarray] = {}
+        
+        # SMA：只需要最后 period 列，每个周期一次按行求均值
+        for period in self.sma_periods:
+            values = np.zeros(rows)
+            if 0 < period <= width:
+                values = filled[:, width - period:].mean(axis=1)
+            mas[f'sma_{period}'] = np.where(lengths >= period, values, 0.0)
+        
+        # EMA：adjust=False 的递推展开为加权和，整个矩阵一次矩阵-向量乘法
+        for period in self.ema_periods:
+            if emas is not None:
+                mas[f'ema_{period}'] = emas[f'ema_{period}']
+                continue
+            values = self._ema(filled, lengths, period) if width else np.zeros(rows)
+            mas[f'ema_{period}'] = np.where(lengths >= period, values, 0.0)
+        
+        current_price = filled[:, -1] if width else np.zeros(rows)
+        ma_avg, spread, is_convergent, position = classify(
+            mas, current_price, self.convergence_threshold
+        )
+        
+        return BatchIndicatorResult(
+            symbols=list(symbols),
+            close=close,
+            lengths=lengths,
+            mas=mas,
+            current_price=current_price,
+            ma_avg=ma_avg,
+            spread_percent=spread,
+            is_convergent=is_convergent,
+            position=position
+        )
+    
+    def compute_series(self, close: np.ndarray) -> Dict[str, Any]:
+        """
+        计算单个交易对每一根K线处的指标（供回测使用）
+        
+        第 t 个元素等于把 close[:t + 1] 交给 calculate_all_mas 的结果，
+        即以第 t 根K线作为最新K线时策略看到的值。
+        
+        Args:
+            close: 收盘价序列（从旧到新）
+            
+        Returns:
+            mas（{均线名称: 序列}）、ma_avg、spread_percent、is_convergent、position
+        """
+        close = np.asarray(close, dtype=np.float64)
+        
+        mas: Dict[str, np.ndarray] = {}
+        for period in self.sma_periods:
+            mas[f'sma_{period}'] = sma_series(close, period)
+        for period in self.ema_periods:
+            mas[f'ema_{period}'] = ema_series(close, period)
+        
+        ma_avg, spread, is_convergent, position = classify(mas, close, self.convergence_threshold)
+        
+        return {
+            'mas': mas,
+            'ma_avg': ma_avg,
+            'spread_percent': spread,
+            'is_convergent': is_convergent,
+            'position': position
+        }
+    
+    def compute_klines(
+        self,
+        klines_by_symbol: Dict[str, Any],
+        symbols: Optional[List[str]] = None,
+        max_bars: Optional[int] = None,
+        ema_state: Optional[BatchEMAState] = None
+    ) -> BatchIndicatorResult:
+        """
+        从K线字典直接计算（见 build_matrix 和 compute）
+        
+        Args:
+            klines_by_symbol: {交易对: K线}
+            symbols: 交易对顺序
+            max_bars: 每个交易对最多使用的K线数量
+            ema_state: EMA 流式状态（会被更新），None 时 EMA 按传入的K线窗口计算
+            
+        Returns:
+            BatchIndicatorResult（只包含有K线数据的交易对）
+        """
+        names, bars_list = self._decode_all(klines_by_symbol, symbols, max_bars)
+        matrix, lengths = self._stack([bars['close'] for bars in bars_list])
+        emas = self._streaming_emas(ema_state, names, bars_list) if ema_state is not None else None
+        return self.compute(names, matrix, lengths, emas)
+    
+    def _streaming_emas(
+        self,
+        state: BatchEMAState,
+        names: List[str],
+        bars_list: List[np.ndarray]
+    ) -> Dict[str, np.ndarray]:
+        """
+        把新收盘的K线计入流式 EMA 状态，返回计入最后一根K线之后的 EMA
+        
+        新收盘的K线排成右对齐矩阵，每个周期一次矩阵-向量乘法：
+        ema = (1-a)^k * 上次的 EMA + sum(a * (1-a)^(k-1-i) * x[i])，k 为新收盘的K线数量；
+        没有状态的交易对以第一根新K线作为初始值（与 _ema 相同）
+        """
+        rows = len(names)
+        new_matrix, new_lengths = self._stack([
+            state.new_closed(symbol, bars) for symbol, bars in zip(names, bars_list)
+        ])
+        filled = np.nan_to_num(new_matrix, nan=0.0)
+        width = filled.shape[1]
+        
+        count = np.array([state.count.get(symbol, 0) for symbol in names], dtype=np.int64)
+        previous = np.array([
+            state.ema.get(symbol, np.zeros(len(self.ema_periods))) for symbol in names
+        ]).reshape(rows, len(self.ema_periods))
+        last_close = np.array([float(bars['close'][-1]) for bars in bars_list])
+        new_count = count + new_lengths
+        
+        closed = np.zeros((rows, len(self.ema_periods)))
+        emas: Dict[str, np.ndarray] = {}
+        for j, period in enumerate(self.ema_periods):
+            alpha = 2.0 / (period + 1)
+            
+            values = np.zeros(rows)
+            if width:
+                weights, decay = self._weights(period, width)
+                values = filled @ weights
+                
+                # 没有状态的交易对：第一根新K线的系数补到 (1-a)^(k-1)
+                seeded = np.nonzero((count == 0) & (new_lengths > 0))[0]
+                starts = width - new_lengths[seeded]
+                values[seeded] += filled[seeded, starts] * (decay[starts] - weights[starts])
+            
+            # 已有状态的交易对：上次的 EMA 衰减 k 次
+            carried = count > 0
+            values[carried] += previous[carried, j] * (1 - alpha) ** new_lengths[carried]
+            closed[:, j] = values
+            
+            # 计入最后一根K线（与 StreamingEMA.peek 相同）
+            current = np.where(new_count > 0, (1 - alpha) * values + alpha * last_close, last_close)
+            emas[f'ema_{period}'] = np.where(new_count + 1 >= period, current, 0.0)
+        
+        for i, symbol in enumerate(names):
+            state.count[symbol] = int(new_count[i])
+            state.ema[symbol] = closed[i]
+        
+        return emas
+    
+    def _ema(self, filled: np.ndarray, lengths: np.ndarray, period: int) -> np.ndarray:
+        """
+        每行最后一个 EMA 值
+        
+        y = (1-a)^(n-1) * x[s] + sum(a * (1-a)^(n-1-i) * x[i], i > s)，s 为第一个有效下标：
+        先对整行乘以 a * (1-a)^(n-1-i)（缺失部分为 0），再把第一个有效值的系数补到 (1-a)^(n-1-s)
+        """
+        width = filled.shape[1]
+        weights, decay = self._weights(period, width)
+        
+        values = filled @ weights
+        
+        starts = width - lengths
+        has_data = lengths > 0
+        rows = np.nonzero(has_data)[0]
+        first = filled[rows, starts[rows]]
+        values[rows] += first * (decay[starts[rows]] - weights[starts[rows]])
+        
+        return values
+    
+    def _weights(self, period: int, width: int) -> Tuple[np.ndarray, np.ndarray]:
+        """EMA 权重 a * (1-a)^(n-1-i) 和衰减系数 (1-a)^(n-1-i)"""
+        key = (period, width)
+        if key not in self._ema_weights:
+            alpha = 2.0 / (period + 1)
+            decay = (1 - alpha) ** np.arange(width - 1, -1, -1, dtype=np.float64)
+            self._ema_weights[key] = (alpha * decay, decay)
+        return self._ema_weights[key]
@@ -3,9 +3,13 @@
 """
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
+import threading
 import time
 
 from .indicators import TechnicalIndicators
+from .streaming_indicators import MovingAverageSet
+from .batch_indicators import BatchIndicatorEngine, BatchEMAState
+from ..market.kline_decoder import decode_klines
 from ..utils.logger import get_logger
 
 
@@ -17,7 +21,8 @@ class DoubleMaStrategy:
         sma_periods: List[int] = [20, 60, 120],
         ema_periods: List[int] = [20, 60, 120],
         convergence_threshold: float = 2.0,
-        breakout_confirmation_minutes: int = 30
+        breakout_confirmation_minutes: int = 30,
+        streaming_ema: bool = False
     ):
         """
         初始化策略
@@ -27,48 +32,79 @@ class DoubleMaStrategy:
             ema_periods: EMA 周期列表
             convergence_threshold: 均线密集阈值（百分比）
             breakout_confirmation_minutes: 突破确认时间（分钟）
+            streaming_ema: EMA 是否使用流式状态（覆盖第一次分析以来的全部历史）；
+                默认 False，与原实现和回测一样只按传入的K线窗口计算
         """
         self.sma_periods = sma_periods
         self.ema_periods = ema_periods
         self.convergence_threshold = convergence_threshold
         self.breakout_confirmation_minutes = breakout_confirmation_minutes
+        self.streaming_ema = streaming_ema
         self.logger = get_logger()
         
         # 存储每个交易对的状态
         self.symbol_states = {}
+        
+        # 每个交易对一把锁：多个交易对可以并发分析，同一交易对的状态更新串行
+        self._symbol_locks: Dict[str, threading.RLock] = {}
+        self._locks_guard = threading.Lock()
+        
+        # 每个 (交易对, K线间隔) 的流式均线，只处理新收盘的K线（streaming_ema 时使用）
+        self._ma_sets: Dict[Tuple[str, str], MovingAverageSet] = {}
+        
+        # 多交易对批量计算（streaming_ema 时 EMA 按K线间隔保存流式状态，与 analyze 的语义相同）
+        self.engine = BatchIndicatorEngine(sma_periods, ema_periods, convergence_threshold)
+        self._ema_states: Dict[str, BatchEMAState] = {}
+        self._batch_lock = threading.Lock()
     
     def analyze(
         self,
         symbol: str,
-        klines: List[List],
-        interval: str
+        klines,
+        interval: str,
+        now: Optional[datetime] = None
     ) -> Dict[str, Any]:
         """
         分析交易信号
         
         Args:
             symbol: 交易对符号
-            klines: K线数据
+            klines: K线数据（REST 格式的列表或 decode_klines 返回的结构化数组）
             interval: K线间隔
+            now: 当前时间，默认 datetime.now()（回测时传入K线时间）
             
         Returns:
             分析结果
         """
-        # 解析K线数据
-        parsed_data = TechnicalIndicators.parse_klines(klines)
+        # 解码为结构化数组（已解码的数组直接使用）
+        bars = decode_klines(klines)
         
-        if not parsed_data['close']:
+        if len(bars) == 0:
             self.logger.warning(f"{symbol} 没有K线数据")
             return self._create_signal('HOLD', 0, "无K线数据")
         
+        with self._symbol_lock(symbol):
+            return self._analyze_locked(symbol, interval, bars, now)
+    
+    def _analyze_locked(self, symbol: str, interval: str, bars, now: Optional[datetime]) -> Dict[str, Any]:
+        """analyze 的主体（持有该交易对的锁）"""
+        close_prices = bars['close']
+        
         # 计算所有均线
-        ma_data = TechnicalIndicators.calculate_all_mas(
-            parsed_data['close'],
-            self.sma_periods,
-            self.ema_periods
-        )
+        if self.streaming_ema:
+            # 增量更新，最后一根K线可能尚未收盘，只预览不提交
+            key = (symbol, interval)
+            if key not in self._ma_sets:
+                self._ma_sets[key] = MovingAverageSet(self.sma_periods, self.ema_periods)
+            ma_data = self._ma_sets[key].sync(bars['open_time'], close_prices)
+        else:
+            ma_data = TechnicalIndicators.calculate_all_mas(
+                close_prices,
+                self.sma_periods,
+                self.ema_periods
+            )
         
-        current_price = parsed_data['close'][-1]
+        current_price = float(close_prices[-1])
         
         # 获取所有均线值
         all_ma_values = [v for v in ma_data.values() if v > 0]
@@ -92,6 +128,128 @@ class DoubleMaStrategy:
             all_ma_values
         )
         
+        return self._evaluate(
+            symbol,
+            interval,
+            close_prices,
+            ma_data,
+            current_price,
+            ma_avg,
+            is_convergent,
+            price_position,
+            now
+        )
+    
+    def analyze_batch(
+        self,
+        klines_by_symbol: Dict[str, Any],
+        interval: str,
+        symbols: Optional[List[str]] = None,
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        批量分析多个交易对
+        
+        所有交易对的均线、密集度和价格位置由 BatchIndicatorEngine 一次向量化计算，
+        EMA 与 analyze 的口径相同：默认按传入的K线窗口计算，streaming_ema 时是覆盖第一次计算
+        以来全部历史的流式状态（每个K线间隔一份），同一组K线窗口在两种执行模式下得到相同的信号；
+        之后逐个交易对更新状态并生成信号。
+        
+        Args:
+            klines_by_symbol: {交易对: K线数据}，值可以是获取失败时的异常对象
+            interval: K线间隔
+            symbols: 交易对顺序，默认为 klines_by_symbol 的键
+            now: 当前时间，默认 datetime.now()
+            
+        Returns:
+            {交易对: 分析结果}，K线获取失败的交易对对应原异常对象
+        """
+        symbols = list(symbols) if symbols is not None else list(klines_by_symbol)
+        with self._batch_lock:
+            ema_state = self._ema_states.setdefault(interval, BatchEMAState()) if self.streaming_ema else None
+            batch = self.engine.compute_klines(klines_by_symbol, symbols, ema_state=ema_state)
+        
+        results = {}
+        for symbol in symbols:
+            klines = klines_by_symbol.get(symbol)
+            if isinstance(klines, Exception):
+                results[symbol] = klines
+                continue
+            
+            if symbol not in batch:
+                self.logger.warning(f"{symbol} 没有K线数据")
+                results[symbol] = self._create_signal('HOLD', 0, "无K线数据")
+                continue
+            
+            indicators = batch.for_symbol(symbol)
+            if indicators['ma_avg'] <= 0:
+                self.logger.warning(f"{symbol} 无法计算均线")
+                results[symbol] = self._create_signal('HOLD', 0, "无法计算均线")
+                continue
+            
+            results[symbol] = self._evaluate(
+                symbol,
+                interval,
+                batch.closes(symbol),
+                indicators['ma_data'],
+                indicators['current_price'],
+                indicators['ma_avg'],
+                indicators['is_convergent'],
+                indicators['price_position'],
+                now
+            )
+        
+        return results
+    
+    def _evaluate(
+        self,
+        symbol: str,
+        interval: str,
+        close_prices,
+        ma_data: Dict[str, float],
+        current_price: float,
+        ma_avg: float,
+        is_convergent: bool,
+        price_position: str,
+        now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        根据指标更新交易对状态并生成信号
+        
+        Args:
+            symbol: 交易对符号
+            interval: K线间隔
+            close_prices: 收盘价（从旧到新）
+            ma_data: 所有均线值
+            current_price: 当前价格
+            ma_avg: 有效均线的平均值
+            is_convergent: 是否密集
+            price_position: 价格位置
+            now: 当前时间，默认 datetime.now()
+            
+        Returns:
+            分析结果
+        """
+        now = now or datetime.now()
+        
+        with self._symbol_lock(symbol):
+            return self._evaluate_locked(
+                symbol, interval, close_prices, ma_data, current_price, ma_avg, is_convergent, price_position, now
+            )
+    
+    def _evaluate_locked(
+        self,
+        symbol: str,
+        interval: str,
+        close_prices,
+        ma_data: Dict[str, float],
+        current_price: float,
+        ma_avg: float,
+        is_convergent: bool,
+        price_position: str,
+        now: datetime
+    ) -> Dict[str, Any]:
+        """_evaluate 的主体（持有该交易对的锁）"""
         # 获取或创建该交易对的状态
         if symbol not in self.symbol_states:
             self.symbol_states[symbol] = {
@@ -105,7 +263,7 @@ class DoubleMaStrategy:
         
         # 记录均线密集时间
         if is_convergent and state['last_convergence_time'] is None:
-            state['last_convergence_time'] = datetime.now()
+            state['last_convergence_time'] = now
             self.logger.info(f"{symbol} 均线密集，平均值: {ma_avg:.6f}")
         
         # 如果均线不密集，重置密集时间
@@ -118,12 +276,13 @@ class DoubleMaStrategy:
         signal = self._generate_signal(
             symbol,
             current_price,
-            parsed_data['close'],
+            close_prices,
             ma_avg,
             is_convergent,
             price_position,
             state,
-            interval
+            interval,
+            now
         )
         
         # 添加额外信息
@@ -143,7 +302,8 @@ class DoubleMaStrategy:
         is_convergent: bool,
         price_position: str,
         state: Dict[str, Any],
-        interval: str
+        interval: str,
+        now: Optional[datetime] = None
     ) -> Dict[str, Any]:
         """
         生成交易信号
@@ -157,11 +317,12 @@ class DoubleMaStrategy:
             price_position: 价格位置
             state: 交易对状态
             interval: K线间隔
+            now: 当前时间，默认 datetime.now()
             
         Returns:
             交易信号
         """
-        now = datetime.now()
+        now = now or datetime.now()
         
         # 如果有持仓，检查平仓条件
         if state['position']:
@@ -266,6 +427,14 @@ class DoubleMaStrategy:
         # 默认持有
         return self._create_signal('HOLD', 50, "等待交易信号")
     
+    def _symbol_lock(self, symbol: str) -> threading.RLock:
+        """获取交易对的锁（不存在时创建）"""
+        lock = self._symbol_locks.get(symbol)
+        if lock is None:
+            with self._locks_guard:
+                lock = self._symbol_locks.setdefault(symbol, threading.RLock())
+        return lock
+    
     def _get_confirmation_bars(self, interval: str, minutes: int) -> int:
         """
         根据K线间隔计算确认所需的K线数量
@@ -314,14 +483,15 @@ class DoubleMaStrategy:
         Args:
             symbol: 交易对符号
         """
-        if symbol in self.symbol_states:
-            self.symbol_states[symbol] = {
-                'last_convergence_time': None,
-                'breakout_direction': None,
-                'breakout_time': None,
-                'position': None
-            }
-            self.logger.info(f"重置 {symbol} 状态")
+        with self._symbol_lock(symbol):
+            if symbol in self.symbol_states:
+                self.symbol_states[symbol] = {
+                    'last_convergence_time': None,
+                    'breakout_direction': None,
+                    'breakout_time': None,
+                    'position': None
+                }
+                self.logger.info(f"重置 {symbol} 状态")
     
     def get_symbol_state(self, symbol: str) -> Optional[Dict[str, Any]]:
         """
@@ -331,6 +501,8 @@ class DoubleMaStrategy:
             symbol: 交易对符号
             
         Returns:
-            状态字典
+            状态字典（副本）
         """
-        return self.symbol_states.get(symbol)
+        with self._symbol_lock(symbol):
+            state = self.symbol_states.get(symbol)
+            return dict(state) if state is not None else None
@@ -5,6 +5,9 @@ import numpy as np
 import pandas as pd
 from typing import List, Tuple, Dict, Any
 
+from ..market.kline_decoder import decode_klines
+from .streaming_indicators import MovingAverageSet
+
 
 class TechnicalIndicators:
     """技术指标计算类"""
@@ -63,17 +66,10 @@ class TechnicalIndicators:
         Returns:
             包含所有均线值的字典
         """
-        result = {}
-        
-        # 计算 SMA
-        for period in sma_periods:
-            result[f'sma_{period}'] = TechnicalIndicators.sma(close_prices, period)
-        
-        # 计算 EMA
-        for period in ema_periods:
-            result[f'ema_{period}'] = TechnicalIndicators.ema(close_prices, period)
-        
-        return result
+        # 所有均线在同一次遍历中更新，结果与逐个调用 sma/ema 相同
+        ma_set = MovingAverageSet(sma_periods, ema_periods)
+        ma_set.seed(np.asarray(close_prices, dtype=np.float64).tolist())
+        return ma_set.values()
     
     @staticmethod
     def check_ma_convergence(
@@ -244,51 +240,19 @@ class TechnicalIndicators:
         return float(atr) if not pd.isna(atr) else 0.0
     
     @staticmethod
-    def parse_klines(klines: List[List]) -> Dict[str, List[float]]:
+    def parse_klines(klines: List[List]) -> Dict[str, np.ndarray]:
         """
         解析K线数据
         
         Args:
-            klines: K线数据列表
+            klines: K线数据列表，或 decode_klines 返回的结构化数组
             
         Returns:
-            解析后的数据字典
+            解析后的数据字典（值为结构化数组的列视图，不复制数据）
         """
-        # K线数据格式：
-        # [
-        #   [
-        #     1499040000000,      // 开盘时间
-        #     "0.01634000",       // 开盘价
-        #     "0.80000000",       // 最高价
-        #     "0.01575800",       // 最低价
-        #     "0.01577100",       // 收盘价
-        #     "148976.11427815",  // 成交量
-        #     1499644799999,      // 收盘时间
-        #     "2434.19055334",    // 成交额
-        #     308,                // 成交笔数
-        #     "1756.87402397",    // 主动买入成交量
-        #     "28.46694368",      // 主动买入成交额
-        #     "17928899.62484339" // 请忽略该参数
-        #   ]
-        # ]
-        
-        if not klines:
-            return {
-                'open_time': [],
-                'open': [],
-                'high': [],
-                'low': [],
-                'close': [],
-                'volume': [],
-                'close_time': []
-            }
+        bars = decode_klines(klines)
         
         return {
-            'open_time': [int(k[0]) for k in klines],
-            'open': [float(k[1]) for k in klines],
-            'high': [float(k[2]) for k in klines],
-            'low': [float(k[3]) for k in klines],
-            'close': [float(k[4]) for k in klines],
-            'volume': [float(k[5]) for k in klines],
-            'close_time': [int(k[6]) for k in klines]
+            name: bars[name]
+            for name in ('open_time', 'open', 'high', 'low', 'close', 'volume', 'close_time')
         }
@@ -0,0 +1,306 @@
+"""
+流式技术指标模块
+
+每个指标保存自己的状态，每根已收盘K线 O(1) 更新；可以先用历史数据初始化（seed），
+再逐根更新。peek() 在不修改状态的情况下计算“追加一个值之后”的结果，
+用于把尚未收盘的最后一根K线计入指标。
+
+未满周期时返回 0.0，与 TechnicalIndicators 中对应函数的约定一致。
+"""
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+
+class StreamingSMA:
+    """简单移动平均（环形缓冲区 + 滚动求和）"""
+    
+    __slots__ = ('period', '_buffer', '_index', '_count', '_sum', '_updates')
+    
+    def __init__(self, period: int):
+        """
+        Args:
+            period: 周期
+        """
+        if period <= 0:
+            raise ValueError(f"周期必须为正数: {period}")
+        
+        self.period = period
+        self._buffer = [0.0] * period
+        self._index = 0
+        self._count = 0
+        self._sum = 0.0
+        self._updates = 0
+    
+    def update(self, value: float) -> float:
+        """
+        追加一个值
+        
+        Args:
+            value: 新值
+            
+        Returns:
+            当前 SMA（未满周期时为 0.0）
+        """
+        value = float(value)
+        oldest = self._buffer[self._index]
+        self._buffer[self._index] = value
+        self._index = (self._index + 1) % self.period
+        
+        if self._count < self.period:
+            self._count += 1
+            self._sum += value
+        else:
+            self._sum += value - oldest
+        
+        # 定期重新求和，消除滚动加减累积的浮点误差（均摊 O(1)）
+        self._updates += 1
+        if self._updates % self.period == 0:
+            self._sum = sum(self._buffer[:self._count])
+        
+        return self.value
+    
+    def peek(self, value: float) -> float:
+        """
+        计算追加 value 之后的 SMA（不修改状态）
+        
+        Args:
+            value: 假设追加的值
+            
+        Returns:
+            SMA（未满周期时为 0.0）
+        """
+        if self._count + 1 < self.period:
+            return 0.0
+        if self._count < self.period:
+            return (self._sum + value) / self.period
+        return (self._sum - self._buffer[self._index] + value) / self.period
+    
+    @property
+    def value(self) -> float:
+        """当前 SMA（未满周期时为 0.0）"""
+        if self._count < self.period:
+            return 0.0
+        return self._sum / self.period
+    
+    @property
+    def count(self) -> int:
+        """已处理的值数量（最多为周期长度）"""
+        return self._count
+
+
+class StreamingEMA:
+    """
+    指数移动平均
+    
+    与 pandas ewm(span=period, adjust=False) 相同：第一个值作为初始值，
+    之后 ema = ema + alpha * (value - ema)，alpha = 2 / (period + 1)
+    """
+    
+    __slots__ = ('period', 'alpha', '_ema', '_count')
+    
+    def __init__(self, period: int):
+        """
+        Args:
+            period: 周期（span）
+        """
+        if period <= 0:
+            raise ValueError(f"周期必须为正数: {period}")
+        
+        self.period = period
+        self.alpha = 2.0 / (period + 1)
+        self._ema = 0.0
+        self._count = 0
+    
+    def update(self, value: float) -> float:
+        """
+        追加一个值
+        
+        Args:
+            value: 新值
+            
+        Returns:
+            当前 EMA（处理的值少于周期时为 0.0）
+        """
+        value = float(value)
+        if self._count == 0:
+            self._ema = value
+        else:
+            self._ema = (1 - self.alpha) * self._ema + self.alpha * value
+        self._count += 1
+        
+        return self.value
+    
+    def peek(self, value: float) -> float:
+        """计算追加 value 之后的 EMA（不修改状态）"""
+        if self._count + 1 < self.period:
+            return 0.0
+        if self._count == 0:
+            return float(value)
+        return (1 - self.alpha) * self._ema + self.alpha * value
+    
+    @property
+    def value(self) -> float:
+        """当前 EMA（处理的值少于周期时为 0.0）"""
+        if self._count < self.period:
+            return 0.0
+        return self._ema
+    
+    @property
+    def count(self) -> int:
+        """已处理的值数量"""
+        return self._count
+
+
+class StreamingATR:
+    """
+    平均真实波幅（真实波幅的简单移动平均）
+    
+    与 TechnicalIndicators.calculate_atr 相同：第一根K线的真实波幅为 high - low，
+    至少需要 period + 1 根K线才返回非零值
+    """
+    
+    __slots__ = ('period', '_tr', '_prev_close', '_count')
+    
+    def __init__(self, period: int = 14):
+        """
+        Args:
+            period: 周期
+        """
+        self.period = period
+        self._tr = StreamingSMA(period)
+        self._prev_close: Optional[float] = None
+        self._count = 0
+    
+    def _true_range(self, high: float, low: float) -> float:
+        if self._prev_close is None:
+            return high - low
+        return max(high - low, abs(high - self._prev_close), abs(low - self._prev_close))
+    
+    def update(self, high: float, low: float, close: float) -> float:
+        """
+        追加一根K线
+        
+        Args:
+            high: 最高价
+            low: 最低价
+            close: 收盘价
+            
+        Returns:
+            当前 ATR（K线不足 period + 1 根时为 0.0）
+        """
+        high, low = float(high), float(low)
+        self._tr.update(self._true_range(high, low))
+        self._prev_close = float(close)
+        self._count += 1
+        
+        return self.value
+    
+    def peek(self, high: float, low: float, close: float) -> float:
+        """计算追加一根K线之后的 ATR（不修改状态）"""
+        if self._count + 1 < self.period + 1:
+            return 0.0
+        return self._tr.peek(self._true_range(float(high), float(low)))
+    
+    @property
+    def value(self) -> float:
+        """当前 ATR（K线不足 period + 1 根时为 0.0）"""
+        if self._count < self.period + 1:
+            return 0.0
+        return self._tr.value
+
+
+class MovingAverageSet:
+    """
+    一组 SMA/EMA（结果的键与 TechnicalIndicators.calculate_all_mas 相同）
+    
+    按 (交易对, 周期) 各保存一份；sync() 根据开盘时间只处理新收盘的K线。
+    """
+    
+    __slots__ = ('smas', 'emas', 'last_open_time')
+    
+    def __init__(self, sma_periods: Iterable[int], ema_periods: Iterable[int]):
+        """
+        Args:
+            sma_periods: SMA 周期列表
+            ema_periods: EMA 周期列表
+        """
+        self.smas = {period: StreamingSMA(period) for period in sma_periods}
+        self.emas = {period: StreamingEMA(period) for period in ema_periods}
+        self.last_open_time: Optional[int] = None
+    
+    def reset(self):
+        """清空状态"""
+        self.smas = {period: StreamingSMA(period) for period in self.smas}
+        self.emas = {period: StreamingEMA(period) for period in self.emas}
+        self.last_open_time = None
+    
+    def seed(self, values: Iterable[float]):
+        """
+        用历史收盘价初始化（从旧到新）
+        
+        Args:
+            values: 收盘价序列
+        """
+        for value in values:
+            self.update(value)
+    
+    def update(self, value: float):
+        """追加一个已收盘的收盘价"""
+        for sma in self.smas.values():
+            sma.update(value)
+        for ema in self.emas.values():
+            ema.update(value)
+    
+    def values(self) -> Dict[str, float]:
+        """当前所有均线值"""
+        result = {f'sma_{period}': sma.value for period, sma in self.smas.items()}
+        result.update({f'ema_{period}': ema.value for period, ema in self.emas.items()})
+        return result
+    
+    def peek_values(self, value: float) -> Dict[str, float]:
+        """追加 value（例如未收盘K线的最新价）之后的所有均线值（不修改状态）"""
+        result = {f'sma_{period}': sma.peek(value) for period, sma in self.smas.items()}
+        result.update({f'ema_{period}': ema.peek(value) for period, ema in self.emas.items()})
+        return result
+    
+    def sync(self, open_times: np.ndarray, closes: np.ndarray) -> Dict[str, float]:
+        """
+        用最新的K线窗口更新状态并返回均线值
+        
+        除最后一根外的K线视为已收盘，只处理开盘时间晚于上次同步的部分；
+        最后一根K线（可能尚未收盘）只通过 peek 计入结果。
+        窗口与已处理的数据不连续（例如第一次调用或中间缺失K线）时用整个窗口重新初始化。
+        
+        Args:
+            open_times: 开盘时间数组（从旧到新）
+            closes: 收盘价数组
+            
+        Returns:
+            所有均线值
+        """
+        if len(closes) == 0:
+            return self.values()
+        
+        closed_times = open_times[:-1]
+        closed_values = closes[:-1]
+        
+        start = None
+        if self.last_open_time is not None:
+            # 窗口中必须包含上次处理到的K线，否则无法保证连续
+            index = int(np.searchsorted(closed_times, self.last_open_time))
+            if index < len(closed_times) and closed_times[index] == self.last_open_time:
+                start = index + 1
+        
+        if start is None:
+            self.reset()
+            start = 0
+        
+        for value in closed_values[start:].tolist():
+            self.update(value)
+        
+        if len(closed_times):
+            self.last_open_time = int(closed_times[-1])
+        
+        return self.peek_values(float(closes[-1]))
+
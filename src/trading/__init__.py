@@ -3,16 +3,35 @@
 """
 from .trader import Trader
 from .risk_manager import RiskManager
+from .account_state import AccountStateService
+from .exchange_info import ExchangeInfoService, SymbolRules
 from .manual_order_handler import ManualOrderHandler, ManualOrder, OrderSide, OrderSource, ManualPosition
 from .manual_order_api import ManualOrderAPIServer
+from .symbol_pipeline import SymbolPipeline, SymbolTimer
+from .protective_orders import ProtectiveOrderManager, ProtectiveOrders
+from .trigger_index import TriggerIndex, Trigger
+from .trailing_stop import TrailingStopEngine, StopRecord
+from .order_queue import OrderQueue
 
 __all__ = [
     'Trader', 
     'RiskManager',
+    'AccountStateService',
+    'ExchangeInfoService',
+    'SymbolRules',
     'ManualOrderHandler',
     'ManualOrder',
     'OrderSide',
     'OrderSource',
     'ManualPosition',
-    'ManualOrderAPIServer'
+    'ManualOrderAPIServer',
+    'SymbolPipeline',
+    'SymbolTimer',
+    'ProtectiveOrderManager',
+    'ProtectiveOrders',
+    'TriggerIndex',
+    'Trigger',
+    'TrailingStopEngine',
+    'StopRecord',
+    'OrderQueue'
 ]
@@ -0,0 +1,344 @@
+"""
+账户状态服务模块
+
+通过用户数据流（listenKey）接收余额、持仓和订单推送，在内存中维护一致的账户快照，
+并定期通过 REST 对账。交易器和风险管理器读取本地快照，无需每次下单前请求余额和持仓。
+"""
+import copy
+import threading
+import time
+from typing import Dict, Any, List, Optional, Callable
+
+from ..api.ws_stream import WebSocketStream
+from ..utils.logger import get_logger
+
+
+# 仍在挂单簿中的订单状态
+_OPEN_ORDER_STATUSES = ('NEW', 'PARTIALLY_FILLED')
+
+
+class AccountStateService(WebSocketStream):
+    """账户状态服务（用户数据流 + 定期对账）"""
+    
+    def __init__(
+        self,
+        client,
+        ws_url: str = 'wss://fstream.asterdex.com',
+        keepalive_interval: float = 1800,
+        reconcile_interval: float = 60,
+        max_snapshot_age: float = 300
+    ):
+        """
+        初始化账户状态服务
+        
+        Args:
+            client: AsterDexClient 实例
+            ws_url: WebSocket 基础地址
+            keepalive_interval: listenKey 续期间隔（秒）
+            reconcile_interval: REST 对账间隔（秒）
+            max_snapshot_age: 快照超过该时间未对账视为不可用（秒）
+        """
+        super().__init__(name='UserDataStream')
+        
+        self.client = client
+        self.ws_url = ws_url.rstrip('/')
+        self.keepalive_interval = keepalive_interval
+        self.reconcile_interval = reconcile_interval
+        self.max_snapshot_age = max_snapshot_age
+        self.logger = get_logger()
+        
+        self.listen_key: Optional[str] = None
+        self.last_reconcile_time: Optional[float] = None
+        self.last_event_time: Optional[int] = None
+        
+        self._lock = threading.RLock()
+        self._balances: Dict[str, Dict[str, Any]] = {}
+        self._positions: Dict[tuple, Dict[str, Any]] = {}
+        self._open_orders: Dict[int, Dict[str, Any]] = {}
+        
+        # 每个交易对最近一次已知的杠杆（对账和 ACCOUNT_CONFIG_UPDATE 更新），新开的持仓据此填充
+        self._leverage: Dict[str, str] = {}
+        self._reconcile_requested = False
+        
+        # 订单推送回调（止损 / 止盈单成交后撤销另一笔）
+        self._order_listeners: List[Callable[[Dict[str, Any]], None]] = []
+        
+        # 推送不含可用余额，余额变化后尽快通过 REST 刷新（也用于唤醒维护线程立即对账）
+        self._balance_dirty = threading.Event()
+        # 余额变化次数和最近一次 REST 刷新覆盖到的次数，两者不等时本地可用余额已过期
+        self._balance_updates = 0
+        self._balance_loaded = 0
+        self._maintenance_thread: Optional[threading.Thread] = None
+    
+    # ==================== 生命周期 ====================
+    
+    def start(self):
+        """启动用户数据流和维护线程（续期、对账）"""
+        super().start()
+        
+        self._maintenance_thread = threading.Thread(
+            target=self._maintenance_loop,
+            daemon=True,
+            name="AccountStateMaintenance"
+        )
+        self._maintenance_thread.start()
+    
+    def stop(self):
+        """停止用户数据流并关闭 listenKey"""
+        super().stop()
+        
+        self._balance_dirty.set()
+        if self._maintenance_thread:
+            self._maintenance_thread.join(timeout=5)
+        
+        if self.listen_key:
+            try:
+                self.client.close_user_stream()
+            except Exception as e:
+                self.logger.warning(f"关闭 listenKey 失败: {e}")
+            self.listen_key = None
+    
+    async def _prepare(self):
+        """连接前申请 listenKey"""
+        result = await self._run_blocking(self.client.start_user_stream)
+        self.listen_key = result['listenKey']
+    
+    def _build_url(self) -> str:
+        return f"{self.ws_url}/ws/{self.listen_key}"
+    
+    async def _on_connect(self):
+        """连接后立即对账，补上断线期间的变化"""
+        await self._run_blocking(self.reconcile)
+    
+    def _maintenance_loop(self):
+        """定期续期 listenKey、对账，并在余额变化后刷新可用余额"""
+        last_keepalive = time.time()
+        
+        while self.is_running:
+            balance_dirty = self._balance_dirty.wait(timeout=1)
+            if not self.is_running:
+                break
+            
+            now = time.time()
+            
+            try:
+                if self.listen_key and now - last_keepalive >= self.keepalive_interval:
+                    self.client.keepalive_user_stream()
+                    last_keepalive = now
+                
+                if (
+                    self._reconcile_requested
+                    or self.last_reconcile_time is None
+                    or now - self.last_reconcile_time >= self.reconcile_interval
+                ):
+                    self.reconcile()
+                elif balance_dirty:
+                    self._balance_dirty.clear()
+                    self.refresh_balance()
+                    
+            except Exception as e:
+                self.logger.error(f"账户状态维护失败: {e}")
+                time.sleep(1)
+    
+    # ==================== REST 对账 ====================
+    
+    def reconcile(self):
+        """通过 REST 重新加载余额、持仓和挂单"""
+        self._reconcile_requested = False
+        updates = self._balance_updates
+        balances = self.client.get_balance()
+        positions = self.client.get_position_info()
+        open_orders = self.client.get_open_orders()
+        
+        with self._lock:
+            self._load_balances(balances, updates)
+            
+            self._positions = {}
+            for pos in positions:
+                self._positions[(pos['symbol'], pos.get('positionSide', 'BOTH'))] = dict(pos)
+                if 'leverage' in pos:
+                    self._leverage[pos['symbol']] = str(pos['leverage'])
+            
+            self._open_orders = {int(order['orderId']): dict(order) for order in open_orders}
+            self.last_reconcile_time = time.time()
+        
+        self._balance_dirty.clear()
+    
+    def refresh_balance(self):
+        """通过 REST 刷新余额（含可用余额）"""
+        updates = self._balance_updates
+        self._load_balances(self.client.get_balance(), updates)
+    
+    def _load_balances(self, balances: List[Dict[str, Any]], updates: int):
+        with self._lock:
+            self._balances = {item['asset']: dict(item) for item in balances}
+            # 请求期间又有余额变化时仍视为过期
+            self._balance_loaded = max(self._balance_loaded, updates)
+    
+    def _mark_balance_dirty(self):
+        """余额已变化，本地可用余额在下次 REST 刷新前不可信"""
+        with self._lock:
+            self._balance_updates += 1
+        self._balance_dirty.set()
+    
+    # ==================== 推送处理 ====================
+    
+    def _on_message(self, message: Dict[str, Any]):
+        """处理用户数据流推送"""
+        event = message.get('e')
+        
+        if event == 'ACCOUNT_UPDATE':
+            self._apply_account_update(message)
+        elif event == 'ORDER_TRADE_UPDATE':
+            self._apply_order_update(message['o'])
+            for listener in self._order_listeners:
+                try:
+                    listener(message['o'])
+                except Exception as e:
+                    self.logger.error(f"订单推送回调出错: {e}")
+        elif event == 'ACCOUNT_CONFIG_UPDATE':
+            self._apply_config_update(message)
+        elif event == 'listenKeyExpired':
+            self.logger.warning("listenKey 已过期，重新连接用户数据流")
+            self.reconnect()
+            return
+        
+        if 'E' in message:
+            self.last_event_time = int(message['E'])
+    
+    def _apply_account_update(self, message: Dict[str, Any]):
+        """余额和持仓变化"""
+        update = message.get('a', {})
+        
+        with self._lock:
+            for item in update.get('B', []):
+                balance = self._balances.setdefault(item['a'], {'asset': item['a']})
+                balance['balance'] = item['wb']
+                balance['crossWalletBalance'] = item.get('cw', balance.get('crossWalletBalance'))
+            
+            for item in update.get('P', []):
+                key = (item['s'], item.get('ps', 'BOTH'))
+                position = self._positions.get(key)
+                if position is None:
+                    position = self._positions[key] = {
+                        'symbol': item['s'],
+                        'positionSide': item.get('ps', 'BOTH')
+                    }
+                    leverage = self._leverage.get(item['s'])
+                    if leverage is not None:
+                        position['leverage'] = leverage
+                    else:
+                        # 没有该交易对的杠杆记录，尽快通过 REST 对账补上
+                        self._reconcile_requested = True
+                position['positionAmt'] = item['pa']
+                position['entryPrice'] = item['ep']
+                position['unRealizedProfit'] = item['up']
+                if 'mt' in item:
+                    position['marginType'] = 'isolated' if item['mt'] == 'isolated' else 'cross'
+                if 'iw' in item:
+                    position['isolatedWallet'] = item['iw']
+                
+                # 推送不含名义价值，用最近的标记价格（没有则用开仓价）估算
+                price = float(position.get('markPrice') or item['ep'] or 0)
+                position['notional'] = str(float(item['pa']) * price)
+        
+        if update.get('B'):
+            self._mark_balance_dirty()
+        elif self._reconcile_requested:
+            self._balance_dirty.set()
+    
+    def _apply_order_update(self, order: Dict[str, Any]):
+        """订单状态变化"""
+        order_id = int(order['i'])
+        
+        with self._lock:
+            if order.get('X') in _OPEN_ORDER_STATUSES:
+                self._open_orders[order_id] = {
+                    'orderId': order_id,
+                    'symbol': order['s'],
+                    'clientOrderId': order.get('c'),
+                    'side': order.get('S'),
+                    'type': order.get('o'),
+                    'origQty': order.get('q'),
+                    'price': order.get('p'),
+                    'stopPrice': order.get('sp'),
+                    'executedQty': order.get('z'),
+                    'status': order.get('X'),
+                    'reduceOnly': order.get('R', False),
+                    'positionSide': order.get('ps', 'BOTH'),
+                    'updateTime': order.get('T')
+                }
+            else:
+                self._open_orders.pop(order_id, None)
+        
+        # 成交会占用或释放保证金，可用余额随之变化（ACCOUNT_UPDATE 可能稍后才到）
+        if order.get('x') == 'TRADE':
+            self._mark_balance_dirty()
+    
+    def _apply_config_update(self, message: Dict[str, Any]):
+        """杠杆变化"""
+        config = message.get('ac')
+        if not config:
+            return
+        
+        with self._lock:
+            self._leverage[config['s']] = str(config['l'])
+            for (symbol, _), position in self._positions.items():
+                if symbol == config['s']:
+                    position['leverage'] = str(config['l'])
+    
+    def add_order_listener(self, callback: Callable[[Dict[str, Any]], None]):
+        """
+        注册订单推送回调（在数据流线程中调用，回调应尽快返回）
+        
+        Args:
+            callback: callback(ORDER_TRADE_UPDATE 中的订单字段 o)
+        """
+        self._order_listeners.append(callback)
+    
+    # ==================== 读取接口（返回与 REST 相同的格式） ====================
+    
+    def is_ready(self) -> bool:
+        """快照是否可用（数据流在线且近期对账过）"""
+        if not self.is_connected or self.last_reconcile_time is None:
+            return False
+        return time.time() - self.last_reconcile_time <= self.max_snapshot_age
+    
+    @property
+    def balance_stale(self) -> bool:
+        """余额变化后是否还没有通过 REST 刷新可用余额"""
+        with self._lock:
+            return self._balance_loaded < self._balance_updates
+    
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        获取一致的账户快照
+        
+        Returns:
+            {'balances': [...], 'positions': [...], 'open_orders': [...], 'reconciled_at': 时间戳}
+        """
+        with self._lock:
+            return {
+                'balances': copy.deepcopy(list(self._balances.values())),
+                'positions': copy.deepcopy(list(self._positions.values())),
+                'open_orders': copy.deepcopy(list(self._open_orders.values())),
+                'reconciled_at': self.last_reconcile_time
+            }
+    
+    def get_balance(self) -> List[Dict[str, Any]]:
+        """获取余额（同 AsterDexClient.get_balance 格式）"""
+        return self.snapshot()['balances']
+    
+    def get_position_info(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取持仓（同 AsterDexClient.get_position_info 格式）"""
+        positions = self.snapshot()['positions']
+        if symbol:
+            positions = [pos for pos in positions if pos.get('symbol') == symbol]
+        return positions
+    
+    def get_open_orders(self, symbol: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取挂单（同 AsterDexClient.get_open_orders 格式）"""
+        orders = self.snapshot()['open_orders']
+        if symbol:
+            orders = [order for order in orders if order.get('symbol') == symbol]
+        return orders
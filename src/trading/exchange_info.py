@@ -0,0 +1,313 @@
+"""
+交易所信息缓存模块
+
+/fapi/v1/exchangeInfo 只下载一次并持久化到磁盘（带有效期），后台定期刷新；
+每个交易对的过滤器预先编译为 SymbolRules，下单前的数量取整和订单校验只需一次字典查找
+"""
+import json
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from decimal import Decimal
+from typing import Dict, Any, Optional, List
+
+from ..utils.logger import get_logger
+
+
+@dataclass(frozen=True)
+class SymbolRules:
+    """单个交易对预编译的交易规则"""
+    symbol: str
+    step_size: Decimal                  # 数量步长
+    min_qty: float                      # 最小数量
+    max_qty: float                      # 最大数量
+    tick_size: Decimal                  # 价格步长
+    min_price: float                    # 最小价格
+    max_price: float                    # 最大价格
+    min_notional: float                 # 最小名义价值
+    quantity_precision: int             # 数量精度
+    price_precision: int                # 价格精度
+    has_lot_size: bool = True           # 是否存在 LOT_SIZE 过滤器
+    has_price_filter: bool = True       # 是否存在 PRICE_FILTER 过滤器
+    raw: Dict[str, Any] = field(default_factory=dict, compare=False, repr=False)
+    
+    @classmethod
+    def from_symbol_info(cls, symbol_info: Dict[str, Any]) -> 'SymbolRules':
+        """
+        从 exchangeInfo 中的交易对信息编译规则
+        
+        Args:
+            symbol_info: exchangeInfo['symbols'] 中的一项
+            
+        Returns:
+            SymbolRules 实例
+        """
+        filters = {f.get('filterType'): f for f in symbol_info.get('filters', [])}
+        lot_size = filters.get('LOT_SIZE')
+        price_filter = filters.get('PRICE_FILTER')
+        min_notional = filters.get('MIN_NOTIONAL', {})
+        
+        return cls(
+            symbol=symbol_info.get('symbol', ''),
+            step_size=Decimal(str(float((lot_size or {}).get('stepSize', 0.01)))),
+            min_qty=float((lot_size or {}).get('minQty', 0)),
+            max_qty=float((lot_size or {}).get('maxQty', float('inf'))),
+            tick_size=Decimal(str(float((price_filter or {}).get('tickSize', 0.01)))),
+            min_price=float((price_filter or {}).get('minPrice', 0)),
+            max_price=float((price_filter or {}).get('maxPrice', float('inf'))),
+            min_notional=float(min_notional.get('notional', 0)),
+            quantity_precision=int(symbol_info.get('quantityPrecision', 3)),
+            price_precision=int(symbol_info.get('pricePrecision', 2)),
+            has_lot_size=lot_size is not None,
+            has_price_filter=price_filter is not None,
+            raw=symbol_info
+        )
+    
+    def round_quantity(self, quantity: float) -> float:
+        """
+        限制数量范围并向下取整到数量步长
+        
+        Args:
+            quantity: 原始数量
+            
+        Returns:
+            调整后的数量
+        """
+        if not self.has_lot_size:
+            return quantity
+        
+        quantity = max(self.min_qty, min(quantity, self.max_qty))
+        
+        if self.step_size > 0:
+            value = Decimal(str(quantity))
+            quantity = float(value - value % self.step_size)
+        
+        return quantity
+    
+    def round_price(self, price: float) -> float:
+        """
+        把价格向下取整到价格步长
+        
+        Args:
+            price: 原始价格
+            
+        Returns:
+            调整后的价格
+        """
+        if not self.has_price_filter or self.tick_size <= 0:
+            return price
+        
+        value = Decimal(str(price))
+        return float(value - value % self.tick_size)
+    
+    def validate(self, quantity: float, price: float) -> tuple[bool, str]:
+        """
+        校验订单数量、价格和名义价值
+        
+        Args:
+            quantity: 数量
+            price: 价格
+            
+        Returns:
+            (是否有效, 错误信息)
+        """
+        if self.has_price_filter:
+            if price < self.min_price:
+                return False, f"价格 {price} 低于最小价格 {self.min_price}"
+            if price > self.max_price:
+                return False, f"价格 {price} 高于最大价格 {self.max_price}"
+            if self.tick_size > 0 and Decimal(str(price)) % self.tick_size != 0:
+                return False, f"价格 {price} 不符合价格步长 {float(self.tick_size)}"
+        
+        if self.has_lot_size:
+            if quantity < self.min_qty:
+                return False, f"数量 {quantity} 低于最小数量 {self.min_qty}"
+            if quantity > self.max_qty:
+                return False, f"数量 {quantity} 高于最大数量 {self.max_qty}"
+            if self.step_size > 0 and Decimal(str(quantity)) % self.step_size != 0:
+                return False, f"数量 {quantity} 不符合数量步长 {float(self.step_size)}"
+        
+        notional = price * quantity
+        if notional < self.min_notional:
+            return False, f"名义价值 {notional} 低于最小值 {self.min_notional}"
+        
+        return True, ""
+
+
+class ExchangeInfoService:
+    """交易所信息缓存（所有交易器共享）"""
+    
+    def __init__(
+        self,
+        client,
+        cache_file: Optional[str] = 'cache/exchange_info.json',
+        ttl_seconds: float = 3600
+    ):
+        """
+        初始化交易所信息缓存
+        
+        Args:
+            client: AsterDexClient 实例
+            cache_file: 磁盘缓存文件路径（None 表示不持久化）
+            ttl_seconds: 缓存有效期（秒），也是后台刷新间隔
+        """
+        self.client = client
+        self.cache_file = cache_file
+        self.ttl_seconds = ttl_seconds
+        self.logger = get_logger()
+        
+        self.fetched_at: Optional[float] = None
+        self._exchange_info: Optional[Dict[str, Any]] = None
+        self._symbols: Dict[str, Dict[str, Any]] = {}
+        self._rules: Dict[str, SymbolRules] = {}
+        
+        self._refresh_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._refresh_thread: Optional[threading.Thread] = None
+    
+    @property
+    def is_loaded(self) -> bool:
+        """是否已加载"""
+        return self._exchange_info is not None
+    
+    def load(self):
+        """
+        加载交易所信息（优先使用未过期的磁盘缓存）
+        
+        网络请求失败时退回过期的磁盘缓存
+        """
+        cached = self._read_cache()
+        
+        if cached and time.time() - cached['fetched_at'] < self.ttl_seconds:
+            self._apply(cached['exchange_info'], cached['fetched_at'])
+            self.logger.info(f"从缓存加载交易所信息（{len(self._rules)} 个交易对）")
+            return
+        
+        try:
+            self.refresh()
+        except Exception as e:
+            if not cached:
+                raise
+            self._apply(cached['exchange_info'], cached['fetched_at'])
+            self.logger.warning(f"获取交易所信息失败，使用过期缓存: {e}")
+    
+    def refresh(self):
+        """从交易所重新下载并写入磁盘缓存"""
+        with self._refresh_lock:
+            exchange_info = self.client.get_exchange_info()
+            fetched_at = time.time()
+            self._apply(exchange_info, fetched_at)
+            self._write_cache(exchange_info, fetched_at)
+        
+        self.logger.info(f"成功获取交易所信息（{len(self._rules)} 个交易对）")
+    
+    def _apply(self, exchange_info: Dict[str, Any], fetched_at: float):
+        """编译交易对规则并整体替换（读取方无需加锁）"""
+        symbols = {s['symbol']: s for s in exchange_info.get('symbols', []) if 'symbol' in s}
+        rules = {symbol: SymbolRules.from_symbol_info(info) for symbol, info in symbols.items()}
+        
+        self._exchange_info = exchange_info
+        self._symbols = symbols
+        self._rules = rules
+        self.fetched_at = fetched_at
+    
+    def _read_cache(self) -> Optional[Dict[str, Any]]:
+        """读取磁盘缓存"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return None
+        
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                cached = json.load(f)
+            if 'fetched_at' not in cached or 'exchange_info' not in cached:
+                return None
+            return cached
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"读取交易所信息缓存失败: {e}")
+            return None
+    
+    def _write_cache(self, exchange_info: Dict[str, Any], fetched_at: float):
+        """写入磁盘缓存（先写临时文件再替换，避免读到半个文件）"""
+        if not self.cache_file:
+            return
+        
+        try:
+            cache_dir = os.path.dirname(self.cache_file)
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            
+            tmp_file = f"{self.cache_file}.tmp"
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'fetched_at': fetched_at, 'exchange_info': exchange_info}, f)
+            os.replace(tmp_file, self.cache_file)
+        except OSError as e:
+            self.logger.warning(f"写入交易所信息缓存失败: {e}")
+    
+    # ==================== 后台刷新 ====================
+    
+    def start(self):
+        """启动后台刷新线程"""
+        if self._refresh_thread and self._refresh_thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        self._refresh_thread = threading.Thread(
+            target=self._refresh_loop,
+            daemon=True,
+            name="ExchangeInfoRefresh"
+        )
+        self._refresh_thread.start()
+    
+    def stop(self):
+        """停止后台刷新线程"""
+        self._stop_event.set()
+        if self._refresh_thread:
+            self._refresh_thread.join(timeout=5)
+    
+    def _refresh_loop(self):
+        while True:
+            age = time.time() - self.fetched_at if self.fetched_at else self.ttl_seconds
+            if self._stop_event.wait(timeout=max(1.0, self.ttl_seconds - age)):
+                break
+            
+            try:
+                self.refresh()
+            except Exception as e:
+                self.logger.error(f"刷新交易所信息失败: {e}")
+                if self._stop_event.wait(timeout=60):
+                    break
+    
+    # ==================== 查询 ====================
+    
+    def get_exchange_info(self) -> Optional[Dict[str, Any]]:
+        """获取完整的交易所信息"""
+        return self._exchange_info
+    
+    def get_symbol_info(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """
+        获取交易对原始信息
+        
+        Args:
+            symbol: 交易对符号
+            
+        Returns:
+            交易对信息，不存在时返回 None
+        """
+        return self._symbols.get(symbol)
+    
+    def get_rules(self, symbol: str) -> Optional[SymbolRules]:
+        """
+        获取交易对预编译规则
+        
+        Args:
+            symbol: 交易对符号
+            
+        Returns:
+            SymbolRules，不存在时返回 None
+        """
+        return self._rules.get(symbol)
+    
+    def symbols(self) -> List[str]:
+        """所有交易对"""
+        return list(self._symbols.keys())
@@ -1,34 +1,85 @@
 """
 手动交易 HTTP API 服务器
 提供 REST API 接口接收手动交易指令
+
+每个连接一个线程（支持 HTTP/1.1 keep-alive），请求按类型交给两个独立的线程池执行：
+下单 / 平仓走下单线程池，持仓 / 指标查询走查询线程池，慢查询不会占用下单的执行线程；
+查询积压超过上限时直接返回 503，避免拖垮行情和交易接口。
+持仓查询带 ETag，客户端携带 If-None-Match 且持仓视图未变时返回 304
 """
-from typing import Dict, Any
+from typing import Dict, Any, Callable, Optional, Tuple
 import json
-from http.server import BaseHTTPRequestHandler, HTTPServer
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+import socket
 import threading
 
 from .manual_order_handler import ManualOrderHandler, ManualOrder, OrderSource, OrderSide
 from ..utils.logger import get_logger
 
 
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match 是否包含当前 ETag（弱比较，支持多个值和 *）"""
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == '*' or candidate.strip('"') == etag:
+            return True
+    return False
+
+
 class ManualOrderAPIHandler(BaseHTTPRequestHandler):
     """手动交易 API 请求处理器"""
     
+    # HTTP/1.1：同一连接可连续发送多个请求（每个响应都带 Content-Length）
+    protocol_version = 'HTTP/1.1'
+    
+    # keep-alive 连接空闲超时（秒）
+    timeout = 30
+    
     # 类变量，用于存储 handler 实例
     order_handler: ManualOrderHandler = None
     
+    def setup(self):
+        super().setup()
+        # 响应头和响应体分两次写出，关闭 Nagle 避免与客户端延迟 ACK 叠加出约 40ms 的等待
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
     def log_message(self, format, *args):
-        """重写日志方法，使用统一的日志系统"""
+        """重写日志方法，使用统一的日志系统（请求日志为 DEBUG 级别，避免高并发时刷屏）"""
         logger = get_logger()
-        logger.info(f"API: {format % args}")
+        logger.debug(f"API: {format % args}")
     
-    def _send_json_response(self, status_code: int, data: Dict[str, Any]):
-        """发送 JSON 响应"""
+    def _send_body(
+        self,
+        status_code: int,
+        body: bytes,
+        content_type: str,
+        headers: Optional[Dict[str, str]] = None
+    ):
+        """发送响应（带 Content-Length，连接可复用；304 没有响应体）"""
         self.send_response(status_code)
-        self.send_header('Content-type', 'application/json')
+        if status_code != 304:
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.end_headers()
-        self.wfile.write(json.dumps(data, ensure_ascii=False).encode('utf-8'))
+        if status_code != 304:
+            self.wfile.write(body)
+    
+    def _send_json_response(
+        self,
+        status_code: int,
+        data: Optional[Dict[str, Any]],
+        headers: Optional[Dict[str, str]] = None
+    ):
+        """发送 JSON 响应"""
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8') if data is not None else b''
+        self._send_body(status_code, body, 'application/json', headers)
     
     def _parse_request_body(self) -> Dict[str, Any]:
         """解析请求体"""
@@ -39,25 +90,71 @@ class ManualOrderAPIHandler(BaseHTTPRequestHandler):
         body = self.rfile.read(content_length)
         return json.loads(body.decode('utf-8'))
     
+    def _dispatch(self, pool: str, func: Callable[..., Tuple[int, Dict[str, Any]]], *args):
+        """
+        在指定线程池中执行请求并发送结果
+        
+        Args:
+            pool: 'order'（下单 / 平仓）或 'query'（只读查询）
+            func: 返回 (状态码, 响应数据) 或 (状态码, 响应数据, 响应头) 的处理函数
+        """
+        server = self.server
+        executor = getattr(server, f'{pool}_executor', None)
+        
+        # 没有线程池时（直接使用处理器类）在连接线程中执行
+        if executor is None:
+            self._send_json_response(*func(*args))
+            return
+        
+        slots = server.query_slots if pool == 'query' else None
+        if slots is not None and not slots.acquire(blocking=False):
+            self._send_json_response(503, {
+                'success': False,
+                'error': 'Server busy, retry later'
+            })
+            return
+        
+        try:
+            future = executor.submit(func, *args)
+            try:
+                # 下单 / 平仓等待执行完成：超时返回错误时订单可能仍会成交，客户端重试会重复开仓
+                timeout = server.request_timeout if pool == 'query' else None
+                result = future.result(timeout=timeout)
+            except FutureTimeoutError:
+                result = 504, {'success': False, 'error': 'Request timed out'}
+            except Exception as e:
+                result = 500, {'success': False, 'error': str(e)}
+        finally:
+            if slots is not None:
+                slots.release()
+        
+        self._send_json_response(*result)
+    
     def do_OPTIONS(self):
         """处理 CORS 预检请求"""
         self.send_response(200)
         self.send_header('Access-Control-Allow-Origin', '*')
         self.send_header('Access-Control-Allow-Methods', 'GET, POST, OPTIONS')
         self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.send_header('Content-Length', '0')
         self.end_headers()
     
     def do_GET(self):
         """处理 GET 请求"""
-        if self.path == '/':
+        path = urlsplit(self.path).path
+        
+        if path == '/':
             # 首页 - API 文档
             self._handle_index()
-        elif self.path == '/health':
+        elif path == '/health':
             # 健康检查
-            self._handle_health()
-        elif self.path == '/positions':
+            self._send_json_response(*self._handle_health())
+        elif path == '/positions':
             # 获取手动持仓列表
-            self._handle_get_positions()
+            self._dispatch('query', self._handle_get_positions, self.headers.get('If-None-Match'))
+        elif path == '/metrics':
+            # 请求额度使用情况
+            self._dispatch('query', self._handle_metrics)
         else:
             self._send_json_response(404, {
                 'success': False,
@@ -66,13 +163,25 @@ class ManualOrderAPIHandler(BaseHTTPRequestHandler):
     
     def do_POST(self):
         """处理 POST 请求"""
-        if self.path == '/order':
+        path = urlsplit(self.path).path
+        
+        # 先读完请求体，keep-alive 连接上的下一个请求才能正确解析
+        try:
+            data = self._parse_request_body()
+        except ValueError as e:
+            self._send_json_response(400, {
+                'success': False,
+                'error': f'Invalid JSON body: {str(e)}'
+            })
+            return
+        
+        if path == '/order':
             # 创建手动交易指令
-            self._handle_create_order()
-        elif self.path.startswith('/close/'):
+            self._dispatch('order', self._handle_create_order, data)
+        elif path.startswith('/close/'):
             # 关闭持仓
-            order_id = self.path.split('/')[-1]
-            self._handle_close_position(order_id)
+            order_id = path.split('/')[-1]
+            self._dispatch('order', self._handle_close_position, order_id)
         else:
             self._send_json_response(404, {
                 'success': False,
@@ -106,10 +215,16 @@ class ManualOrderAPIHandler(BaseHTTPRequestHandler):
             
             <div class="endpoint">
                 <h3><span class="method">GET</span> /positions</h3>
-                <p>获取所有手动持仓</p>
+                <p>获取所有手动持仓（价格来自缓存，price_time 为价格时间；带 If-None-Match 且未变化时返回 304）</p>
                 <pre>curl http://localhost:8080/positions</pre>
             </div>
             
+            <div class="endpoint">
+                <h3><span class="method">GET</span> /metrics</h3>
+                <p>交易所请求额度使用情况（权重、下单次数、排队和限流统计）及时钟同步状态（偏移、RTT、漂移）</p>
+                <pre>curl http://localhost:8080/metrics</pre>
+            </div>
+            
             <div class="endpoint">
                 <h3><span class="method">POST</span> /order</h3>
                 <p>创建手动交易指令（立即开仓）</p>
@@ -135,6 +250,8 @@ curl -X POST http://localhost:8080/order \\
                     <li><b>leverage</b>: 杠杆（可选），不填则使用配置的杠杆</li>
                     <li><b>stop_loss_percent</b>: 止损百分比（可选），如 2.0 表示 2%</li>
                     <li><b>take_profit_percent</b>: 止盈百分比（可选），如 5.0 表示 5%</li>
+                    <li><b>trailing_stop_percent</b>: 移动止损回撤百分比（可选），如 1.5 表示从最高价回撤 1.5% 止损</li>
+                    <li><b>break_even_percent</b>: 保本止损百分比（可选），盈利达到该百分比后止损移到开仓价</li>
                     <li><b>note</b>: 备注（可选）</li>
                 </ul>
             </div>
@@ -147,77 +264,97 @@ curl -X POST http://localhost:8080/order \\
         </body>
         </html>
         """
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html; charset=utf-8')
-        self.end_headers()
-        self.wfile.write(html.encode('utf-8'))
+        self._send_body(200, html.encode('utf-8'), 'text/html; charset=utf-8')
     
-    def _handle_health(self):
+    def _handle_health(self) -> Tuple[int, Dict[str, Any]]:
         """健康检查"""
-        self._send_json_response(200, {
+        return 200, {
             'success': True,
             'status': 'running',
             'manual_positions': len(self.order_handler.manual_positions) if self.order_handler else 0
-        })
+        }
+    
+    def _handle_metrics(self) -> Tuple[int, Dict[str, Any]]:
+        """获取请求额度使用情况"""
+        if not self.order_handler:
+            return 503, {
+                'success': False,
+                'error': 'Order handler not initialized'
+            }
+        
+        client = self.order_handler.trader.asterdex
+        snapshot = self.order_handler.market_snapshot
+        return 200, {
+            'success': True,
+            'rate_limit': client.get_rate_limit_metrics(),
+            'clock': client.clock.report() if client.clock else None,
+            'market_snapshot': snapshot.metrics() if snapshot else None
+        }
     
-    def _handle_get_positions(self):
-        """获取手动持仓列表"""
+    def _handle_get_positions(
+        self,
+        if_none_match: Optional[str] = None
+    ) -> Tuple[int, Optional[Dict[str, Any]], Dict[str, str]]:
+        """
+        获取手动持仓列表
+        
+        Args:
+            if_none_match: 请求头 If-None-Match（与当前 ETag 相同时返回 304）
+        """
         try:
             if not self.order_handler:
-                self._send_json_response(503, {
+                return 503, {
                     'success': False,
                     'error': 'Order handler not initialized'
-                })
-                return
+                }, {}
             
-            positions = self.order_handler.get_manual_positions()
+            etag, positions = self.order_handler.get_positions_view()
+            headers = {'ETag': f'"{etag}"', 'Cache-Control': 'no-cache'}
             
-            self._send_json_response(200, {
+            if if_none_match and _etag_matches(if_none_match, etag):
+                return 304, None, headers
+            
+            price_times = [p['price_time'] for p in positions if p.get('price_time')]
+            return 200, {
                 'success': True,
                 'positions': positions,
-                'count': len(positions)
-            })
+                'count': len(positions),
+                'price_time': min(price_times) if price_times else None
+            }, headers
         except Exception as e:
-            self._send_json_response(500, {
+            return 500, {
                 'success': False,
                 'error': str(e)
-            })
+            }, {}
     
-    def _handle_create_order(self):
+    def _handle_create_order(self, data: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
         """创建手动交易指令"""
         try:
             if not self.order_handler:
-                self._send_json_response(503, {
+                return 503, {
                     'success': False,
                     'error': 'Order handler not initialized'
-                })
-                return
-            
-            # 解析请求
-            data = self._parse_request_body()
+                }
             
             # 验证必填字段
             if 'symbol' not in data:
-                self._send_json_response(400, {
+                return 400, {
                     'success': False,
                     'error': 'Missing required field: symbol'
-                })
-                return
+                }
             
             if 'side' not in data:
-                self._send_json_response(400, {
+                return 400, {
                     'success': False,
                     'error': 'Missing required field: side'
-                })
-                return
+                }
             
             # 验证方向
             if data['side'].upper() not in ['LONG', 'SHORT']:
-                self._send_json_response(400, {
+                return 400, {
                     'success': False,
                     'error': 'Invalid side, must be LONG or SHORT'
-                })
-                return
+                }
             
             # 创建订单对象
             order = ManualOrder(
@@ -227,6 +364,8 @@ curl -X POST http://localhost:8080/order \\
                 leverage=data.get('leverage'),
                 stop_loss_percent=data.get('stop_loss_percent'),
                 take_profit_percent=data.get('take_profit_percent'),
+                trailing_stop_percent=data.get('trailing_stop_percent'),
+                break_even_percent=data.get('break_even_percent'),
                 note=data.get('note'),
                 source=OrderSource.API
             )
@@ -235,85 +374,122 @@ curl -X POST http://localhost:8080/order \\
             order_id = self.order_handler.execute_manual_order(order)
             
             if order_id:
-                self._send_json_response(200, {
+                return 200, {
                     'success': True,
                     'message': 'Order created successfully',
                     'order_id': order_id,
                     'symbol': order.symbol,
                     'side': order.side.value
-                })
+                }
             else:
-                self._send_json_response(500, {
+                return 500, {
                     'success': False,
                     'error': 'Failed to create order'
-                })
-        
+                }
+                
         except ValueError as e:
-            self._send_json_response(400, {
+            return 400, {
                 'success': False,
                 'error': f'Invalid parameter: {str(e)}'
-            })
+            }
         except Exception as e:
-            self._send_json_response(500, {
+            return 500, {
                 'success': False,
                 'error': str(e)
-            })
+            }
     
-    def _handle_close_position(self, order_id: str):
+    def _handle_close_position(self, order_id: str) -> Tuple[int, Dict[str, Any]]:
         """关闭持仓"""
         try:
             if not self.order_handler:
-                self._send_json_response(503, {
+                return 503, {
                     'success': False,
                     'error': 'Order handler not initialized'
-                })
-                return
+                }
             
             success = self.order_handler.close_position_by_id(order_id)
             
             if success:
-                self._send_json_response(200, {
+                return 200, {
                     'success': True,
                     'message': f'Position {order_id} closed successfully'
-                })
+                }
             else:
-                self._send_json_response(404, {
+                return 404, {
                     'success': False,
                     'error': f'Position {order_id} not found'
-                })
-        
+                }
+                
         except Exception as e:
-            self._send_json_response(500, {
+            return 500, {
                 'success': False,
                 'error': str(e)
-            })
+            }
+
+
+class _APIHTTPServer(ThreadingHTTPServer):
+    """每个连接一个线程的 HTTP 服务器，持有下单和查询两个线程池"""
+    
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 128
+    
+    order_executor: Optional[ThreadPoolExecutor] = None
+    query_executor: Optional[ThreadPoolExecutor] = None
+    query_slots: Optional[threading.BoundedSemaphore] = None
+    request_timeout: float = 30.0
 
 
 class ManualOrderAPIServer:
     """手动交易 API 服务器"""
     
-    def __init__(self, order_handler: ManualOrderHandler, host: str = '0.0.0.0', port: int = 8080):
+    def __init__(
+        self,
+        order_handler: ManualOrderHandler,
+        host: str = '0.0.0.0',
+        port: int = 8080,
+        order_workers: int = 4,
+        query_workers: int = 4,
+        max_pending_queries: int = 64,
+        request_timeout: float = 30.0,
+        keepalive_timeout: float = 30.0
+    ):
         """
         初始化 API 服务器
         
         Args:
             order_handler: 手动交易处理器
             host: 监听地址
-            port: 监听端口
+            port: 监听端口（0 表示由系统分配）
+            order_workers: 下单 / 平仓线程数
+            query_workers: 持仓 / 指标查询线程数
+            max_pending_queries: 执行中和排队的查询上限，超过时返回 503
+            request_timeout: 等待单个查询结果的超时（秒），超时返回 504（下单 / 平仓始终等待执行完成）
+            keepalive_timeout: keep-alive 连接空闲超时（秒）
         """
         self.order_handler = order_handler
         self.host = host
         self.port = port
+        self.order_workers = order_workers
+        self.query_workers = query_workers
+        self.max_pending_queries = max_pending_queries
+        self.request_timeout = request_timeout
         self.logger = get_logger()
         
         # 设置 handler 类变量
         ManualOrderAPIHandler.order_handler = order_handler
+        ManualOrderAPIHandler.timeout = keepalive_timeout
         
         # HTTP 服务器
         self.server = None
         self.server_thread = None
         self.is_running = False
     
+    @property
+    def address(self) -> Tuple[str, int]:
+        """实际监听的地址和端口"""
+        return self.server.server_address[:2] if self.server else (self.host, self.port)
+    
     def start(self):
         """启动 API 服务器"""
         if self.is_running:
@@ -321,7 +497,18 @@ class ManualOrderAPIServer:
             return
         
         try:
-            self.server = HTTPServer((self.host, self.port), ManualOrderAPIHandler)
+            self.server = _APIHTTPServer((self.host, self.port), ManualOrderAPIHandler)
+            self.server.order_executor = ThreadPoolExecutor(
+                max_workers=self.order_workers,
+                thread_name_prefix='APIOrder'
+            )
+            self.server.query_executor = ThreadPoolExecutor(
+                max_workers=self.query_workers,
+                thread_name_prefix='APIQuery'
+            )
+            self.server.query_slots = threading.BoundedSemaphore(self.max_pending_queries)
+            self.server.request_timeout = self.request_timeout
+            self.port = self.address[1]
             
             self.server_thread = threading.Thread(
                 target=self.server.serve_forever,
@@ -338,8 +525,9 @@ class ManualOrderAPIServer:
             self.logger.info(f"  API 文档: http://localhost:{self.port}/")
             self.logger.info(f"  健康检查: http://localhost:{self.port}/health")
             self.logger.info(f"  查看持仓: http://localhost:{self.port}/positions")
+            self.logger.info(f"  线程池: 下单 {self.order_workers}，查询 {self.query_workers}")
             self.logger.info("=" * 60)
-        
+            
         except Exception as e:
             self.logger.error(f"启动 API 服务器失败: {e}")
             raise
@@ -352,6 +540,8 @@ class ManualOrderAPIServer:
         if self.server:
             self.server.shutdown()
             self.server.server_close()
+            self.server.order_executor.shutdown(wait=False)
+            self.server.query_executor.shutdown(wait=False)
         
         if self.server_thread:
             self.server_thread.join(timeout=5)
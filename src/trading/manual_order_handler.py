@@ -1,16 +1,23 @@
 """
 手动交易指令处理模块
-支持接收手动交易指令并立即执行开仓，然后自动监控并平仓
+支持接收手动交易指令并立即执行开仓，在交易所挂出止损 / 止盈单；
+条件单未能挂出时由本地监控线程轮询价格并平仓。
+文件方式支持 JSON 指令文件（轮询并写回 processed 标记）和只追加的 JSONL 指令队列（inotify 通知）；
+持仓视图从共享的内存价格缓存计算，价格超过时效时才批量刷新
 """
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
+import hashlib
 import json
 import os
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
+from .order_queue import OrderQueue
+from .trigger_index import TriggerIndex, Trigger
 from ..utils.logger import get_logger
 
 
@@ -37,6 +44,8 @@ class ManualOrder:
     leverage: Optional[int] = None      # 杠杆（可选，不指定则使用配置的杠杆）
     stop_loss_percent: Optional[float] = None  # 止损百分比（可选）
     take_profit_percent: Optional[float] = None  # 止盈百分比（可选）
+    trailing_stop_percent: Optional[float] = None  # 移动止损回撤百分比（可选，默认使用配置）
+    break_even_percent: Optional[float] = None     # 保本止损触发百分比（可选，默认使用配置）
     note: Optional[str] = None          # 备注
     source: OrderSource = OrderSource.API  # 来源
     timestamp: Optional[datetime] = None
@@ -58,6 +67,8 @@ class ManualOrder:
             'leverage': self.leverage,
             'stop_loss_percent': self.stop_loss_percent,
             'take_profit_percent': self.take_profit_percent,
+            'trailing_stop_percent': self.trailing_stop_percent,
+            'break_even_percent': self.break_even_percent,
             'note': self.note,
             'source': self.source.value,
             'timestamp': self.timestamp.isoformat()
@@ -73,6 +84,8 @@ class ManualOrder:
             leverage=data.get('leverage'),
             stop_loss_percent=data.get('stop_loss_percent'),
             take_profit_percent=data.get('take_profit_percent'),
+            trailing_stop_percent=data.get('trailing_stop_percent'),
+            break_even_percent=data.get('break_even_percent'),
             note=data.get('note'),
             source=OrderSource[data.get('source', 'API')],
             timestamp=datetime.fromisoformat(data['timestamp']) if 'timestamp' in data else None
@@ -141,33 +154,90 @@ class ManualPosition:
 class ManualOrderHandler:
     """手动交易指令处理器"""
     
-    def __init__(self, trader, config: Dict[str, Any]):
+    def __init__(
+        self,
+        trader,
+        config: Dict[str, Any],
+        market_stream=None,
+        market_snapshot=None,
+        protective_orders=None,
+        trailing_stops=None,
+        position_manager=None
+    ):
         """
         初始化手动交易处理器
         
         Args:
             trader: Trader 实例
             config: 手动交易配置
+            market_stream: MarketDataStream 实例（可选，提供内存中的标记价格）
+            market_snapshot: MarketSnapshot 实例（可选，默认使用交易器的行情快照）
+            protective_orders: ProtectiveOrderManager 实例（可选，默认使用交易器的条件单管理器）
+            trailing_stops: TrailingStopEngine 实例（可选，默认使用交易器的移动止损引擎）
+            position_manager: AIPositionManager 实例（可选，定期复查持仓并收紧止损）
         """
         self.trader = trader
         self.config = config
+        self.market_stream = market_stream
+        self.market_snapshot = market_snapshot or getattr(trader, 'market_snapshot', None)
+        self.protective_orders = protective_orders or getattr(trader, 'protective_orders', None)
+        self.trailing_stops = trailing_stops or getattr(trader, 'trailing_stops', None)
+        self.position_manager = position_manager
         self.logger = get_logger()
         
         # 手动持仓记录
         self.manual_positions: Dict[str, ManualPosition] = {}
         
-        # 指令队列文件路径
+        # 交易所条件单未覆盖的持仓按价位索引，每个周期每个交易对只比较一次价格
+        self.trigger_index = TriggerIndex()
+        # 正在平仓的持仓（触发平仓和 API 平仓共用，同一持仓同时只发出一笔平仓单）
+        self._closing: set = set()
+        self._closing_lock = threading.Lock()
+        
+        # 交易所条件单成交时移除对应的手动持仓
+        if self.protective_orders:
+            self.protective_orders.add_listener(self._on_protective_order_filled)
+        
+        # 移动止损 / 保本止损更新本地监控的止损价
+        if self.trailing_stops:
+            self.trailing_stops.add_listener(self._on_stop_moved)
+        
+        # 指令文件路径：json 模式轮询 JSON 文件并写回 processed 标记，jsonl 模式消费只追加的指令队列
         self.order_file = config.get('order_file', 'manual_orders.json')
+        self.file_watch_mode = config.get('file_watch_mode', 'json')
+        self.order_queue: Optional[OrderQueue] = None
         
         # 监控线程
         self.monitoring_thread = None
         self.file_watch_thread = None
+        self.review_thread = None
         self.is_running = False
+        self._stop_event = threading.Event()
         
         # 默认配置
         self.default_leverage = config.get('default_leverage', 3)
         self.default_position_percent = config.get('default_position_percent', 20)
         self.check_interval = config.get('check_interval', 10)  # 检查间隔（秒）
+        self.ai_review_interval = config.get('ai_review_interval', 300)  # AI 复查间隔（秒）
+        
+        # 触发后的平仓在线程池中执行，不阻塞监控周期
+        self._close_executor = ThreadPoolExecutor(
+            max_workers=config.get('close_workers', 4),
+            thread_name_prefix='ManualClose'
+        )
+        self.last_cycle_ms: Optional[float] = None
+        
+        # 共享价格缓存 {交易对: (价格, 时间戳)}：行情数据流推送和监控周期的批量查询都会写入，
+        # 持仓查询只在价格超过 price_max_age 秒时才请求行情
+        self.price_max_age = config.get('price_max_age', 5.0)
+        self._prices: Dict[str, Tuple[float, float]] = {}
+        self._prices_lock = threading.Lock()
+        if self.market_stream:
+            self.market_stream.add_price_listener(self._on_price)
+        
+        # 最近一次计算的持仓视图 (指纹, ETag, 持仓列表)，持仓和价格都没变时直接复用
+        self._positions_view: Optional[Tuple[tuple, str, List[Dict[str, Any]]]] = None
+        self._view_lock = threading.Lock()
         
         self.logger.info("✅ 手动交易处理器已初始化")
     
@@ -178,6 +248,7 @@ class ManualOrderHandler:
             return
         
         self.is_running = True
+        self._stop_event.clear()
         
         # 启动持仓监控线程
         self.monitoring_thread = threading.Thread(
@@ -190,20 +261,32 @@ class ManualOrderHandler:
         # 启动文件监听线程（如果启用）
         if self.config.get('enable_file_watch', True):
             self.file_watch_thread = threading.Thread(
-                target=self._watch_order_file,
+                target=self._watch_order_queue if self.file_watch_mode == 'jsonl' else self._watch_order_file,
                 daemon=True,
                 name="OrderFileWatcher"
             )
             self.file_watch_thread.start()
         
+        # 启动 AI 复查线程（建议只通过移动止损引擎收紧止损）
+        if self.position_manager and self.trailing_stops:
+            self.review_thread = threading.Thread(
+                target=self._review_loop,
+                daemon=True,
+                name="ManualPositionReview"
+            )
+            self.review_thread.start()
+        
         self.logger.info("🚀 手动交易处理器已启动")
         self.logger.info(f"  - 持仓监控间隔: {self.check_interval}秒")
+        if self.review_thread:
+            self.logger.info(f"  - AI 止损复查间隔: {self.ai_review_interval}秒")
         if self.config.get('enable_file_watch', True):
-            self.logger.info(f"  - 指令文件监听: {self.order_file}")
+            self.logger.info(f"  - 指令文件监听: {self.order_file}（{self.file_watch_mode}）")
     
     def stop(self):
         """停止手动交易处理器"""
         self.is_running = False
+        self._stop_event.set()
         
         if self.monitoring_thread:
             self.monitoring_thread.join(timeout=5)
@@ -211,6 +294,11 @@ class ManualOrderHandler:
         if self.file_watch_thread:
             self.file_watch_thread.join(timeout=5)
         
+        if self.review_thread:
+            self.review_thread.join(timeout=5)
+        
+        self._close_executor.shutdown(wait=True)
+        
         self.logger.info("🛑 手动交易处理器已停止")
     
     def execute_manual_order(self, order: ManualOrder) -> Optional[str]:
@@ -237,8 +325,7 @@ class ManualOrderHandler:
             self.logger.info("=" * 60)
             
             # 获取当前价格
-            ticker = self.trader.asterdex.get_ticker(symbol)
-            current_price = float(ticker['lastPrice'])
+            current_price = self._get_current_price(symbol)
             
             # 确定杠杆
             leverage = order.leverage if order.leverage else self.default_leverage
@@ -253,16 +340,15 @@ class ManualOrderHandler:
                 quantity = order.quantity
             else:
                 # 使用默认仓位百分比计算
-                account = self.trader.asterdex.get_account()
-                available_balance = float(account['availableBalance'])
+                balance_info, _ = self.trader._get_account_snapshot(symbol)
+                available_balance = self.trader._get_available_balance(balance_info)
                 position_size = available_balance * self.default_position_percent / 100
                 quantity = (position_size * leverage) / current_price
             
             # 格式化数量
-            symbol_info = self.trader.get_symbol_info(symbol)
-            if symbol_info:
-                quantity_precision = symbol_info.get('quantityPrecision', 3)
-                quantity = round(quantity, quantity_precision)
+            symbol_rules = self.trader.get_symbol_rules(symbol)
+            if symbol_rules:
+                quantity = symbol_rules.round_quantity(quantity)
             
             self.logger.info(f"📊 开仓参数:")
             self.logger.info(f"  当前价格: ${current_price:,.2f}")
@@ -272,11 +358,12 @@ class ManualOrderHandler:
             # 执行开仓
             order_side_str = "BUY" if side == OrderSide.LONG else "SELL"
             
-            result = self.trader.asterdex.create_order(
+            result = self.trader.asterdex.place_order(
                 symbol=symbol,
                 side=order_side_str,
                 order_type="MARKET",
-                quantity=quantity
+                quantity=str(quantity),
+                position_side='BOTH'
             )
             
             order_id = result.get('orderId')
@@ -285,6 +372,9 @@ class ManualOrderHandler:
                 self.logger.error(f"❌ 开仓失败: 未返回订单ID")
                 return None
             
+            order_id = str(order_id)
+            current_price = float(result.get('avgPrice') or 0) or current_price
+            
             self.logger.info(f"✅ 开仓成功!")
             self.logger.info(f"  订单ID: {order_id}")
             
@@ -321,6 +411,39 @@ class ManualOrderHandler:
             
             self.manual_positions[order_id] = position
             
+            # 在交易所挂出只减仓的止损 / 止盈单，挂单失败的一侧由本地监控兜底
+            if self.protective_orders and (stop_loss_price or take_profit_price):
+                protection = self.protective_orders.place(
+                    f'manual:{order_id}',
+                    symbol,
+                    side.value,
+                    quantity,
+                    stop_loss_price=stop_loss_price,
+                    take_profit_price=take_profit_price,
+                    rules=symbol_rules
+                )
+                if protection.complete:
+                    self.logger.info(f"🛡️ 止损 / 止盈已由交易所挂单执行")
+                if protection.stop_loss_price:
+                    position.stop_loss_price = stop_loss_price = protection.stop_loss_price
+            
+            if self.trailing_stops:
+                record = self.trailing_stops.track(
+                    f'manual:{order_id}',
+                    symbol,
+                    side.value,
+                    current_price,
+                    stop_loss_price=stop_loss_price,
+                    trail_percent=order.trailing_stop_percent,
+                    break_even_percent=order.break_even_percent,
+                    rules=symbol_rules
+                )
+                if record:
+                    self.logger.info(f"  移动止损 / 保本止损已启用")
+            
+            if not self._is_protected(order_id):
+                self.trigger_index.add(order_id, symbol, side.value, stop_loss_price, take_profit_price)
+            
             self.logger.info(f"📝 已添加到监控列表（自动监控并平仓）")
             self.logger.info("=" * 60)
             
@@ -330,75 +453,328 @@ class ManualOrderHandler:
             self.logger.error(f"❌ 执行手动交易指令失败: {e}", exc_info=True)
             return None
     
+    def _is_protected(self, order_id: str) -> bool:
+        """持仓的止损 / 止盈是否都已由交易所条件单覆盖"""
+        if not self.protective_orders:
+            return False
+        protection = self.protective_orders.get(f'manual:{order_id}')
+        return protection is not None and protection.complete
+    
+    def _on_protective_order_filled(self, protection):
+        """交易所条件单成交：持仓已被交易所平仓，移除记录"""
+        if not protection.key.startswith('manual:'):
+            return
+        
+        order_id = protection.key[len('manual:'):]
+        self.trigger_index.remove(order_id)
+        position = self.manual_positions.pop(order_id, None)
+        if position is None:
+            return
+        
+        self.logger.info("=" * 60)
+        self.logger.info(f"✅ 交易所{'止损' if protection.triggered == 'STOP_MARKET' else '止盈'}单已平仓")
+        self.logger.info(f"  订单ID: {order_id}")
+        self.logger.info(f"  交易对: {position.symbol}")
+        self.logger.info(f"  开仓价: ${position.entry_price:,.2f}")
+        self.logger.info(f"  持仓时长: {datetime.now() - position.open_time}")
+        self.logger.info("=" * 60)
+    
+    def _on_stop_moved(self, key: str, stop_price: float):
+        """移动止损 / 保本止损收紧了止损：更新持仓记录，本地监控的持仓重新索引"""
+        if not key.startswith('manual:'):
+            return
+        
+        order_id = key[len('manual:'):]
+        position = self.manual_positions.get(order_id)
+        if position is None:
+            return
+        
+        position.stop_loss_price = stop_price
+        if order_id in self.trigger_index and order_id not in self._closing:
+            self.trigger_index.add(
+                order_id,
+                position.symbol,
+                position.side.value,
+                position.stop_loss_price,
+                position.take_profit_price
+            )
+    
+    def review_positions(self) -> int:
+        """
+        用 AIPositionManager 复查受移动止损跟踪的手动持仓，采纳 stop_loss_update 建议
+        
+        建议交给 TrailingStopEngine.apply_stop_update，只会收紧止损；改单和本地止损价的更新
+        由引擎的推送线程完成。
+        
+        Returns:
+            采纳的止损调整次数
+        """
+        if not self.position_manager or not self.trailing_stops:
+            return 0
+        
+        positions = {
+            order_id: position for order_id, position in list(self.manual_positions.items())
+            if order_id not in self._closing and self.trailing_stops.get(f'manual:{order_id}')
+        }
+        if not positions:
+            return 0
+        
+        prices = self.get_cached_prices(sorted({p.symbol for p in positions.values()}))
+        
+        applied = 0
+        for order_id, position in positions.items():
+            cached = prices.get(position.symbol)
+            if cached is None:
+                continue
+            
+            direction = 1 if position.side == OrderSide.LONG else -1
+            recommendation = self.position_manager.monitor_position(
+                {
+                    'symbol': position.symbol,
+                    'entry_price': position.entry_price,
+                    'position_amt': direction * position.quantity,
+                    'holding_hours': round((datetime.now() - position.open_time).total_seconds() / 3600, 1)
+                },
+                cached[0]
+            )
+            
+            if self.trailing_stops.apply_stop_update(f'manual:{order_id}', recommendation.get('stop_loss_update')):
+                applied += 1
+        
+        return applied
+    
+    def _review_loop(self):
+        """按 ai_review_interval 定期复查持仓"""
+        while not self._stop_event.wait(self.ai_review_interval):
+            try:
+                applied = self.review_positions()
+                if applied:
+                    self.logger.info(f"🤖 AI 复查收紧了 {applied} 个持仓的止损")
+            except Exception as e:
+                self.logger.error(f"AI 持仓复查异常: {e}", exc_info=True)
+    
     def _monitor_positions(self):
-        """监控手动开仓的持仓（自动平仓）"""
+        """
+        监控手动开仓的持仓（交易所条件单未覆盖的持仓按价位索引检查并自动平仓）
+        
+        每个周期一次批量获取所有相关交易对的价格，每个交易对用一次二分查找找出被穿越的价位；
+        周期按固定节拍执行，检查耗时不会累积到下一个周期。
+        """
         self.logger.info("👀 持仓监控线程已启动")
         
+        next_run = time.monotonic()
+        last_status_log = 0.0
+        
         while self.is_running:
             try:
-                if not self.manual_positions:
-                    time.sleep(self.check_interval)
-                    continue
+                start = time.perf_counter()
+                self._sync_trigger_index()
+                if len(self.trigger_index):
+                    self._check_triggers()
+                self.last_cycle_ms = (time.perf_counter() - start) * 1000
                 
-                # 检查每个手动持仓
-                positions_to_close = []
-                
-                for order_id, position in self.manual_positions.items():
-                    symbol = position.symbol
-                    
-                    # 获取当前价格
-                    ticker = self.trader.asterdex.get_ticker(symbol)
-                    current_price = float(ticker['lastPrice'])
-                    
-                    # 计算盈亏
-                    pnl_percent = position.calculate_pnl_percent(current_price)
-                    
-                    # 判断是否应该平仓
-                    should_close = position.should_close(current_price)
+                # 定期输出持仓状态
+                if self.manual_positions and time.time() - last_status_log >= 60:
+                    last_status_log = time.time()
+                    self.logger.info(
+                        f"📊 手动持仓 {len(self.manual_positions)} 个，"
+                        f"本地监控 {len(self.trigger_index)} 个，检查耗时 {self.last_cycle_ms:.1f}ms"
+                    )
                     
-                    if should_close:
-                        self.logger.info(f"🎯 触发平仓条件:")
-                        self.logger.info(f"  订单ID: {order_id}")
-                        self.logger.info(f"  交易对: {symbol}")
-                        self.logger.info(f"  方向: {position.side.value}")
-                        self.logger.info(f"  开仓价: ${position.entry_price:,.2f}")
-                        self.logger.info(f"  当前价: ${current_price:,.2f}")
-                        self.logger.info(f"  盈亏: {pnl_percent:+.2f}%")
-                        
-                        positions_to_close.append((order_id, position, current_price))
-                    else:
-                        # 定期输出持仓状态
-                        if int(time.time()) % 60 == 0:  # 每分钟输出一次
-                            self.logger.info(f"📊 持仓状态 - {symbol}: {pnl_percent:+.2f}%")
-                
-                # 执行平仓
-                for order_id, position, current_price in positions_to_close:
-                    self._close_manual_position(order_id, position, current_price)
+            except Exception as e:
+                self.logger.error(f"持仓监控异常: {e}", exc_info=True)
+            
+            next_run += self.check_interval
+            delay = next_run - time.monotonic()
+            if delay < 0:
+                self.logger.warning(f"持仓监控周期延迟 {-delay:.1f}秒")
+                next_run = time.monotonic()
+                delay = 0
+            time.sleep(delay)
+    
+    def _sync_trigger_index(self):
+        """交易所条件单失效的持仓加入索引，已被条件单覆盖的持仓移出索引"""
+        for order_id, position in list(self.manual_positions.items()):
+            if order_id in self._closing:
+                continue
+            
+            protected = self._is_protected(order_id)
+            if protected and order_id in self.trigger_index:
+                self.trigger_index.remove(order_id)
+            elif not protected and order_id not in self.trigger_index:
+                if position.stop_loss_price or position.take_profit_price:
+                    self.trigger_index.add(
+                        order_id,
+                        position.symbol,
+                        position.side.value,
+                        position.stop_loss_price,
+                        position.take_profit_price
+                    )
+    
+    def _check_triggers(self):
+        """批量获取价格并找出被穿越的止损 / 止盈价位，在线程池中平仓"""
+        symbols = self.trigger_index.symbols()
+        prices = self._get_prices(symbols)
+        
+        for symbol in symbols:
+            current_price = prices.get(symbol)
+            if current_price is None:
+                self.logger.warning(f"无法获取 {symbol} 价格，跳过本周期检查")
+                continue
+            
+            for trigger in self.trigger_index.pop_crossed(symbol, current_price):
+                position = self.manual_positions.get(trigger.position_id)
+                if position is None:
+                    continue
                 
-                time.sleep(self.check_interval)
+                self.logger.info(f"🎯 触发平仓条件:")
+                self.logger.info(f"  订单ID: {trigger.position_id}")
+                self.logger.info(f"  交易对: {symbol}")
+                self.logger.info(f"  方向: {position.side.value}")
+                self.logger.info(f"  {'止损' if trigger.kind == 'STOP_LOSS' else '止盈'}价: ${trigger.level:,.2f}")
+                self.logger.info(f"  开仓价: ${position.entry_price:,.2f}")
+                self.logger.info(f"  当前价: ${current_price:,.2f}")
+                self.logger.info(f"  盈亏: {position.calculate_pnl_percent(current_price):+.2f}%")
                 
+                if not self._begin_closing(trigger.position_id):
+                    self.logger.info(f"  {trigger.position_id} 正在平仓，跳过")
+                    continue
+                self._close_executor.submit(self._close_triggered, trigger, position, current_price)
+    
+    def _close_triggered(self, trigger: Trigger, position: ManualPosition, current_price: float):
+        """平仓被触发的持仓（失败时下个周期重新检查）"""
+        try:
+            self._close_manual_position(trigger.position_id, position, current_price)
+        finally:
+            self._end_closing(trigger.position_id)
+    
+    def _begin_closing(self, order_id: str) -> bool:
+        """标记持仓正在平仓，已在平仓中时返回 False"""
+        with self._closing_lock:
+            if order_id in self._closing:
+                return False
+            self._closing.add(order_id)
+            return True
+    
+    def _end_closing(self, order_id: str):
+        with self._closing_lock:
+            self._closing.discard(order_id)
+    
+    def _get_prices(self, symbols: List[str]) -> Dict[str, float]:
+        """
+        批量获取价格：行情数据流的标记价格，其余交易对一次请求全部价格
+        
+        Args:
+            symbols: 交易对列表
+            
+        Returns:
+            {交易对: 价格}
+        """
+        prices = {}
+        
+        if self.market_stream:
+            for symbol in symbols:
+                mark_price = self.market_stream.get_mark_price(symbol)
+                if mark_price is not None:
+                    prices[symbol] = mark_price
+        
+        missing = [symbol for symbol in symbols if symbol not in prices]
+        if missing:
+            if self.market_snapshot:
+                all_prices = self.market_snapshot.get_prices()
+            else:
+                all_prices = {t['symbol']: float(t['price']) for t in self.trader.asterdex.get_ticker_price()}
+            prices.update({symbol: all_prices[symbol] for symbol in missing if symbol in all_prices})
+        
+        self._store_prices(prices)
+        return prices
+    
+    def _on_price(self, symbol: str, price: float):
+        """行情数据流推送的标记价格写入价格缓存"""
+        with self._prices_lock:
+            self._prices[symbol] = (price, time.time())
+    
+    def _store_prices(self, prices: Dict[str, float]):
+        """批量查询到的价格写入价格缓存"""
+        now = time.time()
+        with self._prices_lock:
+            for symbol, price in prices.items():
+                self._prices[symbol] = (price, now)
+    
+    def get_cached_prices(self, symbols: List[str]) -> Dict[str, Tuple[float, float]]:
+        """
+        从价格缓存读取价格，缺失或超过 price_max_age 秒的交易对一次批量刷新
+        
+        Args:
+            symbols: 交易对列表
+            
+        Returns:
+            {交易对: (价格, 时间戳)}，刷新失败时返回缓存中的旧价格
+        """
+        now = time.time()
+        with self._prices_lock:
+            cached = {symbol: self._prices[symbol] for symbol in symbols if symbol in self._prices}
+        
+        stale = [
+            symbol for symbol in symbols
+            if symbol not in cached or now - cached[symbol][1] > self.price_max_age
+        ]
+        if stale:
+            try:
+                self._get_prices(stale)
             except Exception as e:
-                self.logger.error(f"持仓监控异常: {e}", exc_info=True)
-                time.sleep(self.check_interval)
+                self.logger.error(f"刷新价格失败，使用缓存中的价格: {e}")
+            with self._prices_lock:
+                cached.update({symbol: self._prices[symbol] for symbol in stale if symbol in self._prices})
+        
+        return cached
+    
+    def _get_current_price(self, symbol: str) -> float:
+        """
+        获取当前价格（优先使用行情数据流的标记价格，数据过期时读取共享行情快照或请求行情接口）
+        
+        Args:
+            symbol: 交易对符号
+            
+        Returns:
+            当前价格
+        """
+        if self.market_stream:
+            mark_price = self.market_stream.get_mark_price(symbol)
+            if mark_price is not None:
+                return mark_price
+        
+        if self.market_snapshot:
+            return self.market_snapshot.get_price(symbol)
+        
+        return float(self.trader.asterdex.get_ticker_price(symbol)['price'])
     
-    def _close_manual_position(self, order_id: str, position: ManualPosition, current_price: float):
-        """平仓手动持仓"""
+    def _close_manual_position(self, order_id: str, position: ManualPosition, current_price: float) -> bool:
+        """平仓手动持仓，返回是否成功"""
         try:
             symbol = position.symbol
             
-            # 平仓方向与开仓相反
+            # 平仓方向与开仓相反（先平仓再撤销条件单：平仓失败时持仓仍有交易所止损保护，
+            # 只减仓的条件单在持仓平掉后触发也不会开出新仓位）
             close_side = "SELL" if position.side == OrderSide.LONG else "BUY"
             
-            result = self.trader.asterdex.create_order(
+            result = self.trader.asterdex.place_order(
                 symbol=symbol,
                 side=close_side,
                 order_type="MARKET",
-                quantity=position.quantity,
+                quantity=str(position.quantity),
+                position_side='BOTH',
                 reduce_only=True
             )
             
             close_order_id = result.get('orderId')
             
+            # 撤销交易所条件单，停止移动止损
+            if self.protective_orders:
+                self.protective_orders.cancel(f'manual:{order_id}')
+            if self.trailing_stops:
+                self.trailing_stops.untrack(f'manual:{order_id}')
+            
             pnl_percent = position.calculate_pnl_percent(current_price)
             
             self.logger.info("=" * 60)
@@ -412,10 +788,13 @@ class ManualOrderHandler:
             self.logger.info("=" * 60)
             
             # 从监控列表移除
-            del self.manual_positions[order_id]
+            self.trigger_index.remove(order_id)
+            self.manual_positions.pop(order_id, None)
+            return True
             
         except Exception as e:
             self.logger.error(f"❌ 平仓失败: {e}", exc_info=True)
+            return False
     
     def _watch_order_file(self):
         """监听指令文件"""
@@ -465,25 +844,108 @@ class ManualOrderHandler:
                 self.logger.error(f"文件监听异常: {e}", exc_info=True)
                 time.sleep(5)
     
-    def get_manual_positions(self) -> List[Dict[str, Any]]:
-        """获取所有手动持仓"""
-        positions = []
+    def _watch_order_queue(self):
+        """消费只追加的 JSONL 指令队列（inotify 通知文件变化，不可用时轮询）"""
+        self.order_queue = OrderQueue(self.order_file, self.config.get('queue_checkpoint_file'))
+        watcher = self.order_queue.create_watcher(
+            use_inotify=self.config.get('use_inotify', True),
+            poll_interval=self.config.get('poll_interval', 1.0)
+        )
+        self.logger.info(f"👀 开始监听指令队列: {self.order_file}（{type(watcher).__name__}）")
         
-        for order_id, position in self.manual_positions.items():
-            try:
-                ticker = self.trader.asterdex.get_ticker(position.symbol)
-                current_price = float(ticker['lastPrice'])
-                pnl_percent = position.calculate_pnl_percent(current_price)
-                
-                pos_dict = position.to_dict()
-                pos_dict['current_price'] = current_price
-                pos_dict['pnl_percent'] = pnl_percent
+        try:
+            while self.is_running:
+                try:
+                    self.process_order_queue()
+                except Exception as e:
+                    self.logger.error(f"指令队列处理异常: {e}", exc_info=True)
                 
-                positions.append(pos_dict)
-            except Exception as e:
-                self.logger.error(f"获取持仓信息失败: {e}")
+                # 超时后也检查一次，防止遗漏事件
+                watcher.wait(timeout=self.config.get('poll_interval', 1.0))
+        finally:
+            watcher.close()
+    
+    def process_order_queue(self) -> int:
+        """
+        执行指令队列中新增的指令（每条指令执行前后各写一次检查点，不会重复执行）
+        
+        Returns:
+            执行的指令数量
+        """
+        if self.order_queue is None:
+            self.order_queue = OrderQueue(self.order_file, self.config.get('queue_checkpoint_file'))
+        
+        executed = 0
+        for start, end, order_data in self.order_queue.read_new():
+            if order_data is None:
+                self.order_queue.commit(end)
+                continue
+            
+            try:
+                order = ManualOrder.from_dict(order_data)
+            except (KeyError, ValueError) as e:
+                self.logger.error(f"指令队列第 {start} 字节的指令无效，已跳过: {e}")
+                self.order_queue.commit(end)
+                continue
+            order.source = OrderSource.FILE
+            
+            self.order_queue.begin(start, end)
+            try:
+                self.execute_manual_order(order)
+                executed += 1
+            finally:
+                self.order_queue.commit(end)
         
-        return positions
+        return executed
+    
+    def get_positions_view(self) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        获取持仓视图（价格来自价格缓存；持仓、条件单和价格都没变时返回上次的结果，不重新计算）
+        
+        Returns:
+            (ETag, 持仓列表)，持仓列表由多个调用方共享，只读
+        """
+        items = list(self.manual_positions.items())
+        prices = self.get_cached_prices(sorted({position.symbol for _, position in items}))
+        
+        protections = {}
+        fingerprint = []
+        for order_id, position in items:
+            protection = self.protective_orders.get(f'manual:{order_id}') if self.protective_orders else None
+            protections[order_id] = protection.to_dict() if protection else None
+            fingerprint.append((
+                order_id,
+                position.stop_loss_price,
+                position.take_profit_price,
+                tuple(protections[order_id].values()) if protection else None,
+                prices.get(position.symbol)
+            ))
+        fingerprint = tuple(fingerprint)
+        
+        with self._view_lock:
+            if self._positions_view and self._positions_view[0] == fingerprint:
+                return self._positions_view[1], self._positions_view[2]
+        
+        positions = []
+        for order_id, position in items:
+            current_price, price_time = prices.get(position.symbol, (None, None))
+            
+            pos_dict = position.to_dict()
+            pos_dict['current_price'] = current_price
+            pos_dict['pnl_percent'] = position.calculate_pnl_percent(current_price) if current_price else None
+            pos_dict['price_time'] = datetime.fromtimestamp(price_time).isoformat() if price_time else None
+            pos_dict['protective_orders'] = protections[order_id]
+            positions.append(pos_dict)
+        
+        etag = hashlib.sha1(repr(fingerprint).encode('utf-8')).hexdigest()[:20]
+        with self._view_lock:
+            self._positions_view = (fingerprint, etag, positions)
+        
+        return etag, positions
+    
+    def get_manual_positions(self) -> List[Dict[str, Any]]:
+        """获取所有手动持仓"""
+        return [dict(position) for position in self.get_positions_view()[1]]
     
     def close_position_by_id(self, order_id: str) -> bool:
         """手动关闭指定持仓"""
@@ -493,12 +955,17 @@ class ManualOrderHandler:
         
         position = self.manual_positions[order_id]
         
+        # 触发平仓可能已在线程池中执行，不重复发出平仓单
+        if not self._begin_closing(order_id):
+            self.logger.warning(f"订单ID {order_id} 正在平仓")
+            return False
+        
         try:
-            ticker = self.trader.asterdex.get_ticker(position.symbol)
-            current_price = float(ticker['lastPrice'])
+            current_price = self._get_current_price(position.symbol)
             
-            self._close_manual_position(order_id, position, current_price)
-            return True
+            return self._close_manual_position(order_id, position, current_price)
         except Exception as e:
             self.logger.error(f"关闭持仓失败: {e}")
             return False
+        finally:
+            self._end_closing(order_id)
@@ -0,0 +1,305 @@
+"""
+手动交易指令队列模块
+
+指令文件是只追加的 JSONL（每行一个指令），按字节偏移读取新增的完整行，
+处理进度写入独立的检查点文件（写临时文件后原子替换），不改写指令文件本身，
+因此写入方只需追加一行，不会与读取方竞争同一文件内容。
+
+文件变化优先使用 Linux inotify 通知（通过 ctypes 调用 libc，无额外依赖），
+不可用时退回到按间隔检查文件大小 / inode 的轮询方式。
+"""
+import ctypes
+import ctypes.util
+import json
+import os
+import select
+import struct
+import sys
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from ..utils.logger import get_logger
+
+
+# inotify 事件掩码
+_IN_MODIFY = 0x00000002
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class InotifyWatcher:
+    """基于 inotify 的文件变化通知（监听所在目录，文件被创建、替换或追加时唤醒）"""
+    
+    def __init__(self, libc, fd: int, path: str):
+        self._libc = libc
+        self._fd = fd
+        self.path = path
+        self._name = os.fsencode(os.path.basename(path))
+    
+    @classmethod
+    def create(cls, path: str) -> Optional['InotifyWatcher']:
+        """
+        创建 inotify 监听
+        
+        Args:
+            path: 被监听的文件路径（所在目录必须存在）
+            
+        Returns:
+            InotifyWatcher，当前系统不支持 inotify 时返回 None
+        """
+        if not sys.platform.startswith('linux'):
+            return None
+        
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+            if fd < 0:
+                return None
+            
+            directory = os.fsencode(os.path.dirname(os.path.abspath(path)))
+            mask = _IN_MODIFY | _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE
+            if libc.inotify_add_watch(fd, directory, mask) < 0:
+                os.close(fd)
+                return None
+        except (OSError, AttributeError):
+            return None
+        
+        return cls(libc, fd, path)
+    
+    def wait(self, timeout: float) -> bool:
+        """
+        等待文件变化
+        
+        Args:
+            timeout: 最长等待时间（秒）
+            
+        Returns:
+            是否有该文件的变化事件
+        """
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return False
+        
+        changed = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            
+            offset = 0
+            while offset + _EVENT_HEADER.size <= len(data):
+                _, _, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                start = offset + _EVENT_HEADER.size
+                name = data[start:start + name_len].rstrip(b'\0')
+                if name == self._name:
+                    changed = True
+                offset = start + name_len
+        
+        return changed
+    
+    def close(self):
+        """关闭 inotify 文件描述符"""
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+class PollingWatcher:
+    """轮询文件大小 / inode / 修改时间的变化（inotify 不可用时使用）"""
+    
+    def __init__(self, path: str, poll_interval: float = 1.0):
+        self.path = path
+        self.poll_interval = poll_interval
+        self._last = self._stat()
+    
+    def _stat(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_size, st.st_mtime_ns
+    
+    def wait(self, timeout: float) -> bool:
+        """
+        等待文件变化
+        
+        Args:
+            timeout: 最长等待时间（秒）
+            
+        Returns:
+            文件是否变化
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            current = self._stat()
+            if current != self._last:
+                self._last = current
+                return True
+            
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(self.poll_interval, remaining))
+    
+    def close(self):
+        pass
+
+
+class OrderQueue:
+    """只追加 JSONL 指令队列（按字节偏移消费，检查点原子写入）"""
+    
+    def __init__(self, path: str, checkpoint_file: Optional[str] = None):
+        """
+        初始化指令队列
+        
+        Args:
+            path: JSONL 指令文件路径
+            checkpoint_file: 检查点文件路径（默认 <path>.offset）
+        """
+        self.path = path
+        self.checkpoint_file = checkpoint_file or f'{path}.offset'
+        self.logger = get_logger()
+        
+        self.offset = 0
+        self.inode: Optional[int] = None
+        self.pending: Optional[Tuple[int, int]] = None
+        self._load_checkpoint()
+    
+    # ==================== 检查点 ====================
+    
+    def _load_checkpoint(self):
+        """读取检查点；上次退出时有正在处理的指令则跳过它（已提交到交易所的指令不能重复执行）"""
+        try:
+            with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            self.logger.error(f"读取指令队列检查点失败，从头开始读取: {e}")
+            return
+        
+        self.offset = int(data.get('offset', 0))
+        self.inode = data.get('inode')
+        pending = data.get('pending')
+        
+        if pending:
+            start, end = pending
+            self.logger.error(
+                f"⚠️ 上次退出时指令队列第 {start}-{end} 字节的指令正在执行，结果未知，已跳过；请在交易所确认该笔订单"
+            )
+            self.offset = end
+            self._save_checkpoint()
+    
+    def _save_checkpoint(self):
+        """原子写入检查点（写临时文件、fsync 后替换）"""
+        data = {
+            'offset': self.offset,
+            'inode': self.inode,
+            'pending': list(self.pending) if self.pending else None
+        }
+        tmp_file = f'{self.checkpoint_file}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, self.checkpoint_file)
+    
+    def begin(self, start: int, end: int):
+        """
+        标记一条指令开始执行（执行前写入检查点）
+        
+        Args:
+            start: 指令行的起始偏移
+            end: 指令行的结束偏移（下一行的起始偏移）
+        """
+        self.pending = (start, end)
+        self._save_checkpoint()
+    
+    def commit(self, end: int):
+        """
+        标记一条指令处理完成，推进偏移
+        
+        Args:
+            end: 指令行的结束偏移
+        """
+        self.pending = None
+        self.offset = end
+        self._save_checkpoint()
+    
+    # ==================== 读取 ====================
+    
+    def read_new(self) -> List[Tuple[int, int, Optional[Dict[str, Any]]]]:
+        """
+        读取检查点之后新增的完整行（末尾没有换行符的行等写入方写完后再读取）
+        
+        Returns:
+            [(起始偏移, 结束偏移, 指令字典)]，无法解析的行指令字典为 None
+        """
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return []
+        
+        with f:
+            st = os.fstat(f.fileno())
+            
+            # 文件被替换或截断时从头读取
+            if self.inode is not None and (st.st_ino != self.inode or st.st_size < self.offset):
+                self.logger.warning(f"指令文件已被替换或截断，从头读取: {self.path}")
+                self.offset = 0
+            if self.inode != st.st_ino:
+                self.inode = st.st_ino
+                self._save_checkpoint()
+            
+            if st.st_size <= self.offset:
+                return []
+            
+            f.seek(self.offset)
+            data = f.read(st.st_size - self.offset)
+        
+        complete = data.rfind(b'\n') + 1
+        records = []
+        position = self.offset
+        for line in data[:complete].splitlines(keepends=True):
+            start, position = position, position + len(line)
+            text = line.strip()
+            if not text:
+                records.append((start, position, None))
+                continue
+            try:
+                record = json.loads(text)
+                if not isinstance(record, dict):
+                    raise ValueError('指令必须是 JSON 对象')
+            except ValueError as e:
+                self.logger.error(f"指令队列第 {start} 字节的行无法解析，已跳过: {e}")
+                record = None
+            records.append((start, position, record))
+        
+        return records
+    
+    def create_watcher(self, use_inotify: bool = True, poll_interval: float = 1.0):
+        """
+        创建文件变化监听（inotify 不可用时使用轮询）
+        
+        Args:
+            use_inotify: 是否优先使用 inotify
+            poll_interval: 轮询间隔（秒）
+            
+        Returns:
+            InotifyWatcher 或 PollingWatcher
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        
+        watcher = InotifyWatcher.create(self.path) if use_inotify else None
+        if watcher is None:
+            return PollingWatcher(self.path, poll_interval)
+        return watcher
@@ -0,0 +1,436 @@
+"""
+交易所止损 / 止盈单模块
+
+开仓后在交易所挂出只减仓的 STOP_MARKET / TAKE_PROFIT_MARKET 条件单，由交易所按标记价格触发，
+不再依赖本地轮询行情。一笔成交后撤销另一笔；持仓被主动平仓时撤销两笔。
+用户数据流推送订单成交时立即处理，没有数据流时由 sync 定期对账（一次请求全部挂单）。
+"""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Callable
+
+from .exchange_info import SymbolRules
+from ..utils.logger import get_logger
+
+
+# 条件单类型
+STOP_LOSS = 'STOP_MARKET'
+TAKE_PROFIT = 'TAKE_PROFIT_MARKET'
+
+# 不再挂在订单簿中、也没有成交的订单状态
+_INACTIVE_STATUSES = ('CANCELED', 'EXPIRED', 'REJECTED')
+
+
+@dataclass
+class ProtectiveOrders:
+    """一个持仓在交易所挂出的止损 / 止盈单"""
+    key: str                                    # 持仓标识（如 manual:订单ID、strategy:交易对）
+    symbol: str
+    side: str                                   # 持仓方向（LONG/SHORT）
+    quantity: float
+    stop_loss_price: Optional[float] = None
+    take_profit_price: Optional[float] = None
+    stop_loss_order_id: Optional[int] = None
+    take_profit_order_id: Optional[int] = None
+    triggered: Optional[str] = None             # 已成交的条件单类型
+    
+    @property
+    def close_side(self) -> str:
+        """平仓方向"""
+        return 'SELL' if self.side == 'LONG' else 'BUY'
+    
+    @property
+    def order_ids(self) -> Dict[int, str]:
+        """挂单中的条件单 {订单ID: 条件单类型}"""
+        ids = {}
+        if self.stop_loss_order_id is not None:
+            ids[self.stop_loss_order_id] = STOP_LOSS
+        if self.take_profit_order_id is not None:
+            ids[self.take_profit_order_id] = TAKE_PROFIT
+        return ids
+    
+    @property
+    def complete(self) -> bool:
+        """设置了价格的条件单是否都已挂出（否则需要本地轮询兜底）"""
+        return (
+            (self.stop_loss_price is None or self.stop_loss_order_id is not None)
+            and (self.take_profit_price is None or self.take_profit_order_id is not None)
+        )
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            'key': self.key,
+            'symbol': self.symbol,
+            'side': self.side,
+            'quantity': self.quantity,
+            'stop_loss_price': self.stop_loss_price,
+            'take_profit_price': self.take_profit_price,
+            'stop_loss_order_id': self.stop_loss_order_id,
+            'take_profit_order_id': self.take_profit_order_id,
+            'triggered': self.triggered
+        }
+
+
+class ProtectiveOrderManager:
+    """交易所止损 / 止盈单管理（交易器和手动交易共享）"""
+    
+    def __init__(self, client, account_state=None, working_type: str = 'MARK_PRICE'):
+        """
+        初始化条件单管理器
+        
+        Args:
+            client: AsterDexClient 实例
+            account_state: AccountStateService 实例（可选，订阅订单推送并提供本地挂单）
+            working_type: 触发价格类型（MARK_PRICE/CONTRACT_PRICE）
+        """
+        self.client = client
+        self.account_state = account_state
+        self.working_type = working_type
+        self.logger = get_logger()
+        
+        self._orders: Dict[str, ProtectiveOrders] = {}
+        self._keys_by_order_id: Dict[int, str] = {}
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[ProtectiveOrders], None]] = []
+        
+        # 正在挂单的数量，以及挂单期间收到的未知订单推送 {订单ID: 状态}（挂单完成后补处理）
+        self._placing = 0
+        self._early_updates: Dict[int, Optional[str]] = {}
+        
+        # 推送回调在数据流线程中执行，撤单请求放到后台线程
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='ProtectiveOrders')
+        
+        if account_state:
+            account_state.add_order_listener(self.on_order_update)
+    
+    def add_listener(self, callback: Callable[[ProtectiveOrders], None]):
+        """
+        注册条件单成交回调（持仓已被交易所平仓）
+        
+        Args:
+            callback: callback(ProtectiveOrders)，triggered 为成交的条件单类型
+        """
+        self._listeners.append(callback)
+    
+    # ==================== 挂单 / 撤单 ====================
+    
+    def place(
+        self,
+        key: str,
+        symbol: str,
+        side: str,
+        quantity: float,
+        stop_loss_price: Optional[float] = None,
+        take_profit_price: Optional[float] = None,
+        rules: Optional[SymbolRules] = None
+    ) -> ProtectiveOrders:
+        """
+        挂出止损 / 止盈单（同一标识下已有的条件单先撤销）
+        
+        Args:
+            key: 持仓标识
+            symbol: 交易对符号
+            side: 持仓方向（LONG/SHORT）
+            quantity: 持仓数量
+            stop_loss_price: 止损触发价格
+            take_profit_price: 止盈触发价格
+            rules: 交易对规则（触发价格取整到价格步长）
+            
+        Returns:
+            ProtectiveOrders，挂单失败的一侧订单ID为 None
+        """
+        self.cancel(key)
+        
+        if rules:
+            stop_loss_price = rules.round_price(stop_loss_price) if stop_loss_price else stop_loss_price
+            take_profit_price = rules.round_price(take_profit_price) if take_profit_price else take_profit_price
+        
+        orders = ProtectiveOrders(
+            key=key,
+            symbol=symbol,
+            side=side,
+            quantity=quantity,
+            stop_loss_price=stop_loss_price,
+            take_profit_price=take_profit_price
+        )
+        
+        with self._lock:
+            self._orders[key] = orders
+            self._placing += 1
+        
+        # 挂单请求不持有锁，推送处理和查询不等待交易所响应
+        stop_loss_order_id = take_profit_order_id = None
+        try:
+            stop_loss_order_id = self._place_one(orders, STOP_LOSS, stop_loss_price) if stop_loss_price else None
+            take_profit_order_id = self._place_one(orders, TAKE_PROFIT, take_profit_price) if take_profit_price else None
+        finally:
+            with self._lock:
+                orders.stop_loss_order_id = stop_loss_order_id
+                orders.take_profit_order_id = take_profit_order_id
+                
+                registered = self._orders.get(key) is orders
+                if registered:
+                    for order_id in orders.order_ids:
+                        self._keys_by_order_id[order_id] = key
+                
+                # 挂单期间先到达的推送
+                early = [
+                    (order_id, self._early_updates.pop(order_id))
+                    for order_id in orders.order_ids
+                    if order_id in self._early_updates
+                ]
+                self._placing -= 1
+                if self._placing == 0:
+                    self._early_updates.clear()
+        
+        if not registered:
+            # 挂单期间持仓已被平仓（记录已被撤销），撤销刚挂出的条件单
+            for order_id, order_type in orders.order_ids.items():
+                self._cancel_one(orders.symbol, order_id, order_type)
+            return orders
+        
+        for order_id, status in early:
+            self._apply_status(order_id, status)
+        
+        return orders
+    
+    def _place_one(self, orders: ProtectiveOrders, order_type: str, stop_price: float) -> Optional[int]:
+        """挂出一笔条件单，失败时返回 None（由本地轮询兜底）"""
+        try:
+            result = self.client.place_order(
+                symbol=orders.symbol,
+                side=orders.close_side,
+                order_type=order_type,
+                quantity=str(orders.quantity),
+                position_side='BOTH',
+                reduce_only=True,
+                stop_price=str(stop_price),
+                working_type=self.working_type
+            )
+            order_id = int(result['orderId'])
+            self.logger.info(f"🛡️ {orders.symbol} {order_type} 已挂单: 触发价 {stop_price}，订单ID {order_id}")
+            return order_id
+        except Exception as e:
+            self.logger.error(f"❌ {orders.symbol} {order_type} 挂单失败（改为本地监控）: {e}")
+            return None
+    
+    def cancel(self, key: str) -> Optional[ProtectiveOrders]:
+        """
+        撤销一个持仓的全部条件单（持仓被主动平仓时调用）
+        
+        Args:
+            key: 持仓标识
+            
+        Returns:
+            被撤销的 ProtectiveOrders，没有记录时返回 None
+        """
+        with self._lock:
+            orders = self._orders.pop(key, None)
+            if orders is None:
+                return None
+            for order_id in orders.order_ids:
+                self._keys_by_order_id.pop(order_id, None)
+        
+        for order_id, order_type in orders.order_ids.items():
+            self._cancel_one(orders.symbol, order_id, order_type)
+        
+        return orders
+    
+    def _cancel_one(self, symbol: str, order_id: int, order_type: str):
+        """撤销一笔条件单（已成交或已撤销时交易所返回错误，忽略）"""
+        try:
+            self.client.cancel_order(symbol, order_id)
+            self.logger.info(f"{symbol} {order_type} 已撤销: 订单ID {order_id}")
+        except Exception as e:
+            self.logger.warning(f"{symbol} {order_type} 撤销失败（可能已成交或已撤销）: {e}")
+    
+    def amend_stop_loss(self, key: str, stop_price: float, rules: Optional[SymbolRules] = None) -> bool:
+        """
+        修改止损触发价（先挂新止损单再撤旧单，持仓始终有止损保护）
+        
+        Args:
+            key: 持仓标识
+            stop_price: 新的止损触发价格
+            rules: 交易对规则（触发价格取整到价格步长）
+            
+        Returns:
+            是否修改成功
+        """
+        with self._lock:
+            orders = self._orders.get(key)
+        if orders is None:
+            return False
+        
+        if rules:
+            stop_price = rules.round_price(stop_price)
+        if stop_price == orders.stop_loss_price and orders.stop_loss_order_id is not None:
+            return True
+        
+        new_id = self._place_one(orders, STOP_LOSS, stop_price)
+        if new_id is None:
+            return False
+        
+        with self._lock:
+            if self._orders.get(key) is not orders:
+                # 挂单期间持仓已被平仓
+                replaced = False
+            else:
+                replaced = True
+                old_id = orders.stop_loss_order_id
+                orders.stop_loss_order_id = new_id
+                orders.stop_loss_price = stop_price
+                self._keys_by_order_id[new_id] = key
+                if old_id is not None:
+                    self._keys_by_order_id.pop(old_id, None)
+        
+        if not replaced:
+            self._cancel_one(orders.symbol, new_id, STOP_LOSS)
+            return False
+        
+        if old_id is None:
+            return True
+        
+        try:
+            self.client.cancel_order(orders.symbol, old_id)
+            return True
+        except Exception as e:
+            self.logger.warning(f"{orders.symbol} 旧止损单 {old_id} 撤销失败: {e}")
+        
+        # 撤单失败通常是旧止损单刚刚成交：按成交处理，撤销新止损单和止盈单
+        try:
+            status = self.client.get_order(orders.symbol, old_id).get('status')
+        except Exception as e:
+            self.logger.warning(f"查询条件单 {old_id} 失败: {e}")
+            return True
+        
+        if status == 'FILLED':
+            with self._lock:
+                orders.stop_loss_order_id = old_id
+                self._keys_by_order_id[old_id] = key
+                self._keys_by_order_id.pop(new_id, None)
+            self._cancel_one(orders.symbol, new_id, STOP_LOSS)
+            self._apply_status(old_id, 'FILLED')
+            return False
+        
+        return True
+    
+    def get(self, key: str) -> Optional[ProtectiveOrders]:
+        """获取一个持仓的条件单"""
+        with self._lock:
+            return self._orders.get(key)
+    
+    def keys(self, prefix: str = '') -> List[str]:
+        """指定前缀的持仓标识"""
+        with self._lock:
+            return [key for key in self._orders if key.startswith(prefix)]
+    
+    # ==================== 成交同步 ====================
+    
+    def on_order_update(self, order: Dict[str, Any]):
+        """
+        处理用户数据流的订单推送
+        
+        Args:
+            order: ORDER_TRADE_UPDATE 中的订单字段 o
+        """
+        order_id = int(order['i'])
+        with self._lock:
+            if order_id not in self._keys_by_order_id:
+                # 条件单可能已挂出但订单ID尚未登记
+                if self._placing:
+                    self._early_updates[order_id] = order.get('X')
+                return
+        
+        self._executor.submit(self._apply_status, order_id, order.get('X'))
+    
+    def sync(self, keys: Optional[List[str]] = None) -> List[ProtectiveOrders]:
+        """
+        对账：找出已经不在挂单中的条件单并查询结果（没有用户数据流时的兜底）
+        
+        Args:
+            keys: 需要对账的持仓标识，默认全部
+            
+        Returns:
+            本次发现已成交（持仓已被交易所平仓）的 ProtectiveOrders
+        """
+        with self._lock:
+            tracked = {
+                order_id: orders
+                for key, orders in self._orders.items()
+                if keys is None or key in keys
+                for order_id in orders.order_ids
+            }
+        
+        if not tracked:
+            return []
+        
+        if self.account_state and self.account_state.is_ready():
+            open_orders = self.account_state.get_open_orders()
+        else:
+            open_orders = self.client.get_open_orders()
+        open_ids = {int(order['orderId']) for order in open_orders}
+        
+        triggered = []
+        for order_id, orders in tracked.items():
+            if order_id in open_ids:
+                continue
+            try:
+                status = self.client.get_order(orders.symbol, order_id).get('status')
+            except Exception as e:
+                self.logger.warning(f"查询条件单 {order_id} 失败: {e}")
+                continue
+            result = self._apply_status(order_id, status)
+            if result is not None:
+                triggered.append(result)
+        
+        return triggered
+    
+    def _apply_status(self, order_id: int, status: Optional[str]) -> Optional[ProtectiveOrders]:
+        """
+        根据订单状态更新记录：成交时撤销另一笔并通知，被外部撤销时清除该笔（改为本地监控）
+        
+        Returns:
+            成交时返回 ProtectiveOrders，否则返回 None
+        """
+        with self._lock:
+            key = self._keys_by_order_id.get(order_id)
+            orders = self._orders.get(key) if key else None
+            if orders is None:
+                return None
+            
+            order_type = orders.order_ids.get(order_id)
+            
+            if status == 'FILLED':
+                orders.triggered = order_type
+                del self._orders[key]
+                for other_id in orders.order_ids:
+                    self._keys_by_order_id.pop(other_id, None)
+            elif status in _INACTIVE_STATUSES:
+                self._keys_by_order_id.pop(order_id, None)
+                if order_type == STOP_LOSS:
+                    orders.stop_loss_order_id = None
+                else:
+                    orders.take_profit_order_id = None
+                self.logger.warning(f"{orders.symbol} {order_type} 已失效（{status}），改为本地监控")
+                return None
+            else:
+                return None
+        
+        self.logger.info(f"🎯 {orders.symbol} {order_type} 已成交，持仓已由交易所平仓")
+        for other_id, other_type in orders.order_ids.items():
+            if other_id != order_id:
+                self._cancel_one(orders.symbol, other_id, other_type)
+        
+        for listener in self._listeners:
+            try:
+                listener(orders)
+            except Exception as e:
+                self.logger.error(f"条件单成交回调出错: {e}")
+        
+        return orders
+    
+    def shutdown(self):
+        """关闭后台线程"""
+        self._executor.shutdown(wait=True)
@@ -4,6 +4,7 @@
 from typing import Dict, Any, Optional
 from decimal import Decimal, ROUND_DOWN
 
+from .exchange_info import SymbolRules
 from ..utils.logger import get_logger
 
 
@@ -14,7 +15,9 @@ class RiskManager:
         self,
         max_leverage: int = 5,
         max_position_percent: float = 30.0,
-        margin_type: str = 'ISOLATED'
+        margin_type: str = 'ISOLATED',
+        stop_loss_percent: Optional[float] = None,
+        take_profit_percent: Optional[float] = None
     ):
         """
         初始化风险管理器
@@ -23,10 +26,14 @@ class RiskManager:
             max_leverage: 最大杠杆倍数
             max_position_percent: 单币种最大保证金占用百分比
             margin_type: 保证金类型（ISOLATED/CROSSED）
+            stop_loss_percent: 策略开仓的止损百分比（None 表示不设置止损）
+            take_profit_percent: 策略开仓的止盈百分比（None 表示不设置止盈）
         """
         self.max_leverage = max_leverage
         self.max_position_percent = max_position_percent
         self.margin_type = margin_type
+        self.stop_loss_percent = stop_loss_percent
+        self.take_profit_percent = take_profit_percent
         self.logger = get_logger()
     
     def calculate_position_size(
@@ -34,7 +41,7 @@ class RiskManager:
         available_balance: float,
         current_price: float,
         leverage: int,
-        symbol_info: Dict[str, Any]
+        symbol_info
     ) -> Dict[str, Any]:
         """
         计算仓位大小
@@ -43,7 +50,7 @@ class RiskManager:
             available_balance: 可用余额（USDT）
             current_price: 当前价格
             leverage: 杠杆倍数
-            symbol_info: 交易对信息
+            symbol_info: 交易对规则（SymbolRules）或 exchangeInfo 中的交易对信息
             
         Returns:
             仓位信息，包含：
@@ -80,37 +87,19 @@ class RiskManager:
     def _apply_lot_size_filter(
         self,
         quantity: float,
-        symbol_info: Dict[str, Any]
+        symbol_info
     ) -> float:
         """
         应用交易所的LOT_SIZE过滤器
         
         Args:
             quantity: 原始数量
-            symbol_info: 交易对信息
+            symbol_info: 交易对规则（SymbolRules）或 exchangeInfo 中的交易对信息
             
         Returns:
             调整后的数量
         """
-        # 从 exchangeInfo 中查找 LOT_SIZE 过滤器
-        filters = symbol_info.get('filters', [])
-        
-        for f in filters:
-            if f.get('filterType') == 'LOT_SIZE':
-                min_qty = float(f.get('minQty', 0))
-                max_qty = float(f.get('maxQty', float('inf')))
-                step_size = float(f.get('stepSize', 0.01))
-                
-                # 确保数量在范围内
-                quantity = max(min_qty, min(quantity, max_qty))
-                
-                # 向下取整到 step_size
-                if step_size > 0:
-                    quantity = float(Decimal(str(quantity)) - Decimal(str(quantity)) % Decimal(str(step_size)))
-                
-                break
-        
-        return quantity
+        return self._get_rules(symbol_info).round_quantity(quantity)
     
     def validate_order(
         self,
@@ -118,7 +107,7 @@ class RiskManager:
         side: str,
         quantity: float,
         price: float,
-        symbol_info: Dict[str, Any]
+        symbol_info
     ) -> tuple[bool, str]:
         """
         验证订单是否符合交易所规则
@@ -128,59 +117,19 @@ class RiskManager:
             side: 买卖方向
             quantity: 数量
             price: 价格
-            symbol_info: 交易对信息
+            symbol_info: 交易对规则（SymbolRules）或 exchangeInfo 中的交易对信息
             
         Returns:
             (是否有效, 错误信息)
         """
-        filters = symbol_info.get('filters', [])
-        
-        for f in filters:
-            filter_type = f.get('filterType')
-            
-            # 价格过滤器
-            if filter_type == 'PRICE_FILTER':
-                min_price = float(f.get('minPrice', 0))
-                max_price = float(f.get('maxPrice', float('inf')))
-                tick_size = float(f.get('tickSize', 0.01))
-                
-                if price < min_price:
-                    return False, f"价格 {price} 低于最小价格 {min_price}"
-                if price > max_price:
-                    return False, f"价格 {price} 高于最大价格 {max_price}"
-                
-                # 检查价格精度
-                if tick_size > 0:
-                    price_mod = float(Decimal(str(price)) % Decimal(str(tick_size)))
-                    if price_mod != 0:
-                        return False, f"价格 {price} 不符合价格步长 {tick_size}"
-            
-            # 数量过滤器
-            elif filter_type == 'LOT_SIZE':
-                min_qty = float(f.get('minQty', 0))
-                max_qty = float(f.get('maxQty', float('inf')))
-                step_size = float(f.get('stepSize', 0.01))
-                
-                if quantity < min_qty:
-                    return False, f"数量 {quantity} 低于最小数量 {min_qty}"
-                if quantity > max_qty:
-                    return False, f"数量 {quantity} 高于最大数量 {max_qty}"
-                
-                # 检查数量精度
-                if step_size > 0:
-                    qty_mod = float(Decimal(str(quantity)) % Decimal(str(step_size)))
-                    if qty_mod != 0:
-                        return False, f"数量 {quantity} 不符合数量步长 {step_size}"
-            
-            # 名义价值过滤器
-            elif filter_type == 'MIN_NOTIONAL':
-                min_notional = float(f.get('notional', 0))
-                notional = price * quantity
-                
-                if notional < min_notional:
-                    return False, f"名义价值 {notional} 低于最小值 {min_notional}"
-        
-        return True, ""
+        return self._get_rules(symbol_info).validate(quantity, price)
+    
+    @staticmethod
+    def _get_rules(symbol_info) -> SymbolRules:
+        """获取预编译规则（传入原始交易对信息时现场编译）"""
+        if isinstance(symbol_info, SymbolRules):
+            return symbol_info
+        return SymbolRules.from_symbol_info(symbol_info)
     
     def calculate_stop_loss(
         self,
@@ -0,0 +1,242 @@
+"""
+交易对并发执行模块
+
+每个交易对的 获取K线 → 分析 → 执行 流程在有界线程池中并发运行，
+一个交易对的慢请求或 AI 二次确认不会推迟其他交易对的检查。
+每个交易对有独立的超时时间，超时后本周期不再等待，上一轮仍在执行的交易对在下一周期跳过；
+任务通过计时器的 deadline / expired() 得知是否已超时，超时后不应再下单。
+每个周期记录各交易对各阶段耗时，并输出决定周期耗时的关键路径。
+"""
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future, CancelledError, wait, FIRST_COMPLETED
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from ..utils.logger import get_logger
+
+
+class SymbolTimer:
+    """单个交易对一次执行的分阶段计时"""
+    
+    __slots__ = ('symbol', 'submitted_at', 'started_at', 'finished_at', 'deadline', 'stages')
+    
+    def __init__(self, symbol: str):
+        self.symbol = symbol
+        self.submitted_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.deadline: Optional[float] = None   # 超时时刻（time.perf_counter），开始执行时设置
+        self.stages: Dict[str, float] = {}     # {阶段名称: 毫秒}
+    
+    def expired(self) -> bool:
+        """是否已超过超时时刻（超时后执行器不再等待该任务）"""
+        return self.deadline is not None and time.perf_counter() >= self.deadline
+    
+    @contextmanager
+    def stage(self, name: str):
+        """记录一个阶段的耗时"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+    
+    def summary(self, end: Optional[float] = None) -> Dict[str, Any]:
+        """
+        计时汇总
+        
+        Args:
+            end: 结束时刻（未完成的任务传入超时时刻）
+            
+        Returns:
+            排队时间、执行时间和各阶段耗时（毫秒）
+        """
+        end = self.finished_at or end or time.perf_counter()
+        started = self.started_at or end
+        return {
+            'queue_ms': round((started - self.submitted_at) * 1000, 1),
+            'run_ms': round((end - started) * 1000, 1),
+            'total_ms': round((end - self.submitted_at) * 1000, 1),
+            'stages': {name: round(ms, 1) for name, ms in self.stages.items()}
+        }
+
+
+class SymbolPipeline:
+    """按交易对并发执行策略流程"""
+    
+    def __init__(
+        self,
+        name: str,
+        max_workers: int = 4,
+        symbol_timeout: float = 60.0,
+        history_size: int = 100
+    ):
+        """
+        初始化执行器
+        
+        Args:
+            name: 名称（日志和线程名）
+            max_workers: 最大并发交易对数量
+            symbol_timeout: 单个交易对从开始执行算起的超时秒数
+            history_size: 保留的周期耗时样本数量
+        """
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.symbol_timeout = symbol_timeout
+        self.logger = get_logger()
+        
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f'{name}Symbol')
+        self._in_flight: Dict[str, Tuple[Future, SymbolTimer]] = {}
+        self._lock = threading.Lock()
+        
+        self.last_cycle: Optional[Dict[str, Any]] = None
+        self.cycle_ms: deque = deque(maxlen=history_size)
+    
+    def run(self, symbols: List[str], task: Callable[[str, SymbolTimer], Any]) -> Dict[str, Any]:
+        """
+        并发执行一个周期
+        
+        Args:
+            symbols: 交易对列表
+            task: task(交易对, 计时器)，在计时器的 stage 中执行各阶段，下单前检查 timer.expired()
+            
+        Returns:
+            {交易对: task 返回值}，失败的交易对对应异常对象，超时的交易对对应 TimeoutError，
+            上一轮仍在执行而跳过的交易对不包含在内
+        """
+        cycle_start = time.perf_counter()
+        futures: Dict[str, Tuple[Future, SymbolTimer]] = {}
+        skipped = []
+        
+        with self._lock:
+            for symbol in symbols:
+                previous = self._in_flight.get(symbol)
+                if previous and not previous[0].done():
+                    skipped.append(symbol)
+                    continue
+                timer = SymbolTimer(symbol)
+                future = self._executor.submit(self._run_symbol, symbol, task, timer, self.symbol_timeout)
+                futures[symbol] = (future, timer)
+                self._in_flight[symbol] = (future, timer)
+        
+        if skipped:
+            self.logger.warning(f"{self.name} 上一轮仍在执行，跳过: {', '.join(skipped)}")
+        
+        results: Dict[str, Any] = {}
+        ended: Dict[str, float] = {}
+        timed_out = []
+        pending = set(futures)
+        
+        while pending:
+            now = time.perf_counter()
+            timeout = None
+            
+            for symbol in list(pending):
+                future, timer = futures[symbol]
+                if future.done():
+                    pending.discard(symbol)
+                    if future.cancelled():
+                        results[symbol] = CancelledError(f"{symbol} 已取消")
+                    else:
+                        error = future.exception()
+                        results[symbol] = error if error is not None else future.result()
+                    ended[symbol] = timer.finished_at or now
+                elif timer.started_at is None:
+                    # 仍在排队等待空闲线程，排队时间不计入超时
+                    timeout = 0.05 if timeout is None else min(timeout, 0.05)
+                elif now >= timer.deadline:
+                    pending.discard(symbol)
+                    timed_out.append(symbol)
+                    results[symbol] = TimeoutError(f"{symbol} 执行超过 {self.symbol_timeout}s")
+                    ended[symbol] = now
+                    future.add_done_callback(lambda f, t=timer: self._log_late(t))
+                else:
+                    remaining = timer.deadline - now
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+            
+            if pending:
+                wait([futures[s][0] for s in pending], timeout=timeout, return_when=FIRST_COMPLETED)
+        
+        self._report(cycle_start, futures, ended, results, skipped, timed_out)
+        return results
+    
+    @staticmethod
+    def _run_symbol(
+        symbol: str,
+        task: Callable[[str, SymbolTimer], Any],
+        timer: SymbolTimer,
+        symbol_timeout: float
+    ) -> Any:
+        start = time.perf_counter()
+        # 先设置超时时刻：执行器看到 started_at 时 deadline 已经可用
+        timer.deadline = start + symbol_timeout
+        timer.started_at = start
+        try:
+            return task(symbol, timer)
+        finally:
+            timer.finished_at = time.perf_counter()
+    
+    def _log_late(self, timer: SymbolTimer):
+        """超时的任务最终完成时记录耗时"""
+        summary = timer.summary()
+        self.logger.warning(f"{self.name} {timer.symbol} 超时后完成，耗时 {summary['run_ms']:.0f}ms {summary['stages']}")
+    
+    def _report(
+        self,
+        cycle_start: float,
+        futures: Dict[str, Tuple[Future, SymbolTimer]],
+        ended: Dict[str, float],
+        results: Dict[str, Any],
+        skipped: List[str],
+        timed_out: List[str]
+    ):
+        """汇总本周期耗时并输出关键路径"""
+        wall_ms = (time.perf_counter() - cycle_start) * 1000
+        per_symbol = {symbol: timer.summary(ended.get(symbol)) for symbol, (_, timer) in futures.items()}
+        
+        critical = max(per_symbol, key=lambda s: per_symbol[s]['total_ms']) if per_symbol else None
+        failed = [s for s, r in results.items() if isinstance(r, Exception) and s not in timed_out]
+        
+        self.last_cycle = {
+            'wall_ms': round(wall_ms, 1),
+            'serial_ms': round(sum(s['run_ms'] for s in per_symbol.values()), 1),
+            'symbols': len(futures),
+            'workers': self.max_workers,
+            'critical_path': dict(symbol=critical, **per_symbol[critical]) if critical else None,
+            'skipped': skipped,
+            'timed_out': timed_out,
+            'failed': failed,
+            'per_symbol': per_symbol
+        }
+        self.cycle_ms.append(wall_ms)
+        
+        if critical:
+            path = per_symbol[critical]
+            stages = ' / '.join(f"{name} {ms:.0f}ms" for name, ms in path['stages'].items())
+            self.logger.info(
+                f"⏱️ {self.name} 周期 {wall_ms:.0f}ms（{len(futures)} 个交易对，"
+                f"逐个执行合计 {self.last_cycle['serial_ms']:.0f}ms），"
+                f"关键路径 {critical} {path['total_ms']:.0f}ms: 排队 {path['queue_ms']:.0f}ms"
+                + (f" / {stages}" if stages else "")
+            )
+    
+    def metrics(self) -> Dict[str, Any]:
+        """
+        执行统计
+        
+        Returns:
+            最近一个周期的汇总和周期耗时样本的中位数 / 最大值（毫秒）
+        """
+        samples = sorted(self.cycle_ms)
+        return {
+            'last_cycle': self.last_cycle,
+            'cycles': len(samples),
+            'cycle_ms_p50': samples[len(samples) // 2] if samples else None,
+            'cycle_ms_max': samples[-1] if samples else None
+        }
+    
+    def shutdown(self, wait: bool = True):
+        """关闭线程池（未开始的任务直接取消）"""
+        self._executor.shutdown(wait=wait, cancel_futures=True)
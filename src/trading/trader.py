@@ -1,25 +1,35 @@
 """
 交易执行器模块
 """
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable
+import threading
 import time
 
 from ..api import AsterDexClient, DeepSeekClient
 from ..strategies import DoubleMaStrategy
 from .risk_manager import RiskManager
+from .exchange_info import ExchangeInfoService, SymbolRules
 from ..utils.logger import get_logger
 
 
 class Trader:
     """交易执行器"""
     
+    # 所有交易器共享同一账户：读取余额到下单之间串行，避免并发开仓重复使用同一份可用余额
+    _order_lock = threading.Lock()
+    
     def __init__(
         self,
         asterdex_client: AsterDexClient,
         deepseek_client: Optional[DeepSeekClient],
         risk_manager: RiskManager,
         strategy: DoubleMaStrategy,
-        leverage: int = 5
+        leverage: int = 5,
+        account_state=None,
+        exchange_info: Optional[ExchangeInfoService] = None,
+        market_snapshot=None,
+        protective_orders=None,
+        trailing_stops=None
     ):
         """
         初始化交易执行器
@@ -30,24 +40,32 @@ class Trader:
             risk_manager: 风险管理器
             strategy: 交易策略
             leverage: 杠杆倍数
+            account_state: AccountStateService 实例（可选，提供本地账户快照）
+            exchange_info: 共享的交易所信息缓存（可选，不传入时自行创建）
+            market_snapshot: 共享的行情快照（可选，合并各模块的价格请求）
+            protective_orders: 共享的 ProtectiveOrderManager（可选，开仓后在交易所挂止损 / 止盈单）
+            trailing_stops: 共享的 TrailingStopEngine（可选，按价格移动交易所止损单）
         """
         self.asterdex = asterdex_client
         self.deepseek = deepseek_client
         self.risk_manager = risk_manager
         self.strategy = strategy
         self.leverage = leverage
+        self.account_state = account_state
+        self.market_snapshot = market_snapshot
+        self.protective_orders = protective_orders
+        self.trailing_stops = trailing_stops
         self.logger = get_logger()
         
-        # 缓存交易所信息
-        self.exchange_info = None
-        self.symbol_info_cache = {}
+        # 交易所信息缓存（多个交易器共享同一实例）
+        self.exchange_info = exchange_info or ExchangeInfoService(asterdex_client, cache_file=None)
     
     def initialize(self):
         """初始化交易器"""
         try:
-            # 获取交易所信息
-            self.exchange_info = self.asterdex.get_exchange_info()
-            self.logger.info("成功获取交易所信息")
+            # 获取交易所信息（共享缓存已加载时不再下载）
+            if not self.exchange_info.is_loaded:
+                self.exchange_info.load()
             
             # 测试连接
             self.asterdex.ping()
@@ -57,6 +75,20 @@ class Trader:
             self.logger.error(f"初始化失败: {e}")
             raise
     
+    def get_price(self, symbol: str) -> float:
+        """
+        获取最新价格（有行情快照时与其他模块共享请求）
+        
+        Args:
+            symbol: 交易对符号
+            
+        Returns:
+            最新价格
+        """
+        if self.market_snapshot:
+            return self.market_snapshot.get_price(symbol)
+        return float(self.asterdex.get_ticker_price(symbol)['price'])
+    
     def get_symbol_info(self, symbol: str) -> Optional[Dict[str, Any]]:
         """
         获取交易对信息
@@ -67,19 +99,19 @@ class Trader:
         Returns:
             交易对信息
         """
-        if symbol in self.symbol_info_cache:
-            return self.symbol_info_cache[symbol]
-        
-        if not self.exchange_info:
-            return None
-        
-        symbols = self.exchange_info.get('symbols', [])
-        for s in symbols:
-            if s.get('symbol') == symbol:
-                self.symbol_info_cache[symbol] = s
-                return s
+        return self.exchange_info.get_symbol_info(symbol)
+    
+    def get_symbol_rules(self, symbol: str) -> Optional[SymbolRules]:
+        """
+        获取交易对预编译规则（步长、精度、最小名义价值）
         
-        return None
+        Args:
+            symbol: 交易对符号
+            
+        Returns:
+            SymbolRules
+        """
+        return self.exchange_info.get_rules(symbol)
     
     def setup_symbol(self, symbol: str):
         """
@@ -110,7 +142,8 @@ class Trader:
         self,
         symbol: str,
         signal: Dict[str, Any],
-        interval: str
+        interval: str,
+        expired: Optional[Callable[[], bool]] = None
     ) -> Optional[Dict[str, Any]]:
         """
         执行交易信号
@@ -119,6 +152,7 @@ class Trader:
             symbol: 交易对符号
             signal: 交易信号
             interval: K线间隔
+            expired: 返回本次执行是否已超时的函数（可选，超时后不再下单）
             
         Returns:
             订单信息
@@ -129,14 +163,12 @@ class Trader:
             return None
         
         try:
-            # 获取账户余额
-            balance_info = self.asterdex.get_balance()
+            # 获取账户余额和当前持仓
+            balance_info, positions = self._get_account_snapshot(symbol)
             available_balance = self._get_available_balance(balance_info)
             
             self.logger.info(f"可用余额: {available_balance:.2f} USDT")
             
-            # 获取当前持仓
-            positions = self.asterdex.get_position_info(symbol)
             current_position = self._get_current_position(positions, symbol)
             
             # 检查风险
@@ -149,6 +181,8 @@ class Trader:
             # 如果是平仓信号
             if action == 'CLOSE':
                 if current_position and current_position['position_amt'] != 0:
+                    if self._is_expired(symbol, expired):
+                        return None
                     return self._close_position(symbol, current_position)
                 else:
                     self.logger.info(f"{symbol} 没有持仓，无需平仓")
@@ -176,13 +210,49 @@ class Trader:
                     except Exception as e:
                         self.logger.warning(f"AI 分析异常（使用本地策略继续）: {e}")
                 
-                # 执行开仓
-                return self._open_position(symbol, action, available_balance, signal)
-        
+                # 执行开仓（AI 确认期间其他交易对可能已经开仓，下单前重新读取余额和持仓）
+                with self._order_lock:
+                    balance_info, positions = self._get_account_snapshot(symbol)
+                    if self._get_current_position(positions, symbol):
+                        self.logger.warning(f"{symbol} 已有持仓，跳过开仓信号")
+                        return None
+                    available_balance = self._get_available_balance(balance_info)
+                    if self._is_expired(symbol, expired):
+                        return None
+                    return self._open_position(symbol, action, available_balance, signal)
+                    
         except Exception as e:
             self.logger.error(f"执行信号失败 [{symbol}]: {e}")
             return None
     
+    def _is_expired(self, symbol: str, expired: Optional[Callable[[], bool]]) -> bool:
+        """执行已超时（执行器不再等待）时跳过下单"""
+        if expired is not None and expired():
+            self.logger.warning(f"{symbol} 执行超时，跳过下单")
+            return True
+        return False
+    
+    def _get_account_snapshot(self, symbol: str) -> tuple:
+        """
+        获取余额和持仓
+        
+        账户状态服务可用时读取本地快照（全部持仓），否则通过 REST 查询该交易对。
+        推送不含可用余额，成交或余额变化后先同步刷新余额，避免按过期的可用余额下单
+        
+        Args:
+            symbol: 交易对符号
+            
+        Returns:
+            (余额信息, 持仓列表)
+        """
+        if self.account_state and self.account_state.is_ready():
+            if self.account_state.balance_stale:
+                self.account_state.refresh_balance()
+            snapshot = self.account_state.snapshot()
+            return snapshot['balances'], snapshot['positions']
+        
+        return self.asterdex.get_balance(), self.asterdex.get_position_info(symbol)
+    
     def _get_available_balance(self, balance_info: Dict[str, Any]) -> float:
         """
         获取可用余额
@@ -251,11 +321,10 @@ class Trader:
         """
         try:
             # 获取当前价格
-            ticker = self.asterdex.get_ticker_price(symbol)
-            current_price = float(ticker['price'])
+            current_price = self.get_price(symbol)
             
-            # 获取交易对信息
-            symbol_info = self.get_symbol_info(symbol)
+            # 获取交易对规则
+            symbol_info = self.get_symbol_rules(symbol)
             if not symbol_info:
                 self.logger.error(f"无法获取 {symbol} 交易对信息")
                 return None
@@ -302,8 +371,10 @@ class Trader:
             
             self.logger.info(f"开仓成功: {order}")
             
-            # 如果启用了止损，设置止损单
-            # （这里简化处理，实际应用中可以设置止损限价单）
+            # 在交易所挂出只减仓的止损 / 止盈条件单
+            if self.protective_orders:
+                entry_price = float(order.get('avgPrice') or 0) or current_price
+                self._place_protective_orders(symbol, side, quantity, entry_price, symbol_info)
             
             return order
         
@@ -311,6 +382,60 @@ class Trader:
             self.logger.error(f"开仓失败 [{symbol}]: {e}")
             return None
     
+    def _place_protective_orders(
+        self,
+        symbol: str,
+        side: str,
+        quantity: float,
+        entry_price: float,
+        symbol_info
+    ):
+        """
+        按风险管理配置挂出止损 / 止盈单
+        
+        Args:
+            symbol: 交易对符号
+            side: 开仓方向（BUY/SELL）
+            quantity: 开仓数量
+            entry_price: 开仓价格
+            symbol_info: 交易对规则
+        """
+        stop_loss_percent = self.risk_manager.stop_loss_percent
+        take_profit_percent = self.risk_manager.take_profit_percent
+        if not stop_loss_percent and not take_profit_percent:
+            return
+        
+        key = f'strategy:{symbol}'
+        position_side = 'LONG' if side == 'BUY' else 'SHORT'
+        stop_loss_price = (
+            self.risk_manager.calculate_stop_loss(entry_price, side, stop_loss_percent)
+            if stop_loss_percent else None
+        )
+        
+        protection = self.protective_orders.place(
+            key,
+            symbol,
+            position_side,
+            quantity,
+            stop_loss_price=stop_loss_price,
+            take_profit_price=(
+                self.risk_manager.calculate_take_profit(entry_price, side, take_profit_percent)
+                if take_profit_percent else None
+            ),
+            rules=symbol_info
+        )
+        
+        # 移动止损 / 保本止损从交易所实际挂出的止损价开始收紧
+        if self.trailing_stops:
+            self.trailing_stops.track(
+                key,
+                symbol,
+                position_side,
+                entry_price,
+                stop_loss_price=protection.stop_loss_price,
+                rules=symbol_info
+            )
+    
     def _close_position(
         self,
         symbol: str,
@@ -357,6 +482,12 @@ class Trader:
             
             self.logger.info(f"平仓成功: {order}")
             
+            # 持仓已平，撤销剩余的止损 / 止盈单
+            if self.protective_orders:
+                self.protective_orders.cancel(f'strategy:{symbol}')
+            if self.trailing_stops:
+                self.trailing_stops.untrack(f'strategy:{symbol}')
+            
             return order
         
         except Exception as e:
@@ -0,0 +1,418 @@
+"""
+移动止损 / 保本止损模块
+
+每个持仓保存一条紧凑的记录（方向、开仓价、当前止损、最有利价格和比例参数），
+行情数据流每推送一次标记价格就在内存中更新止损：价格创新高（做空为新低）时按回撤比例上移止损，
+盈利达到阈值后把止损移到开仓价附近。止损只会收紧，不会放宽。
+
+止损变化由后台线程定期推送到交易所（撤换止损条件单），按持仓限制最小间隔和最小变动幅度，
+并限制每秒的总改单次数，避免频繁请求交易所接口。
+"""
+import threading
+import time
+from typing import Dict, Any, List, Optional, Callable
+
+from .exchange_info import SymbolRules
+from ..utils.logger import get_logger
+
+
+class StopRecord:
+    """一个持仓的止损状态（紧凑记录）"""
+    
+    __slots__ = (
+        'key', 'symbol', 'direction', 'entry_price', 'stop_price', 'best_price',
+        'trail_ratio', 'activation_ratio', 'break_even_ratio', 'break_even_offset',
+        'rules', 'notified_stop', 'pushed_stop', 'pushed_at'
+    )
+    
+    def __init__(
+        self,
+        key: str,
+        symbol: str,
+        direction: int,
+        entry_price: float,
+        stop_price: Optional[float],
+        trail_ratio: Optional[float],
+        activation_ratio: float,
+        break_even_ratio: Optional[float],
+        break_even_offset: float,
+        rules: Optional[SymbolRules]
+    ):
+        self.key = key
+        self.symbol = symbol
+        self.direction = direction              # 1 做多，-1 做空
+        self.entry_price = entry_price
+        self.stop_price = stop_price
+        self.best_price = entry_price           # 持仓期间最有利的价格
+        self.trail_ratio = trail_ratio
+        self.activation_ratio = activation_ratio
+        self.break_even_ratio = break_even_ratio
+        self.break_even_offset = break_even_offset
+        self.rules = rules
+        self.notified_stop = stop_price         # 最近一次通知回调的止损
+        self.pushed_stop = stop_price           # 最近一次推送到交易所的止损
+        self.pushed_at = 0.0
+    
+    def tighter(self, price: float) -> bool:
+        """price 是否比当前止损更紧（做多更高，做空更低）"""
+        return self.stop_price is None or (price - self.stop_price) * self.direction > 0
+    
+    def update(self, price: float) -> bool:
+        """
+        用最新价格更新止损
+        
+        Args:
+            price: 最新价格
+            
+        Returns:
+            止损是否变化
+        """
+        if (price - self.best_price) * self.direction <= 0:
+            return False
+        self.best_price = price
+        
+        gain = (price - self.entry_price) * self.direction / self.entry_price
+        changed = False
+        
+        if self.break_even_ratio is not None and gain >= self.break_even_ratio:
+            break_even = self.entry_price * (1 + self.direction * self.break_even_offset)
+            if self.tighter(break_even):
+                self.stop_price = break_even
+                changed = True
+        
+        if self.trail_ratio is not None and gain >= self.activation_ratio:
+            trail = price * (1 - self.direction * self.trail_ratio)
+            if self.tighter(trail):
+                self.stop_price = trail
+                changed = True
+        
+        return changed
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典"""
+        return {
+            'key': self.key,
+            'symbol': self.symbol,
+            'side': 'LONG' if self.direction > 0 else 'SHORT',
+            'entry_price': self.entry_price,
+            'stop_price': self.stop_price,
+            'best_price': self.best_price,
+            'pushed_stop': self.pushed_stop
+        }
+
+
+class TrailingStopEngine:
+    """移动止损 / 保本止损引擎（交易器和手动交易共享）"""
+    
+    def __init__(
+        self,
+        protective_orders=None,
+        trail_percent: Optional[float] = None,
+        activation_percent: float = 0.0,
+        break_even_percent: Optional[float] = None,
+        break_even_offset_percent: float = 0.0,
+        min_update_interval: float = 5.0,
+        min_step_percent: float = 0.1,
+        max_updates_per_second: float = 2.0,
+        flush_interval: float = 1.0,
+        price_source: Optional[Callable[[], Dict[str, float]]] = None
+    ):
+        """
+        初始化移动止损引擎
+        
+        Args:
+            protective_orders: ProtectiveOrderManager 实例（可选，把止损变化推送到交易所）
+            trail_percent: 默认回撤百分比，None 表示不启用移动止损
+            activation_percent: 默认盈利达到该百分比后开始移动止损
+            break_even_percent: 默认盈利达到该百分比后止损移到开仓价，None 表示不启用
+            break_even_offset_percent: 保本止损相对开仓价的偏移百分比（覆盖手续费）
+            min_update_interval: 同一持仓两次改单的最小间隔（秒）
+            min_step_percent: 止损相对上次推送至少变动的百分比才改单
+            max_updates_per_second: 每秒最多改单次数（所有持仓合计）
+            flush_interval: 后台推送间隔（秒）
+            price_source: 没有行情数据流时，后台线程每次推送前调用它获取 {交易对: 价格}
+        """
+        self.protective_orders = protective_orders
+        self.trail_percent = trail_percent
+        self.activation_percent = activation_percent
+        self.break_even_percent = break_even_percent
+        self.break_even_offset_percent = break_even_offset_percent
+        self.min_update_interval = min_update_interval
+        self.min_step_ratio = min_step_percent / 100
+        self.max_updates_per_second = max_updates_per_second
+        self.flush_interval = flush_interval
+        self.price_source = price_source
+        self.logger = get_logger()
+        
+        self._records: Dict[str, StopRecord] = {}
+        self._by_symbol: Dict[str, Dict[str, StopRecord]] = {}
+        self._dirty: set = set()
+        self._lock = threading.Lock()
+        self._listeners: List[Callable[[str, float], None]] = []
+        
+        # 改单令牌桶
+        self._tokens = max(1.0, max_updates_per_second)
+        self._tokens_at = time.monotonic()
+        
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        
+        # 条件单成交（持仓已平）时停止跟踪
+        if protective_orders:
+            protective_orders.add_listener(lambda protection: self.untrack(protection.key))
+    
+    def add_listener(self, callback: Callable[[str, float], None]):
+        """
+        注册止损变化回调（在后台线程中调用，用于更新本地监控的止损价）
+        
+        Args:
+            callback: callback(持仓标识, 新止损价)
+        """
+        self._listeners.append(callback)
+    
+    # ==================== 持仓登记 ====================
+    
+    def track(
+        self,
+        key: str,
+        symbol: str,
+        side: str,
+        entry_price: float,
+        stop_loss_price: Optional[float] = None,
+        trail_percent: Optional[float] = None,
+        break_even_percent: Optional[float] = None,
+        rules: Optional[SymbolRules] = None
+    ) -> Optional[StopRecord]:
+        """
+        开始跟踪一个持仓（同一标识已存在时替换）
+        
+        Args:
+            key: 持仓标识（与 ProtectiveOrderManager 一致，如 manual:订单ID、strategy:交易对）
+            symbol: 交易对符号
+            side: 持仓方向（LONG/SHORT）
+            entry_price: 开仓价格
+            stop_loss_price: 初始止损价格
+            trail_percent: 回撤百分比（默认使用引擎配置）
+            break_even_percent: 保本触发百分比（默认使用引擎配置）
+            rules: 交易对规则（推送前把止损取整到价格步长）
+            
+        Returns:
+            StopRecord，移动止损和保本止损都未启用时返回 None
+        """
+        trail_percent = trail_percent if trail_percent is not None else self.trail_percent
+        break_even_percent = break_even_percent if break_even_percent is not None else self.break_even_percent
+        if not trail_percent and not break_even_percent:
+            return None
+        
+        record = StopRecord(
+            key=key,
+            symbol=symbol,
+            direction=1 if side == 'LONG' else -1,
+            entry_price=entry_price,
+            stop_price=stop_loss_price,
+            trail_ratio=trail_percent / 100 if trail_percent else None,
+            activation_ratio=self.activation_percent / 100,
+            break_even_ratio=break_even_percent / 100 if break_even_percent else None,
+            break_even_offset=self.break_even_offset_percent / 100,
+            rules=rules
+        )
+        
+        with self._lock:
+            self._remove_locked(key)
+            self._records[key] = record
+            self._by_symbol.setdefault(symbol, {})[key] = record
+        
+        return record
+    
+    def untrack(self, key: str) -> bool:
+        """
+        停止跟踪一个持仓（持仓已平仓）
+        
+        Args:
+            key: 持仓标识
+            
+        Returns:
+            是否存在
+        """
+        with self._lock:
+            return self._remove_locked(key)
+    
+    def _remove_locked(self, key: str) -> bool:
+        record = self._records.pop(key, None)
+        if record is None:
+            return False
+        
+        records = self._by_symbol[record.symbol]
+        del records[key]
+        if not records:
+            del self._by_symbol[record.symbol]
+        self._dirty.discard(key)
+        return True
+    
+    def get(self, key: str) -> Optional[StopRecord]:
+        """获取一个持仓的止损记录"""
+        with self._lock:
+            return self._records.get(key)
+    
+    def symbols(self) -> List[str]:
+        """正在跟踪的交易对"""
+        with self._lock:
+            return list(self._by_symbol)
+    
+    # ==================== 价格更新（内存中，无网络请求） ====================
+    
+    def on_price(self, symbol: str, price: float):
+        """
+        处理一次价格推送（在行情数据流线程中调用）
+        
+        Args:
+            symbol: 交易对符号
+            price: 最新价格
+        """
+        with self._lock:
+            records = self._by_symbol.get(symbol)
+            if not records:
+                return
+            for record in records.values():
+                if record.update(price):
+                    self._dirty.add(record.key)
+    
+    def apply_stop_update(self, key: str, stop_update: Dict[str, Any]) -> bool:
+        """
+        应用 AIPositionManager.monitor_position 返回的 stop_loss_update 建议（只收紧止损）
+        
+        Args:
+            key: 持仓标识
+            stop_update: {"suggested": bool, "new_percentage": 相对开仓价的止损百分比（-3 表示亏损 3%）}
+            
+        Returns:
+            止损是否变化
+        """
+        if not stop_update or not stop_update.get('suggested'):
+            return False
+        
+        try:
+            percentage = float(stop_update['new_percentage'])
+        except (KeyError, TypeError, ValueError):
+            return False
+        
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                return False
+            
+            stop_price = record.entry_price * (1 + record.direction * percentage / 100)
+            if not record.tighter(stop_price):
+                return False
+            
+            record.stop_price = stop_price
+            self._dirty.add(key)
+        
+        self.logger.info(f"{record.symbol} 采纳止损调整建议: 止损 {percentage:+.2f}%（{stop_price:.6f}）")
+        return True
+    
+    # ==================== 推送到交易所 ====================
+    
+    def flush(self) -> int:
+        """
+        通知本地回调并把止损变化推送到交易所（节流）
+        
+        Returns:
+            本次改单次数
+        """
+        now = time.monotonic()
+        with self._lock:
+            pending = [self._records[key] for key in self._dirty]
+            self._dirty.clear()
+            
+            self._tokens = min(
+                max(1.0, self.max_updates_per_second),
+                self._tokens + (now - self._tokens_at) * self.max_updates_per_second
+            )
+            self._tokens_at = now
+        
+        # 先推送止损移动幅度最大的持仓
+        pending.sort(key=lambda record: self._move_ratio(record), reverse=True)
+        
+        updates = 0
+        deferred = []
+        for record in pending:
+            stop_price = record.stop_price
+            
+            if stop_price != record.notified_stop:
+                record.notified_stop = stop_price
+                for listener in self._listeners:
+                    try:
+                        listener(record.key, stop_price)
+                    except Exception as e:
+                        self.logger.error(f"止损变化回调出错: {e}")
+            
+            if not self.protective_orders or self.protective_orders.get(record.key) is None:
+                continue
+            
+            if self._move_ratio(record) < self.min_step_ratio:
+                continue
+            
+            if now - record.pushed_at < self.min_update_interval or self._tokens < 1:
+                deferred.append(record.key)
+                continue
+            
+            self._tokens -= 1
+            record.pushed_at = now
+            if self.protective_orders.amend_stop_loss(record.key, stop_price, rules=record.rules):
+                record.pushed_stop = stop_price
+                updates += 1
+                self.logger.info(f"📈 {record.symbol} 止损已移动到 {stop_price:.6f}（{record.key}）")
+            else:
+                deferred.append(record.key)
+        
+        if deferred:
+            with self._lock:
+                self._dirty.update(key for key in deferred if key in self._records)
+        
+        return updates
+    
+    @staticmethod
+    def _move_ratio(record: StopRecord) -> float:
+        """当前止损相对上次推送的变动比例"""
+        if record.pushed_stop is None:
+            return float('inf')
+        return abs(record.stop_price - record.pushed_stop) / record.pushed_stop
+    
+    def start(self):
+        """启动后台推送线程"""
+        if self._thread and self._thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='TrailingStopEngine')
+        self._thread.start()
+    
+    def stop(self):
+        """停止后台推送线程"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+    
+    def _run(self):
+        """后台线程：没有行情数据流时拉取价格，然后推送止损变化"""
+        while not self._stop_event.wait(self.flush_interval):
+            try:
+                if self.price_source and self._records:
+                    prices = self.price_source()
+                    for symbol in self.symbols():
+                        if symbol in prices:
+                            self.on_price(symbol, prices[symbol])
+                self.flush()
+            except Exception as e:
+                self.logger.error(f"移动止损推送异常: {e}")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """引擎状态"""
+        with self._lock:
+            return {
+                'tracked': len(self._records),
+                'symbols': len(self._by_symbol),
+                'pending': len(self._dirty)
+            }
@@ -0,0 +1,192 @@
+"""
+价格触发索引模块
+
+按交易对把持仓的止损 / 止盈价格保存在两个有序列表中：价格下跌到该价位触发（多单止损、空单止盈）
+和价格上涨到该价位触发（多单止盈、空单止损）。每个交易对收到一次价格后，
+用二分查找找出所有被穿越的价位，耗时 O(log n + k)，与持仓数量基本无关。
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+# 触发类型
+STOP_LOSS = 'STOP_LOSS'
+TAKE_PROFIT = 'TAKE_PROFIT'
+
+
+@dataclass(frozen=True)
+class Trigger:
+    """一个被穿越的触发价位"""
+    position_id: str
+    symbol: str
+    kind: str           # STOP_LOSS / TAKE_PROFIT
+    level: float
+
+
+class _SortedLevels:
+    """按价位排序的触发列表（价位相同时按加入顺序）"""
+    
+    __slots__ = ('levels', 'entries')
+    
+    def __init__(self):
+        self.levels: List[float] = []
+        self.entries: List[Tuple[float, int, str, str]] = []   # (价位, 序号, 持仓ID, 触发类型)
+    
+    def __len__(self) -> int:
+        return len(self.levels)
+    
+    def add(self, entry: Tuple[float, int, str, str]):
+        index = bisect_right(self.levels, entry[0])
+        self.levels.insert(index, entry[0])
+        self.entries.insert(index, entry)
+    
+    def remove(self, level: float, position_id: str):
+        index = bisect_left(self.levels, level)
+        while index < len(self.levels) and self.levels[index] == level:
+            if self.entries[index][2] == position_id:
+                del self.levels[index]
+                del self.entries[index]
+                return
+            index += 1
+    
+    def at_or_above(self, price: float) -> List[Tuple[float, int, str, str]]:
+        """价位 >= price 的触发（价格下跌到价位即触发的一侧）"""
+        return self.entries[bisect_left(self.levels, price):]
+    
+    def at_or_below(self, price: float) -> List[Tuple[float, int, str, str]]:
+        """价位 <= price 的触发（价格上涨到价位即触发的一侧）"""
+        return self.entries[:bisect_right(self.levels, price)]
+
+
+class TriggerIndex:
+    """按交易对索引的止损 / 止盈价位"""
+    
+    def __init__(self):
+        self._falling: Dict[str, _SortedLevels] = {}     # 价格 <= 价位时触发
+        self._rising: Dict[str, _SortedLevels] = {}      # 价格 >= 价位时触发
+        self._positions: Dict[str, List[Tuple[str, str, float]]] = {}   # {持仓ID: [(交易对, 方向, 价位)]}
+        self._sequence = 0
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        """索引中的持仓数量"""
+        return len(self._positions)
+    
+    def __contains__(self, position_id: str) -> bool:
+        return position_id in self._positions
+    
+    def add(
+        self,
+        position_id: str,
+        symbol: str,
+        side: str,
+        stop_loss_price: Optional[float] = None,
+        take_profit_price: Optional[float] = None
+    ):
+        """
+        加入一个持仓的触发价位（已存在时先移除）
+        
+        Args:
+            position_id: 持仓ID
+            symbol: 交易对符号
+            side: 持仓方向（LONG/SHORT）
+            stop_loss_price: 止损价格
+            take_profit_price: 止盈价格
+        """
+        with self._lock:
+            self._remove_locked(position_id)
+            
+            legs = []
+            if stop_loss_price:
+                legs.append((STOP_LOSS, stop_loss_price, 'falling' if side == 'LONG' else 'rising'))
+            if take_profit_price:
+                legs.append((TAKE_PROFIT, take_profit_price, 'rising' if side == 'LONG' else 'falling'))
+            if not legs:
+                return
+            
+            records = []
+            for kind, level, direction in legs:
+                books = self._falling if direction == 'falling' else self._rising
+                self._sequence += 1
+                books.setdefault(symbol, _SortedLevels()).add((level, self._sequence, position_id, kind))
+                records.append((symbol, direction, level))
+            self._positions[position_id] = records
+    
+    def remove(self, position_id: str) -> bool:
+        """
+        移除一个持仓的全部触发价位
+        
+        Args:
+            position_id: 持仓ID
+            
+        Returns:
+            是否存在
+        """
+        with self._lock:
+            return self._remove_locked(position_id)
+    
+    def _remove_locked(self, position_id: str) -> bool:
+        records = self._positions.pop(position_id, None)
+        if records is None:
+            return False
+        
+        for symbol, direction, level in records:
+            books = self._falling if direction == 'falling' else self._rising
+            book = books[symbol]
+            book.remove(level, position_id)
+            if not book:
+                del books[symbol]
+        return True
+    
+    def symbols(self) -> List[str]:
+        """有触发价位的交易对"""
+        with self._lock:
+            return sorted(set(self._falling) | set(self._rising))
+    
+    def crossed(self, symbol: str, price: float) -> List[Trigger]:
+        """
+        当前价格穿越的触发价位（不移除）
+        
+        Args:
+            symbol: 交易对符号
+            price: 当前价格
+            
+        Returns:
+            Trigger 列表；同一持仓同时穿越止损和止盈时只返回止损
+        """
+        with self._lock:
+            return self._crossed_locked(symbol, price)
+    
+    def _crossed_locked(self, symbol: str, price: float) -> List[Trigger]:
+        entries = []
+        falling = self._falling.get(symbol)
+        if falling:
+            entries.extend(falling.at_or_above(price))
+        rising = self._rising.get(symbol)
+        if rising:
+            entries.extend(rising.at_or_below(price))
+        
+        triggers: Dict[str, Trigger] = {}
+        for level, _, position_id, kind in sorted(entries, key=lambda entry: entry[1]):
+            if position_id not in triggers or kind == STOP_LOSS:
+                triggers[position_id] = Trigger(position_id, symbol, kind, level)
+        return list(triggers.values())
+    
+    def pop_crossed(self, symbol: str, price: float) -> List[Trigger]:
+        """
+        取出当前价格穿越的触发价位，并移除这些持仓的全部价位（避免重复触发）
+        
+        Args:
+            symbol: 交易对符号
+            price: 当前价格
+            
+        Returns:
+            Trigger 列表
+        """
+        with self._lock:
+            triggers = self._crossed_locked(symbol, price)
+            for trigger in triggers:
+                self._remove_locked(trigger.position_id)
+            return triggers
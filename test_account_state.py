@@ -0,0 +1,386 @@
+#!/usr/bin/env python3
+"""
+测试账户状态服务
+
+这个脚本验证：
+1. REST 对账加载余额、持仓和挂单，读取接口返回与 REST 相同的格式
+2. 回放 ACCOUNT_UPDATE 推送：余额和持仓更新，新开的持仓使用该交易对最近一次已知的杠杆
+3. 回放 ORDER_TRADE_UPDATE 推送：挂单簿增删，订单回调收到订单字段
+4. 回放 ACCOUNT_CONFIG_UPDATE 推送：杠杆变化同步到该交易对的持仓和后续新开的持仓
+5. 余额变化后维护线程只刷新余额；没有杠杆记录的新持仓触发立即对账
+6. 成交或余额变化后可用余额标记为过期，交易器下单前同步刷新
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.trading.account_state import AccountStateService
+from src.trading.risk_manager import RiskManager
+from src.trading.trader import Trader
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.CRITICAL)
+
+
+# 录制的 REST 响应
+BALANCES = [
+    {'asset': 'USDT', 'balance': '1000.00000000', 'crossWalletBalance': '1000.00000000', 'availableBalance': '800.00000000'},
+    {'asset': 'BNB', 'balance': '0.50000000', 'crossWalletBalance': '0.50000000', 'availableBalance': '0.50000000'}
+]
+
+POSITIONS = [
+    {
+        'symbol': 'BTCUSDT', 'positionSide': 'BOTH', 'positionAmt': '0.010', 'entryPrice': '50000.0',
+        'markPrice': '50500.00000000', 'unRealizedProfit': '5.00000000', 'leverage': '5',
+        'marginType': 'cross', 'isolatedWallet': '0', 'notional': '505.00000000'
+    },
+    {
+        'symbol': 'ETHUSDT', 'positionSide': 'BOTH', 'positionAmt': '0.000', 'entryPrice': '0.0',
+        'markPrice': '3000.00000000', 'unRealizedProfit': '0.00000000', 'leverage': '10',
+        'marginType': 'isolated', 'isolatedWallet': '0', 'notional': '0'
+    }
+]
+
+OPEN_ORDERS = [
+    {
+        'orderId': 1001, 'symbol': 'BTCUSDT', 'clientOrderId': 'sl-1', 'side': 'SELL', 'type': 'STOP_MARKET',
+        'origQty': '0.010', 'price': '0', 'stopPrice': '49000', 'executedQty': '0', 'status': 'NEW',
+        'reduceOnly': True, 'positionSide': 'BOTH', 'updateTime': 1700000000000
+    }
+]
+
+# 录制的用户数据流推送
+ACCOUNT_UPDATE = json.loads('''
+{
+  "e": "ACCOUNT_UPDATE", "E": 1700000001000, "T": 1700000000999,
+  "a": {
+    "m": "ORDER",
+    "B": [{"a": "USDT", "wb": "990.50000000", "cw": "985.00000000", "bc": "0"}],
+    "P": [
+      {"s": "BTCUSDT", "pa": "0.020", "ep": "50250.0", "cr": "0", "up": "5.00000000", "mt": "cross", "iw": "0", "ps": "BOTH"},
+      {"s": "ETHUSDT", "pa": "-0.5", "ep": "3000.0", "cr": "0", "up": "0", "mt": "isolated", "iw": "150.0", "ps": "SHORT"}
+    ]
+  }
+}
+''')
+
+ORDER_NEW = json.loads('''
+{
+  "e": "ORDER_TRADE_UPDATE", "E": 1700000002000, "T": 1700000001999,
+  "o": {"s": "BTCUSDT", "c": "tp-1", "S": "SELL", "o": "TAKE_PROFIT_MARKET", "f": "GTE_GTC", "q": "0.020",
+        "p": "0", "ap": "0", "sp": "52000", "x": "NEW", "X": "NEW", "i": 1002, "l": "0", "z": "0",
+        "L": "0", "T": 1700000001999, "R": true, "ps": "BOTH"}
+}
+''')
+
+ACCOUNT_CONFIG_UPDATE = json.loads('''
+{"e": "ACCOUNT_CONFIG_UPDATE", "E": 1700000004000, "T": 1700000003999, "ac": {"s": "BTCUSDT", "l": 20}}
+''')
+
+
+def order_event(order_id, status, executed='0', event_time=1700000003000):
+    """以 ORDER_NEW 为模板生成不同状态的订单推送"""
+    message = json.loads(json.dumps(ORDER_NEW))
+    message['E'] = event_time
+    message['o'].update({'i': order_id, 'X': status, 'x': 'TRADE' if executed != '0' else status, 'z': executed})
+    return message
+
+
+def position_event(symbol, amount, entry_price, side='BOTH', event_time=1700000005000):
+    """只含持仓变化的 ACCOUNT_UPDATE 推送"""
+    return {
+        'e': 'ACCOUNT_UPDATE', 'E': event_time,
+        'a': {'m': 'ORDER', 'B': [], 'P': [{'s': symbol, 'pa': amount, 'ep': entry_price, 'up': '0', 'ps': side}]}
+    }
+
+
+class FakeClient:
+    """返回录制响应、记录请求次数的模拟客户端"""
+    
+    def __init__(self):
+        self.balances = json.loads(json.dumps(BALANCES))
+        self.positions = json.loads(json.dumps(POSITIONS))
+        self.open_orders = json.loads(json.dumps(OPEN_ORDERS))
+        self.calls = {'get_balance': 0, 'get_position_info': 0, 'get_open_orders': 0}
+        self._lock = threading.Lock()
+    
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] += 1
+    
+    def get_balance(self):
+        self._count('get_balance')
+        return json.loads(json.dumps(self.balances))
+    
+    def get_position_info(self, symbol=None):
+        self._count('get_position_info')
+        return json.loads(json.dumps(self.positions))
+    
+    def get_open_orders(self, symbol=None):
+        self._count('get_open_orders')
+        return json.loads(json.dumps(self.open_orders))
+
+
+def make_service(client):
+    service = AccountStateService(client, reconcile_interval=3600)
+    service.reconcile()
+    return service
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_reconcile():
+    """测试 REST 对账"""
+    client = FakeClient()
+    service = make_service(client)
+    
+    snapshot = service.snapshot()
+    assert snapshot['balances'] == BALANCES
+    assert snapshot['positions'] == POSITIONS
+    assert snapshot['open_orders'] == OPEN_ORDERS
+    assert snapshot['reconciled_at'] is not None
+    
+    assert service.get_position_info('ETHUSDT') == [POSITIONS[1]]
+    assert service.get_open_orders('ETHUSDT') == []
+    
+    # 返回的是副本
+    service.get_position_info('BTCUSDT')[0]['positionAmt'] = '999'
+    assert service.get_position_info('BTCUSDT')[0]['positionAmt'] == '0.010'
+    
+    # 再次对账替换全部状态（交易所侧已平仓、挂单已撤销）
+    client.positions = client.positions[1:]
+    client.open_orders = []
+    service.reconcile()
+    assert service.get_position_info('BTCUSDT') == [] and service.get_open_orders() == []
+    
+    logger.info("✓ 测试通过: REST 对账")
+
+
+def test_account_update():
+    """测试 ACCOUNT_UPDATE"""
+    service = make_service(FakeClient())
+    
+    service._on_message(ACCOUNT_UPDATE)
+    assert service.last_event_time == 1700000001000
+    assert service._balance_dirty.is_set()
+    
+    usdt = next(b for b in service.get_balance() if b['asset'] == 'USDT')
+    assert usdt['balance'] == '990.50000000' and usdt['crossWalletBalance'] == '985.00000000'
+    assert usdt['availableBalance'] == '800.00000000'       # 推送不含可用余额，保留对账时的值
+    
+    # 已有持仓：更新数量、开仓价，名义价值按最近的标记价格估算，杠杆不变
+    btc = service.get_position_info('BTCUSDT')[0]
+    assert btc['positionAmt'] == '0.020' and btc['entryPrice'] == '50250.0'
+    assert btc['leverage'] == '5' and btc['marginType'] == 'cross'
+    assert abs(float(btc['notional']) - 0.020 * 50500) < 1e-9
+    
+    # 新开的持仓（双向持仓模式的空头）：杠杆取该交易对最近一次已知的值，没有标记价格时用开仓价估算
+    eth_short = next(p for p in service.get_position_info('ETHUSDT') if p['positionSide'] == 'SHORT')
+    assert eth_short['leverage'] == '10'
+    assert eth_short['marginType'] == 'isolated' and eth_short['isolatedWallet'] == '150.0'
+    assert abs(float(eth_short['notional']) + 0.5 * 3000) < 1e-9
+    assert not service._reconcile_requested
+    
+    # 没有杠杆记录的交易对：不填默认值，请求立即对账
+    service._balance_dirty.clear()
+    service._on_message(position_event('SOLUSDT', '3', '150.0'))
+    sol = service.get_position_info('SOLUSDT')[0]
+    assert 'leverage' not in sol and sol['positionAmt'] == '3'
+    assert service._reconcile_requested and service._balance_dirty.is_set()
+    
+    logger.info("✓ 测试通过: ACCOUNT_UPDATE")
+
+
+def test_order_update():
+    """测试 ORDER_TRADE_UPDATE"""
+    service = make_service(FakeClient())
+    received = []
+    
+    def broken_listener(order):
+        raise RuntimeError('listener failed')
+    
+    service.add_order_listener(broken_listener)
+    service.add_order_listener(received.append)
+    
+    service._on_message(ORDER_NEW)
+    order = next(o for o in service.get_open_orders() if o['orderId'] == 1002)
+    assert order['type'] == 'TAKE_PROFIT_MARKET' and order['stopPrice'] == '52000'
+    assert order['clientOrderId'] == 'tp-1' and order['reduceOnly'] is True and order['status'] == 'NEW'
+    assert received == [ORDER_NEW['o']]                     # 前一个回调出错不影响后续回调
+    
+    service._on_message(order_event(1002, 'PARTIALLY_FILLED', executed='0.005'))
+    order = next(o for o in service.get_open_orders() if o['orderId'] == 1002)
+    assert order['status'] == 'PARTIALLY_FILLED' and order['executedQty'] == '0.005'
+    
+    service._on_message(order_event(1002, 'FILLED', executed='0.020', event_time=1700000003500))
+    service._on_message(order_event(1001, 'CANCELED', event_time=1700000003600))
+    assert service.get_open_orders() == []
+    assert [o['X'] for o in received] == ['NEW', 'PARTIALLY_FILLED', 'FILLED', 'CANCELED']
+    assert service.last_event_time == 1700000003600
+    
+    # 不在挂单簿中的订单被撤销：忽略
+    service._on_message(order_event(9999, 'EXPIRED'))
+    assert service.get_open_orders() == []
+    
+    logger.info("✓ 测试通过: ORDER_TRADE_UPDATE")
+
+
+def test_config_update():
+    """测试 ACCOUNT_CONFIG_UPDATE"""
+    service = make_service(FakeClient())
+    service._on_message(ACCOUNT_UPDATE)
+    
+    service._on_message(ACCOUNT_CONFIG_UPDATE)
+    assert service.get_position_info('BTCUSDT')[0]['leverage'] == '20'
+    assert {p['leverage'] for p in service.get_position_info('ETHUSDT')} == {'10'}
+    
+    # 还没有持仓的交易对先调整杠杆，随后开仓的持仓使用新杠杆
+    service._on_message({'e': 'ACCOUNT_CONFIG_UPDATE', 'E': 1700000004500, 'ac': {'s': 'SOLUSDT', 'l': 7}})
+    service._on_message(position_event('SOLUSDT', '3', '150.0'))
+    assert service.get_position_info('SOLUSDT')[0]['leverage'] == '7'
+    assert not service._reconcile_requested
+    
+    # 只切换保证金模式的推送（不含 ac）被忽略
+    service._on_message({'e': 'ACCOUNT_CONFIG_UPDATE', 'E': 1700000006000, 'ai': {'j': True}})
+    assert service.get_position_info('BTCUSDT')[0]['leverage'] == '20'
+    assert service.last_event_time == 1700000006000
+    
+    logger.info("✓ 测试通过: ACCOUNT_CONFIG_UPDATE")
+
+
+def test_maintenance_refresh():
+    """测试余额刷新和立即对账"""
+    client = FakeClient()
+    service = make_service(client)
+    
+    # 只启动维护线程（不连接数据流）
+    service.is_running = True
+    thread = threading.Thread(target=service._maintenance_loop, daemon=True)
+    thread.start()
+    
+    try:
+        # 余额变化：只刷新余额，不重新对账
+        client.balances[0]['availableBalance'] = '790.00000000'
+        service._on_message(ACCOUNT_UPDATE)
+        assert wait_for(lambda: client.calls['get_balance'] == 2)
+        assert wait_for(lambda: service.get_balance()[0]['availableBalance'] == '790.00000000')
+        assert client.calls['get_position_info'] == 1 and client.calls['get_open_orders'] == 1
+        
+        # 没有杠杆记录的新持仓：立即对账，杠杆由 REST 补上
+        client.positions.append({
+            'symbol': 'SOLUSDT', 'positionSide': 'BOTH', 'positionAmt': '3', 'entryPrice': '150.0',
+            'markPrice': '151.0', 'unRealizedProfit': '3.0', 'leverage': '4', 'marginType': 'cross',
+            'isolatedWallet': '0', 'notional': '453.0'
+        })
+        service._on_message(position_event('SOLUSDT', '3', '150.0'))
+        assert wait_for(lambda: client.calls['get_position_info'] == 2)
+        assert wait_for(lambda: service.get_position_info('SOLUSDT')[0].get('leverage') == '4')
+        assert not service._reconcile_requested
+    finally:
+        service.is_running = False
+        service._balance_dirty.set()
+        thread.join(timeout=5)
+    
+    assert not thread.is_alive()
+    logger.info("✓ 测试通过: 余额刷新和立即对账")
+
+
+def test_stale_balance():
+    """测试过期的可用余额在下单前刷新"""
+    client = FakeClient()
+    service = make_service(client)
+    assert not service.balance_stale
+    
+    # 新挂单不改变余额，成交后可用余额过期
+    service._on_message(ORDER_NEW)
+    assert not service.balance_stale
+    service._on_message(order_event(1002, 'FILLED', executed='0.020'))
+    assert service.balance_stale
+    service.refresh_balance()
+    assert not service.balance_stale
+    
+    # 只含持仓的推送不改变余额
+    service._on_message(position_event('BTCUSDT', '0.030', '50000.0'))
+    assert not service.balance_stale
+    
+    # 刷新请求期间又有余额变化：仍视为过期
+    original_get_balance = client.get_balance
+    
+    def get_balance_with_update():
+        balances = original_get_balance()
+        service._on_message(ACCOUNT_UPDATE)
+        return balances
+    
+    client.get_balance = get_balance_with_update
+    service._on_message(ACCOUNT_UPDATE)
+    service.refresh_balance()
+    assert service.balance_stale
+    client.get_balance = original_get_balance
+    
+    # 交易器读取快照前同步刷新余额
+    service.is_connected = True
+    trader = Trader(
+        asterdex_client=client,
+        deepseek_client=None,
+        risk_manager=RiskManager(),
+        strategy=None,
+        account_state=service
+    )
+    client.balances[0]['availableBalance'] = '500.00000000'
+    calls = client.calls['get_balance']
+    balance_info, _ = trader._get_account_snapshot('BTCUSDT')
+    assert trader._get_available_balance(balance_info) == 500.0
+    assert client.calls['get_balance'] == calls + 1 and not service.balance_stale
+    
+    # 余额没有变化时直接读取本地快照
+    trader._get_account_snapshot('BTCUSDT')
+    assert client.calls['get_balance'] == calls + 1
+    
+    logger.info("✓ 测试通过: 过期的可用余额在下单前刷新")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_reconcile,
+        test_account_update,
+        test_order_update,
+        test_config_update,
+        test_maintenance_refresh,
+        test_stale_balance
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
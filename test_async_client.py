@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+测试异步 API 客户端
+
+这个脚本验证：
+1. get_klines_batch 并发请求所有交易对，结果按交易对返回；单个交易对失败时值为对应的异常对象，不影响其他交易对
+   （HTTP 错误、超时、响应体不完整，as_array=True 时同样适用）
+2. 每个请求发送前按端点权重和优先级从限流调度器获取额度，响应头用于校正额度
+3. 额度不足时请求不会发出，批量请求中对应交易对的值为 RateLimitTimeout
+4. 429 响应按 Retry-After 暂停所有请求
+5. 条件单参数（stopPrice、workingType）和订单查询与同步客户端一致
+
+请求发往本地 aiohttp 服务，限流调度器使用手动推进的时钟
+"""
+
+import sys
+import os
+import json
+import asyncio
+
+import aiohttp
+import numpy as np
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from eth_account import Account
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.api.async_asterdex_client import AsyncAsterDexClient
+from src.api.rate_limiter import RequestScheduler, RateLimitTimeout
+from src.market.kline_decoder import decode_klines_json
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.CRITICAL)
+
+PRIVATE_KEY = '0x4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318'
+USER = '0x63DD5aCC6b1aa0f563956C0e534DD30B6dcF7C4e'
+SIGNER = Account.from_key(PRIVATE_KEY).address
+
+
+def make_klines(symbol, count=3):
+    """与 /fapi/v1/klines 格式相同的响应体，开盘价按交易对区分"""
+    base = 100 * (len(symbol) + ord(symbol[0]))
+    rows = []
+    for i in range(count):
+        open_time = 1700000000000 + i * 60000
+        rows.append([open_time, f"{base + i}", f"{base + i + 1}", f"{base + i - 1}", f"{base + i + 0.5}",
+                     "12.5", open_time + 59999, "1250.0", 42, "6.1", "615.2", "0"])
+    return json.dumps(rows, separators=(',', ':')).encode('utf-8')
+
+
+class FakeExchange:
+    """本地交易所：按交易对返回K线、错误或延迟响应，记录请求和同时进行的请求数"""
+    
+    def __init__(self):
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.delay = 0.05
+        self.errors = {}        # {交易对: (状态码, 响应体, 响应头)}
+        self.slow = set()       # 超过读取超时的交易对
+        self.headers = {}       # 所有响应附带的响应头
+    
+    def app(self):
+        app = web.Application()
+        app.router.add_get('/fapi/v1/klines', self.klines)
+        app.router.add_get('/fapi/v3/balance', self.balance)
+        app.router.add_post('/fapi/v3/order', self.order)
+        app.router.add_get('/fapi/v3/order', self.query_order)
+        return app
+    
+    async def klines(self, request):
+        symbol = request.query['symbol']
+        self.requests.append(('GET', '/fapi/v1/klines', dict(request.query)))
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(2 if symbol in self.slow else self.delay)
+        finally:
+            self.in_flight -= 1
+        
+        status, body, headers = self.errors.get(symbol, (200, make_klines(symbol), {}))
+        return web.Response(status=status, body=body, headers={**self.headers, **headers},
+                            content_type='application/json')
+    
+    async def balance(self, request):
+        self.requests.append(('GET', '/fapi/v3/balance', dict(request.query)))
+        return web.json_response([{'asset': 'USDT', 'balance': '1000'}], headers=self.headers)
+    
+    async def order(self, request):
+        self.requests.append(('POST', '/fapi/v3/order', dict(await request.post())))
+        return web.json_response({'orderId': 1, 'status': 'NEW'}, headers=self.headers)
+    
+    async def query_order(self, request):
+        self.requests.append(('GET', '/fapi/v3/order', dict(request.query)))
+        return web.json_response({'orderId': int(request.query['orderId']), 'status': 'FILLED'},
+                                 headers=self.headers)
+
+
+class FakeClock:
+    """手动推进的单调时钟"""
+    
+    def __init__(self, start=1000.0):
+        self.now = start
+    
+    def __call__(self):
+        return self.now
+
+
+def run_with_exchange(exchange, scenario, rate_limiter=None):
+    """启动本地交易所，用指向它的客户端运行 scenario(client)"""
+    async def main():
+        server = TestServer(exchange.app())
+        await server.start_server()
+        client = AsyncAsterDexClient(
+            USER, SIGNER, PRIVATE_KEY,
+            api_base_url=str(server.make_url('')).rstrip('/'),
+            http_config={'timeouts': {'/fapi/v1/klines': 0.5}},
+            rate_limiter=rate_limiter
+        )
+        try:
+            async with client:
+                return await scenario(client)
+        finally:
+            await server.close()
+    
+    return asyncio.run(main())
+
+
+def test_batch_results():
+    """测试批量K线的结果与异常映射"""
+    exchange = FakeExchange()
+    exchange.errors = {
+        'ETHUSDT': (400, b'{"code":-1121,"msg":"Invalid symbol."}', {}),
+        'SOLUSDT': (200, make_klines('SOLUSDT')[:-20], {}),
+        'XRPUSDT': (503, b'Service Unavailable', {}),
+    }
+    exchange.slow = {'DOGEUSDT'}
+    symbols = ['BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'XRPUSDT', 'DOGEUSDT', 'BNBUSDT']
+    
+    async def scenario(client):
+        as_lists = await client.get_klines_batch(symbols, '1m', limit=100)
+        as_arrays = await client.get_klines_batch(symbols, '1m', limit=100, as_array=True)
+        empty = await client.get_klines_batch([], '1m')
+        return as_lists, as_arrays, empty
+    
+    as_lists, as_arrays, empty = run_with_exchange(exchange, scenario)
+    
+    # 结果按传入顺序包含所有交易对
+    for results in (as_lists, as_arrays):
+        assert list(results) == symbols
+        
+        # HTTP 错误：保留状态码
+        assert isinstance(results['ETHUSDT'], aiohttp.ClientResponseError)
+        assert results['ETHUSDT'].status == 400
+        assert isinstance(results['XRPUSDT'], aiohttp.ClientResponseError)
+        assert results['XRPUSDT'].status == 503
+        
+        # 读取超时
+        assert isinstance(results['DOGEUSDT'], asyncio.TimeoutError)
+        
+        # 响应体不完整
+        assert isinstance(results['SOLUSDT'], ValueError)
+    
+    # 成功的交易对不受其他交易对失败的影响
+    for symbol in ('BTCUSDT', 'BNBUSDT'):
+        assert as_lists[symbol] == json.loads(make_klines(symbol))
+        bars = as_arrays[symbol]
+        np.testing.assert_array_equal(bars, decode_klines_json(make_klines(symbol)))
+        assert list(bars['open']) == [float(k[1]) for k in as_lists[symbol]]
+    
+    assert empty == {}
+    
+    # 所有交易对同时请求，参数一致
+    assert exchange.max_in_flight == len(symbols)
+    assert len(exchange.requests) == 2 * len(symbols)
+    for _, _, query in exchange.requests:
+        assert query['interval'] == '1m' and query['limit'] == '100'
+    
+    logger.info("✓ 测试通过: 批量K线的结果与异常映射")
+
+
+def test_rate_limiter_acquire():
+    """测试请求前获取限流额度"""
+    exchange = FakeExchange()
+    scheduler = RequestScheduler(
+        weight_limit=100, order_limit=10, interval_seconds=60,
+        market_reserve_ratio=0.2, acquire_timeout=0, time_source=FakeClock()
+    )
+    
+    async def scenario(client):
+        # 行情请求：limit=500 权重 5，limit=100 权重 2
+        await client.get_klines('BTCUSDT', '1m', limit=500)
+        await client.get_klines_batch(['BTCUSDT', 'ETHUSDT', 'SOLUSDT'], '1m', limit=100, as_array=True)
+        after_market = scheduler.metrics()
+        
+        # 账户查询（权重 5）和下单（计入下单次数）
+        await client.get_balance()
+        await client.place_order('BTCUSDT', 'BUY', 'MARKET', '0.001')
+        after_trading = scheduler.metrics()
+        
+        # 服务端用量更紧时按响应头下调
+        exchange.headers = {'X-MBX-USED-WEIGHT-1M': '75', 'X-MBX-ORDER-COUNT-1M': '3'}
+        await client.get_klines('BTCUSDT', '1m', limit=50)
+        after_headers = scheduler.metrics()
+        
+        # 行情请求不能动用保留的 20：剩余 25，权重 10 的请求不能发出
+        sent = len(exchange.requests)
+        try:
+            await client.get_klines('BTCUSDT', '1m', limit=1500)
+            raise AssertionError("应当等待额度超时")
+        except RateLimitTimeout:
+            pass
+        batch = await client.get_klines_batch(['BTCUSDT', 'ETHUSDT'], '1m', limit=1500)
+        assert len(exchange.requests) == sent
+        
+        # 交易请求仍可使用保留额度
+        await client.place_order('BTCUSDT', 'SELL', 'MARKET', '0.001')
+        return after_market, after_trading, after_headers, batch, scheduler.metrics()
+    
+    after_market, after_trading, after_headers, batch, final = run_with_exchange(
+        exchange, scenario, rate_limiter=scheduler
+    )
+    
+    assert after_market['weight_available'] == 100 - 5 - 3 * 2
+    assert after_market['requests'] == {'order': 0, 'account': 0, 'market': 4}
+    assert after_market['order_available'] == 10
+    
+    assert after_trading['weight_available'] == 89 - 5 - 1
+    assert after_trading['requests'] == {'order': 1, 'account': 1, 'market': 4}
+    assert after_trading['order_available'] == 9
+    
+    assert after_headers['weight_available'] == 25
+    assert after_headers['server_used_weight'] == 75
+    assert after_headers['order_available'] == 7
+    
+    assert list(batch) == ['BTCUSDT', 'ETHUSDT']
+    assert all(isinstance(result, RateLimitTimeout) for result in batch.values())
+    
+    assert final['requests'] == {'order': 2, 'account': 1, 'market': 5}
+    assert final['timeout_count'] == 3
+    assert final['weight_available'] == 24 and final['order_available'] == 6
+    
+    # 签名请求带上签名参数
+    method, endpoint, form = exchange.requests[-1]
+    assert (method, endpoint) == ('POST', '/fapi/v3/order')
+    assert form['side'] == 'SELL' and form['signer'] == SIGNER and 'signature' in form
+    
+    logger.info("✓ 测试通过: 请求前获取限流额度")
+
+
+def test_throttled_response():
+    """测试 429 暂停所有请求"""
+    exchange = FakeExchange()
+    exchange.errors = {'ETHUSDT': (429, b'{"code":-1003,"msg":"Too many requests."}', {'Retry-After': '5'})}
+    clock = FakeClock()
+    scheduler = RequestScheduler(weight_limit=100, acquire_timeout=0, time_source=clock)
+    
+    async def scenario(client):
+        results = await client.get_klines_batch(['ETHUSDT'], '1m', limit=50)
+        
+        # 暂停期间所有请求都不发出
+        sent = len(exchange.requests)
+        blocked = await client.get_klines_batch(['BTCUSDT'], '1m', limit=50)
+        try:
+            await client.place_order('BTCUSDT', 'BUY', 'MARKET', '0.001')
+            raise AssertionError("暂停期间不应下单")
+        except RateLimitTimeout:
+            pass
+        assert len(exchange.requests) == sent
+        
+        # 暂停结束后恢复
+        clock.now += 5
+        resumed = await client.get_klines_batch(['BTCUSDT'], '1m', limit=50)
+        return results, blocked, resumed
+    
+    results, blocked, resumed = run_with_exchange(exchange, scenario, rate_limiter=scheduler)
+    
+    assert isinstance(results['ETHUSDT'], aiohttp.ClientResponseError)
+    assert results['ETHUSDT'].status == 429
+    assert isinstance(blocked['BTCUSDT'], RateLimitTimeout)
+    assert resumed['BTCUSDT'] == json.loads(make_klines('BTCUSDT'))
+    
+    metrics = scheduler.metrics()
+    assert metrics['throttled_count'] == 1
+    assert metrics['blocked_seconds'] == 0
+    
+    logger.info("✓ 测试通过: 429 暂停所有请求")
+
+
+def test_order_parity():
+    """测试条件单和订单查询"""
+    exchange = FakeExchange()
+    
+    async def scenario(client):
+        await client.place_order(
+            'BTCUSDT', 'SELL', 'STOP_MARKET', '0.010',
+            reduce_only=True, stop_price='49000', working_type='MARK_PRICE'
+        )
+        await client.place_order('BTCUSDT', 'BUY', 'MARKET', '0.010')
+        return await client.get_order('BTCUSDT', 1)
+    
+    order = run_with_exchange(exchange, scenario)
+    assert order == {'orderId': 1, 'status': 'FILLED'}
+    
+    (_, _, stop), (_, _, market), (method, endpoint, query) = exchange.requests
+    assert stop['type'] == 'STOP_MARKET' and stop['reduceOnly'] == 'True'
+    assert stop['stopPrice'] == '49000' and stop['workingType'] == 'MARK_PRICE'
+    assert 'timeInForce' not in stop
+    assert 'stopPrice' not in market and 'workingType' not in market
+    assert (method, endpoint) == ('GET', '/fapi/v3/order')
+    assert query['symbol'] == 'BTCUSDT' and query['orderId'] == '1' and 'signature' in query
+    
+    logger.info("✓ 测试通过: 条件单和订单查询")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_batch_results,
+        test_rate_limiter_acquire,
+        test_throttled_response,
+        test_order_parity
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+测试回测引擎
+
+这个脚本验证：
+1. 回测信号与逐根K线调用 DoubleMaStrategy.analyze（时间取自K线）完全一致
+2. 成交价含滑点、手续费按名义价值收取，权益曲线终值等于初始资金加总盈亏
+3. 多交易对回测的组合权益与各交易对结果一致，可以从 KlineStore 读取数据
+"""
+
+import sys
+import os
+import math
+import tempfile
+from datetime import datetime
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+import numpy as np
+
+from src.backtest import DoubleMaBacktester
+from src.market.kline_decoder import KLINE_DTYPE
+from src.market.kline_store import KlineStore
+from src.strategies.double_ma import DoubleMaStrategy
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+# 策略每根K线都会输出日志，测试中只保留警告以上
+logging.getLogger('trading_bot').setLevel(logging.ERROR)
+
+INTERVAL_MS = {'15m': 900000, '4h': 14400000}
+
+
+def make_bars(count, volatility, seed, interval='15m'):
+    """生成几何随机游走K线（开盘价等于上一根收盘价）"""
+    rng = np.random.default_rng(seed)
+    step = INTERVAL_MS[interval]
+    bars = np.zeros(count, dtype=KLINE_DTYPE)
+    bars['open_time'] = 1600000000000 // step * step + np.arange(count, dtype=np.int64) * step
+    bars['close_time'] = bars['open_time'] + step - 1
+    close = 100 * np.exp(np.cumsum(rng.normal(0, volatility, count)))
+    bars['close'] = close
+    bars['open'] = np.concatenate(([close[0]], close[:-1]))
+    bars['high'] = np.maximum(bars['open'], close)
+    bars['low'] = np.minimum(bars['open'], close)
+    return bars
+
+
+def live_signals(bars, interval):
+    """逐根K线调用 analyze，时间为该K线的收盘时刻"""
+    strategy = DoubleMaStrategy()
+    signals = []
+    for t in range(len(bars)):
+        now = datetime.fromtimestamp((int(bars['close_time'][t]) + 1) / 1000)
+        signal = strategy.analyze('TESTUSDT', bars[:t + 1], interval, now=now)
+        if signal['action'] != 'HOLD':
+            signals.append((t, signal['action']))
+    return signals
+
+
+def test_signals_match_analyze():
+    """回测信号与 analyze 一致"""
+    backtester = DoubleMaBacktester()
+    total = 0
+    for interval, volatility, seed in (('15m', 0.008, 3), ('15m', 0.005, 11), ('4h', 0.012, 5)):
+        bars = make_bars(3000, volatility, seed, interval)
+        expected = live_signals(bars, interval)
+        actual = backtester.generate_signals(bars, interval)
+        assert actual == expected, f"{interval} seed={seed}: {actual[:6]} != {expected[:6]}"
+        total += len(actual)
+    
+    assert total > 20, f"信号数量过少: {total}"
+    
+    logger.info(f"✓ 测试通过: 回测信号与 analyze 一致（{total} 个信号）")
+
+
+def test_fills_and_equity():
+    """成交价、手续费和权益曲线"""
+    bars = make_bars(3000, 0.008, 3)
+    backtester = DoubleMaBacktester(initial_capital=1000, position_percent=50, leverage=2, fee_rate=0.001, slippage_bps=10)
+    result = backtester.run('TESTUSDT', bars, '15m')
+    
+    assert result.trades, "没有交易"
+    for trade, (opened, closed) in zip(result.trades, zip(result.signals[::2], result.signals[1::2])):
+        open_price = bars['open'][opened['index'] + 1]
+        if trade['side'] == 'LONG':
+            assert math.isclose(trade['entry_price'], open_price * 1.001)
+        else:
+            assert math.isclose(trade['entry_price'], open_price * 0.999)
+        assert trade['entry_time'] == bars['open_time'][opened['index'] + 1]
+        assert trade['exit_signal_time'] == closed['time']
+        
+        expected_fees = trade['quantity'] * (trade['entry_price'] + trade['exit_price']) * 0.001
+        assert math.isclose(trade['fees'], expected_fees)
+    
+    # 首笔交易按初始资金开仓
+    first = result.trades[0]
+    assert math.isclose(first['quantity'] * first['entry_price'], 1000 * 0.5 * 2)
+    
+    total_pnl = sum(t['pnl'] for t in result.trades)
+    assert math.isclose(result.equity[-1], 1000 + total_pnl, rel_tol=1e-9)
+    assert math.isclose(result.stats['final_equity'], result.equity[-1])
+    assert result.stats['trades'] == len(result.trades)
+    assert 0 <= result.stats['max_drawdown_percent'] <= 100
+    
+    logger.info("✓ 测试通过: 成交与权益曲线")
+
+
+def test_portfolio_from_store():
+    """从 KlineStore 读取多个交易对回测"""
+    universe = {
+        'AAAUSDT': make_bars(2000, 0.008, 1),
+        'BBBUSDT': make_bars(2000, 0.008, 2)[500:],
+        'CCCUSDT': make_bars(2000, 0.012, 4)
+    }
+    
+    with tempfile.TemporaryDirectory() as data_dir:
+        store = KlineStore(client=None, data_dir=data_dir)
+        for symbol, bars in universe.items():
+            series, _ = store._series(symbol, '15m')
+            series.append(bars)
+        
+        backtester = DoubleMaBacktester(initial_capital=3000)
+        portfolio = backtester.run_store(store, list(universe), '15m')
+    
+    assert set(portfolio.results) == set(universe)
+    for symbol, result in portfolio.results.items():
+        single = DoubleMaBacktester(initial_capital=1000).run(symbol, universe[symbol], '15m')
+        assert np.allclose(result.equity, single.equity)
+    
+    assert len(portfolio.open_time) == 2000
+    final = sum(r.equity[-1] for r in portfolio.results.values())
+    assert math.isclose(portfolio.equity[-1], final)
+    assert math.isclose(portfolio.equity[0], 3000, rel_tol=1e-6)
+    assert portfolio.stats['trades'] == len(portfolio.trades)
+    
+    logger.info("✓ 测试通过: 多交易对组合回测")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_signals_match_analyze,
+        test_fills_and_equity,
+        test_portfolio_from_store
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+测试K线收盘调度器
+
+这个脚本验证：
+1. 只在K线收盘（加结算延迟）之后分发，注册前已收盘的K线不分发
+2. 有数据源时只分发收盘K线已更新的交易对，其余交易对在确认后或超时后分发
+3. 同一根K线不会重复分发，并记录收盘到信号的延迟
+4. 后台线程按真实时间在边界触发
+5. 周线在周一 00:00 UTC 收盘（与交易所和K线重采样一致），不是按 Unix 纪元对齐的周四
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.market.bar_close import BarCloseDispatcher, interval_to_ms
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+MINUTE = 60 * 1000
+DAY = 1440 * MINUTE
+BASE = 1700000000000 // (15 * MINUTE) * (15 * MINUTE)   # 15m 边界
+MONDAY = 1699833600000                                  # 2023-11-13 00:00 UTC（周一）
+
+
+class FakeClock:
+    """可手动推进的时钟（秒）"""
+    
+    def __init__(self, ms):
+        self.ms = ms
+    
+    def __call__(self):
+        return self.ms / 1000
+
+
+def make_dispatcher(clock, bar_source=None, settle_delay=1.0, max_wait=10.0):
+    calls = []
+    dispatcher = BarCloseDispatcher(
+        settle_delay=settle_delay,
+        max_wait=max_wait,
+        bar_source=bar_source,
+        time_source=clock
+    )
+    dispatcher.register('hf', '15m', ['BTCUSDT', 'ETHUSDT'], lambda symbols, bar_close: calls.append((symbols, bar_close)))
+    return dispatcher, calls
+
+
+def test_interval_to_ms():
+    """K线间隔换算"""
+    assert interval_to_ms('1m') == MINUTE
+    assert interval_to_ms('15m') == 15 * MINUTE
+    assert interval_to_ms('4h') == 240 * MINUTE
+    assert interval_to_ms('1w') == 7 * 1440 * MINUTE
+    for bad in ('1M', 'abc', ''):
+        try:
+            interval_to_ms(bad)
+        except ValueError:
+            continue
+        raise AssertionError(f"应拒绝 {bad}")
+    
+    logger.info("✓ 测试通过: K线间隔换算")
+
+
+def test_dispatch_on_bar_close():
+    """边界 + 结算延迟之后分发全部交易对，且只分发一次"""
+    clock = FakeClock(BASE + 5 * MINUTE)
+    dispatcher, calls = make_dispatcher(clock)
+    
+    # 注册时所在的K线尚未收盘
+    timeout = dispatcher._tick(clock.ms)
+    assert calls == []
+    assert abs(timeout - (10 * MINUTE + 1000) / 1000) < 0.01, timeout
+    
+    # 收盘但未过结算延迟
+    clock.ms = BASE + 15 * MINUTE + 500
+    dispatcher._tick(clock.ms)
+    assert calls == []
+    
+    clock.ms = BASE + 15 * MINUTE + 1200
+    dispatcher._tick(clock.ms)
+    assert calls == [(['BTCUSDT', 'ETHUSDT'], BASE + 15 * MINUTE)]
+    
+    # 同一根K线不再分发
+    clock.ms += 5000
+    dispatcher._tick(clock.ms)
+    assert len(calls) == 1
+    
+    metrics = dispatcher.metrics()['hf']
+    assert metrics['dispatch_count'] == 1
+    assert metrics['dispatch_delay_ms']['last'] == 1200
+    assert metrics['signal_delay_ms']['last'] == 1200
+    
+    logger.info("✓ 测试通过: K线收盘后分发一次")
+
+
+def test_only_changed_symbols():
+    """有数据源时只分发收盘K线已确认的交易对"""
+    clock = FakeClock(BASE + 5 * MINUTE)
+    closed = {'BTCUSDT': BASE - 15 * MINUTE, 'ETHUSDT': BASE - 15 * MINUTE}
+    dispatcher, calls = make_dispatcher(clock, bar_source=lambda s, i: closed[s])
+    
+    # BTC 的收盘推送已到，ETH 尚未到
+    clock.ms = BASE + 15 * MINUTE + 1500
+    closed['BTCUSDT'] = BASE
+    timeout = dispatcher._tick(clock.ms)
+    assert calls == [(['BTCUSDT'], BASE + 15 * MINUTE)]
+    assert timeout < 1.0
+    
+    # ETH 确认后单独分发
+    clock.ms += 300
+    closed['ETHUSDT'] = BASE
+    dispatcher._tick(clock.ms)
+    assert calls[-1] == (['ETHUSDT'], BASE + 15 * MINUTE)
+    
+    # 下一根K线：ETH 一直没有确认，超时后仍然分发
+    clock.ms = BASE + 30 * MINUTE + 1500
+    closed['BTCUSDT'] = BASE + 15 * MINUTE
+    dispatcher._tick(clock.ms)
+    assert calls[-1] == (['BTCUSDT'], BASE + 30 * MINUTE)
+    
+    clock.ms = BASE + 30 * MINUTE + 10500
+    dispatcher._tick(clock.ms)
+    assert calls[-1] == (['ETHUSDT'], BASE + 30 * MINUTE)
+    assert len(calls) == 4
+    
+    logger.info("✓ 测试通过: 只分发收盘K线有更新的交易对")
+
+
+def test_weekly_boundary():
+    """周线在周一收盘"""
+    calls = []
+    clock = FakeClock(MONDAY + 2 * DAY + 12 * 60 * MINUTE)     # 周三 12:00
+    dispatcher = BarCloseDispatcher(settle_delay=1.0, time_source=clock)
+    dispatcher.register('weekly', '1w', ['BTCUSDT'], lambda symbols, bar_close: calls.append(bar_close))
+    
+    # 下一次检查在下周一 00:00 + 结算延迟
+    timeout = dispatcher._tick(clock.ms)
+    assert calls == []
+    assert abs(timeout - (MONDAY + 7 * DAY + 1000 - clock.ms) / 1000) < 0.01, timeout
+    
+    # 周四 00:00（按 Unix 纪元对齐的周边界）不分发
+    clock.ms = MONDAY + 3 * DAY + 2000
+    dispatcher._tick(clock.ms)
+    assert calls == []
+    
+    clock.ms = MONDAY + 7 * DAY + 2000
+    dispatcher._tick(clock.ms)
+    assert calls == [MONDAY + 7 * DAY]
+    
+    logger.info("✓ 测试通过: 周线在周一收盘")
+
+
+def test_background_thread():
+    """后台线程在真实的K线边界触发"""
+    fired = threading.Event()
+    results = []
+    
+    # 用 1m K线，把时钟偏移到距离下一个边界约 0.3 秒
+    offset = (MINUTE - 300 - int(time.time() * 1000) % MINUTE) / 1000
+    dispatcher = BarCloseDispatcher(settle_delay=0.1, time_source=lambda: time.time() + offset)
+    dispatcher.register('fast', '1m', ['BTCUSDT'], lambda symbols, bar_close: (results.append(symbols), fired.set()))
+    dispatcher.start()
+    try:
+        assert fired.wait(timeout=3), "未在边界触发"
+        assert results == [['BTCUSDT']]
+    finally:
+        dispatcher.stop()
+    
+    delay = dispatcher.metrics()['fast']['signal_delay_ms']['last']
+    assert 100 <= delay < 1000, delay
+    
+    logger.info("✓ 测试通过: 后台线程按边界触发")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_interval_to_ms,
+        test_dispatch_on_bar_close,
+        test_only_changed_symbols,
+        test_weekly_boundary,
+        test_background_thread
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+测试批量指标计算
+
+这个脚本验证：
+1. BatchIndicatorEngine 的均线与逐个交易对调用 calculate_all_mas 一致（含长度不同、数据不足的交易对）
+2. 均线密集度、均线平均值、价格位置与 TechnicalIndicators 的函数一致
+3. DoubleMaStrategy.analyze_batch 与逐个调用 analyze 生成相同的信号
+4. 多个周期连续输入滑动窗口（含窗口不连续）时两种模式的均线和信号始终一致（窗口 EMA 和流式 EMA）
+5. 默认的 EMA 与原实现一样按传入的K线窗口计算，流式 EMA 需要 streaming_ema 显式开启
+"""
+
+import sys
+import os
+import math
+from datetime import datetime
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+import numpy as np
+
+from src.market.kline_decoder import KLINE_DTYPE
+from src.strategies.indicators import TechnicalIndicators
+from src.strategies.batch_indicators import BatchIndicatorEngine
+from src.strategies.double_ma import DoubleMaStrategy
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SMA_PERIODS = [20, 60, 120]
+EMA_PERIODS = [20, 60, 120]
+
+
+def make_klines(count, seed, base=30000.0, volatility=25.0):
+    """生成结构化数组格式的K线"""
+    rng = np.random.default_rng(seed)
+    bars = np.zeros(count, dtype=KLINE_DTYPE)
+    bars['open_time'] = 1700000000000 + np.arange(count, dtype=np.int64) * 900000
+    bars['close_time'] = bars['open_time'] + 899999
+    bars['close'] = base + np.cumsum(rng.normal(0, volatility, count))
+    bars['open'] = bars['close']
+    bars['high'] = bars['close'] + 10
+    bars['low'] = bars['close'] - 10
+    return bars
+
+
+def make_universe():
+    """不同长度、不同价格量级的交易对（含均线密集的平稳行情）"""
+    return {
+        'BTCUSDT': make_klines(150, 1),
+        'ETHUSDT': make_klines(150, 2, base=2000.0, volatility=2.0),
+        'SOLUSDT': make_klines(90, 3, base=150.0, volatility=0.2),
+        'NEWUSDT': make_klines(15, 4, base=1.0, volatility=0.01),
+        'FLATUSDT': make_klines(150, 5, base=10.0, volatility=0.001),
+        'EMPTYUSDT': np.zeros(0, dtype=KLINE_DTYPE),
+        'FAILUSDT': RuntimeError("请求失败")
+    }
+
+
+def assert_close(actual, expected, label):
+    assert math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-9), \
+        f"{label}: {actual} != {expected}"
+
+
+def test_mas_match_reference():
+    """均线与逐个交易对计算的结果一致"""
+    universe = make_universe()
+    engine = BatchIndicatorEngine(SMA_PERIODS, EMA_PERIODS)
+    result = engine.compute_klines(universe)
+    
+    assert result.symbols == ['BTCUSDT', 'ETHUSDT', 'SOLUSDT', 'NEWUSDT', 'FLATUSDT']
+    
+    for symbol in result.symbols:
+        closes = universe[symbol]['close']
+        expected = TechnicalIndicators.calculate_all_mas(closes, SMA_PERIODS, EMA_PERIODS)
+        actual = result.for_symbol(symbol)['ma_data']
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            assert_close(actual[key], expected[key], f"{symbol} {key}")
+        assert np.array_equal(result.closes(symbol), closes)
+    
+    logger.info("✓ 测试通过: 均线与原始实现一致")
+
+
+def test_classification_matches_reference():
+    """密集度、均线平均值和价格位置与原始实现一致"""
+    universe = make_universe()
+    engine = BatchIndicatorEngine(SMA_PERIODS, EMA_PERIODS, convergence_threshold=2.0)
+    result = engine.compute_klines(universe)
+    
+    for symbol in result.symbols:
+        closes = universe[symbol]['close']
+        ma_data = TechnicalIndicators.calculate_all_mas(closes, SMA_PERIODS, EMA_PERIODS)
+        values = [v for v in ma_data.values() if v > 0]
+        indicators = result.for_symbol(symbol)
+        
+        assert indicators['is_convergent'] == TechnicalIndicators.check_ma_convergence(values, 2.0), symbol
+        assert indicators['price_position'] == TechnicalIndicators.check_price_position(
+            float(closes[-1]), values
+        ), symbol
+        if values:
+            assert_close(indicators['ma_avg'], sum(values) / len(values), f"{symbol} ma_avg")
+        else:
+            assert indicators['ma_avg'] == 0.0
+    
+    assert result.for_symbol('FLATUSDT')['is_convergent']
+    assert result.for_symbol('NEWUSDT')['price_position'] == 'UNKNOWN'
+    
+    logger.info("✓ 测试通过: 密集度与价格位置一致")
+
+
+def test_analyze_batch_matches_analyze():
+    """批量分析与逐个分析的信号一致"""
+    universe = make_universe()
+    symbols = list(universe)
+    
+    for streaming_ema in (False, True):
+        batch_strategy = DoubleMaStrategy(SMA_PERIODS, EMA_PERIODS, streaming_ema=streaming_ema)
+        single_strategy = DoubleMaStrategy(SMA_PERIODS, EMA_PERIODS, streaming_ema=streaming_ema)
+        
+        signals = batch_strategy.analyze_batch(universe, '15m', symbols)
+        assert isinstance(signals['FAILUSDT'], RuntimeError)
+        assert signals['EMPTYUSDT']['reason'] == "无K线数据"
+        
+        for symbol in symbols:
+            if isinstance(universe[symbol], Exception):
+                continue
+            expected = single_strategy.analyze(symbol, universe[symbol], '15m')
+            actual = signals[symbol]
+            assert actual['action'] == expected['action'], symbol
+            assert actual['reason'] == expected['reason'], symbol
+            for key in ('is_convergent', 'price_position'):
+                assert actual.get(key) == expected.get(key), f"{symbol} {key}"
+            for key, value in expected.get('ma_data', {}).items():
+                assert_close(actual['ma_data'][key], value, f"{symbol} {key}")
+    
+    logger.info("✓ 测试通过: 批量分析与逐个分析一致")
+
+
+def test_sliding_windows_parity():
+    """滑动窗口多周期输入时批量分析与逐个分析一致"""
+    window = 150
+    history = {
+        'BTCUSDT': make_klines(1200, 11),
+        'ETHUSDT': make_klines(1200, 12, base=2000.0, volatility=2.0),
+        'FLATUSDT': make_klines(1200, 13, base=10.0, volatility=0.001)
+    }
+    symbols = list(history)
+    
+    # 每 50 根、每 1 根推进，再跳过一段（不连续，重新初始化）
+    ends = list(range(window, 600, 50)) + list(range(600, 640)) + list(range(900, 1200, 50))
+    
+    for streaming_ema in (False, True):
+        batch_strategy = DoubleMaStrategy(SMA_PERIODS, EMA_PERIODS, streaming_ema=streaming_ema)
+        single_strategy = DoubleMaStrategy(SMA_PERIODS, EMA_PERIODS, streaming_ema=streaming_ema)
+        
+        for end in ends:
+            universe = {symbol: bars[end - window:end] for symbol, bars in history.items()}
+            now = datetime.fromtimestamp(int(universe['BTCUSDT']['open_time'][-1]) / 1000)
+            signals = batch_strategy.analyze_batch(universe, '15m', symbols, now=now)
+            
+            for symbol in symbols:
+                expected = single_strategy.analyze(symbol, universe[symbol], '15m', now=now)
+                actual = signals[symbol]
+                assert actual['action'] == expected['action'], f"{symbol}[{end}]"
+                assert actual['reason'] == expected['reason'], f"{symbol}[{end}]"
+                for key, value in expected['ma_data'].items():
+                    assert_close(actual['ma_data'][key], value, f"{symbol} {key}[{end}]")
+    
+    logger.info(f"✓ 测试通过: {len(ends)} 个周期的滑动窗口批量分析与逐个分析一致")
+
+
+def test_window_ema_by_default():
+    """默认按K线窗口计算 EMA，流式 EMA 需要显式开启"""
+    window = 150
+    bars = make_klines(600, 21)
+    
+    window_strategy = DoubleMaStrategy(SMA_PERIODS, EMA_PERIODS)
+    streaming_strategy = DoubleMaStrategy(SMA_PERIODS, EMA_PERIODS, streaming_ema=True)
+    assert not window_strategy.streaming_ema
+    
+    drift = 0.0
+    for end in range(window, len(bars)):
+        klines = bars[end - window:end]
+        expected = TechnicalIndicators.calculate_all_mas(klines['close'], SMA_PERIODS, EMA_PERIODS)
+        
+        # 默认：每次都与原实现对传入窗口的计算结果相同，与之前分析过的K线无关
+        batch = window_strategy.analyze_batch({'BTCUSDT': klines}, '15m')['BTCUSDT']
+        for signal in (window_strategy.analyze('BTCUSDT', klines, '15m'), batch):
+            for key, value in expected.items():
+                assert_close(signal['ma_data'][key], value, f"{key}[{end}]")
+        
+        # 流式：EMA 覆盖第一次分析以来的全部历史，与窗口 EMA 不同
+        streamed = streaming_strategy.analyze('BTCUSDT', klines, '15m')['ma_data']
+        drift = max(drift, abs(streamed['ema_120'] - expected['ema_120']))
+        assert_close(streamed['sma_120'], expected['sma_120'], f"sma_120[{end}]")
+    
+    assert not window_strategy._ma_sets and not window_strategy._ema_states
+    assert drift > 1.0
+    
+    logger.info(f"✓ 测试通过: 默认窗口 EMA，流式 EMA 与之最大相差 {drift:.2f}")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_mas_match_reference,
+        test_classification_matches_reference,
+        test_analyze_batch_matches_analyze,
+        test_sliding_windows_parity,
+        test_window_ema_by_default
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
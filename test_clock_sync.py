@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+测试服务器时钟同步
+
+这个脚本验证：
+1. 偏移取 RTT 最小的一次采样，服务器时间对应本地往返的中点
+2. 多次同步后按最小二乘拟合出漂移速率，同步之间的偏移按漂移外推
+3. 同步报告的 RTT 统计和建议的 recvWindow
+4. 服务器返回 -1021 时后台线程立即重新同步
+5. 客户端取得 HTTP 会话后才签名，等待会话的时间不消耗 recvWindow
+"""
+
+import sys
+import os
+import math
+import time
+from contextlib import contextmanager
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+import requests
+from eth_account import Account
+
+from src.api import AsterDexClient
+from src.api.clock_sync import ServerClock
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.CRITICAL)
+
+PRIVATE_KEY = '0x4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318'
+USER = '0x63DD5aCC6b1aa0f563956C0e534DD30B6dcF7C4e'
+SIGNER = Account.from_key(PRIVATE_KEY).address
+
+
+class FakeTime:
+    """手动推进的本地时钟"""
+    
+    def __init__(self, start=1700000000.0):
+        self.now = start
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+
+class FakeServer:
+    """
+    模拟 /fapi/v1/time：服务器时钟 = 本地时间 * (1 + drift) + offset，
+    每次请求按 delays 中的 (去程, 回程) 延迟推进本地时钟
+    """
+    
+    def __init__(self, clock, offset, drift=0.0, delays=None):
+        self.clock = clock
+        self.offset = offset
+        self.drift = drift
+        self.start = clock.now
+        self.delays = list(delays or [])
+        self.requests = 0
+    
+    def server_time(self, local):
+        return local + self.offset + self.drift * (local - self.start)
+    
+    def get_server_time(self):
+        self.requests += 1
+        out, back = self.delays.pop(0) if self.delays else (0.005, 0.005)
+        self.clock.advance(out)
+        server_ms = self.server_time(self.clock.now) * 1000
+        self.clock.advance(back)
+        return {'serverTime': server_ms}
+
+
+def test_offset_from_min_rtt():
+    """测试最小 RTT 采样"""
+    clock = FakeTime()
+    # 第 1、3 次采样排队延迟大且不对称，第 2 次往返最短
+    delays = [(0.200, 0.010), (0.004, 0.004), (0.010, 0.300), (0.030, 0.030), (0.050, 0.020)]
+    server = FakeServer(clock, offset=0.250, delays=delays)
+    sync_clock = ServerClock(server, samples=5, time_source=clock)
+    
+    report = sync_clock.sync()
+    assert server.requests == 5
+    assert abs(report['offset_ms'] - 250.0) < 0.01, report
+    assert abs(report['rtt_ms'] - 8.0) < 1e-6
+    assert abs(report['rtt_max_ms'] - 310.0) < 1e-6
+    assert abs(report['rtt_median_ms'] - 70.0) < 1e-6
+    assert report['synced'] and report['sync_count'] == 1
+    
+    # 校正后的时间与服务器时间一致
+    assert abs(sync_clock.time() - server.server_time(clock.now)) < 1e-6
+    
+    logger.info("✓ 测试通过: 偏移取最小 RTT 采样")
+
+
+def test_drift_fit():
+    """测试漂移拟合和外推"""
+    clock = FakeTime()
+    server = FakeServer(clock, offset=-0.120, drift=50e-6)
+    sync_clock = ServerClock(server, samples=3, resync_interval=300, history_size=6, time_source=clock)
+    
+    assert sync_clock.offset() == 0.0           # 同步前不校正
+    
+    for _ in range(8):
+        report = sync_clock.sync()
+        clock.advance(300)
+    
+    assert abs(report['drift_ppm'] - 50.0) < 0.01, report
+    assert report['history_size'] == 6
+    
+    # 距上次同步 300 秒，偏移按漂移外推（误差远小于 1ms）
+    error_ms = abs(sync_clock.time() - server.server_time(clock.now)) * 1000
+    assert error_ms < 0.01, f"外推误差 {error_ms:.4f}ms"
+    
+    # 不做漂移校正时误差为 300 秒 * 50ppm = 15ms
+    stale_ms = abs(clock.now + sync_clock._offset - server.server_time(clock.now)) * 1000
+    assert math.isclose(stale_ms, 15.0, rel_tol=0.01)
+    
+    logger.info(f"✓ 测试通过: 漂移拟合（外推误差 {error_ms:.4f}ms）")
+
+
+def test_suggested_recv_window():
+    """测试建议的 recvWindow"""
+    clock = FakeTime()
+    server = FakeServer(clock, offset=0.0, delays=[(0.100, 0.100)])
+    sync_clock = ServerClock(server, samples=1, resync_interval=300, time_source=clock)
+    
+    assert sync_clock.report()['suggested_recv_window_ms'] is None
+    
+    report = sync_clock.sync()
+    assert abs(report['suggested_recv_window_ms'] - (3 * 200 + 100)) <= 1
+    
+    # 低延迟时不低于 500ms
+    fast_clock = ServerClock(FakeServer(clock, offset=0.0), samples=1, time_source=clock)
+    assert fast_clock.sync()['suggested_recv_window_ms'] == 500
+    
+    logger.info("✓ 测试通过: 建议的 recvWindow")
+
+
+class FakeResponse:
+    def __init__(self, status_code, text):
+        self.status_code = status_code
+        self.text = text
+        self.headers = {}
+    
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f'{self.status_code} Error', response=self)
+    
+    def json(self):
+        return {}
+
+
+class FakeSessionPool:
+    """等待空闲会话时推进本地时钟，记录请求参数"""
+    
+    def __init__(self, clock, wait, response):
+        self.clock = clock
+        self.wait = wait
+        self.response = response
+        self.sent = []
+    
+    @contextmanager
+    def session(self):
+        self.clock.advance(self.wait)
+        yield self
+    
+    def post(self, url, data=None, headers=None, timeout=None):
+        self.sent.append(data)
+        return self.response
+    
+    def get(self, url, params=None, timeout=None):
+        self.sent.append(params)
+        return self.response
+    
+    def close(self):
+        pass
+
+
+def make_client(clock, pool):
+    client = AsterDexClient(USER, SIGNER, PRIVATE_KEY, recv_window=1000)
+    client.session_pool.close()
+    client.session_pool = pool
+    client.rate_limiter = None
+    client.request_signer.time_source = clock
+    return client
+
+
+def test_resync_on_1021():
+    """测试 -1021 立即重新同步"""
+    clock = FakeTime()
+    server = FakeServer(clock, offset=0.0)
+    sync_clock = ServerClock(server, samples=1, resync_interval=3600, time_source=clock)
+    sync_clock.sync()
+    sync_clock.start()
+    
+    response = FakeResponse(400, '{"code":-1021,"msg":"Timestamp for this request is outside of the recvWindow."}')
+    client = make_client(clock, FakeSessionPool(clock, 0.0, response))
+    client.use_server_clock(sync_clock)
+    
+    try:
+        try:
+            client._request('POST', '/fapi/v3/order', {'symbol': 'BTCUSDT'}, signed=True)
+            raise AssertionError("应抛出 HTTPError")
+        except requests.exceptions.HTTPError:
+            pass
+        
+        deadline = time.monotonic() + 5
+        while sync_clock.sync_count < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert sync_clock.sync_count == 2
+    finally:
+        sync_clock.stop()
+        client.close()
+    
+    logger.info("✓ 测试通过: -1021 立即重新同步")
+
+
+def test_sign_after_session_acquired():
+    """测试取得会话后签名"""
+    clock = FakeTime()
+    pool = FakeSessionPool(clock, wait=2.5, response=FakeResponse(200, '{}'))
+    client = make_client(clock, pool)
+    
+    try:
+        requested_at = clock.now
+        client._request('POST', '/fapi/v3/order', {'symbol': 'BTCUSDT'}, signed=True)
+        timestamp = pool.sent[0]['timestamp']
+        
+        # 时间戳是等待 2.5 秒之后的时间，服务器收到时仍在 1000ms 的 recvWindow 内
+        assert timestamp == int(round(clock.now * 1000))
+        assert timestamp - int(requested_at * 1000) == 2500
+        assert pool.sent[0]['recvWindow'] == 1000
+    finally:
+        client.close()
+    
+    logger.info("✓ 测试通过: 取得会话后签名")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_offset_from_min_rtt,
+        test_drift_fit,
+        test_suggested_recv_window,
+        test_resync_on_1021,
+        test_sign_after_session_acquired
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
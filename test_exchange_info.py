@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+测试交易对预编译规则
+
+这个脚本验证：
+1. SymbolRules.round_quantity 与原 RiskManager 的 LOT_SIZE 处理一致：限制在 minQty/maxQty 之间并向下取整到 stepSize
+2. SymbolRules.round_price 向下取整到 tickSize，结果能通过价格步长校验
+3. SymbolRules.validate 与原 RiskManager.validate_order 的结果和错误信息一致（价格范围、步长、最小数量、最小名义价值）
+4. RiskManager 传入原始交易对信息或 SymbolRules 时结果相同
+
+原实现逐字保留在本文件中（legacy_*），作为对照
+"""
+
+import sys
+import os
+import itertools
+from decimal import Decimal
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.trading.exchange_info import SymbolRules
+from src.trading.risk_manager import RiskManager
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.CRITICAL)
+
+
+def make_symbol_info(step_size='0.001', min_qty='0.001', max_qty='1000', tick_size='0.10',
+                     min_price='0.10', max_price='1000000', notional='5', filters=None):
+    """与 exchangeInfo['symbols'] 中一项格式相同的交易对信息（过滤器顺序与交易所一致）"""
+    all_filters = {
+        'PRICE_FILTER': {'filterType': 'PRICE_FILTER', 'minPrice': min_price,
+                         'maxPrice': max_price, 'tickSize': tick_size},
+        'LOT_SIZE': {'filterType': 'LOT_SIZE', 'stepSize': step_size,
+                     'minQty': min_qty, 'maxQty': max_qty},
+        'MARKET_LOT_SIZE': {'filterType': 'MARKET_LOT_SIZE', 'stepSize': step_size,
+                            'minQty': min_qty, 'maxQty': '100'},
+        'MIN_NOTIONAL': {'filterType': 'MIN_NOTIONAL', 'notional': notional},
+    }
+    names = filters if filters is not None else list(all_filters)
+    return {
+        'symbol': 'BTCUSDT',
+        'pricePrecision': 2,
+        'quantityPrecision': 3,
+        'filters': [all_filters[name] for name in names]
+    }
+
+
+def legacy_apply_lot_size_filter(quantity, symbol_info):
+    """原 RiskManager._apply_lot_size_filter"""
+    filters = symbol_info.get('filters', [])
+    
+    for f in filters:
+        if f.get('filterType') == 'LOT_SIZE':
+            min_qty = float(f.get('minQty', 0))
+            max_qty = float(f.get('maxQty', float('inf')))
+            step_size = float(f.get('stepSize', 0.01))
+            
+            quantity = max(min_qty, min(quantity, max_qty))
+            
+            if step_size > 0:
+                quantity = float(Decimal(str(quantity)) - Decimal(str(quantity)) % Decimal(str(step_size)))
+            
+            break
+    
+    return quantity
+
+
+def legacy_validate_order(quantity, price, symbol_info):
+    """原 RiskManager.validate_order"""
+    filters = symbol_info.get('filters', [])
+    
+    for f in filters:
+        filter_type = f.get('filterType')
+        
+        if filter_type == 'PRICE_FILTER':
+            min_price = float(f.get('minPrice', 0))
+            max_price = float(f.get('maxPrice', float('inf')))
+            tick_size = float(f.get('tickSize', 0.01))
+            
+            if price < min_price:
+                return False, f"价格 {price} 低于最小价格 {min_price}"
+            if price > max_price:
+                return False, f"价格 {price} 高于最大价格 {max_price}"
+            
+            if tick_size > 0:
+                price_mod = float(Decimal(str(price)) % Decimal(str(tick_size)))
+                if price_mod != 0:
+                    return False, f"价格 {price} 不符合价格步长 {tick_size}"
+        
+        elif filter_type == 'LOT_SIZE':
+            min_qty = float(f.get('minQty', 0))
+            max_qty = float(f.get('maxQty', float('inf')))
+            step_size = float(f.get('stepSize', 0.01))
+            
+            if quantity < min_qty:
+                return False, f"数量 {quantity} 低于最小数量 {min_qty}"
+            if quantity > max_qty:
+                return False, f"数量 {quantity} 高于最大数量 {max_qty}"
+            
+            if step_size > 0:
+                qty_mod = float(Decimal(str(quantity)) % Decimal(str(step_size)))
+                if qty_mod != 0:
+                    return False, f"数量 {quantity} 不符合数量步长 {step_size}"
+        
+        elif filter_type == 'MIN_NOTIONAL':
+            min_notional = float(f.get('notional', 0))
+            notional = price * quantity
+            
+            if notional < min_notional:
+                return False, f"名义价值 {notional} 低于最小值 {min_notional}"
+    
+    return True, ""
+
+
+# 对照用的交易对：常见步长、整数步长、交易所返回的带尾零写法、缺少过滤器
+SYMBOL_INFOS = [
+    make_symbol_info(),
+    make_symbol_info(step_size='1', min_qty='1', max_qty='50000', tick_size='0.0001',
+                     min_price='0.0001', max_price='200', notional='5'),
+    make_symbol_info(step_size='0.00100000', min_qty='0.00100000', tick_size='0.01000000',
+                     min_price='0.01000000', notional='100'),
+    make_symbol_info(step_size='0.5', min_qty='0.5', max_qty='10', tick_size='0.5', min_price='1'),
+    make_symbol_info(filters=['PRICE_FILTER', 'MIN_NOTIONAL']),
+    make_symbol_info(filters=['LOT_SIZE', 'MIN_NOTIONAL']),
+    make_symbol_info(filters=['PRICE_FILTER', 'LOT_SIZE']),
+    make_symbol_info(filters=[]),
+]
+
+QUANTITIES = [0, 0.0004, 0.001, 0.0015, 0.1 + 0.2, 0.0567, 0.5, 0.75, 1, 1.2345, 3.0, 9.99,
+              10, 10.5, 123.456789, 999.9999, 1000, 1000.5, 50000, 60000.7]
+PRICES = [0.00005, 0.0001, 0.1, 0.15, 0.3, 1, 1.05, 2.5, 99.99, 100.1, 199.9999, 250,
+          30012.3, 30012.37, 999999.9, 1000001]
+
+
+def test_round_quantity():
+    """测试数量取整与原实现一致"""
+    for symbol_info in SYMBOL_INFOS:
+        rules = SymbolRules.from_symbol_info(symbol_info)
+        for quantity in QUANTITIES:
+            assert rules.round_quantity(quantity) == legacy_apply_lot_size_filter(quantity, symbol_info), \
+                (symbol_info['filters'], quantity)
+    
+    rules = SymbolRules.from_symbol_info(make_symbol_info())
+    # 向下取整，不四舍五入
+    assert rules.round_quantity(0.0567) == 0.056
+    assert rules.round_quantity(1.2349999) == 1.234
+    # 浮点误差不会多减一个步长
+    assert rules.round_quantity(0.1 + 0.2) == 0.3
+    # 限制在 minQty/maxQty 之间
+    assert rules.round_quantity(0.0004) == 0.001
+    assert rules.round_quantity(0) == 0.001
+    assert rules.round_quantity(2000) == 1000
+    
+    # 整数步长
+    rules = SymbolRules.from_symbol_info(SYMBOL_INFOS[1])
+    assert rules.round_quantity(123.456789) == 123
+    
+    # 没有 LOT_SIZE 过滤器时原样返回
+    rules = SymbolRules.from_symbol_info(make_symbol_info(filters=['PRICE_FILTER']))
+    assert rules.round_quantity(0.123456) == 0.123456
+    
+    logger.info("✓ 测试通过: 数量取整与原实现一致")
+
+
+def test_round_price():
+    """测试价格取整"""
+    rules = SymbolRules.from_symbol_info(make_symbol_info())
+    assert rules.round_price(30012.37) == 30012.3
+    assert rules.round_price(30012.3) == 30012.3
+    assert rules.round_price(0.1 + 0.2) == 0.3
+    
+    rules = SymbolRules.from_symbol_info(SYMBOL_INFOS[1])
+    assert rules.round_price(1.23456) == 1.2345
+    
+    rules = SymbolRules.from_symbol_info(SYMBOL_INFOS[3])
+    assert rules.round_price(100.99) == 100.5
+    assert rules.round_price(101) == 101
+    
+    # 取整后的价格都能通过价格步长校验
+    for symbol_info in SYMBOL_INFOS[:4]:
+        rules = SymbolRules.from_symbol_info(symbol_info)
+        tick_size = float(rules.tick_size)
+        for price in PRICES:
+            rounded = rules.round_price(price)
+            assert rounded <= price and price - rounded < tick_size
+            if rules.min_price <= rounded <= rules.max_price:
+                _, message = rules.validate(rules.max_qty, rounded)
+                assert '价格步长' not in message, (price, message)
+    
+    # 没有 PRICE_FILTER 过滤器时原样返回
+    rules = SymbolRules.from_symbol_info(make_symbol_info(filters=['LOT_SIZE']))
+    assert rules.round_price(30012.37) == 30012.37
+    
+    logger.info("✓ 测试通过: 价格取整")
+
+
+def test_validate():
+    """测试订单校验与原实现一致"""
+    for symbol_info in SYMBOL_INFOS:
+        rules = SymbolRules.from_symbol_info(symbol_info)
+        for quantity, price in itertools.product(QUANTITIES, PRICES):
+            assert rules.validate(quantity, price) == legacy_validate_order(quantity, price, symbol_info), \
+                (symbol_info['filters'], quantity, price)
+    
+    rules = SymbolRules.from_symbol_info(make_symbol_info())
+    assert rules.validate(0.01, 30012.3) == (True, "")
+    assert rules.validate(0.0005, 30012.3) == (False, "数量 0.0005 低于最小数量 0.001")
+    assert rules.validate(0.0015, 30012.3) == (False, "数量 0.0015 不符合数量步长 0.001")
+    assert rules.validate(0.01, 30012.37) == (False, "价格 30012.37 不符合价格步长 0.1")
+    assert rules.validate(0.01, 0.05) == (False, "价格 0.05 低于最小价格 0.1")
+    
+    # 最小名义价值：5 USDT 恰好通过，低于 5 不通过
+    assert rules.validate(0.05, 100.0) == (True, "")
+    assert rules.validate(0.049, 100.0) == (False, "名义价值 4.9 低于最小值 5.0")
+    
+    # 没有 MIN_NOTIONAL 过滤器时不限制名义价值
+    rules = SymbolRules.from_symbol_info(make_symbol_info(filters=['PRICE_FILTER', 'LOT_SIZE']))
+    assert rules.validate(0.001, 0.1) == (True, "")
+    
+    logger.info("✓ 测试通过: 订单校验与原实现一致")
+
+
+def test_risk_manager_accepts_both():
+    """测试 RiskManager 接受原始交易对信息和 SymbolRules"""
+    risk_manager = RiskManager(max_leverage=5, max_position_percent=30.0)
+    symbol_info = make_symbol_info()
+    rules = SymbolRules.from_symbol_info(symbol_info)
+    
+    for quantity in QUANTITIES:
+        assert risk_manager._apply_lot_size_filter(quantity, symbol_info) == \
+            risk_manager._apply_lot_size_filter(quantity, rules) == \
+            legacy_apply_lot_size_filter(quantity, symbol_info)
+    
+    for quantity, price in itertools.product(QUANTITIES, PRICES):
+        assert risk_manager.validate_order('BTCUSDT', 'BUY', quantity, price, symbol_info) == \
+            risk_manager.validate_order('BTCUSDT', 'BUY', quantity, price, rules) == \
+            legacy_validate_order(quantity, price, symbol_info)
+    
+    position = risk_manager.calculate_position_size(1000.0, 30012.3, 5, rules)
+    assert position == risk_manager.calculate_position_size(1000.0, 30012.3, 5, symbol_info)
+    
+    logger.info("✓ 测试通过: RiskManager 接受原始交易对信息和 SymbolRules")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_round_quantity,
+        test_round_price,
+        test_validate,
+        test_risk_manager_accepts_both
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+测试K线解码
+
+这个脚本验证：
+1. decode_klines_json 的结果与原实现（json.loads 后逐列 int/float 转换）逐字段一致
+2. decode_klines 接受列表和已解码的结构化数组，多余的列被忽略
+3. 交易所错误、截断的响应体和列数不足的K线抛出 ValueError
+"""
+
+import sys
+import os
+import json
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.market.kline_decoder import KLINE_DTYPE, decode_klines, decode_klines_json
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.CRITICAL)
+
+INT_FIELDS = ('open_time', 'close_time', 'trades')
+
+
+def make_rows(count):
+    """与 /fapi/v1/klines 格式相同的K线，第 i 行的数字由 i 决定"""
+    rows = []
+    for i in range(count):
+        open_time = 1700000000000 + i * 60000
+        rows.append([
+            open_time, f"{100 + i * 0.25:.2f}", f"{101 + i}", f"{99.5 + i * 0.125}", "100.75",
+            f"{12.345 * (i + 1):.3f}", open_time + 59999, "1245.67", 42 + i, "6.1", "615.2", "0"
+        ])
+    return rows
+
+
+def legacy_decode(rows):
+    """原实现：逐列转换为 int/float"""
+    return {
+        name: [int(k[index]) if name in INT_FIELDS else float(k[index]) for k in rows]
+        for index, name in enumerate(KLINE_DTYPE.names)
+    }
+
+
+def assert_matches(bars, rows):
+    assert bars.dtype == KLINE_DTYPE and len(bars) == len(rows)
+    for name, values in legacy_decode(rows).items():
+        assert bars[name].tolist() == values, name
+
+
+def raises_value_error(func):
+    try:
+        func()
+    except ValueError:
+        return True
+    return False
+
+
+def test_decode_payload():
+    """测试响应体解码与原实现一致"""
+    for count in (1, 2, 150, 1500):
+        rows = make_rows(count)
+        compact = json.dumps(rows, separators=(',', ':'))
+        for payload in (compact, compact.encode('utf-8'), json.dumps(rows, indent=2)):
+            assert_matches(decode_klines_json(payload), rows)
+    
+    # 负数、科学计数法、只有 11 列、多于 12 列
+    rows = make_rows(3)
+    rows[0][3] = "-99.5"
+    rows[1][5] = "1.2345e1"
+    assert_matches(decode_klines_json(json.dumps(rows)), rows)
+    assert_matches(decode_klines_json(json.dumps([row[:11] for row in rows])), rows)
+    assert_matches(decode_klines_json(json.dumps([row + ["1", 2] for row in rows])), rows)
+    
+    # 空数组
+    for payload in ('[]', b' [ ] '):
+        assert len(decode_klines_json(payload)) == 0
+    
+    logger.info("✓ 测试通过: 响应体解码与原实现一致")
+
+
+def test_decode_rows():
+    """测试已解析的K线列表"""
+    rows = make_rows(5)
+    bars = decode_klines(rows)
+    assert_matches(bars, rows)
+    
+    # 已解码的结构化数组原样返回
+    assert decode_klines(bars) is bars
+    assert len(decode_klines([])) == 0
+    
+    logger.info("✓ 测试通过: 已解析的K线列表")
+
+
+def test_malformed_payloads():
+    """测试格式错误的响应体"""
+    compact = json.dumps(make_rows(3), separators=(',', ':'))
+    payloads = [
+        '{"code":-1121,"msg":"Invalid symbol."}',
+        '"error"',
+        compact[:-1],
+        compact[:-20],
+        json.dumps([row[:10] for row in make_rows(2)]),
+        compact.replace('"101"', '"abc"', 1),
+    ]
+    for payload in payloads:
+        assert raises_value_error(lambda: decode_klines_json(payload)), payload
+    
+    logger.info("✓ 测试通过: 格式错误的响应体")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_decode_payload,
+        test_decode_rows,
+        test_malformed_payloads
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
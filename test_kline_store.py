@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+测试本地K线存储
+
+这个脚本验证：
+1. 首次同步下载 initial_limit 根K线，已收盘的写入磁盘，未收盘的只保存在内存中
+2. 收盘判断以 close_time < 当前时间为准，最后一根未收盘K线随每次同步替换
+3. 落后超过一页（1500 根）时分页追赶，K线连续、不重复；initial_limit 超过一页时首次同步向前分页
+4. 写入中断导致各列长度不一致时，重新打开截断到最短的一列，并从断点继续同步
+5. get_range 按开盘时间二分查找（开始含、结束不含）
+"""
+
+import sys
+import os
+import tempfile
+
+import numpy as np
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.market.kline_decoder import KLINE_DTYPE
+from src.market.kline_store import KlineStore, KlineSeriesFile
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.CRITICAL)
+
+MINUTE_MS = 60000
+T0 = 1700000000000 - 1700000000000 % MINUTE_MS
+
+
+def make_bars(indexes):
+    """第 i 根 1 分钟K线，价格和成交量由下标确定"""
+    indexes = np.asarray(indexes, dtype=np.int64)
+    bars = np.empty(len(indexes), dtype=KLINE_DTYPE)
+    bars['open_time'] = T0 + indexes * MINUTE_MS
+    bars['close_time'] = bars['open_time'] + MINUTE_MS - 1
+    bars['open'] = 100.0 + indexes
+    bars['high'] = 101.0 + indexes
+    bars['low'] = 99.0 + indexes
+    bars['close'] = 100.5 + indexes
+    bars['volume'] = indexes * 2.0
+    bars['quote_volume'] = indexes * 200.0
+    bars['trades'] = indexes
+    bars['taker_buy_volume'] = indexes * 1.0
+    bars['taker_buy_quote_volume'] = indexes * 100.0
+    return bars
+
+
+class FakeClock:
+    """手动推进的时钟（秒）"""
+    
+    def __init__(self, bar_index, offset_ms=30000):
+        self.now_ms = T0 + bar_index * MINUTE_MS + offset_ms
+    
+    def __call__(self):
+        return self.now_ms / 1000
+    
+    def advance_bars(self, count):
+        self.now_ms += count * MINUTE_MS
+
+
+class FakeClient:
+    """按 REST 语义返回K线（含当前未收盘的一根），记录请求参数"""
+    
+    def __init__(self, clock):
+        self.clock = clock
+        self.requests = []
+    
+    def get_klines_array(self, symbol, interval, start_time=None, end_time=None, limit=500):
+        request = {'start_time': start_time, 'limit': limit}
+        if end_time is not None:
+            request['end_time'] = end_time
+        self.requests.append(request)
+        forming_index = (self.clock.now_ms - T0) // MINUTE_MS
+        if end_time is not None:
+            forming_index = min(forming_index, (end_time - T0) // MINUTE_MS)
+        if start_time is None:
+            first = max(0, forming_index - limit + 1)
+        else:
+            first = max(0, -(-(start_time - T0) // MINUTE_MS))
+        last = min(forming_index, first + limit - 1)
+        return make_bars(range(first, last + 1))
+
+
+def bar_indexes(bars):
+    return list((bars['open_time'] - T0) // MINUTE_MS)
+
+
+def test_initial_sync_and_forming():
+    """测试首次同步和未收盘K线"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        clock = FakeClock(bar_index=199)
+        client = FakeClient(clock)
+        store = KlineStore(client, data_dir=data_dir, initial_limit=100, time_source=clock)
+        
+        assert store.sync('BTCUSDT', '1m') == 99
+        assert client.requests == [{'start_time': None, 'limit': 100}]
+        
+        # 磁盘上只有已收盘的 100..198，第 199 根只在内存中
+        series, _ = store._series('BTCUSDT', '1m')
+        assert series.length == 99 and series.last_open_time == T0 + 198 * MINUTE_MS
+        assert os.path.getsize(os.path.join(data_dir, 'BTCUSDT', '1m', 'close.bin')) == 99 * 8
+        
+        bars = store.get_klines('BTCUSDT', '1m', limit=10)
+        assert bar_indexes(bars) == list(range(190, 200))
+        np.testing.assert_array_equal(bars, make_bars(range(190, 200)))
+        assert bar_indexes(store.get_klines('BTCUSDT', '1m', limit=10, include_forming=False)) == list(range(189, 199))
+        assert bar_indexes(store.get_klines('BTCUSDT', '1m', limit=1)) == [199]
+        
+        # 时间恰好等于 close_time 时仍未收盘
+        clock.now_ms = T0 + 199 * MINUTE_MS + MINUTE_MS - 1
+        assert store.sync('BTCUSDT', '1m') == 0
+        assert client.requests[-1] == {'start_time': T0 + 199 * MINUTE_MS, 'limit': 1500}
+        assert bar_indexes(store.get_klines('BTCUSDT', '1m', limit=2)) == [198, 199]
+        
+        # 收盘后写入磁盘，新的未收盘K线替换旧的
+        clock.now_ms += 1
+        assert store.sync('BTCUSDT', '1m') == 1
+        assert bar_indexes(store.get_klines('BTCUSDT', '1m', limit=3)) == [198, 199, 200]
+        assert series.length == 100
+        
+        # 交易所返回的全是已收盘K线（例如停牌）：内存中不再保留未收盘K线
+        client.get_klines_array = lambda **kwargs: make_bars([])
+        assert store.sync('BTCUSDT', '1m') == 0
+        assert bar_indexes(store.get_klines('BTCUSDT', '1m', limit=2)) == [198, 199]
+    
+    logger.info("✓ 测试通过: 首次同步和未收盘K线")
+
+
+def test_paging():
+    """测试分页追赶"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        clock = FakeClock(bar_index=100)
+        client = FakeClient(clock)
+        store = KlineStore(client, data_dir=data_dir, initial_limit=101, time_source=clock)
+        assert store.sync('BTCUSDT', '1m') == 100
+        
+        # 落后 4000 根：1500 + 1500 + 1000（外加未收盘的一根）
+        clock.advance_bars(4000)
+        client.requests.clear()
+        assert store.sync('BTCUSDT', '1m') == 4000
+        assert [r['start_time'] for r in client.requests] == [
+            T0 + 100 * MINUTE_MS, T0 + 1600 * MINUTE_MS, T0 + 3100 * MINUTE_MS
+        ]
+        assert all(r['limit'] == 1500 for r in client.requests)
+        
+        closed = store.get_range('BTCUSDT', '1m')
+        assert len(closed) == 4100
+        assert bar_indexes(closed) == list(range(0, 4100))
+        np.testing.assert_array_equal(closed, make_bars(range(0, 4100)))
+        assert bar_indexes(store.get_klines('BTCUSDT', '1m', limit=1)) == [4100]
+        
+        # 恰好落后 1500 根：第一页是满页（1499 根已收盘 + 1 根未收盘），再请求一次才确认追上
+        clock.advance_bars(1499)
+        client.requests.clear()
+        assert store.sync('BTCUSDT', '1m') == 1499
+        assert len(client.requests) == 2
+        assert bar_indexes(store.get_klines('BTCUSDT', '1m', limit=2)) == [5598, 5599]
+    
+    # initial_limit 超过一页：从最新一页向前分页，历史不足时停止
+    with tempfile.TemporaryDirectory() as data_dir:
+        clock = FakeClock(bar_index=3999)
+        client = FakeClient(clock)
+        store = KlineStore(client, data_dir=data_dir, initial_limit=3200, time_source=clock)
+        assert store.sync('BTCUSDT', '1m') == 3199
+        assert client.requests == [
+            {'start_time': None, 'limit': 1500},
+            {'start_time': None, 'limit': 1500, 'end_time': T0 + 2500 * MINUTE_MS - 1},
+            {'start_time': None, 'limit': 200, 'end_time': T0 + 1000 * MINUTE_MS - 1}
+        ]
+        assert bar_indexes(store.get_range('BTCUSDT', '1m')) == list(range(800, 3999))
+        assert bar_indexes(store.get_klines('BTCUSDT', '1m', limit=1)) == [3999]
+        
+        clock = FakeClock(bar_index=1999)
+        client = FakeClient(clock)
+        store = KlineStore(client, data_dir=os.path.join(data_dir, 'short'), initial_limit=3200, time_source=clock)
+        assert store.sync('BTCUSDT', '1m') == 1999
+        assert len(client.requests) == 2
+        assert bar_indexes(store.get_range('BTCUSDT', '1m')) == list(range(0, 1999))
+    
+    logger.info("✓ 测试通过: 分页追赶")
+
+
+def test_torn_write_resume():
+    """测试写入中断后恢复"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        clock = FakeClock(bar_index=50)
+        client = FakeClient(clock)
+        store = KlineStore(client, data_dir=data_dir, initial_limit=51, time_source=clock)
+        assert store.sync('BTCUSDT', '1m') == 50
+        
+        # 模拟追加 10 根时进程被杀：前两列写完，第三列只写了半根，其余列未写
+        directory = os.path.join(data_dir, 'BTCUSDT', '1m')
+        torn = make_bars(range(50, 60))
+        for name in ('open_time', 'open'):
+            with open(os.path.join(directory, f'{name}.bin'), 'ab') as f:
+                f.write(torn[name].tobytes())
+        with open(os.path.join(directory, 'high.bin'), 'ab') as f:
+            f.write(torn['high'].tobytes()[:4])
+        
+        # 重新打开：截断到最短的一列
+        series = KlineSeriesFile(directory)
+        assert series.length == 50 and series.last_open_time == T0 + 49 * MINUTE_MS
+        for name in KLINE_DTYPE.names:
+            assert os.path.getsize(os.path.join(directory, f'{name}.bin')) == 50 * KLINE_DTYPE[name].itemsize
+        
+        # 新进程从断点继续同步，数据连续且与交易所一致
+        clock.advance_bars(20)
+        restarted = KlineStore(FakeClient(clock), data_dir=data_dir, initial_limit=51, time_source=clock)
+        assert restarted.sync('BTCUSDT', '1m') == 20
+        closed = restarted.get_range('BTCUSDT', '1m')
+        np.testing.assert_array_equal(closed, make_bars(range(0, 70)))
+        
+        # 只有一列写入、其余列文件缺失：视为空序列
+        empty_dir = os.path.join(data_dir, 'ETHUSDT', '1m')
+        os.makedirs(empty_dir)
+        with open(os.path.join(empty_dir, 'open_time.bin'), 'wb') as f:
+            f.write(torn['open_time'].tobytes())
+        series = KlineSeriesFile(empty_dir)
+        assert series.length == 0 and series.last_open_time is None
+        assert os.path.getsize(os.path.join(empty_dir, 'open_time.bin')) == 0
+    
+    logger.info("✓ 测试通过: 写入中断后恢复")
+
+
+def test_get_range():
+    """测试按开盘时间读取"""
+    with tempfile.TemporaryDirectory() as data_dir:
+        clock = FakeClock(bar_index=100)
+        store = KlineStore(FakeClient(clock), data_dir=data_dir, initial_limit=101, time_source=clock)
+        
+        # 同步前为空
+        assert len(store.get_range('BTCUSDT', '1m', T0, T0 + MINUTE_MS)) == 0
+        
+        store.sync('BTCUSDT', '1m')
+        
+        def indexes(start=None, end=None):
+            return bar_indexes(store.get_range('BTCUSDT', '1m', start, end))
+        
+        # 开始含、结束不含
+        assert indexes(T0 + 10 * MINUTE_MS, T0 + 15 * MINUTE_MS) == [10, 11, 12, 13, 14]
+        
+        # 不在K线边界上的时间
+        assert indexes(T0 + 10 * MINUTE_MS + 1, T0 + 15 * MINUTE_MS + 1) == [11, 12, 13, 14, 15]
+        
+        # 超出范围、无边界、空区间
+        assert indexes(T0 - 5 * MINUTE_MS, T0 + 2 * MINUTE_MS) == [0, 1]
+        assert indexes(T0 + 98 * MINUTE_MS) == [98, 99]
+        assert indexes(end=T0 + 3 * MINUTE_MS) == [0, 1, 2]
+        assert len(indexes()) == 100
+        assert indexes(T0 + 200 * MINUTE_MS) == []
+        assert indexes(T0 + 20 * MINUTE_MS, T0 + 20 * MINUTE_MS) == []
+        assert indexes(T0 + 30 * MINUTE_MS, T0 + 20 * MINUTE_MS) == []
+        
+        # 未收盘K线不在范围内
+        assert 100 not in indexes(T0 + 99 * MINUTE_MS)
+        
+        # 返回的是副本
+        bars = store.get_range('BTCUSDT', '1m', T0, T0 + MINUTE_MS)
+        bars['close'] = 0
+        assert store.get_range('BTCUSDT', '1m', T0, T0 + MINUTE_MS)['close'][0] == 100.5
+    
+    logger.info("✓ 测试通过: 按开盘时间读取")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_initial_sync_and_forming,
+        test_paging,
+        test_torn_write_resume,
+        test_get_range
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
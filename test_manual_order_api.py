@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""
+测试手动交易 API 服务器
+
+这个脚本验证：
+1. HTTP/1.1 keep-alive：同一连接连续发送多个请求，每个响应都带 Content-Length
+2. 慢查询占满查询线程池时，平仓请求仍然立即执行
+3. 查询积压超过上限时返回 503
+4. 请求体无法解析、路径不存在时连接仍可继续使用，参数校验保持不变
+5. 下单执行时间超过请求超时时仍等待执行结果，不返回 504
+"""
+
+import sys
+import os
+import json
+import time
+import threading
+import http.client
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.trading.manual_order_api import ManualOrderAPIServer
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.ERROR)
+
+
+class StubOrderHandler:
+    """模拟手动交易处理器（查询持仓较慢）"""
+    
+    def __init__(self, positions_delay=0.0, order_delay=0.0):
+        self.positions_delay = positions_delay
+        self.order_delay = order_delay
+        self.manual_positions = {'1': object()}
+        self.release = threading.Event()
+        self.closed = []
+        self.orders = []
+    
+    def get_positions_view(self):
+        if self.positions_delay:
+            self.release.wait(self.positions_delay)
+        return 'v1', [{'order_id': '1'}]
+    
+    def execute_manual_order(self, order):
+        if self.order_delay:
+            time.sleep(self.order_delay)
+        self.orders.append(order)
+        return '42'
+    
+    def close_position_by_id(self, order_id):
+        self.closed.append(order_id)
+        return order_id == '1'
+
+
+def start_server(handler, **kwargs):
+    server = ManualOrderAPIServer(handler, host='127.0.0.1', port=0, **kwargs)
+    server.start()
+    return server
+
+
+def request(conn, method, path, body=None):
+    headers = {'Content-Type': 'application/json'} if body is not None else {}
+    conn.request(method, path, body=body, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    assert response.getheader('Content-Length') == str(len(data))
+    return response.status, data
+
+
+def test_keep_alive():
+    """测试 keep-alive"""
+    server = start_server(StubOrderHandler())
+    try:
+        conn = http.client.HTTPConnection(*server.address, timeout=5)
+        status, _ = request(conn, 'GET', '/health')
+        assert status == 200
+        sock = conn.sock
+        assert sock is not None
+        
+        for path in ('/positions', '/positions?refresh=1', '/'):
+            status, _ = request(conn, 'GET', path)
+            assert status == 200
+        status, data = request(conn, 'POST', '/order', json.dumps({'symbol': 'BTCUSDT', 'side': 'LONG'}))
+        assert status == 200 and json.loads(data)['order_id'] == '42'
+        
+        assert conn.sock is sock        # 全部请求复用同一个连接
+        conn.close()
+    finally:
+        server.stop()
+    
+    logger.info("✓ 测试通过: keep-alive")
+
+
+def test_close_not_blocked_by_queries():
+    """测试慢查询不阻塞平仓"""
+    handler = StubOrderHandler(positions_delay=10)
+    server = start_server(handler, query_workers=2, max_pending_queries=8)
+    try:
+        def slow_query():
+            conn = http.client.HTTPConnection(*server.address, timeout=15)
+            request(conn, 'GET', '/positions')
+            conn.close()
+        
+        readers = [threading.Thread(target=slow_query) for _ in range(4)]
+        for reader in readers:
+            reader.start()
+        time.sleep(0.2)
+        
+        conn = http.client.HTTPConnection(*server.address, timeout=5)
+        start = time.perf_counter()
+        status, _ = request(conn, 'POST', '/close/1')
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        assert status == 200 and handler.closed == ['1']
+        assert elapsed_ms < 500, f"平仓耗时 {elapsed_ms:.0f}ms"
+        
+        status, _ = request(conn, 'GET', '/health')
+        assert status == 200
+        conn.close()
+        
+        handler.release.set()
+        for reader in readers:
+            reader.join(timeout=5)
+    finally:
+        handler.release.set()
+        server.stop()
+    
+    logger.info(f"✓ 测试通过: 慢查询不阻塞平仓（平仓耗时 {elapsed_ms:.1f}ms）")
+
+
+def test_query_overload():
+    """测试查询积压上限"""
+    handler = StubOrderHandler(positions_delay=10)
+    server = start_server(handler, query_workers=1, max_pending_queries=2)
+    statuses = []
+    lock = threading.Lock()
+    
+    def query():
+        conn = http.client.HTTPConnection(*server.address, timeout=15)
+        status, _ = request(conn, 'GET', '/positions')
+        with lock:
+            statuses.append(status)
+        conn.close()
+    
+    try:
+        readers = [threading.Thread(target=query) for _ in range(5)]
+        for reader in readers:
+            reader.start()
+        
+        deadline = time.monotonic() + 5
+        while len(statuses) < 3 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert sorted(statuses) == [503, 503, 503]
+        
+        handler.release.set()
+        for reader in readers:
+            reader.join(timeout=5)
+        assert sorted(statuses) == [200, 200, 503, 503, 503]
+    finally:
+        handler.release.set()
+        server.stop()
+    
+    logger.info("✓ 测试通过: 查询积压上限")
+
+
+def test_errors_keep_connection():
+    """测试错误请求"""
+    handler = StubOrderHandler()
+    server = start_server(handler)
+    try:
+        conn = http.client.HTTPConnection(*server.address, timeout=5)
+        
+        status, data = request(conn, 'POST', '/order', '{not json')
+        assert status == 400 and 'Invalid JSON' in json.loads(data)['error']
+        
+        status, _ = request(conn, 'POST', '/unknown', json.dumps({'x': 1}))
+        assert status == 404
+        
+        status, data = request(conn, 'POST', '/order', json.dumps({'symbol': 'BTCUSDT'}))
+        assert status == 400 and json.loads(data)['error'] == 'Missing required field: side'
+        
+        status, _ = request(conn, 'POST', '/order', json.dumps({'symbol': 'BTCUSDT', 'side': 'UP'}))
+        assert status == 400
+        
+        status, _ = request(conn, 'POST', '/close/999')
+        assert status == 404
+        
+        status, _ = request(conn, 'OPTIONS', '/order')
+        assert status == 200
+        
+        status, _ = request(conn, 'GET', '/health')
+        assert status == 200
+        assert handler.orders == []
+        conn.close()
+    finally:
+        server.stop()
+    
+    logger.info("✓ 测试通过: 错误请求")
+
+
+def test_slow_order_not_timed_out():
+    """测试慢下单不超时"""
+    handler = StubOrderHandler(order_delay=0.6)
+    server = start_server(handler, request_timeout=0.2)
+    try:
+        conn = http.client.HTTPConnection(*server.address, timeout=5)
+        status, data = request(conn, 'POST', '/order', json.dumps({'symbol': 'BTCUSDT', 'side': 'LONG'}))
+        assert status == 200 and json.loads(data)['order_id'] == '42'
+        assert len(handler.orders) == 1
+        conn.close()
+    finally:
+        server.stop()
+    
+    logger.info("✓ 测试通过: 慢下单等待执行结果")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_keep_alive,
+        test_close_not_blocked_by_queries,
+        test_query_overload,
+        test_errors_keep_connection,
+        test_slow_order_not_timed_out
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
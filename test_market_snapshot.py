@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+测试共享行情快照
+
+这个脚本验证：
+1. 多个线程同时请求相同数据时只发出一次请求，其余调用方共享结果
+2. 有效期内直接返回缓存，过期后重新请求
+3. 单个交易对价格从一次全部交易对的 ticker 请求中读取
+4. 请求失败时所有等待的调用方都收到异常，失败结果不缓存
+5. 返回的K线数组只读
+"""
+
+import sys
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+import numpy as np
+
+from src.market.kline_decoder import KLINE_DTYPE
+from src.market.market_snapshot import MarketSnapshot
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.ERROR)
+
+
+class FakeClient:
+    """记录请求次数的模拟客户端"""
+    
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = {'ticker_all': 0, 'ticker_symbol': 0, 'klines': 0}
+        self._lock = threading.Lock()
+    
+    def _count(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        time.sleep(self.delay)
+        if self.fail:
+            raise ConnectionError("交易所不可用")
+    
+    def get_ticker_price(self, symbol=None):
+        if symbol is None:
+            self._count('ticker_all')
+            return [{'symbol': 'BTCUSDT', 'price': '50000.5'}, {'symbol': 'ETHUSDT', 'price': '3000'}]
+        self._count('ticker_symbol')
+        return {'symbol': symbol, 'price': '1.25'}
+    
+    def get_klines_array(self, symbol, interval, limit=500):
+        self._count('klines')
+        bars = np.zeros(limit, dtype=KLINE_DTYPE)
+        bars['close'] = np.arange(limit)
+        return bars
+
+
+def test_coalescing():
+    """测试并发请求合并"""
+    client = FakeClient(delay=0.2)
+    snapshot = MarketSnapshot(client)
+    
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: snapshot.get_klines('BTCUSDT', '15m', 100), range(8)))
+    
+    assert client.calls['klines'] == 1
+    assert all(r is results[0] for r in results)
+    
+    metrics = snapshot.metrics()
+    assert metrics['requests'] == 1
+    assert metrics['coalesced'] + metrics['cache_hits'] == 7
+    
+    # 不同参数是不同的请求
+    snapshot.get_klines('BTCUSDT', '15m', 50)
+    assert client.calls['klines'] == 2
+    
+    logger.info(f"✓ 测试通过: 并发请求合并（节省 {metrics['saved_percent']}%）")
+
+
+def test_ttl():
+    """测试缓存有效期"""
+    now = [0.0]
+    client = FakeClient()
+    snapshot = MarketSnapshot(client, price_ttl=1.0, time_source=lambda: now[0])
+    
+    snapshot.get_prices()
+    now[0] = 0.9
+    snapshot.get_prices()
+    assert client.calls['ticker_all'] == 1
+    
+    now[0] = 1.1
+    snapshot.get_prices()
+    assert client.calls['ticker_all'] == 2
+    
+    snapshot.invalidate('prices')
+    snapshot.get_prices()
+    assert client.calls['ticker_all'] == 3
+    
+    logger.info("✓ 测试通过: 缓存有效期")
+
+
+def test_price_from_all_tickers():
+    """测试单个交易对价格来自一次全部交易对请求"""
+    client = FakeClient()
+    snapshot = MarketSnapshot(client)
+    
+    assert snapshot.get_price('BTCUSDT') == 50000.5
+    assert snapshot.get_price('ETHUSDT') == 3000.0
+    assert client.calls == {'ticker_all': 1, 'ticker_symbol': 0, 'klines': 0}
+    
+    # 全部交易对中没有的交易对单独请求
+    assert snapshot.get_price('NEWUSDT') == 1.25
+    assert client.calls['ticker_symbol'] == 1
+    
+    logger.info("✓ 测试通过: 单个交易对价格")
+
+
+def test_errors_propagate():
+    """测试失败传递给所有等待的调用方"""
+    client = FakeClient(delay=0.2, fail=True)
+    snapshot = MarketSnapshot(client)
+    
+    def call(_):
+        try:
+            snapshot.get_prices()
+            return None
+        except ConnectionError as e:
+            return e
+    
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        errors = list(executor.map(call, range(4)))
+    
+    assert all(isinstance(e, ConnectionError) for e in errors)
+    assert client.calls['ticker_all'] == 1
+    assert snapshot.metrics()['errors'] == 1
+    
+    # 失败结果不缓存，恢复后重新请求
+    client.fail = False
+    client.delay = 0.0
+    assert snapshot.get_prices()['BTCUSDT'] == 50000.5
+    assert client.calls['ticker_all'] == 2
+    
+    logger.info("✓ 测试通过: 失败传递")
+
+
+def test_read_only_klines():
+    """测试K线数组只读"""
+    snapshot = MarketSnapshot(FakeClient())
+    bars = snapshot.get_klines('BTCUSDT', '15m', 10)
+    
+    try:
+        bars['close'][0] = 1.0
+        assert False, "共享的K线数组应该只读"
+    except ValueError:
+        pass
+    
+    logger.info("✓ 测试通过: K线数组只读")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_coalescing,
+        test_ttl,
+        test_price_from_all_tickers,
+        test_errors_propagate,
+        test_read_only_klines
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+测试 WebSocket 行情数据流
+
+在本地启动一个 WebSocket 模拟服务器回放录制的K线推送，验证：
+1. 首次连接通过 REST 初始化K线序列，推送的K线被追加/替换
+2. 断线重连后通过 REST 回补断线期间缺失的K线
+3. 使用方读取K线和标记价格时不发起网络请求
+4. 首次回补超过单次请求上限（1500 根）时从最新一页向前分页
+"""
+
+import sys
+import os
+import asyncio
+import json
+import threading
+import time
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+import websockets
+from unittest.mock import Mock
+import logging
+
+from src.market import BarSeries, MarketDataStream
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+INTERVAL_MS = 15 * 60 * 1000
+START_TIME = 1700000000000 // INTERVAL_MS * INTERVAL_MS
+
+
+def make_recorded_klines(count):
+    """生成一段“录制”的 15m K线（REST 格式）"""
+    klines = []
+    for i in range(count):
+        open_time = START_TIME + i * INTERVAL_MS
+        close = 100 + i * 0.5
+        klines.append([
+            open_time, f"{close - 0.2:.2f}", f"{close + 1:.2f}", f"{close - 1:.2f}",
+            f"{close:.2f}", "10.0", open_time + INTERVAL_MS - 1, "1000.0",
+            42, "5.0", "500.0", "0"
+        ])
+    return klines
+
+
+def to_ws_message(kline, closed=True):
+    """把 REST K线转换为组合流推送消息"""
+    return json.dumps({
+        'stream': 'btcusdt@kline_15m',
+        'data': {
+            'e': 'kline', 'E': kline[6], 's': 'BTCUSDT',
+            'k': {
+                't': kline[0], 'T': kline[6], 's': 'BTCUSDT', 'i': '15m',
+                'o': kline[1], 'c': kline[4], 'h': kline[2], 'l': kline[3],
+                'v': kline[5], 'n': kline[8], 'x': closed, 'q': kline[7],
+                'V': kline[9], 'Q': kline[10]
+            }
+        }
+    })
+
+
+class ReplayServer:
+    """按连接顺序回放录制数据的 WebSocket 模拟服务器"""
+    
+    def __init__(self, sessions):
+        self.sessions = sessions
+        self.connections = 0
+        self.paths = []
+        self.loop = asyncio.new_event_loop()
+        self.ready = threading.Event()
+        self.port = None
+        threading.Thread(target=self._run, daemon=True).start()
+        self.ready.wait(5)
+    
+    async def _handler(self, connection):
+        self.paths.append(connection.request.path)
+        session = self.sessions[min(self.connections, len(self.sessions) - 1)]
+        self.connections += 1
+        # 等客户端完成连接后的 REST 回补再开始推送
+        while session.get('ready') and not session['ready']():
+            await asyncio.sleep(0.01)
+        for message in session['messages']:
+            await connection.send(message)
+        if session.get('on_close'):
+            session['on_close']()
+        if session.get('keep_open'):
+            await asyncio.sleep(3600)
+    
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        
+        async def main():
+            async with websockets.serve(self._handler, '127.0.0.1', 0) as server:
+                self.port = server.sockets[0].getsockname()[1]
+                self.ready.set()
+                await asyncio.Future()
+        
+        self.loop.run_until_complete(main())
+
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+def test_bar_series_update_and_merge():
+    """测试1: K线序列的替换、追加和回补合并"""
+    klines = make_recorded_klines(10)
+    series = BarSeries(max_bars=8)
+    
+    series.merge(klines[:5])
+    series.update(klines[4][:4] + ['999'] + klines[4][5:])
+    series.update(klines[2])
+    series.merge(klines[4:10])
+    
+    assert [k[0] for k in series.to_klines()] == [k[0] for k in klines[2:10]]
+    assert series.to_klines(3) == klines[7:10]
+    assert series.last_closed_open_time == klines[9][0]
+    
+    logger.info("✓ 测试通过: K线序列合并正确")
+
+
+def test_stream_replay_and_gap_backfill():
+    """测试2: 回放推送并在重连后回补缺口"""
+    recorded = make_recorded_klines(200)
+    exchange = {'now_index': 150}
+    
+    def rest_get_klines(symbol, interval, start_time=None, end_time=None, limit=500):
+        available = recorded[:exchange['now_index']]
+        if start_time is not None:
+            available = [k for k in available if k[0] >= start_time]
+            return available[:limit]
+        return available[-limit:]
+    
+    client = Mock()
+    client.get_klines.side_effect = rest_get_klines
+    
+    mark_price = json.dumps({
+        'stream': 'btcusdt@markPrice@1s',
+        'data': {'e': 'markPriceUpdate', 'E': 1, 's': 'BTCUSDT', 'p': '123.45', 'i': '123.40', 'r': '0.0001'}
+    })
+    
+    def disconnect():
+        # 断线期间交易所又产生了 10 根K线
+        exchange['now_index'] = 180
+    
+    sessions = [
+        {
+            'messages': [to_ws_message(k) for k in recorded[150:170]]
+            + [to_ws_message(recorded[170], closed=False), mark_price],
+            'ready': lambda: client.get_klines.call_count >= 1,
+            'on_close': disconnect
+        },
+        {
+            'messages': [to_ws_message(k) for k in recorded[180:190]],
+            'ready': lambda: client.get_klines.call_count >= 2,
+            'keep_open': True
+        }
+    ]
+    server = ReplayServer(sessions)
+    
+    stream = MarketDataStream(
+        client,
+        symbols=['BTCUSDT'],
+        intervals=['15m'],
+        ws_url=f"ws://127.0.0.1:{server.port}",
+        backfill_limit=150
+    )
+    stream.reconnect_delay = 0.1
+    
+    try:
+        stream.start()
+        assert stream.wait_until_connected(timeout=10)
+        
+        def has_all_bars():
+            klines = stream.get_klines('BTCUSDT', '15m')
+            return klines is not None and len(klines) == 190
+        
+        assert wait_for(has_all_bars), "未收到全部K线"
+        
+        calls_before = client.get_klines.call_count
+        klines = stream.get_klines('BTCUSDT', '15m')
+        assert [k[0] for k in klines] == [k[0] for k in recorded[:190]]
+        assert klines[170] == recorded[170]
+        assert stream.get_klines('BTCUSDT', '15m', limit=150) == recorded[40:190]
+        assert stream.get_klines('BTCUSDT', '15m', limit=1000) is None
+        assert stream.get_mark_price('BTCUSDT') == 123.45
+        assert stream.get_mark_price('ETHUSDT') is None
+        assert client.get_klines.call_count == calls_before
+        assert stream.connect_count >= 2
+        assert server.paths[0] == '/stream?streams=btcusdt@kline_15m/btcusdt@markPrice@1s'
+    finally:
+        stream.stop()
+    
+    logger.info("✓ 测试通过: 推送回放与断线回补正确")
+
+
+def test_initial_backfill_paging():
+    """测试3: 首次回补分页获取"""
+    recorded = make_recorded_klines(3500)
+    requests = []
+    
+    def rest_get_klines(symbol, interval, start_time=None, end_time=None, limit=500):
+        requests.append((end_time, limit))
+        available = [k for k in recorded if end_time is None or k[0] <= end_time]
+        return available[-limit:]
+    
+    client = Mock()
+    client.get_klines.side_effect = rest_get_klines
+    stream = MarketDataStream(client, ['BTCUSDT'], ['15m'], max_bars=3000, backfill_limit=2416)
+    
+    async def backfill():
+        stream._loop = asyncio.get_running_loop()
+        await stream._backfill('BTCUSDT', '15m')
+    
+    asyncio.run(backfill())
+    
+    assert requests == [(None, 1500), (recorded[2000][0] - 1, 916)]
+    assert stream._series[('BTCUSDT', '15m')].to_klines() == recorded[-2416:]
+    
+    logger.info("✓ 测试通过: 首次回补分页获取")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_bar_series_update_and_merge,
+        test_stream_replay_and_gap_backfill,
+        test_initial_backfill_paging
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,234 @@
+#!/usr/bin/env python3
+"""
+测试 JSONL 指令队列
+
+这个脚本验证：
+1. 只读取以换行结尾的完整行，未写完的行在写完后再读取，无法解析的行被跳过
+2. 检查点原子写入，重启后从上次的偏移继续；执行中退出的指令重启后不再执行
+3. 指令文件被替换或截断后从头读取
+4. inotify（或轮询）在追加后立即唤醒
+5. 写入方并发追加时每条指令恰好执行一次，指令文件不被改写
+"""
+
+import sys
+import os
+import json
+import time
+import tempfile
+import threading
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.trading.manual_order_handler import ManualOrderHandler
+from src.trading.order_queue import OrderQueue, InotifyWatcher, PollingWatcher
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.CRITICAL)
+
+
+def append(path, text):
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+
+
+def order_line(i):
+    return json.dumps({'symbol': 'BTCUSDT', 'side': 'LONG', 'quantity': 0.001, 'note': f'#{i}'}) + '\n'
+
+
+class RecordingHandler(ManualOrderHandler):
+    """只记录指令、不下单的处理器"""
+    
+    def __init__(self, config):
+        super().__init__(trader=None, config=config)
+        self.executed = []
+    
+    def execute_manual_order(self, order):
+        self.executed.append(order.note)
+        return order.note
+
+
+def test_complete_lines():
+    """测试完整行和偏移"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'orders.jsonl')
+        queue = OrderQueue(path)
+        assert queue.read_new() == []         # 文件不存在
+        
+        append(path, order_line(1) + 'not json\n' + '\n' + '{"symbol": "ETH')
+        records = queue.read_new()
+        assert [r[2]['note'] if r[2] else None for r in records] == ['#1', None, None]
+        assert records[0][0] == 0 and records[1][0] == records[0][1]
+        for _, end, _ in records:
+            queue.commit(end)
+        
+        # 写完半行后再读取
+        assert queue.read_new() == []
+        append(path, 'USDT", "side": "SHORT"}\n')
+        records = queue.read_new()
+        assert len(records) == 1 and records[0][2]['symbol'] == 'ETHUSDT'
+        assert records[0][1] == os.path.getsize(path)
+    
+    logger.info("✓ 测试通过: 完整行和偏移")
+
+
+def test_checkpoint_resume():
+    """测试检查点恢复"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'orders.jsonl')
+        append(path, order_line(1) + order_line(2) + order_line(3))
+        
+        queue = OrderQueue(path)
+        first, second, third = queue.read_new()
+        queue.begin(first[0], first[1])
+        queue.commit(first[1])
+        queue.begin(second[0], second[1])       # 执行第二条时退出
+        
+        with open(queue.checkpoint_file, encoding='utf-8') as f:
+            assert json.load(f)['pending'] == [second[0], second[1]]
+        assert not os.path.exists(queue.checkpoint_file + '.tmp')
+        
+        restarted = OrderQueue(path)
+        records = restarted.read_new()
+        assert [r[2]['note'] for r in records] == ['#3']
+        assert restarted.pending is None
+    
+    logger.info("✓ 测试通过: 检查点恢复")
+
+
+def test_replaced_file():
+    """测试文件替换和截断"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'orders.jsonl')
+        append(path, order_line(1) + order_line(2))
+        queue = OrderQueue(path)
+        for _, end, _ in queue.read_new():
+            queue.commit(end)
+        
+        # 替换为新文件
+        replacement = os.path.join(tmp, 'new.jsonl')
+        append(replacement, order_line(3))
+        os.replace(replacement, path)
+        assert [r[2]['note'] for r in queue.read_new()] == ['#3']
+        
+        # 截断
+        queue.commit(os.path.getsize(path))
+        with open(path, 'w', encoding='utf-8'):
+            pass
+        assert queue.read_new() == []
+        append(path, order_line(4))
+        assert [r[2]['note'] for r in queue.read_new()] == ['#4']
+    
+    logger.info("✓ 测试通过: 文件替换和截断")
+
+
+def test_watchers():
+    """测试文件变化通知"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'orders.jsonl')
+        factories = [lambda: PollingWatcher(path, poll_interval=0.01), lambda: InotifyWatcher.create(path)]
+        names = []
+        
+        for factory in factories:
+            watcher = factory()
+            if watcher is None:
+                continue
+            names.append(type(watcher).__name__)
+            assert not watcher.wait(0.05)
+            
+            timer = threading.Timer(0.05, append, args=(path, order_line(1)))
+            timer.start()
+            start = time.monotonic()
+            assert watcher.wait(5.0)
+            latency_ms = (time.monotonic() - start) * 1000 - 50
+            timer.join()
+            assert latency_ms < 500, f"{type(watcher).__name__} 延迟 {latency_ms:.0f}ms"
+            
+            # 同目录的其他文件不唤醒 inotify
+            if isinstance(watcher, InotifyWatcher):
+                watcher.wait(0.05)
+                append(os.path.join(tmp, 'other.txt'), 'x')
+                assert not watcher.wait(0.1)
+            watcher.close()
+        
+        logger.info(f"✓ 测试通过: 文件变化通知（{', '.join(names)}）")
+
+
+def test_exactly_once():
+    """测试并发追加时恰好执行一次"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'orders.jsonl')
+        config = {
+            'enable_file_watch': True,
+            'file_watch_mode': 'jsonl',
+            'order_file': path,
+            'poll_interval': 0.05,
+            'check_interval': 3600
+        }
+        handler = RecordingHandler(config)
+        handler.is_running = True
+        consumer = threading.Thread(target=handler._watch_order_queue, daemon=True)
+        consumer.start()
+        
+        total = 300
+        for i in range(total):
+            line = order_line(i)
+            with open(path, 'a', encoding='utf-8') as f:
+                # 一行分两次写入，读取方可能看到半行
+                f.write(line[:10])
+                f.flush()
+                f.write(line[10:])
+            if i % 50 == 0:
+                time.sleep(0.01)
+        
+        deadline = time.monotonic() + 10
+        while len(handler.executed) < total and time.monotonic() < deadline:
+            time.sleep(0.02)
+        handler.is_running = False
+        consumer.join(timeout=5)
+        
+        assert handler.executed == [f'#{i}' for i in range(total)]
+        with open(path, encoding='utf-8') as f:
+            assert f.read() == ''.join(order_line(i) for i in range(total))
+        
+        # 重启后不重复执行
+        restarted = RecordingHandler(config)
+        assert restarted.process_order_queue() == 0
+        append(path, order_line(total))
+        assert restarted.process_order_queue() == 1 and restarted.executed == [f'#{total}']
+    
+    logger.info(f"✓ 测试通过: 并发追加 {total} 条指令，每条恰好执行一次")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_complete_lines,
+        test_checkpoint_resume,
+        test_replaced_file,
+        test_watchers,
+        test_exactly_once
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
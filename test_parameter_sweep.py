@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+"""
+测试参数扫描
+
+这个脚本验证：
+1. 网格组合数量正确，随机抽样无重复且都在网格内
+2. 多进程扫描（只读内存映射价格数据）与单进程结果完全一致，并且与直接回测一致
+3. 结果按指标排序写入 JSON 文件，精简结果可以传给 AI 参数优化器
+"""
+
+import sys
+import os
+import json
+import tempfile
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+import numpy as np
+
+from src.ai.parameter_optimizer import StrategyParameterOptimizer
+from src.backtest import DoubleMaBacktester, ParameterSweep, grid, random_samples
+from src.market.kline_decoder import KLINE_DTYPE
+from src.strategies.double_ma import DoubleMaStrategy
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.ERROR)
+
+BAR_MS = 15 * 60 * 1000
+
+SPACE = {
+    'sma_periods': [[10, 30, 90], [20, 60, 120]],
+    'ema_periods': [[20, 60, 120]],
+    'convergence_threshold': [1.5, 3.0],
+    'breakout_confirmation_minutes': [15, 30]
+}
+
+
+def make_bars(count, volatility, seed):
+    """生成几何随机游走K线"""
+    rng = np.random.default_rng(seed)
+    bars = np.zeros(count, dtype=KLINE_DTYPE)
+    bars['open_time'] = 1600000000000 // BAR_MS * BAR_MS + np.arange(count, dtype=np.int64) * BAR_MS
+    bars['close_time'] = bars['open_time'] + BAR_MS - 1
+    close = 100 * np.exp(np.cumsum(rng.normal(0, volatility, count)))
+    bars['close'] = close
+    bars['open'] = np.concatenate(([close[0]], close[:-1]))
+    bars['high'] = np.maximum(bars['open'], close)
+    bars['low'] = np.minimum(bars['open'], close)
+    return bars
+
+
+UNIVERSE = {
+    'AAAUSDT': make_bars(3000, 0.008, 1),
+    'BBBUSDT': make_bars(2500, 0.010, 2)
+}
+
+
+def test_param_sets():
+    """测试网格和随机抽样"""
+    combos = grid(SPACE)
+    assert len(combos) == 8
+    assert len({json.dumps(c, sort_keys=True) for c in combos}) == 8
+    assert set(combos[0].keys()) == set(SPACE.keys())
+    
+    samples = random_samples(SPACE, 5, seed=7)
+    keys = [json.dumps(s, sort_keys=True) for s in samples]
+    assert len(samples) == 5 and len(set(keys)) == 5
+    assert set(keys) <= {json.dumps(c, sort_keys=True) for c in combos}
+    assert samples == random_samples(SPACE, 5, seed=7)
+    assert len(random_samples(SPACE, 100)) == 8
+    
+    logger.info("✓ 测试通过: 网格和随机抽样")
+
+
+def test_parallel_matches_serial():
+    """测试多进程扫描与单进程、直接回测结果一致"""
+    combos = grid(SPACE)
+    with tempfile.TemporaryDirectory() as tmp:
+        serial = ParameterSweep('15m', data_dir=tmp, workers=1)
+        serial.load(UNIVERSE)
+        serial_results = serial.run(combos, output='')
+        
+        parallel = ParameterSweep('15m', data_dir=tmp, workers=2)
+        parallel.load(UNIVERSE)
+        parallel_results = parallel.run(combos, output='')
+    
+    assert all('error' not in r for r in serial_results)
+    assert [r['params'] for r in serial_results] == [r['params'] for r in parallel_results]
+    assert [r['stats'] for r in serial_results] == [r['stats'] for r in parallel_results]
+    
+    # 与直接回测一致
+    params = combos[3]
+    expected = DoubleMaBacktester(strategy=DoubleMaStrategy(**params)).run_many(UNIVERSE, '15m').stats
+    actual = next(r for r in serial_results if r['params'] == params)['stats']
+    assert actual == expected
+    
+    logger.info("✓ 测试通过: 多进程扫描与单进程一致")
+
+
+def test_ranking_and_report():
+    """测试排序、结果文件和优化器提示词"""
+    with tempfile.TemporaryDirectory() as tmp:
+        sweep = ParameterSweep('15m', data_dir=tmp, workers=1, metric='total_return_percent', min_trades=1)
+        sweep.load(UNIVERSE)
+        path = os.path.join(tmp, 'result.json')
+        results = sweep.run(grid(SPACE) + [{'sma_periods': 'bad'}], output=path)
+        
+        report = ParameterSweep.load_results(path)
+        assert report['interval'] == '15m'
+        assert report['symbols'] == ['AAAUSDT', 'BBBUSDT']
+        assert len(report['results']) == 9
+    
+    assert [r['rank'] for r in results] == list(range(1, 10))
+    assert 'error' in results[-1]
+    
+    valid = [r for r in results if 'error' not in r and r['stats']['trades'] >= 1]
+    returns = [r['stats']['total_return_percent'] for r in valid]
+    assert returns == sorted(returns, reverse=True)
+    assert results[:len(valid)] == valid
+    
+    summary = ParameterSweep.summarize(results, top=3)
+    assert len(summary) == 3
+    assert summary[0]['params'] == results[0]['params']
+    
+    optimizer = StrategyParameterOptimizer(ai_client=None)
+    prompt = optimizer._build_optimization_prompt({}, {}, None, summary)
+    assert '【历史回测结果】' in prompt
+    assert f'"total_return_percent": {summary[0]["total_return_percent"]}' in prompt
+    
+    logger.info("✓ 测试通过: 排序和结果文件")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_param_sets,
+        test_parallel_matches_serial,
+        test_ranking_and_report
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+测试持仓视图的价格缓存和 ETag
+
+这个脚本验证：
+1. 连续多次查询持仓只在价格超过时效时批量请求一次价格，每个持仓带价格时间
+2. 行情数据流推送的价格直接写入缓存，不请求行情接口；刷新失败时返回缓存中的旧价格
+3. 持仓、止损价和价格都没变时返回同一个 ETag 且不重新计算，任一变化后 ETag 改变
+4. GET /positions 带 If-None-Match 时返回 304（无响应体），连接可继续使用
+"""
+
+import sys
+import os
+import json
+import threading
+import http.client
+from types import SimpleNamespace
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.trading.manual_order_api import ManualOrderAPIServer
+from src.trading.manual_order_handler import ManualOrderHandler, ManualPosition, OrderSide
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.CRITICAL)
+
+
+class FakeClient:
+    """返回固定价格、记录请求次数的模拟客户端"""
+    
+    def __init__(self, prices):
+        self.prices = prices
+        self.ticker_requests = 0
+        self.fail = False
+        self._lock = threading.Lock()
+    
+    def get_ticker_price(self, symbol=None):
+        with self._lock:
+            self.ticker_requests += 1
+        if self.fail:
+            raise ConnectionError('ticker unavailable')
+        if symbol is None:
+            return [{'symbol': s, 'price': str(p)} for s, p in self.prices.items()]
+        return {'symbol': symbol, 'price': str(self.prices[symbol])}
+
+
+class FakeStream:
+    """只提供价格回调注册的行情数据流（离线，不返回标记价格）"""
+    
+    def __init__(self):
+        self.listeners = []
+    
+    def add_price_listener(self, callback):
+        self.listeners.append(callback)
+    
+    def get_mark_price(self, symbol):
+        return None
+    
+    def push(self, symbol, price):
+        for listener in self.listeners:
+            listener(symbol, price)
+
+
+def make_handler(client, market_stream=None, positions=50, price_max_age=5.0):
+    trader = SimpleNamespace(asterdex=client)
+    config = {'enable_file_watch': False, 'price_max_age': price_max_age}
+    handler = ManualOrderHandler(trader, config, market_stream=market_stream)
+    
+    symbols = sorted(client.prices)
+    for i in range(positions):
+        handler.manual_positions[str(i)] = ManualPosition(
+            order_id=str(i),
+            symbol=symbols[i % len(symbols)],
+            side=OrderSide.LONG if i % 2 else OrderSide.SHORT,
+            entry_price=100.0,
+            quantity=1.0,
+            leverage=3,
+            stop_loss_price=90.0 if i % 2 else 110.0
+        )
+    return handler
+
+
+def age_prices(handler, seconds):
+    """把缓存中的价格时间往前移"""
+    with handler._prices_lock:
+        for symbol, (price, timestamp) in handler._prices.items():
+            handler._prices[symbol] = (price, timestamp - seconds)
+
+
+def test_polls_share_prices():
+    """测试多次查询共享价格"""
+    client = FakeClient({'BTCUSDT': 105.0, 'ETHUSDT': 95.0, 'SOLUSDT': 100.0})
+    handler = make_handler(client)
+    
+    for _ in range(100):
+        positions = handler.get_manual_positions()
+    assert client.ticker_requests == 1
+    assert len(positions) == 50
+    
+    btc = next(p for p in positions if p['symbol'] == 'BTCUSDT' and p['side'] == 'LONG')
+    assert btc['current_price'] == 105.0 and abs(btc['pnl_percent'] - 5.0) < 1e-9
+    assert btc['price_time'] is not None
+    
+    # 超过时效后再批量刷新一次
+    age_prices(handler, 10)
+    client.prices['BTCUSDT'] = 110.0
+    positions = handler.get_manual_positions()
+    assert client.ticker_requests == 2
+    assert {p['current_price'] for p in positions if p['symbol'] == 'BTCUSDT'} == {110.0}
+    
+    logger.info("✓ 测试通过: 100 次查询 50 个持仓只请求 1 次价格")
+
+
+def test_stream_and_stale_fallback():
+    """测试数据流推送和刷新失败"""
+    client = FakeClient({'BTCUSDT': 105.0, 'ETHUSDT': 95.0})
+    stream = FakeStream()
+    handler = make_handler(client, market_stream=stream, positions=4)
+    
+    stream.push('BTCUSDT', 120.0)
+    stream.push('ETHUSDT', 80.0)
+    positions = handler.get_manual_positions()
+    assert client.ticker_requests == 0
+    assert {p['symbol']: p['current_price'] for p in positions} == {'BTCUSDT': 120.0, 'ETHUSDT': 80.0}
+    
+    # 价格过期且刷新失败：返回旧价格和旧的价格时间
+    price_time = positions[0]['price_time']
+    age_prices(handler, 10)
+    client.fail = True
+    positions = handler.get_manual_positions()
+    assert client.ticker_requests == 1
+    assert {p['symbol']: p['current_price'] for p in positions} == {'BTCUSDT': 120.0, 'ETHUSDT': 80.0}
+    assert positions[0]['price_time'] < price_time
+    
+    # 没有任何价格的交易对
+    client.prices['XRPUSDT'] = 1.0
+    handler.manual_positions['x'] = ManualPosition('x', 'XRPUSDT', OrderSide.LONG, 1.0, 1.0, 3)
+    missing = next(p for p in handler.get_manual_positions() if p['order_id'] == 'x')
+    assert missing['current_price'] is None and missing['pnl_percent'] is None and missing['price_time'] is None
+    
+    logger.info("✓ 测试通过: 数据流推送和刷新失败")
+
+
+def test_etag():
+    """测试 ETag"""
+    client = FakeClient({'BTCUSDT': 105.0, 'ETHUSDT': 95.0})
+    stream = FakeStream()
+    handler = make_handler(client, market_stream=stream, positions=10)
+    
+    etag, positions = handler.get_positions_view()
+    again, cached = handler.get_positions_view()
+    assert again == etag and cached is positions      # 未变化时不重新计算
+    
+    seen = {etag}
+    
+    stream.push('BTCUSDT', 106.0)                    # 价格变化
+    etag, _ = handler.get_positions_view()
+    assert etag not in seen
+    seen.add(etag)
+    
+    handler._on_stop_moved('manual:1', 99.0)         # 止损价变化
+    etag, positions = handler.get_positions_view()
+    assert etag not in seen and positions[1]['stop_loss_price'] == 99.0
+    seen.add(etag)
+    
+    handler.manual_positions.pop('2')                # 持仓减少
+    etag, positions = handler.get_positions_view()
+    assert etag not in seen and len(positions) == 9
+    
+    # 返回给调用方的副本被修改不影响缓存的视图
+    handler.get_manual_positions()[0]['current_price'] = 0
+    assert handler.get_positions_view()[1][0]['current_price'] != 0
+    
+    logger.info("✓ 测试通过: ETag")
+
+
+def test_not_modified():
+    """测试 304"""
+    client = FakeClient({'BTCUSDT': 105.0, 'ETHUSDT': 95.0})
+    stream = FakeStream()
+    handler = make_handler(client, market_stream=stream, positions=4)
+    stream.push('BTCUSDT', 105.0)
+    stream.push('ETHUSDT', 95.0)
+    
+    server = ManualOrderAPIServer(handler, host='127.0.0.1', port=0)
+    server.start()
+    try:
+        conn = http.client.HTTPConnection(*server.address, timeout=5)
+        
+        conn.request('GET', '/positions')
+        response = conn.getresponse()
+        data = json.loads(response.read())
+        etag = response.getheader('ETag')
+        assert response.status == 200 and etag and data['count'] == 4
+        assert data['price_time'] == min(p['price_time'] for p in data['positions'])
+        
+        conn.request('GET', '/positions', headers={'If-None-Match': f'"other", {etag}'})
+        response = conn.getresponse()
+        assert response.status == 304 and response.read() == b''
+        assert response.getheader('ETag') == etag
+        
+        stream.push('BTCUSDT', 107.0)
+        conn.request('GET', '/positions', headers={'If-None-Match': etag})
+        response = conn.getresponse()
+        data = json.loads(response.read())
+        assert response.status == 200 and response.getheader('ETag') != etag
+        assert 107.0 in {p['current_price'] for p in data['positions']}
+        
+        conn.request('GET', '/health')
+        response = conn.getresponse()
+        response.read()
+        assert response.status == 200
+        conn.close()
+    finally:
+        server.stop()
+    
+    assert client.ticker_requests == 0
+    logger.info("✓ 测试通过: If-None-Match 返回 304")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_polls_share_prices,
+        test_stream_and_stale_fallback,
+        test_etag,
+        test_not_modified
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,410 @@
+#!/usr/bin/env python3
+"""
+测试交易所止损 / 止盈单
+
+这个脚本验证：
+1. 挂出只减仓的 STOP_MARKET / TAKE_PROFIT_MARKET 单，触发价格取整到价格步长
+2. 订单推送中一笔成交后撤销另一笔并通知回调；没有推送时 sync 一次请求全部挂单完成对账
+3. 挂单失败或被外部撤销时标记为未覆盖，由本地轮询兜底
+4. 手动开仓挂出条件单、监控线程跳过已覆盖的持仓，条件单成交后移除持仓，主动平仓后撤销条件单
+5. 策略开仓按风险管理配置挂出条件单，策略平仓时撤销
+6. 平仓单失败时条件单保持挂出、持仓继续记录
+7. 挂单请求不持有锁：挂单期间查询和推送不阻塞，挂单期间到达的成交推送和撤销在挂单完成后处理
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.trading.exchange_info import SymbolRules
+from src.trading.manual_order_handler import ManualOrderHandler, ManualOrder
+from src.trading.protective_orders import ProtectiveOrderManager
+from src.trading.risk_manager import RiskManager
+from src.trading.trader import Trader
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.ERROR)
+
+RULES = SymbolRules.from_symbol_info({
+    'symbol': 'BTCUSDT',
+    'quantityPrecision': 3,
+    'pricePrecision': 1,
+    'filters': [
+        {'filterType': 'LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001', 'maxQty': '1000'},
+        {'filterType': 'PRICE_FILTER', 'tickSize': '0.1', 'minPrice': '0.1', 'maxPrice': '1000000'},
+        {'filterType': 'MIN_NOTIONAL', 'notional': '5'}
+    ]
+})
+
+
+class FakeClient:
+    """记录下单和撤单的模拟客户端"""
+    
+    def __init__(self, price=50000.0, reject_types=()):
+        self.price = price
+        self.reject_types = reject_types
+        self.orders = {}            # {订单ID: 下单参数}
+        self.statuses = {}          # {订单ID: 状态}
+        self.cancelled = []
+        self.calls = []             # [(请求类型, 订单类型或订单ID)]
+        self.open_order_requests = 0
+        self._next_id = 1000
+        self._lock = threading.Lock()
+    
+    def place_order(self, symbol, side, order_type, quantity, position_side='BOTH', reduce_only=False,
+                    stop_price=None, working_type=None, **kwargs):
+        self.calls.append(('place', order_type))
+        if order_type in self.reject_types:
+            raise RuntimeError("订单被拒绝")
+        with self._lock:
+            self._next_id += 1
+            order_id = self._next_id
+        self.orders[order_id] = {
+            'symbol': symbol, 'side': side, 'type': order_type, 'quantity': quantity,
+            'reduce_only': reduce_only, 'stop_price': stop_price, 'working_type': working_type
+        }
+        self.statuses[order_id] = 'FILLED' if order_type == 'MARKET' else 'NEW'
+        return {'orderId': order_id, 'avgPrice': str(self.price) if order_type == 'MARKET' else '0'}
+    
+    def cancel_order(self, symbol, order_id):
+        self.calls.append(('cancel', order_id))
+        if self.statuses.get(order_id) != 'NEW':
+            raise RuntimeError("Unknown order sent.")
+        self.statuses[order_id] = 'CANCELED'
+        self.cancelled.append(order_id)
+        return {'orderId': order_id, 'status': 'CANCELED'}
+    
+    def get_open_orders(self, symbol=None):
+        self.open_order_requests += 1
+        return [{'orderId': order_id, 'symbol': self.orders[order_id]['symbol']}
+                for order_id, status in self.statuses.items() if status == 'NEW']
+    
+    def get_order(self, symbol, order_id):
+        return {'orderId': order_id, 'status': self.statuses[order_id]}
+    
+    def get_ticker_price(self, symbol=None):
+        return {'symbol': symbol, 'price': str(self.price)}
+    
+    def change_leverage(self, symbol, leverage):
+        return {}
+    
+    def change_margin_type(self, symbol, margin_type):
+        return {}
+    
+    def get_balance(self):
+        return [{'asset': 'USDT', 'availableBalance': '1000'}]
+    
+    def get_position_info(self, symbol=None):
+        return []
+
+
+class FakeExchangeInfo:
+    def get_rules(self, symbol):
+        return RULES
+    
+    def get_symbol_info(self, symbol):
+        return RULES.raw
+
+
+def wait_for(condition, timeout=2.0):
+    """等待后台线程完成"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def make_trader(client, manager, stop_loss_percent=None, take_profit_percent=None):
+    return Trader(
+        asterdex_client=client,
+        deepseek_client=None,
+        risk_manager=RiskManager(stop_loss_percent=stop_loss_percent, take_profit_percent=take_profit_percent),
+        strategy=None,
+        exchange_info=FakeExchangeInfo(),
+        protective_orders=manager
+    )
+
+
+def test_place_orders():
+    """测试挂出条件单"""
+    client = FakeClient()
+    manager = ProtectiveOrderManager(client)
+    
+    orders = manager.place('manual:1', 'BTCUSDT', 'LONG', 0.01,
+                           stop_loss_price=48500.06, take_profit_price=55000.04, rules=RULES)
+    
+    assert orders.complete
+    stop = client.orders[orders.stop_loss_order_id]
+    take = client.orders[orders.take_profit_order_id]
+    assert stop['type'] == 'STOP_MARKET' and take['type'] == 'TAKE_PROFIT_MARKET'
+    assert stop['side'] == take['side'] == 'SELL'
+    assert stop['reduce_only'] and take['reduce_only']
+    assert stop['stop_price'] == '48500.0' and take['stop_price'] == '55000.0'
+    assert stop['working_type'] == 'MARK_PRICE'
+    
+    # 同一持仓重新挂单时先撤销旧单
+    replaced = manager.place('manual:1', 'BTCUSDT', 'LONG', 0.01, stop_loss_price=49000.0)
+    assert set(client.cancelled) == {orders.stop_loss_order_id, orders.take_profit_order_id}
+    assert replaced.take_profit_order_id is None and replaced.complete
+    
+    manager.shutdown()
+    logger.info("✓ 测试通过: 挂出条件单")
+
+
+def test_fill_handling():
+    """测试成交后撤销另一笔"""
+    client = FakeClient()
+    manager = ProtectiveOrderManager(client)
+    filled = []
+    manager.add_listener(filled.append)
+    
+    # 订单推送：止损成交
+    orders = manager.place('manual:1', 'BTCUSDT', 'SHORT', 0.01, stop_loss_price=51000.0, take_profit_price=45000.0)
+    assert client.orders[orders.stop_loss_order_id]['side'] == 'BUY'
+    client.statuses[orders.stop_loss_order_id] = 'FILLED'
+    manager.on_order_update({'i': orders.stop_loss_order_id, 's': 'BTCUSDT', 'X': 'FILLED'})
+    assert wait_for(lambda: filled)
+    assert filled[0].triggered == 'STOP_MARKET'
+    assert client.cancelled == [orders.take_profit_order_id]
+    assert manager.get('manual:1') is None
+    
+    # 未跟踪的订单推送直接忽略
+    manager.on_order_update({'i': 1, 's': 'BTCUSDT', 'X': 'FILLED'})
+    
+    # 没有推送：sync 一次请求全部挂单完成对账
+    first = manager.place('manual:2', 'BTCUSDT', 'LONG', 0.01, stop_loss_price=48000.0, take_profit_price=52000.0)
+    second = manager.place('strategy:ETHUSDT', 'ETHUSDT', 'LONG', 0.1, stop_loss_price=2900.0)
+    client.statuses[first.take_profit_order_id] = 'FILLED'
+    
+    triggered = manager.sync()
+    assert [o.key for o in triggered] == ['manual:2'] and triggered[0].triggered == 'TAKE_PROFIT_MARKET'
+    assert client.open_order_requests == 1
+    assert first.stop_loss_order_id in client.cancelled
+    assert manager.get('strategy:ETHUSDT') is second
+    assert [o.key for o in filled] == ['manual:1', 'manual:2']
+    
+    manager.shutdown()
+    logger.info("✓ 测试通过: 成交后撤销另一笔")
+
+
+def test_fallback():
+    """测试挂单失败和被外部撤销"""
+    client = FakeClient(reject_types=('TAKE_PROFIT_MARKET',))
+    manager = ProtectiveOrderManager(client)
+    
+    orders = manager.place('manual:1', 'BTCUSDT', 'LONG', 0.01, stop_loss_price=48000.0, take_profit_price=52000.0)
+    assert orders.stop_loss_order_id is not None and orders.take_profit_order_id is None
+    assert not orders.complete
+    
+    client.reject_types = ()
+    orders = manager.place('manual:2', 'BTCUSDT', 'LONG', 0.01, stop_loss_price=48000.0)
+    client.statuses[orders.stop_loss_order_id] = 'CANCELED'
+    assert manager.sync(['manual:2']) == []
+    assert not manager.get('manual:2').complete
+    
+    manager.shutdown()
+    logger.info("✓ 测试通过: 挂单失败和被外部撤销")
+
+
+def test_manual_orders():
+    """测试手动交易使用交易所条件单"""
+    client = FakeClient()
+    manager = ProtectiveOrderManager(client)
+    trader = make_trader(client, manager)
+    handler = ManualOrderHandler(trader, {'enable_file_watch': False})
+    
+    order_id = handler.execute_manual_order(ManualOrder(
+        symbol='BTCUSDT', side='LONG', quantity=0.0123, stop_loss_percent=2, take_profit_percent=5
+    ))
+    assert order_id is not None
+    position = handler.manual_positions[order_id]
+    assert position.quantity == 0.012
+    assert client.orders[int(order_id)]['type'] == 'MARKET'
+    assert handler._is_protected(order_id)
+    
+    protection = manager.get(f'manual:{order_id}')
+    assert protection.stop_loss_price == 49000.0 and protection.take_profit_price == 52500.0
+    assert handler.get_manual_positions()[0]['protective_orders']['stop_loss_order_id'] == protection.stop_loss_order_id
+    
+    # 交易所止盈成交后移除持仓
+    client.statuses[protection.take_profit_order_id] = 'FILLED'
+    manager.on_order_update({'i': protection.take_profit_order_id, 's': 'BTCUSDT', 'X': 'FILLED'})
+    assert wait_for(lambda: order_id not in handler.manual_positions)
+    assert protection.stop_loss_order_id in client.cancelled
+    
+    # 主动平仓：先下只减仓的市价单，再撤销条件单（API 传入字符串订单ID）
+    order_id = handler.execute_manual_order(ManualOrder(symbol='BTCUSDT', side='SHORT', quantity=0.01, stop_loss_percent=2))
+    protection = manager.get(f'manual:{order_id}')
+    assert handler.close_position_by_id(str(order_id))
+    assert protection.stop_loss_order_id in client.cancelled
+    close_order = client.orders[max(client.orders)]
+    assert close_order['type'] == 'MARKET' and close_order['side'] == 'BUY' and close_order['reduce_only']
+    assert not handler.manual_positions
+    
+    # 不带止损止盈的指令：默认仓位按可用余额计算，不挂条件单
+    order_id = handler.execute_manual_order(ManualOrder(symbol='BTCUSDT', side='LONG'))
+    assert handler.manual_positions[order_id].quantity == RULES.round_quantity(1000 * 0.2 * 3 / 50000)
+    assert manager.get(f'manual:{order_id}') is None and not handler._is_protected(order_id)
+    
+    manager.shutdown()
+    logger.info("✓ 测试通过: 手动交易使用交易所条件单")
+
+
+def test_strategy_orders():
+    """测试策略开仓和平仓"""
+    client = FakeClient()
+    manager = ProtectiveOrderManager(client)
+    trader = make_trader(client, manager, stop_loss_percent=3.0, take_profit_percent=10.0)
+    
+    order = trader._open_position('BTCUSDT', 'SELL', 1000.0, {'action': 'SELL'})
+    assert order is not None
+    protection = manager.get('strategy:BTCUSDT')
+    assert protection.side == 'SHORT' and protection.complete
+    assert protection.stop_loss_price == 51500.0 and protection.take_profit_price == 45000.0
+    assert client.orders[protection.stop_loss_order_id]['quantity'] == client.orders[order['orderId']]['quantity']
+    
+    trader._close_position('BTCUSDT', {'position_amt': -float(protection.quantity), 'unrealized_profit': 0.0})
+    assert manager.get('strategy:BTCUSDT') is None
+    assert set(client.cancelled) == {protection.stop_loss_order_id, protection.take_profit_order_id}
+    
+    # 风险管理未启用止损止盈时不挂条件单
+    plain = make_trader(client, manager)
+    plain._open_position('BTCUSDT', 'BUY', 1000.0, {'action': 'BUY'})
+    assert manager.get('strategy:BTCUSDT') is None
+    
+    manager.shutdown()
+    logger.info("✓ 测试通过: 策略开仓和平仓")
+
+
+def test_close_failure_keeps_protection():
+    """测试平仓失败时保留条件单"""
+    client = FakeClient()
+    manager = ProtectiveOrderManager(client)
+    handler = ManualOrderHandler(make_trader(client, manager), {'enable_file_watch': False})
+    
+    order_id = handler.execute_manual_order(ManualOrder(
+        symbol='BTCUSDT', side='LONG', quantity=0.01, stop_loss_percent=2, take_profit_percent=5
+    ))
+    protection = manager.get(f'manual:{order_id}')
+    
+    # 平仓单被拒绝（限流、时间戳超出 recvWindow 等）
+    client.reject_types = ('MARKET',)
+    assert not handler.close_position_by_id(order_id)
+    assert client.cancelled == []
+    assert manager.get(f'manual:{order_id}') is protection and handler._is_protected(order_id)
+    assert order_id in handler.manual_positions
+    
+    # 重试成功：平仓单在撤销条件单之前发出
+    client.reject_types = ()
+    client.calls.clear()
+    assert handler.close_position_by_id(order_id)
+    assert client.calls[0] == ('place', 'MARKET')
+    assert set(client.cancelled) == {protection.stop_loss_order_id, protection.take_profit_order_id}
+    assert manager.get(f'manual:{order_id}') is None and not handler.manual_positions
+    
+    manager.shutdown()
+    logger.info("✓ 测试通过: 平仓失败时保留条件单")
+
+
+class SlowClient(FakeClient):
+    """止损单下单后等待 release 才返回"""
+    
+    def __init__(self):
+        super().__init__()
+        self.placing = threading.Event()
+        self.release = threading.Event()
+        self.pending_id = None
+    
+    def place_order(self, symbol, side, order_type, quantity, **kwargs):
+        result = super().place_order(symbol, side, order_type, quantity, **kwargs)
+        if order_type == 'STOP_MARKET':
+            self.pending_id = result['orderId']
+            self.placing.set()
+            self.release.wait(5)
+        return result
+
+
+def test_place_without_lock():
+    """测试挂单请求不持有锁"""
+    client = SlowClient()
+    manager = ProtectiveOrderManager(client)
+    filled = []
+    manager.add_listener(filled.append)
+    
+    def place(key):
+        manager.place(key, 'BTCUSDT', 'LONG', 0.01, stop_loss_price=48000.0, take_profit_price=52000.0)
+    
+    # 挂单期间止损单已成交，推送先于订单ID登记到达
+    worker = threading.Thread(target=place, args=('manual:1',))
+    worker.start()
+    assert client.placing.wait(2)
+    
+    start = time.perf_counter()
+    orders = manager.get('manual:1')
+    assert orders is not None and not orders.complete
+    client.statuses[client.pending_id] = 'FILLED'
+    manager.on_order_update({'i': client.pending_id, 's': 'BTCUSDT', 'X': 'FILLED'})
+    assert time.perf_counter() - start < 0.5          # 不等待交易所响应
+    
+    client.release.set()
+    worker.join(2)
+    assert wait_for(lambda: filled and manager.get('manual:1') is None)
+    assert filled[0].triggered == 'STOP_MARKET'
+    assert filled[0].take_profit_order_id in client.cancelled
+    
+    # 挂单期间持仓被平仓：挂出的条件单随后撤销
+    client.placing.clear()
+    client.release.clear()
+    worker = threading.Thread(target=place, args=('manual:2',))
+    worker.start()
+    assert client.placing.wait(2)
+    assert manager.cancel('manual:2') is not None
+    client.release.set()
+    worker.join(2)
+    assert manager.get('manual:2') is None
+    assert client.pending_id in client.cancelled
+    assert all(status != 'NEW' for status in client.statuses.values())
+    
+    manager.shutdown()
+    logger.info("✓ 测试通过: 挂单请求不持有锁")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_place_orders,
+        test_fill_handling,
+        test_fallback,
+        test_manual_orders,
+        test_strategy_orders,
+        test_close_failure_keeps_protection,
+        test_place_without_lock
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
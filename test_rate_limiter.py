@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+测试请求限流调度器
+
+这个脚本验证：
+1. 端点权重和优先级的计算
+2. 权重按周期匀速恢复，行情请求不能动用为交易保留的额度，下单次数单独限流
+3. 更高优先级的请求排队时，低优先级请求即使额度足够也要等待
+4. 响应头中的服务端用量只在比本地估计更紧时下调额度
+5. 429/418 按 Retry-After 暂停所有请求（没有 Retry-After 时暂停一个周期）
+
+所有测试使用手动推进的时钟，结果与运行速度无关
+"""
+
+import sys
+import os
+import time
+import threading
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.api.rate_limiter import (
+    RequestScheduler, RateLimitTimeout, endpoint_weight, endpoint_priority,
+    PRIORITY_ORDER, PRIORITY_ACCOUNT, PRIORITY_MARKET
+)
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.CRITICAL)
+
+
+class FakeClock:
+    """手动推进的单调时钟"""
+    
+    def __init__(self, start=1000.0):
+        self.now = start
+    
+    def __call__(self):
+        return self.now
+    
+    def advance(self, seconds):
+        self.now += seconds
+
+
+def make_scheduler(clock, **kwargs):
+    config = {
+        'weight_limit': 100,
+        'order_limit': 10,
+        'interval_seconds': 60,
+        'market_reserve_ratio': 0.2,
+        'acquire_timeout': 0
+    }
+    config.update(kwargs)
+    return RequestScheduler(time_source=clock, **config)
+
+
+def can_acquire(scheduler, weight, priority=PRIORITY_MARKET, is_order=False):
+    """不等待地尝试获取额度"""
+    try:
+        scheduler.acquire(weight, priority, is_order=is_order, timeout=0)
+        return True
+    except RateLimitTimeout:
+        return False
+
+
+def wait_for(condition, timeout=3.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.005)
+    return True
+
+
+def test_endpoint_weights():
+    """测试端点权重和优先级"""
+    assert endpoint_weight('GET', '/fapi/v1/klines', {'limit': 99}) == 1
+    assert endpoint_weight('GET', '/fapi/v1/klines', {'limit': 100}) == 2
+    assert endpoint_weight('GET', '/fapi/v1/klines', {'limit': 1000}) == 5
+    assert endpoint_weight('GET', '/fapi/v1/klines', {'limit': 1500}) == 10
+    assert endpoint_weight('GET', '/fapi/v1/klines') == 5
+    
+    assert endpoint_weight('GET', '/fapi/v3/openOrders', {'symbol': 'BTCUSDT'}) == 1
+    assert endpoint_weight('GET', '/fapi/v3/openOrders') == 40
+    assert endpoint_weight('GET', '/fapi/v1/ticker/price') == 2
+    assert endpoint_weight('GET', '/fapi/v3/balance') == 5
+    assert endpoint_weight('POST', '/fapi/v3/order', {'symbol': 'BTCUSDT'}) == 1
+    
+    assert endpoint_priority('POST', '/fapi/v3/order', signed=True) == PRIORITY_ORDER
+    assert endpoint_priority('DELETE', '/fapi/v3/order', signed=True) == PRIORITY_ORDER
+    assert endpoint_priority('GET', '/fapi/v3/balance', signed=True) == PRIORITY_ACCOUNT
+    assert endpoint_priority('GET', '/fapi/v1/klines', signed=False) == PRIORITY_MARKET
+    
+    logger.info("✓ 测试通过: 端点权重和优先级")
+
+
+def test_market_reserve_and_refill():
+    """测试行情预留额度和匀速恢复"""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    
+    # 行情请求最多用到 80（保留 20 给交易）
+    assert can_acquire(scheduler, 80)
+    assert not can_acquire(scheduler, 1)
+    assert can_acquire(scheduler, 5, PRIORITY_ACCOUNT)
+    assert can_acquire(scheduler, 15, PRIORITY_ORDER, is_order=True)
+    assert not can_acquire(scheduler, 1, PRIORITY_ORDER, is_order=True)
+    
+    # 每秒恢复 100/60：30 秒后有 50，行情请求可用 30
+    clock.advance(30)
+    assert not can_acquire(scheduler, 31)
+    assert can_acquire(scheduler, 30)
+    
+    # 超过桶容量的请求只要求桶满（行情请求为 80）
+    clock.advance(120)
+    assert can_acquire(scheduler, 500)
+    assert scheduler.metrics()['weight_available'] == 20
+    
+    metrics = scheduler.metrics()
+    assert metrics['requests'] == {'order': 1, 'account': 1, 'market': 3}
+    assert metrics['timeout_count'] == 3
+    
+    logger.info("✓ 测试通过: 行情预留额度和匀速恢复")
+
+
+def test_order_count_limit():
+    """测试下单次数限流"""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, order_limit=2)
+    
+    assert can_acquire(scheduler, 1, PRIORITY_ORDER, is_order=True)
+    assert can_acquire(scheduler, 1, PRIORITY_ORDER, is_order=True)
+    assert not can_acquire(scheduler, 1, PRIORITY_ORDER, is_order=True)
+    
+    # 撤单等不计入下单次数的交易请求不受影响
+    assert can_acquire(scheduler, 1, PRIORITY_ORDER)
+    
+    # 每 30 秒恢复一次下单次数
+    clock.advance(29)
+    assert not can_acquire(scheduler, 1, PRIORITY_ORDER, is_order=True)
+    clock.advance(1)
+    assert can_acquire(scheduler, 1, PRIORITY_ORDER, is_order=True)
+    
+    logger.info("✓ 测试通过: 下单次数限流")
+
+
+def test_priority_ordering():
+    """测试优先级排队"""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock, order_limit=1)
+    assert can_acquire(scheduler, 1, PRIORITY_ORDER, is_order=True)
+    
+    # 下单次数用完，下单请求排队等待（权重额度充足）
+    completed = []
+    
+    def place_order():
+        waited = scheduler.acquire(1, PRIORITY_ORDER, is_order=True, timeout=600)
+        completed.append(('order', waited))
+    
+    worker = threading.Thread(target=place_order)
+    worker.start()
+    try:
+        assert wait_for(lambda: scheduler.metrics()['waiting']['order'] == 1)
+        
+        # 有下单请求排队时，账户查询和行情请求都让行
+        assert not can_acquire(scheduler, 1, PRIORITY_ACCOUNT)
+        assert not can_acquire(scheduler, 1, PRIORITY_MARKET)
+        assert completed == []
+        
+        # 60 秒后恢复一次下单次数，唤醒排队的请求
+        clock.advance(60)
+        scheduler.update_from_headers({})
+        assert wait_for(lambda: completed)
+    finally:
+        clock.advance(600)
+        scheduler.update_from_headers({})
+        worker.join(5)
+    
+    assert completed == [('order', 60)]
+    assert scheduler.metrics()['waiting'] == {'order': 0, 'account': 0, 'market': 0}
+    assert can_acquire(scheduler, 1, PRIORITY_ACCOUNT)
+    assert can_acquire(scheduler, 1, PRIORITY_MARKET)
+    
+    logger.info("✓ 测试通过: 优先级排队")
+
+
+def test_header_updates():
+    """测试响应头校正额度"""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    assert can_acquire(scheduler, 10)
+    
+    # 服务端用量（包含其他进程的请求）比本地估计更紧：下调
+    scheduler.update_from_headers({'X-MBX-USED-WEIGHT-1M': '70', 'X-MBX-ORDER-COUNT-1M': '8'})
+    metrics = scheduler.metrics()
+    assert metrics['weight_available'] == 30 and metrics['order_available'] == 2
+    assert metrics['server_used_weight'] == 70 and metrics['server_order_count'] == 8
+    assert not can_acquire(scheduler, 11)
+    assert can_acquire(scheduler, 10)
+    
+    # 服务端用量比本地估计更松：不上调（小写响应头同样识别）
+    scheduler.update_from_headers({'x-mbx-used-weight-1m': '0', 'x-mbx-order-count-1m': '0'})
+    metrics = scheduler.metrics()
+    assert metrics['weight_available'] == 20 and metrics['order_available'] == 2
+    assert metrics['server_used_weight'] == 0
+    
+    # 无法解析的响应头被忽略
+    scheduler.update_from_headers({'X-MBX-USED-WEIGHT-1M': 'n/a'})
+    assert scheduler.metrics()['weight_available'] == 20
+    
+    logger.info("✓ 测试通过: 响应头校正额度")
+
+
+def test_backoff():
+    """测试 429/418 暂停"""
+    clock = FakeClock()
+    scheduler = make_scheduler(clock)
+    
+    scheduler.update_from_headers({'Retry-After': '5'}, status_code=429)
+    assert scheduler.metrics()['blocked_seconds'] == 5
+    assert not can_acquire(scheduler, 1, PRIORITY_ORDER, is_order=True)
+    assert not can_acquire(scheduler, 1, PRIORITY_MARKET)
+    
+    clock.advance(4.99)
+    assert not can_acquire(scheduler, 1, PRIORITY_ORDER)
+    clock.advance(0.01)
+    assert can_acquire(scheduler, 1, PRIORITY_ORDER)
+    
+    # 418 没有 Retry-After：暂停一个周期；后到的更短暂停不会缩短它
+    scheduler.update_from_headers({}, status_code=418)
+    scheduler.update_from_headers({'Retry-After': '1'}, status_code=429)
+    assert scheduler.metrics()['blocked_seconds'] == 60
+    clock.advance(59)
+    assert not can_acquire(scheduler, 1, PRIORITY_ORDER)
+    clock.advance(1)
+    assert can_acquire(scheduler, 1, PRIORITY_ORDER)
+    
+    # 等待中的请求在暂停结束后继续
+    scheduler.update_from_headers({'Retry-After': '10'}, status_code=429)
+    waited = []
+    worker = threading.Thread(target=lambda: waited.append(scheduler.acquire(1, PRIORITY_ACCOUNT, timeout=30)))
+    worker.start()
+    assert wait_for(lambda: scheduler.metrics()['waiting']['account'] == 1)
+    clock.advance(10)
+    scheduler.update_from_headers({})
+    worker.join(5)
+    assert waited == [10]
+    
+    assert scheduler.metrics()['throttled_count'] == 4
+    logger.info("✓ 测试通过: 429/418 暂停")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_endpoint_weights,
+        test_market_reserve_and_refill,
+        test_order_count_limit,
+        test_priority_ordering,
+        test_header_updates,
+        test_backoff
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+测试K线重采样
+
+这个脚本验证：
+1. 15m 合成的 1h / 4h / 1d K线与交易所按 1m 成交聚合的K线逐字段一致（交易所口径的参考实现）
+2. 周期边界按 UTC 对齐，周线从周一开始，开头不完整的周期被丢弃
+3. 最后一个未走完的周期作为未收盘K线保留，收盘时间为周期结束时间
+4. base_limit 获取的基础K线足够合成所需数量，并能由基础周期推算合成周期的最后收盘时间
+5. 设置 PARITY_SYMBOL 环境变量时，与交易所实际返回的 4h K线对比（需要网络）
+"""
+
+import sys
+import os
+from datetime import datetime, timezone
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+import numpy as np
+
+from src.market.kline_decoder import KLINE_DTYPE, decode_klines_json
+from src.market.resampler import KlineResampler, can_resample, resample_klines
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.ERROR)
+
+MINUTE_MS = 60 * 1000
+HOUR_MS = 60 * MINUTE_MS
+DAY_MS = 24 * HOUR_MS
+
+
+def make_minute_bars(start, count, seed):
+    """生成 1m K线（随机游走，包含成交量字段）"""
+    rng = np.random.default_rng(seed)
+    bars = np.zeros(count, dtype=KLINE_DTYPE)
+    bars['open_time'] = start + np.arange(count, dtype=np.int64) * MINUTE_MS
+    bars['close_time'] = bars['open_time'] + MINUTE_MS - 1
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, count)))
+    bars['open'] = np.concatenate(([100.0], close[:-1]))
+    bars['close'] = close
+    bars['high'] = np.maximum(bars['open'], close) * (1 + rng.uniform(0, 0.001, count))
+    bars['low'] = np.minimum(bars['open'], close) * (1 - rng.uniform(0, 0.001, count))
+    bars['volume'] = rng.uniform(1, 10, count).round(3)
+    bars['quote_volume'] = (bars['volume'] * close).round(4)
+    bars['trades'] = rng.integers(1, 100, count)
+    bars['taker_buy_volume'] = (bars['volume'] * rng.uniform(0, 1, count)).round(3)
+    bars['taker_buy_quote_volume'] = (bars['taker_buy_volume'] * close).round(4)
+    return bars
+
+
+def exchange_klines(minute_bars, interval_ms, offset=0):
+    """交易所口径的参考实现：逐根把 1m K线归入所在周期（周期从第一笔成交开始记录）"""
+    result = []
+    for bar in minute_bars:
+        open_time = (int(bar['open_time']) - offset) // interval_ms * interval_ms + offset
+        if not result or result[-1][0] != open_time:
+            result.append([open_time, bar['open'], bar['high'], bar['low'], bar['close'], bar['volume'],
+                           open_time + interval_ms - 1, bar['quote_volume'], bar['trades'],
+                           bar['taker_buy_volume'], bar['taker_buy_quote_volume']])
+            continue
+        row = result[-1]
+        row[2] = max(row[2], bar['high'])
+        row[3] = min(row[3], bar['low'])
+        row[4] = bar['close']
+        for index, name in ((5, 'volume'), (7, 'quote_volume'), (8, 'trades'),
+                            (9, 'taker_buy_volume'), (10, 'taker_buy_quote_volume')):
+            row[index] += bar[name]
+    
+    bars = np.empty(len(result), dtype=KLINE_DTYPE)
+    for index, name in enumerate(KLINE_DTYPE.names):
+        bars[name] = [row[index] for row in result]
+    return bars
+
+
+def assert_same_klines(actual, expected):
+    """逐字段比较K线（成交量类字段允许浮点求和顺序造成的误差）"""
+    assert len(actual) == len(expected), f"数量不一致: {len(actual)} != {len(expected)}"
+    for name in ('open_time', 'close_time', 'open', 'high', 'low', 'close', 'trades'):
+        assert np.array_equal(actual[name], expected[name]), f"{name} 不一致"
+    for name in ('volume', 'quote_volume', 'taker_buy_volume', 'taker_buy_quote_volume'):
+        assert np.allclose(actual[name], expected[name], rtol=1e-9), f"{name} 不一致"
+
+
+# 从 4h 周期中间开始，到 4h 周期中间结束（最后一根未走完）
+START = 1700000000000 // DAY_MS * DAY_MS + 2 * HOUR_MS + 30 * MINUTE_MS
+ALL_MINUTES = make_minute_bars(START, 9 * 24 * 60 + 7 * 60 + 35, seed=7)
+MINUTES = ALL_MINUTES[:-15]
+BASE = exchange_klines(MINUTES, 15 * MINUTE_MS)
+
+
+def test_parity():
+    """测试与交易所口径一致"""
+    for interval, interval_ms in (('1h', HOUR_MS), ('4h', 4 * HOUR_MS), ('1d', DAY_MS)):
+        expected = exchange_klines(MINUTES, interval_ms)
+        actual = resample_klines(BASE, interval, '15m')
+        # 数据从周期中间开始，交易所的第一根K线缺少开头的成交，本地合成时丢弃
+        assert_same_klines(actual, expected[1:])
+    
+    # REST 格式的列表同样可以合成
+    rows = [[int(b['open_time']), b['open'], b['high'], b['low'], b['close'], b['volume'],
+             int(b['close_time']), b['quote_volume'], int(b['trades']), b['taker_buy_volume'],
+             b['taker_buy_quote_volume']] for b in BASE]
+    assert_same_klines(resample_klines(rows, '4h'), resample_klines(BASE, '4h'))
+    
+    logger.info("✓ 测试通过: 与交易所口径一致")
+
+
+def test_boundaries():
+    """测试周期边界"""
+    bars_4h = resample_klines(BASE, '4h', '15m')
+    assert np.all(bars_4h['open_time'] % (4 * HOUR_MS) == 0)
+    assert bars_4h['open_time'][0] == START // (4 * HOUR_MS) * (4 * HOUR_MS) + 4 * HOUR_MS
+    
+    week_base = exchange_klines(make_minute_bars(START, 20 * 24 * 60, seed=3), HOUR_MS)
+    weeks = resample_klines(week_base, '1w', '1h')
+    assert len(weeks) >= 2
+    for open_time in weeks['open_time']:
+        opened = datetime.fromtimestamp(int(open_time) / 1000, tz=timezone.utc)
+        assert opened.weekday() == 0 and opened.hour == 0
+    
+    assert can_resample('15m', '4h') and can_resample('15m', '1w') and can_resample('1h', '1d')
+    assert not can_resample('4h', '15m')
+    assert not can_resample('7m', '1h')
+    assert not can_resample('15m', '1M')
+    try:
+        resample_klines(BASE, '15m', '4h')
+        assert False, "不能由大周期合成小周期"
+    except ValueError:
+        pass
+    
+    logger.info("✓ 测试通过: 周期边界")
+
+
+def test_partial_last_bar():
+    """测试最后一根未走完的K线"""
+    bars_4h = resample_klines(BASE, '4h', '15m')
+    last = bars_4h[-1]
+    
+    # 数据在 4h 周期开始后 1 小时 50 分结束
+    assert int(last['close_time']) == int(last['open_time']) + 4 * HOUR_MS - 1
+    assert int(BASE['close_time'][-1]) < int(last['close_time'])
+    assert last['close'] == BASE['close'][-1]
+    assert np.isclose(last['volume'], BASE['volume'][BASE['open_time'] >= last['open_time']].sum())
+    
+    # 下一根 15m K线到来后，未收盘的 4h K线随之更新
+    extended = exchange_klines(ALL_MINUTES, 15 * MINUTE_MS)
+    updated = resample_klines(extended, '4h', '15m')
+    assert len(updated) == len(bars_4h)
+    assert updated[-1]['close'] == extended['close'][-1]
+    assert np.array_equal(updated[:-1], bars_4h[:-1])
+    
+    logger.info("✓ 测试通过: 未收盘K线")
+
+
+def test_resampler():
+    """测试重采样器"""
+    resampler = KlineResampler('15m')
+    assert resampler.derives('4h') and not resampler.derives('15m') and not resampler.derives('5m')
+    
+    limit = 20
+    base_limit = resampler.base_limit('4h', limit)
+    for shift in range(16):
+        bars = resampler.resample(BASE[-base_limit - shift:len(BASE) - shift], '4h', limit)
+        assert len(bars) == limit
+    assert np.array_equal(resampler.resample(BASE[-base_limit:], '4h', limit), resample_klines(BASE, '4h')[-limit:])
+    
+    # 基础周期最后收盘于 4h 边界时，4h K线同时收盘
+    boundary = 1700006400000   # 4h 整点
+    assert resampler.last_closed_open_time(boundary - 15 * MINUTE_MS, '4h') == boundary - 4 * HOUR_MS
+    assert resampler.last_closed_open_time(boundary, '4h') == boundary - 4 * HOUR_MS
+    assert resampler.last_closed_open_time(boundary - 30 * MINUTE_MS, '4h') == boundary - 8 * HOUR_MS
+    assert resampler.last_closed_open_time(None, '4h') is None
+    
+    logger.info("✓ 测试通过: 重采样器")
+
+
+def test_exchange_parity():
+    """与交易所实际返回的 4h K线对比（设置 PARITY_SYMBOL 时运行）"""
+    symbol = os.environ.get('PARITY_SYMBOL')
+    if not symbol:
+        logger.info("跳过: 未设置 PARITY_SYMBOL")
+        return
+    
+    import requests
+    base_url = os.environ.get('PARITY_BASE_URL', 'https://fapi.asterdex.com')
+    
+    def fetch(interval, limit):
+        response = requests.get(
+            f'{base_url}/fapi/v1/klines',
+            params={'symbol': symbol, 'interval': interval, 'limit': limit},
+            timeout=10
+        )
+        response.raise_for_status()
+        return decode_klines_json(response.content)
+    
+    exchange_4h = fetch('4h', 60)
+    local_4h = KlineResampler('15m').resample(fetch('15m', 1500), '4h')
+    
+    # 两次请求之间可能有新成交，只比较已收盘的K线
+    common = np.intersect1d(exchange_4h['open_time'][:-1], local_4h['open_time'][:-1])
+    assert len(common) >= 50
+    assert_same_klines(
+        local_4h[np.isin(local_4h['open_time'], common)],
+        exchange_4h[np.isin(exchange_4h['open_time'], common)]
+    )
+    
+    logger.info(f"✓ 测试通过: {symbol} 与交易所 4h K线一致（{len(common)} 根）")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_parity,
+        test_boundaries,
+        test_partial_last_bar,
+        test_resampler,
+        test_exchange_parity
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+测试请求签名器
+
+这个脚本验证：
+1. AsterDexSigner 的输出与原始 _sign_request 实现逐字节一致
+2. 嵌套参数、空值、空格、Unicode 等边界情况
+3. 非法地址与 eth_abi 一样被拒绝
+4. 客户端签名与原始实现一致
+"""
+
+import sys
+import os
+import json
+import math
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from eth_abi import encode
+from eth_account import Account
+from eth_account.messages import encode_defunct
+from web3 import Web3
+
+from src.api.signer import AsterDexSigner
+from src.api import AsterDexClient
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+PRIVATE_KEY = '0x4c0883a69102937d6231471b5dbb6204fe5129617082792ae468d01a3f362318'
+USER = '0x63DD5aCC6b1aa0f563956C0e534DD30B6dcF7C4e'
+SIGNER = Account.from_key(PRIVATE_KEY).address
+NONCE = 1700000000123456
+TIMESTAMP = 1700000000123
+
+
+def legacy_trim_dict(my_dict):
+    """原始实现的 _trim_dict"""
+    for key in my_dict:
+        value = my_dict[key]
+        if isinstance(value, list):
+            new_value = []
+            for item in value:
+                if isinstance(item, dict):
+                    new_value.append(json.dumps(legacy_trim_dict(item)))
+                else:
+                    new_value.append(str(item))
+            my_dict[key] = json.dumps(new_value)
+            continue
+        if isinstance(value, dict):
+            my_dict[key] = json.dumps(legacy_trim_dict(value))
+            continue
+        my_dict[key] = str(value)
+    return my_dict
+
+
+def legacy_sign_request(params, recv_window=50000, nonce=NONCE, timestamp=TIMESTAMP):
+    """原始实现的 _sign_request（nonce 和时间戳固定）"""
+    params = {key: value for key, value in params.items() if value is not None}
+    params['recvWindow'] = recv_window
+    params['timestamp'] = timestamp
+    
+    trimmed_params = legacy_trim_dict(params.copy())
+    json_str = json.dumps(trimmed_params, sort_keys=True).replace(' ', '').replace("'", '\\"')
+    
+    encoded = encode(
+        ['string', 'address', 'address', 'uint256'],
+        [json_str, USER, SIGNER, nonce]
+    )
+    keccak_hex = Web3.keccak(encoded).hex()
+    signable_msg = encode_defunct(hexstr=keccak_hex)
+    signed_message = Account.sign_message(signable_message=signable_msg, private_key=PRIVATE_KEY)
+    
+    params['nonce'] = nonce
+    params['user'] = USER
+    params['signer'] = SIGNER
+    params['signature'] = '0x' + signed_message.signature.hex()
+    return params
+
+
+CASES = [
+    {},
+    {'symbol': 'BTCUSDT'},
+    {
+        'symbol': 'BTCUSDT', 'side': 'BUY', 'type': 'MARKET', 'quantity': '0.001',
+        'positionSide': 'BOTH', 'reduceOnly': False
+    },
+    {'symbol': 'ETHUSDT', 'orderId': 123456789, 'price': None},
+    {'symbol': 'BNBUSDT', 'leverage': 5, 'note': "it's a note with spaces"},
+    {'symbol': 'ASTERUSDT', 'note': '中文备注'},
+    {'batchOrders': [{'symbol': 'BTCUSDT', 'quantity': 1, 'reduceOnly': True}, 'x', 2]},
+    {'meta': {'a': 1, 'b': [1, 2]}, 'flag': True, 'ratio': 0.1},
+    {'quantity': 'x' * 31},
+    {'quantity': 'x' * 32},
+    {'quantity': 'x' * 33},
+]
+
+
+def test_signature_matches_legacy():
+    """测试1: 签名结果与原始实现逐字节一致"""
+    signer = AsterDexSigner(USER, SIGNER, PRIVATE_KEY)
+    
+    for case in CASES:
+        expected = legacy_sign_request(json.loads(json.dumps(case)))
+        actual = signer.sign(json.loads(json.dumps(case)), nonce=NONCE, timestamp=TIMESTAMP)
+        assert actual == expected, f"签名不一致: {case}"
+    
+    logger.info("✓ 测试通过: 所有参数组合签名一致")
+
+
+def test_encoding_matches_eth_abi():
+    """测试2: 预计算的 ABI 编码与 eth_abi 一致"""
+    signer = AsterDexSigner(USER.lower(), SIGNER, PRIVATE_KEY)
+    
+    for json_str in ['', '{}', 'a' * 32, '中文' * 20]:
+        for nonce in [0, 1, NONCE, 2 ** 256 - 1]:
+            expected = encode(
+                ['string', 'address', 'address', 'uint256'],
+                [json_str, USER.lower(), SIGNER, nonce]
+            )
+            assert signer._encode(json_str, nonce) == expected
+    
+    logger.info("✓ 测试通过: ABI 编码一致")
+
+
+def test_invalid_address_rejected():
+    """测试3: 非法地址与 eth_abi 一样被拒绝"""
+    for address in ['0x1234', 'not-an-address', USER + '00']:
+        try:
+            AsterDexSigner(address, SIGNER, PRIVATE_KEY)
+        except Exception:
+            continue
+        raise AssertionError(f"应拒绝地址 {address}")
+    
+    logger.info("✓ 测试通过: 非法地址被拒绝")
+
+
+def test_client_uses_signer():
+    """测试4: 客户端签名与原始实现一致"""
+    client = AsterDexClient(USER, SIGNER, PRIVATE_KEY)
+    client.request_signer.time_source = lambda: NONCE / 1000000
+    
+    params = {'symbol': 'BTCUSDT', 'side': 'SELL', 'reduceOnly': True}
+    expected = legacy_sign_request(dict(params), timestamp=int(round(NONCE / 1000)))
+    assert client._sign_request(dict(params)) == expected
+    client.close()
+    
+    logger.info("✓ 测试通过: 客户端使用新签名器")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_signature_matches_legacy,
+        test_encoding_matches_eth_abi,
+        test_invalid_address_rejected,
+        test_client_uses_signer
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+测试流式技术指标
+
+这个脚本验证：
+1. StreamingSMA / StreamingEMA / StreamingATR 与 TechnicalIndicators 的 sma / ema / calculate_atr 结果一致
+2. 未满周期时返回 0.0，peek 不修改状态
+3. calculate_all_mas 与逐个计算的原始实现一致
+4. MovingAverageSet.sync 增量更新与整段重算一致，K线不连续时重新初始化
+"""
+
+import sys
+import os
+import math
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+import numpy as np
+
+from src.strategies.indicators import TechnicalIndicators
+from src.strategies.streaming_indicators import (
+    StreamingSMA, StreamingEMA, StreamingATR, MovingAverageSet
+)
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+SMA_PERIODS = [20, 60, 120]
+EMA_PERIODS = [20, 60, 120]
+
+
+def make_bars(count, seed=7):
+    """生成随机游走的K线（开盘时间、最高、最低、收盘）"""
+    rng = np.random.default_rng(seed)
+    closes = 30000 + np.cumsum(rng.normal(0, 25, count))
+    highs = closes + rng.uniform(0, 40, count)
+    lows = closes - rng.uniform(0, 40, count)
+    open_times = 1700000000000 + np.arange(count, dtype=np.int64) * 60000
+    return open_times, highs, lows, closes
+
+
+def legacy_calculate_all_mas(close_prices, sma_periods, ema_periods):
+    """原始实现：每条均线单独对整段数据计算"""
+    result = {}
+    for period in sma_periods:
+        result[f'sma_{period}'] = TechnicalIndicators.sma(close_prices, period)
+    for period in ema_periods:
+        result[f'ema_{period}'] = TechnicalIndicators.ema(close_prices, period)
+    return result
+
+
+def assert_close(actual, expected, label):
+    assert math.isclose(actual, expected, rel_tol=1e-9, abs_tol=1e-9), \
+        f"{label}: {actual} != {expected}"
+
+
+def test_sma_matches_reference():
+    """逐根更新的 SMA 与 np.mean 一致"""
+    _, _, _, closes = make_bars(1000)
+    
+    for period in (1, 5, 20, 120):
+        sma = StreamingSMA(period)
+        for i, close in enumerate(closes):
+            value = sma.update(close)
+            expected = TechnicalIndicators.sma(closes[:i + 1], period)
+            assert_close(value, expected, f"SMA{period}[{i}]")
+    
+    logger.info("✓ 测试通过: SMA 与原始实现一致")
+
+
+def test_ema_matches_reference():
+    """逐根更新的 EMA 与 pandas ewm 一致"""
+    _, _, _, closes = make_bars(400)
+    
+    for period in (1, 20, 60, 120):
+        ema = StreamingEMA(period)
+        for i, close in enumerate(closes):
+            value = ema.update(close)
+            if i % 7 == 0 or i == len(closes) - 1:
+                expected = TechnicalIndicators.ema(list(closes[:i + 1]), period)
+                assert_close(value, expected, f"EMA{period}[{i}]")
+    
+    logger.info("✓ 测试通过: EMA 与原始实现一致")
+
+
+def test_atr_matches_reference():
+    """逐根更新的 ATR 与 calculate_atr 一致"""
+    _, highs, lows, closes = make_bars(200)
+    
+    atr = StreamingATR(14)
+    for i in range(len(closes)):
+        value = atr.update(highs[i], lows[i], closes[i])
+        expected = TechnicalIndicators.calculate_atr(
+            list(highs[:i + 1]), list(lows[:i + 1]), list(closes[:i + 1]), 14
+        )
+        assert_close(value, expected, f"ATR[{i}]")
+    
+    logger.info("✓ 测试通过: ATR 与原始实现一致")
+
+
+def test_peek_does_not_mutate():
+    """peek 返回追加后的值且不修改状态"""
+    _, highs, lows, closes = make_bars(150)
+    
+    sma, ema, atr = StreamingSMA(20), StreamingEMA(20), StreamingATR(14)
+    for i in range(len(closes) - 1):
+        sma.update(closes[i])
+        ema.update(closes[i])
+        atr.update(highs[i], lows[i], closes[i])
+    
+    before = (sma.value, ema.value, atr.value)
+    peeked = (sma.peek(closes[-1]), ema.peek(closes[-1]), atr.peek(highs[-1], lows[-1], closes[-1]))
+    assert (sma.value, ema.value, atr.value) == before
+    
+    updated = (sma.update(closes[-1]), ema.update(closes[-1]), atr.update(highs[-1], lows[-1], closes[-1]))
+    for p, u in zip(peeked, updated):
+        assert_close(p, u, "peek")
+    
+    # 未满周期
+    assert StreamingSMA(3).peek(1.0) == 0.0
+    assert StreamingEMA(3).peek(1.0) == 0.0
+    assert StreamingATR(3).peek(2.0, 1.0, 1.5) == 0.0
+    
+    logger.info("✓ 测试通过: peek 不修改状态")
+
+
+def test_calculate_all_mas_matches_legacy():
+    """calculate_all_mas 与逐个计算的结果一致（含数据不足的情况）"""
+    for count in (10, 59, 120, 150, 1500):
+        _, _, _, closes = make_bars(count, seed=count)
+        actual = TechnicalIndicators.calculate_all_mas(closes, SMA_PERIODS, EMA_PERIODS)
+        expected = legacy_calculate_all_mas(closes, SMA_PERIODS, EMA_PERIODS)
+        assert actual.keys() == expected.keys()
+        for key in expected:
+            assert_close(actual[key], expected[key], f"{key} (n={count})")
+    
+    logger.info("✓ 测试通过: calculate_all_mas 与原始实现一致")
+
+
+def test_sync_matches_full_recompute():
+    """滑动窗口逐次 sync 的结果与对全部历史重算一致"""
+    open_times, _, _, closes = make_bars(600)
+    window = 150
+    ma_set = MovingAverageSet(SMA_PERIODS, EMA_PERIODS)
+    
+    for end in range(window, len(closes) + 1):
+        start = end - window
+        actual = ma_set.sync(open_times[start:end], closes[start:end])
+        # 流式状态覆盖第一次同步以来的全部历史
+        expected = legacy_calculate_all_mas(closes[:end], SMA_PERIODS, EMA_PERIODS)
+        for key in expected:
+            assert_close(actual[key], expected[key], f"{key}[{end}]")
+    
+    # 同一窗口重复同步（最后一根K线价格变化）不提交未收盘K线
+    tail = closes[-window:].copy()
+    tail[-1] += 100
+    before = ma_set.values()
+    ma_set.sync(open_times[-window:], tail)
+    assert ma_set.values() == before
+    
+    logger.info("✓ 测试通过: 增量同步与整段重算一致")
+
+
+def test_sync_reseeds_on_gap():
+    """窗口与已处理数据不连续时用新窗口重新初始化"""
+    open_times, _, _, closes = make_bars(1000)
+    ma_set = MovingAverageSet(SMA_PERIODS, EMA_PERIODS)
+    ma_set.sync(open_times[:150], closes[:150])
+    
+    actual = ma_set.sync(open_times[500:650], closes[500:650])
+    expected = legacy_calculate_all_mas(closes[500:650], SMA_PERIODS, EMA_PERIODS)
+    for key in expected:
+        assert_close(actual[key], expected[key], key)
+    
+    logger.info("✓ 测试通过: 不连续时重新初始化")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_sma_matches_reference,
+        test_ema_matches_reference,
+        test_atr_matches_reference,
+        test_peek_does_not_mutate,
+        test_calculate_all_mas_matches_legacy,
+        test_sync_matches_full_recompute,
+        test_sync_reseeds_on_gap
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
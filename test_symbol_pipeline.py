@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+测试按交易对并发执行
+
+这个脚本验证：
+1. 各交易对并发执行，周期耗时接近最慢的交易对，并记录关键路径和分阶段耗时
+2. 单个交易对超时不影响其他交易对，上一轮仍在执行的交易对在下一周期跳过；排队时间不计入超时
+3. 多个交易对并发调用 DoubleMaStrategy.analyze 时，每个交易对的状态和信号与逐个执行一致
+4. 超时后仍在运行的任务通过 timer.expired() 得知已超时，Trader.execute_signal 不再下单
+"""
+
+import sys
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from unittest.mock import Mock
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+import numpy as np
+
+from src.market.kline_decoder import KLINE_DTYPE
+from src.strategies.double_ma import DoubleMaStrategy
+from src.trading.symbol_pipeline import SymbolPipeline
+from src.trading.trader import Trader
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.ERROR)
+
+BAR_MS = 15 * 60 * 1000
+
+
+def make_bars(count, volatility, seed):
+    """生成几何随机游走K线"""
+    rng = np.random.default_rng(seed)
+    bars = np.zeros(count, dtype=KLINE_DTYPE)
+    bars['open_time'] = 1600000000000 // BAR_MS * BAR_MS + np.arange(count, dtype=np.int64) * BAR_MS
+    bars['close_time'] = bars['open_time'] + BAR_MS - 1
+    close = 100 * np.exp(np.cumsum(rng.normal(0, volatility, count)))
+    bars['close'] = close
+    bars['open'] = np.concatenate(([close[0]], close[:-1]))
+    return bars
+
+
+def sleeping_task(durations):
+    """按交易对睡眠指定秒数的任务（分 fetch / execute 两个阶段）"""
+    def task(symbol, timer):
+        with timer.stage('fetch'):
+            time.sleep(durations[symbol] / 2)
+        with timer.stage('execute'):
+            time.sleep(durations[symbol] / 2)
+        return symbol
+    return task
+
+
+def test_concurrent_cycle():
+    """测试并发执行和关键路径"""
+    pipeline = SymbolPipeline('test', max_workers=4, symbol_timeout=5)
+    durations = {'BTCUSDT': 0.3, 'ETHUSDT': 0.1, 'BNBUSDT': 0.1, 'ASTERUSDT': 0.1}
+    
+    start = time.perf_counter()
+    results = pipeline.run(list(durations), sleeping_task(durations))
+    elapsed = time.perf_counter() - start
+    
+    assert results == {s: s for s in durations}
+    assert elapsed < 0.45, f"周期耗时 {elapsed:.2f}s，交易对没有并发执行"
+    
+    cycle = pipeline.last_cycle
+    assert cycle['critical_path']['symbol'] == 'BTCUSDT'
+    assert set(cycle['critical_path']['stages']) == {'fetch', 'execute'}
+    assert cycle['serial_ms'] >= 550
+    assert cycle['wall_ms'] < cycle['serial_ms']
+    assert pipeline.metrics()['cycles'] == 1
+    
+    pipeline.shutdown()
+    logger.info(f"✓ 测试通过: 并发执行（周期 {cycle['wall_ms']:.0f}ms，逐个执行 {cycle['serial_ms']:.0f}ms）")
+
+
+def test_timeout_and_skip():
+    """测试超时、跳过和排队时间"""
+    pipeline = SymbolPipeline('test', max_workers=4, symbol_timeout=0.2)
+    release = threading.Event()
+    
+    def task(symbol, timer):
+        if symbol == 'BTCUSDT':
+            with timer.stage('execute'):
+                release.wait(5)
+        return symbol
+    
+    start = time.perf_counter()
+    results = pipeline.run(['BTCUSDT', 'ETHUSDT'], task)
+    assert time.perf_counter() - start < 1.0
+    assert isinstance(results['BTCUSDT'], TimeoutError)
+    assert results['ETHUSDT'] == 'ETHUSDT'
+    assert pipeline.last_cycle['timed_out'] == ['BTCUSDT']
+    
+    # BTCUSDT 仍在执行：下一周期跳过，其他交易对照常执行
+    results = pipeline.run(['BTCUSDT', 'ETHUSDT'], task)
+    assert 'BTCUSDT' not in results and results['ETHUSDT'] == 'ETHUSDT'
+    assert pipeline.last_cycle['skipped'] == ['BTCUSDT']
+    
+    release.set()
+    time.sleep(0.1)
+    results = pipeline.run(['BTCUSDT'], task)
+    assert results['BTCUSDT'] == 'BTCUSDT'
+    pipeline.shutdown()
+    
+    # 2 个线程、4 个交易对：后两个交易对排队约 0.15s，不计入 0.2s 的超时
+    pipeline = SymbolPipeline('test', max_workers=2, symbol_timeout=0.2)
+    durations = {f'S{i}USDT': 0.15 for i in range(4)}
+    results = pipeline.run(list(durations), sleeping_task(durations))
+    assert results == {s: s for s in durations}
+    assert max(s['queue_ms'] for s in pipeline.last_cycle['per_symbol'].values()) >= 100
+    pipeline.shutdown()
+    
+    logger.info("✓ 测试通过: 超时和跳过")
+
+
+def test_expired_task_skips_order():
+    """测试超时后不再下单"""
+    client = Mock()
+    client.get_balance.return_value = [{'asset': 'USDT', 'availableBalance': '1000'}]
+    client.get_position_info.return_value = []
+    risk_manager = Mock()
+    risk_manager.check_position_risk.return_value = {'risk_level': 'LOW'}
+    trader = Trader(asterdex_client=client, deepseek_client=None, risk_manager=risk_manager, strategy=None)
+    trader._open_position = Mock(return_value={'orderId': 1})
+    trader._close_position = Mock(return_value={'orderId': 2})
+    
+    pipeline = SymbolPipeline('test', max_workers=2, symbol_timeout=0.2)
+    release = threading.Event()
+    finished = threading.Event()
+    late = {}
+    
+    def task(symbol, timer):
+        assert timer.deadline is not None and not timer.expired()
+        if symbol == 'BTCUSDT':
+            # 模拟慢请求：超时后才开始下单
+            release.wait(5)
+        with timer.stage('execute'):
+            result = trader.execute_signal(symbol, {'action': 'BUY', 'confidence': 95}, '15m', expired=timer.expired)
+        if symbol == 'BTCUSDT':
+            late['expired'] = timer.expired()
+            late['result'] = result
+            finished.set()
+        return result
+    
+    results = pipeline.run(['BTCUSDT', 'ETHUSDT'], task)
+    assert isinstance(results['BTCUSDT'], TimeoutError)
+    assert results['ETHUSDT'] == {'orderId': 1}
+    
+    release.set()
+    assert finished.wait(5)
+    assert late == {'expired': True, 'result': None}
+    assert [c.args[0] for c in trader._open_position.call_args_list] == ['ETHUSDT']
+    pipeline.shutdown()
+    
+    # 平仓信号同样不再下单；不传入 expired 时照常下单
+    client.get_position_info.return_value = [{'symbol': 'BTCUSDT', 'positionAmt': '0.01'}]
+    assert trader.execute_signal('BTCUSDT', {'action': 'CLOSE'}, '15m', expired=lambda: True) is None
+    assert not trader._close_position.called
+    assert trader.execute_signal('BTCUSDT', {'action': 'CLOSE'}, '15m') == {'orderId': 2}
+    
+    logger.info("✓ 测试通过: 超时后不再下单")
+
+
+def test_strategy_state_under_concurrency():
+    """测试并发分析时每个交易对的状态正确"""
+    universe = {f'S{i}USDT': make_bars(400, 0.01, i) for i in range(8)}
+    
+    def replay(strategy, symbol):
+        bars = universe[symbol]
+        signals = []
+        for t in range(150, len(bars)):
+            now = datetime.fromtimestamp((int(bars['close_time'][t]) + 1) / 1000)
+            signals.append(strategy.analyze(symbol, bars[t - 149:t + 1], '15m', now=now)['action'])
+        return signals
+    
+    for streaming_ema in (False, True):
+        sequential = DoubleMaStrategy(streaming_ema=streaming_ema)
+        expected = {symbol: replay(sequential, symbol) for symbol in universe}
+        
+        concurrent = DoubleMaStrategy(streaming_ema=streaming_ema)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            actual = dict(zip(universe, executor.map(lambda s: replay(concurrent, s), universe)))
+        
+        assert actual == expected
+        assert concurrent.symbol_states == sequential.symbol_states
+        assert any(a != 'HOLD' for signals in expected.values() for a in signals)
+    
+    # get_symbol_state 返回副本，调用方修改不会影响策略状态
+    state = concurrent.get_symbol_state('S0USDT')
+    assert state == concurrent.symbol_states['S0USDT']
+    assert state is not concurrent.symbol_states['S0USDT']
+    
+    logger.info("✓ 测试通过: 并发分析的交易对状态")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_concurrent_cycle,
+        test_timeout_and_skip,
+        test_expired_task_skips_order,
+        test_strategy_state_under_concurrency
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
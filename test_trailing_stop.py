@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+"""
+测试移动止损 / 保本止损引擎
+
+这个脚本验证：
+1. 做多 / 做空的移动止损和保本止损计算正确，止损只收紧不放宽
+2. 止损变化按持仓最小间隔、最小变动幅度和每秒改单次数节流推送到交易所
+3. 修改交易所止损单时先挂新单再撤旧单；旧单已成交时撤销新单并按成交处理
+4. AIPositionManager 的 stop_loss_update 建议被应用（只收紧）
+5. 手动持仓由本地监控时，止损变化同步到持仓记录和价格触发索引
+6. 行情数据流每次标记价格推送都通知价格回调
+7. 手动交易处理器定期用 AIPositionManager 复查持仓，stop_loss_update 建议经引擎推送并同步到持仓记录
+"""
+
+import sys
+import os
+import itertools
+import threading
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.market.market_stream import MarketDataStream
+from src.trading.exchange_info import SymbolRules
+from src.trading.manual_order_handler import ManualOrderHandler, ManualOrder, OrderSide
+from src.trading.protective_orders import ProtectiveOrderManager
+from src.trading.risk_manager import RiskManager
+from src.trading.trader import Trader
+from src.trading.trailing_stop import TrailingStopEngine
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.ERROR)
+
+RULES = SymbolRules.from_symbol_info({
+    'symbol': 'BTCUSDT',
+    'filters': [
+        {'filterType': 'LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001', 'maxQty': '100000'},
+        {'filterType': 'PRICE_FILTER', 'tickSize': '0.01', 'minPrice': '0.01', 'maxPrice': '1000000'}
+    ]
+})
+
+
+class FakeClient:
+    """记录下单 / 撤单的模拟客户端"""
+    
+    def __init__(self, price=100.0):
+        self.price = price
+        self.order_ids = itertools.count(1)
+        self.placed = []
+        self.cancelled = []
+        self.filled = set()
+        self._lock = threading.Lock()
+    
+    def place_order(self, symbol, side, order_type, quantity, reduce_only=False, stop_price=None, **kwargs):
+        with self._lock:
+            order_id = next(self.order_ids)
+            self.placed.append((order_id, order_type, stop_price))
+        return {'orderId': order_id, 'avgPrice': str(self.price)}
+    
+    def cancel_order(self, symbol, order_id):
+        if order_id in self.filled:
+            raise Exception('Unknown order sent.')
+        self.cancelled.append(order_id)
+        return {}
+    
+    def get_order(self, symbol, order_id):
+        return {'status': 'FILLED' if order_id in self.filled else 'NEW'}
+    
+    def get_open_orders(self, symbol=None):
+        return []
+    
+    def get_ticker_price(self, symbol=None):
+        if symbol is None:
+            return [{'symbol': 'BTCUSDT', 'price': str(self.price)}]
+        return {'symbol': symbol, 'price': str(self.price)}
+    
+    def change_leverage(self, symbol, leverage):
+        return {}
+
+
+class FakeExchangeInfo:
+    def get_rules(self, symbol):
+        return RULES
+
+
+class RecordingOrders:
+    """记录 amend_stop_loss 调用的条件单管理器"""
+    
+    def __init__(self):
+        self.amended = []
+        self.listeners = []
+    
+    def add_listener(self, callback):
+        self.listeners.append(callback)
+    
+    def get(self, key):
+        return object()
+    
+    def amend_stop_loss(self, key, stop_price, rules=None):
+        self.amended.append((key, stop_price))
+        return True
+
+
+def test_stop_math():
+    """测试止损计算"""
+    engine = TrailingStopEngine(trail_percent=2.0, activation_percent=1.0, break_even_percent=1.0)
+    
+    long = engine.track('a', 'BTCUSDT', 'LONG', 100.0, stop_loss_price=95.0)
+    short = engine.track('b', 'BTCUSDT', 'SHORT', 100.0, stop_loss_price=105.0)
+    
+    engine.on_price('BTCUSDT', 100.5)        # 未达到激活 / 保本阈值
+    assert long.stop_price == 95.0 and short.stop_price == 105.0
+    
+    engine.on_price('BTCUSDT', 101.0)        # 做多盈利 1%：保本；移动止损 98.98 低于保本价
+    assert long.stop_price == 100.0
+    
+    engine.on_price('BTCUSDT', 110.0)        # 新高：止损 = 110 * 0.98
+    assert abs(long.stop_price - 107.8) < 1e-9
+    
+    engine.on_price('BTCUSDT', 105.0)        # 回落不放宽
+    assert abs(long.stop_price - 107.8) < 1e-9
+    
+    engine.on_price('BTCUSDT', 90.0)         # 做空盈利 10%：止损 = 90 * 1.02
+    assert abs(short.stop_price - 91.8) < 1e-9
+    assert abs(long.stop_price - 107.8) < 1e-9
+    
+    # 没有任何规则时不跟踪
+    assert TrailingStopEngine().track('c', 'BTCUSDT', 'LONG', 100.0) is None
+    
+    # 单个持仓可覆盖默认参数（只保本）
+    override = engine.track('d', 'ETHUSDT', 'LONG', 100.0, trail_percent=0, break_even_percent=5.0)
+    engine.on_price('ETHUSDT', 104.0)
+    assert override.stop_price is None
+    engine.on_price('ETHUSDT', 120.0)
+    assert override.stop_price == 100.0
+    
+    logger.info("✓ 测试通过: 止损计算")
+
+
+def test_throttled_push():
+    """测试节流推送"""
+    orders = RecordingOrders()
+    engine = TrailingStopEngine(
+        protective_orders=orders,
+        trail_percent=1.0,
+        min_update_interval=3600,
+        min_step_percent=0.5,
+        max_updates_per_second=2
+    )
+    notified = []
+    engine.add_listener(lambda key, stop: notified.append((key, stop)))
+    
+    for i in range(5):
+        engine.track(f'k{i}', 'BTCUSDT', 'LONG', 100.0, stop_loss_price=95.0)
+    
+    # 一千次价格推送只在内存中更新
+    for step in range(1000):
+        engine.on_price('BTCUSDT', 100.0 + step * 0.01)
+    assert orders.amended == []
+    
+    # 令牌桶限制本次最多 2 次改单，其余留到之后
+    assert engine.flush() == 2
+    assert len(notified) == 5
+    assert engine.get_stats()['pending'] == 3
+    
+    engine.max_updates_per_second = engine._tokens = 10
+    assert engine.flush() == 3
+    assert engine.get_stats()['pending'] == 0
+    
+    # 同一持仓最小间隔内不再改单
+    engine.on_price('BTCUSDT', 120.0)
+    engine.max_updates_per_second = engine._tokens = 10
+    assert engine.flush() == 0 and len(orders.amended) == 5
+    assert engine.get_stats()['pending'] == 5
+    
+    # 变动幅度不足时不改单（也不保留待推送状态）
+    engine.min_update_interval = 0
+    for record in engine._records.values():
+        record.pushed_stop = record.stop_price * 0.999
+    engine._dirty.update(engine._records)
+    assert engine.flush() == 0 and engine.get_stats()['pending'] == 0
+    
+    # 条件单成交后停止跟踪
+    orders.listeners[0](type('Protection', (), {'key': 'k0'})())
+    assert engine.get('k0') is None and engine.get_stats()['tracked'] == 4
+    
+    logger.info("✓ 测试通过: 节流推送")
+
+
+def test_amend_stop_loss():
+    """测试修改交易所止损单"""
+    client = FakeClient()
+    manager = ProtectiveOrderManager(client)
+    filled = []
+    manager.add_listener(filled.append)
+    
+    protection = manager.place('manual:1', 'BTCUSDT', 'LONG', 1.0, stop_loss_price=95.0, take_profit_price=120.0)
+    old_stop, take_profit = protection.stop_loss_order_id, protection.take_profit_order_id
+    
+    assert manager.amend_stop_loss('manual:1', 98.004, rules=RULES)
+    assert protection.stop_loss_price == 98.0
+    assert client.placed[-1][1:] == ('STOP_MARKET', '98.0')
+    assert client.cancelled == [old_stop]
+    new_stop = protection.stop_loss_order_id
+    assert manager._keys_by_order_id == {new_stop: 'manual:1', take_profit: 'manual:1'}
+    
+    # 旧止损单在改单期间成交：撤销新止损单和止盈单，通知成交
+    client.filled.add(new_stop)
+    assert not manager.amend_stop_loss('manual:1', 99.0)
+    assert filled and filled[0].triggered == 'STOP_MARKET'
+    assert manager.get('manual:1') is None
+    assert client.placed[-1][0] in client.cancelled and take_profit in client.cancelled
+    
+    # 没有记录时不改单
+    assert not manager.amend_stop_loss('manual:2', 99.0)
+    
+    manager.shutdown()
+    logger.info("✓ 测试通过: 修改交易所止损单")
+
+
+def test_ai_stop_update():
+    """测试应用 AI 止损建议"""
+    engine = TrailingStopEngine(break_even_percent=50.0)
+    record = engine.track('a', 'BTCUSDT', 'SHORT', 100.0, stop_loss_price=105.0)
+    
+    assert not engine.apply_stop_update('a', {'suggested': False, 'reason': '暂无调整建议'})
+    assert not engine.apply_stop_update('a', {'suggested': True, 'new_percentage': -8})   # 放宽，忽略
+    assert engine.apply_stop_update('a', {'suggested': True, 'new_percentage': -2})
+    assert abs(record.stop_price - 102.0) < 1e-9
+    assert engine.apply_stop_update('a', {'suggested': True, 'new_percentage': 1})       # 锁定 1% 利润
+    assert abs(record.stop_price - 99.0) < 1e-9
+    assert not engine.apply_stop_update('missing', {'suggested': True, 'new_percentage': 1})
+    assert not engine.apply_stop_update('a', {'suggested': True})
+    
+    logger.info("✓ 测试通过: 应用 AI 止损建议")
+
+
+def test_manual_local_monitoring():
+    """测试本地监控的手动持仓"""
+    client = FakeClient(price=100.0)
+    engine = TrailingStopEngine(trail_percent=2.0)
+    trader = Trader(
+        asterdex_client=client,
+        deepseek_client=None,
+        risk_manager=RiskManager(),
+        strategy=None,
+        exchange_info=FakeExchangeInfo(),
+        trailing_stops=engine
+    )
+    handler = ManualOrderHandler(trader, {'enable_file_watch': False})
+    
+    order_id = handler.execute_manual_order(
+        ManualOrder(symbol='BTCUSDT', side=OrderSide.LONG, quantity=1.0, stop_loss_percent=5.0)
+    )
+    assert engine.get(f'manual:{order_id}') is not None
+    assert handler.trigger_index.crossed('BTCUSDT', 95.0)
+    
+    engine.on_price('BTCUSDT', 110.0)
+    engine.flush()
+    position = handler.manual_positions[order_id]
+    assert abs(position.stop_loss_price - 107.8) < 1e-9
+    assert handler.trigger_index.crossed('BTCUSDT', 107.9) == []
+    assert handler.trigger_index.crossed('BTCUSDT', 107.7)[0].kind == 'STOP_LOSS'
+    
+    assert handler.close_position_by_id(order_id)
+    assert engine.get(f'manual:{order_id}') is None
+    
+    handler._close_executor.shutdown(wait=True)
+    logger.info("✓ 测试通过: 本地监控的手动持仓")
+
+
+class FakePositionManager:
+    """返回固定止损建议、记录调用参数的 AIPositionManager"""
+    
+    def __init__(self, new_percentage):
+        self.new_percentage = new_percentage
+        self.calls = []
+    
+    def monitor_position(self, position, current_price, market_context=None):
+        self.calls.append((position, current_price))
+        return {
+            'action': 'HOLD',
+            'stop_loss_update': {'suggested': True, 'new_percentage': self.new_percentage}
+        }
+
+
+def test_manual_ai_review():
+    """测试手动持仓的 AI 复查"""
+    client = FakeClient(price=100.0)
+    engine = TrailingStopEngine(break_even_percent=50.0)
+    orders = RecordingOrders()
+    engine.protective_orders = orders
+    trader = Trader(
+        asterdex_client=client,
+        deepseek_client=None,
+        risk_manager=RiskManager(),
+        strategy=None,
+        exchange_info=FakeExchangeInfo(),
+        trailing_stops=engine
+    )
+    advisor = FakePositionManager(new_percentage=-10)
+    handler = ManualOrderHandler(trader, {'enable_file_watch': False}, position_manager=advisor)
+    
+    order_id = handler.execute_manual_order(
+        ManualOrder(symbol='BTCUSDT', side=OrderSide.SHORT, quantity=2.0, stop_loss_percent=5.0)
+    )
+    position = handler.manual_positions[order_id]
+    
+    # 放宽止损的建议被忽略
+    assert handler.review_positions() == 0
+    assert advisor.calls[0][0]['position_amt'] == -2.0 and advisor.calls[0][1] == 100.0
+    assert abs(position.stop_loss_price - 105.0) < 1e-9
+    
+    # 收紧到 -1%：引擎推送到交易所并更新持仓记录和触发索引
+    advisor.new_percentage = -1
+    assert handler.review_positions() == 1
+    engine.flush()
+    assert abs(position.stop_loss_price - 101.0) < 1e-9
+    assert orders.amended == [(f'manual:{order_id}', 101.0)]
+    assert handler.trigger_index.crossed('BTCUSDT', 101.5)[0].kind == 'STOP_LOSS'
+    
+    # 正在平仓的持仓不复查
+    handler._closing.add(order_id)
+    assert handler.review_positions() == 0 and len(advisor.calls) == 2
+    
+    handler._close_executor.shutdown(wait=True)
+    logger.info("✓ 测试通过: 手动持仓的 AI 复查")
+
+
+def test_stream_price_listener():
+    """测试行情数据流价格回调"""
+    stream = MarketDataStream(client=None, symbols=['BTCUSDT'], intervals=[])
+    ticks = []
+    stream.add_price_listener(lambda symbol, price: ticks.append((symbol, price)))
+    stream.add_price_listener(lambda symbol, price: 1 / 0)      # 回调异常不影响数据流
+    
+    for price in ('100.5', '101.25'):
+        stream._on_message({'data': {'e': 'markPriceUpdate', 's': 'BTCUSDT', 'p': price, 'E': 1}})
+    
+    assert ticks == [('BTCUSDT', 100.5), ('BTCUSDT', 101.25)]
+    assert stream.get_mark_price_info('BTCUSDT')['price'] == 101.25
+    
+    logger.info("✓ 测试通过: 行情数据流价格回调")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_stop_math,
+        test_throttled_push,
+        test_amend_stop_loss,
+        test_ai_stop_update,
+        test_manual_local_monitoring,
+        test_manual_ai_review,
+        test_stream_price_listener
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+测试价格触发索引
+
+这个脚本验证：
+1. 索引找出的触发持仓与逐个调用 ManualPosition.should_close 的结果一致（同时穿越时优先止损）
+2. 移除、重复加入和相同价位的持仓处理正确，pop_crossed 取出后不会重复触发
+3. 手动交易监控每个周期只请求一次价格，数百个持仓的检查在一个周期内完成，触发的持仓被平仓
+4. 交易所条件单覆盖的持仓不进入索引，条件单失效后自动加入
+5. 触发平仓和 API 平仓（close_position_by_id）同时发生时只发出一笔平仓单
+"""
+
+import sys
+import os
+import time
+import random
+import threading
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+from src.trading.exchange_info import SymbolRules
+from src.trading.manual_order_handler import ManualOrderHandler, ManualPosition, OrderSide
+from src.trading.protective_orders import ProtectiveOrderManager
+from src.trading.risk_manager import RiskManager
+from src.trading.trader import Trader
+from src.trading.trigger_index import TriggerIndex
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.ERROR)
+
+RULES = SymbolRules.from_symbol_info({
+    'symbol': 'ANY',
+    'filters': [
+        {'filterType': 'LOT_SIZE', 'stepSize': '0.001', 'minQty': '0.001', 'maxQty': '100000'},
+        {'filterType': 'PRICE_FILTER', 'tickSize': '0.01', 'minPrice': '0.01', 'maxPrice': '1000000'}
+    ]
+})
+
+
+def random_positions(count, symbols, seed):
+    """生成随机的手动持仓（部分只有止损或只有止盈）"""
+    rng = random.Random(seed)
+    positions = {}
+    for i in range(count):
+        side = rng.choice([OrderSide.LONG, OrderSide.SHORT])
+        entry = 100.0
+        sign = 1 if side == OrderSide.LONG else -1
+        stop = entry * (1 - sign * rng.uniform(0.01, 0.1)) if rng.random() < 0.8 else None
+        take = entry * (1 + sign * rng.uniform(0.01, 0.1)) if rng.random() < 0.8 else None
+        positions[str(i)] = ManualPosition(
+            order_id=str(i), symbol=rng.choice(symbols), side=side, entry_price=entry,
+            quantity=1.0, leverage=3, stop_loss_price=stop, take_profit_price=take
+        )
+    return positions
+
+
+def build_index(positions):
+    index = TriggerIndex()
+    for order_id, position in positions.items():
+        index.add(order_id, position.symbol, position.side.value, position.stop_loss_price, position.take_profit_price)
+    return index
+
+
+class FakeClient:
+    """按交易对返回固定价格、记录请求次数的模拟客户端"""
+    
+    def __init__(self, prices):
+        self.prices = prices
+        self.ticker_requests = 0
+        self.closed = []
+        self._lock = threading.Lock()
+    
+    def get_ticker_price(self, symbol=None):
+        with self._lock:
+            self.ticker_requests += 1
+        if symbol is None:
+            return [{'symbol': s, 'price': str(p)} for s, p in self.prices.items()]
+        return {'symbol': symbol, 'price': str(self.prices[symbol])}
+    
+    def place_order(self, symbol, side, order_type, quantity, reduce_only=False, **kwargs):
+        if order_type == 'MARKET' and reduce_only:
+            with self._lock:
+                self.closed.append(symbol)
+        return {'orderId': random.randint(1, 10 ** 9)}
+    
+    def cancel_order(self, symbol, order_id):
+        return {}
+    
+    def get_open_orders(self, symbol=None):
+        return []
+
+
+class FakeExchangeInfo:
+    def get_rules(self, symbol):
+        return RULES
+
+
+def make_handler(client, protective_orders=None):
+    trader = Trader(
+        asterdex_client=client,
+        deepseek_client=None,
+        risk_manager=RiskManager(),
+        strategy=None,
+        exchange_info=FakeExchangeInfo(),
+        protective_orders=protective_orders
+    )
+    return ManualOrderHandler(trader, {'enable_file_watch': False, 'close_workers': 8})
+
+
+def test_matches_should_close():
+    """测试与 should_close 一致"""
+    symbols = [f'S{i}USDT' for i in range(20)]
+    positions = random_positions(600, symbols, seed=1)
+    index = build_index(positions)
+    assert len(index) == sum(1 for p in positions.values() if p.stop_loss_price or p.take_profit_price)
+    
+    rng = random.Random(2)
+    for _ in range(200):
+        symbol = rng.choice(symbols)
+        price = rng.uniform(85, 115)
+        triggers = index.crossed(symbol, price)
+        expected = {
+            order_id for order_id, p in positions.items()
+            if p.symbol == symbol and p.should_close(price)
+        }
+        assert {t.position_id for t in triggers} == expected
+        
+        for trigger in triggers:
+            position = positions[trigger.position_id]
+            stop_hit = position.stop_loss_price is not None and (
+                price <= position.stop_loss_price if position.side == OrderSide.LONG
+                else price >= position.stop_loss_price
+            )
+            assert (trigger.kind == 'STOP_LOSS') == stop_hit
+    
+    # 止损和止盈价位重叠时（价格跳空）优先止损
+    overlap = TriggerIndex()
+    overlap.add('x', 'BTCUSDT', 'LONG', stop_loss_price=100.0, take_profit_price=90.0)
+    assert [t.kind for t in overlap.crossed('BTCUSDT', 95.0)] == ['STOP_LOSS']
+    
+    logger.info("✓ 测试通过: 与 should_close 一致")
+
+
+def test_add_remove():
+    """测试移除、重复加入和相同价位"""
+    index = TriggerIndex()
+    index.add('a', 'BTCUSDT', 'LONG', stop_loss_price=95.0)
+    index.add('b', 'BTCUSDT', 'LONG', stop_loss_price=95.0)
+    index.add('c', 'BTCUSDT', 'SHORT', stop_loss_price=105.0, take_profit_price=95.0)
+    index.add('d', 'ETHUSDT', 'LONG')       # 没有价位，不进入索引
+    
+    assert len(index) == 3 and 'd' not in index
+    assert index.symbols() == ['BTCUSDT']
+    assert {t.position_id for t in index.crossed('BTCUSDT', 95.0)} == {'a', 'b', 'c'}
+    assert index.crossed('BTCUSDT', 100.0) == []
+    
+    # 重新加入时替换旧价位
+    index.add('a', 'BTCUSDT', 'LONG', stop_loss_price=90.0)
+    assert {t.position_id for t in index.crossed('BTCUSDT', 94.0)} == {'b', 'c'}
+    
+    assert index.remove('b') and not index.remove('b')
+    popped = index.pop_crossed('BTCUSDT', 94.0)
+    assert [t.position_id for t in popped] == ['c'] and popped[0].kind == 'TAKE_PROFIT'
+    assert index.crossed('BTCUSDT', 200.0) == []   # c 的止损价位随持仓一起移除
+    
+    assert index.remove('a') and len(index) == 0 and index.symbols() == []
+    
+    logger.info("✓ 测试通过: 移除和重复加入")
+
+
+def test_monitor_cycle():
+    """测试批量价格和大量持仓"""
+    symbols = [f'S{i}USDT' for i in range(40)]
+    rng = random.Random(3)
+    prices = {symbol: rng.uniform(88, 112) for symbol in symbols}
+    client = FakeClient(prices)
+    handler = make_handler(client)
+    
+    positions = random_positions(500, symbols, seed=4)
+    handler.manual_positions.update(positions)
+    expected = {order_id for order_id, p in positions.items() if p.should_close(prices[p.symbol])}
+    assert expected
+    
+    start = time.perf_counter()
+    handler._sync_trigger_index()
+    handler._check_triggers()
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    handler._close_executor.shutdown(wait=True)
+    
+    assert client.ticker_requests == 1
+    assert len(client.closed) == len(expected)
+    assert set(handler.manual_positions) == set(positions) - expected
+    assert not handler._closing
+    assert elapsed_ms < handler.check_interval * 1000 / 10, f"检查耗时 {elapsed_ms:.0f}ms"
+    
+    # 剩余持仓在当前价格下不再触发
+    handler._close_executor = type(handler._close_executor)(max_workers=2)
+    handler._check_triggers()
+    handler._close_executor.shutdown(wait=True)
+    assert client.ticker_requests == 2 and len(client.closed) == len(expected)
+    
+    logger.info(f"✓ 测试通过: 500 个持仓 / 40 个交易对，1 次价格请求，检查耗时 {elapsed_ms:.1f}ms")
+
+
+def test_protected_positions():
+    """测试交易所条件单覆盖的持仓"""
+    client = FakeClient({'BTCUSDT': 100.0})
+    manager = ProtectiveOrderManager(client)
+    handler = make_handler(client, protective_orders=manager)
+    
+    position = ManualPosition(order_id='1', symbol='BTCUSDT', side=OrderSide.LONG, entry_price=100.0,
+                              quantity=1.0, leverage=3, stop_loss_price=95.0)
+    handler.manual_positions['1'] = position
+    protection = manager.place('manual:1', 'BTCUSDT', 'LONG', 1.0, stop_loss_price=95.0)
+    
+    handler._sync_trigger_index()
+    assert '1' not in handler.trigger_index
+    
+    # 条件单被外部撤销后改为本地监控
+    manager._apply_status(protection.stop_loss_order_id, 'CANCELED')
+    handler._sync_trigger_index()
+    assert '1' in handler.trigger_index
+    
+    manager.shutdown()
+    handler._close_executor.shutdown(wait=True)
+    logger.info("✓ 测试通过: 交易所条件单覆盖的持仓")
+
+
+def test_concurrent_close():
+    """测试触发平仓和 API 平仓不重复下单"""
+    client = FakeClient({'BTCUSDT': 94.0})
+    release = threading.Event()
+    sending = threading.Event()
+    place_order = client.place_order
+    
+    def slow_place_order(*args, **kwargs):
+        sending.set()
+        release.wait(5)
+        return place_order(*args, **kwargs)
+    
+    client.place_order = slow_place_order
+    handler = make_handler(client)
+    
+    def add_position():
+        handler.manual_positions['1'] = ManualPosition(
+            order_id='1', symbol='BTCUSDT', side=OrderSide.LONG, entry_price=100.0,
+            quantity=1.0, leverage=3, stop_loss_price=95.0
+        )
+        handler._sync_trigger_index()
+    
+    # 触发平仓正在下单时，API 平仓直接返回
+    add_position()
+    handler._check_triggers()
+    assert sending.wait(5)
+    assert handler.close_position_by_id('1') is False
+    release.set()
+    handler._close_executor.shutdown(wait=True)
+    assert client.closed == ['BTCUSDT']
+    assert '1' not in handler.manual_positions and not handler._closing
+    
+    # API 平仓正在下单时，触发的价位不再提交平仓
+    release.clear()
+    sending.clear()
+    handler._close_executor = type(handler._close_executor)(max_workers=2)
+    add_position()
+    api_close = threading.Thread(target=lambda: handler.close_position_by_id('1'))
+    api_close.start()
+    assert sending.wait(5)
+    handler._check_triggers()
+    release.set()
+    api_close.join(timeout=5)
+    handler._close_executor.shutdown(wait=True)
+    assert client.closed == ['BTCUSDT', 'BTCUSDT']
+    assert '1' not in handler.manual_positions and not handler._closing
+    
+    logger.info("✓ 测试通过: 触发平仓和 API 平仓不重复下单")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_matches_should_close,
+        test_add_remove,
+        test_monitor_cycle,
+        test_protected_positions,
+        test_concurrent_close
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+测试滚动窗口优化
+
+这个脚本验证：
+1. 滚动窗口的样本内 / 样本外边界正确
+2. 多进程与单进程结果一致，均线只计算一次（窗口使用完整历史均线的切片）
+3. 推荐参数文件可以被 load_strategy_parameters 加载并用于创建 DoubleMaStrategy
+"""
+
+import sys
+import os
+import tempfile
+
+# 添加项目路径
+sys.path.insert(0, os.path.join(os.path.dirname(__file__)))
+
+import numpy as np
+
+from src.backtest import (
+    DoubleMaBacktester,
+    WalkForwardOptimizer,
+    grid,
+    make_windows,
+    load_strategy_parameters
+)
+from src.backtest.walk_forward import _IndicatorCache, _window_slices
+from src.market.kline_decoder import KLINE_DTYPE
+from src.strategies.double_ma import DoubleMaStrategy
+import logging
+
+# 设置日志
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s [%(levelname)s] %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+logging.getLogger('trading_bot').setLevel(logging.ERROR)
+
+BAR_MS = 15 * 60 * 1000
+DAY_MS = 24 * 60 * 60 * 1000
+
+SPACE = {
+    'sma_periods': [[10, 30, 90], [20, 60, 120]],
+    'ema_periods': [[20, 60, 120]],
+    'convergence_threshold': [1.5, 3.0],
+    'breakout_confirmation_minutes': [30]
+}
+
+
+def make_bars(count, volatility, seed, offset=0):
+    """生成几何随机游走K线"""
+    rng = np.random.default_rng(seed)
+    bars = np.zeros(count, dtype=KLINE_DTYPE)
+    start = 1600000000000 // DAY_MS * DAY_MS + offset * BAR_MS
+    bars['open_time'] = start + np.arange(count, dtype=np.int64) * BAR_MS
+    bars['close_time'] = bars['open_time'] + BAR_MS - 1
+    close = 100 * np.exp(np.cumsum(rng.normal(0, volatility, count)))
+    bars['close'] = close
+    bars['open'] = np.concatenate(([close[0]], close[:-1]))
+    bars['high'] = np.maximum(bars['open'], close)
+    bars['low'] = np.minimum(bars['open'], close)
+    return bars
+
+
+UNIVERSE = {
+    'AAAUSDT': make_bars(40 * 96, 0.010, 1),
+    'BBBUSDT': make_bars(36 * 96, 0.012, 2, offset=4 * 96)   # 晚 4 天上市
+}
+
+
+def test_make_windows():
+    """测试窗口划分"""
+    windows = make_windows(0, 40 * DAY_MS, 10 * DAY_MS, 5 * DAY_MS)
+    assert len(windows) == 6
+    assert windows[0].in_sample_start == 0
+    assert windows[0].in_sample_end == 10 * DAY_MS
+    assert windows[0].out_of_sample_end == 15 * DAY_MS
+    assert windows[1].in_sample_start == 5 * DAY_MS
+    assert windows[-1].out_of_sample_end == 40 * DAY_MS
+    
+    assert len(make_windows(0, 40 * DAY_MS, 10 * DAY_MS, 5 * DAY_MS, step_ms=10 * DAY_MS)) == 3
+    assert make_windows(0, 12 * DAY_MS, 10 * DAY_MS, 5 * DAY_MS) == []
+    
+    logger.info("✓ 测试通过: 窗口划分")
+
+
+def test_parallel_matches_serial():
+    """测试多进程与单进程一致，均线缓存只计算一次"""
+    combos = grid(SPACE)
+    with tempfile.TemporaryDirectory() as tmp:
+        serial = WalkForwardOptimizer('15m', in_sample_days=10, out_of_sample_days=5, data_dir=tmp, workers=1)
+        serial.load(UNIVERSE)
+        serial_result = serial.run(combos, output='', parameters_output='')
+        
+        # 9 条不同的均线（6 条 SMA、3 条 EMA）× 2 个交易对；再次计算时全部命中缓存
+        assert serial_result.stats['indicator_series_computed'] == 18
+        assert serial.precompute(combos) == 0
+        
+        # 窗口内的回测等于用完整历史均线切片直接回测
+        window = serial.windows()[2]
+        params = combos[1]
+        klines = {s: np.load(p) for s, p in serial.sweep.price_files.items()}
+        slices = _window_slices(klines, window.in_sample_start, window.in_sample_end)
+        cache = _IndicatorCache(serial.ma_files)
+        strategy = DoubleMaStrategy(**params)
+        expected = DoubleMaBacktester(strategy=strategy).run_many(
+            {s: klines[s][w] for s, w in slices.items()},
+            '15m',
+            {
+                s: {name: values[w] for name, values in strategy.engine.compute_series(klines[s]['close'])['mas'].items()}
+                for s, w in slices.items()
+            }
+        )
+        actual = DoubleMaBacktester(strategy=strategy).run_many(
+            {s: klines[s][w] for s, w in slices.items()},
+            '15m',
+            {
+                s: {f'{kind}_{p}': cache.get(s, kind, p)[w]
+                    for kind in ('sma', 'ema') for p in params[f'{kind}_periods']}
+                for s, w in slices.items()
+            }
+        )
+        assert actual.stats == expected.stats
+        
+        parallel = WalkForwardOptimizer('15m', in_sample_days=10, out_of_sample_days=5, data_dir=tmp, workers=2)
+        parallel.load(UNIVERSE)
+        parallel_result = parallel.run(combos, output='', parameters_output='')
+    
+    assert len(serial_result.windows) == 6
+    assert serial_result.windows == parallel_result.windows
+    assert serial_result.stability == parallel_result.stability
+    assert serial_result.parameters == parallel_result.parameters
+    
+    logger.info("✓ 测试通过: 多进程与单进程一致")
+
+
+def test_parameters_file():
+    """测试推荐参数文件"""
+    with tempfile.TemporaryDirectory() as tmp:
+        optimizer = WalkForwardOptimizer('15m', in_sample_days=10, out_of_sample_days=5, data_dir=tmp, workers=1)
+        optimizer.load(UNIVERSE)
+        result = optimizer.run(grid(SPACE))
+        
+        assert os.path.exists(result.report_path)
+        assert result.parameters_path == os.path.join(tmp, 'parameters_15m.json')
+        
+        valid = [w for w in result.windows if w.get('best_params')]
+        assert result.stability['valid_windows'] == len(valid) > 0
+        assert sum(s['windows'] for s in result.stability['selections']) == len(valid)
+        assert result.parameters in [w['best_params'] for w in valid]
+        
+        params = load_strategy_parameters(result.parameters_path, '15m')
+        assert params == result.parameters
+        strategy = DoubleMaStrategy(**params)
+        assert strategy.sma_periods == result.parameters['sma_periods']
+        
+        try:
+            load_strategy_parameters(result.parameters_path, '4h')
+            assert False, "K线间隔不一致时应该拒绝加载"
+        except ValueError:
+            pass
+    
+    logger.info("✓ 测试通过: 推荐参数文件")
+
+
+def main():
+    """运行所有测试"""
+    tests = [
+        test_make_windows,
+        test_parallel_matches_serial,
+        test_parameters_file
+    ]
+    
+    failed = 0
+    for test_func in tests:
+        try:
+            test_func()
+        except Exception as e:
+            logger.error(f"✗ 测试 {test_func.__name__} 失败: {e}")
+            failed += 1
+    
+    logger.info(f"\n总计: {len(tests) - failed}/{len(tests)} 测试通过")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())